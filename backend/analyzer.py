@@ -5,7 +5,7 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any, Literal
 from pydantic import BaseModel, Field
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from modules.llm_gateway import get_llm_gateway
 
 # ============================================
 # BASE DE DONNÉES INTERNE - INGRÉDIENTS
@@ -497,15 +497,12 @@ class EmailConsent(BaseModel):
 class ProductAnalyzer:
     def __init__(self, api_key: str):
         self.api_key = api_key
-        self.chat = LlmChat(
-            api_key=api_key,
-            session_id=f"analyzer_{uuid.uuid4().hex[:8]}",
-            system_message="""Tu es un expert scientifique en attractants pour la chasse au Québec et en Amérique du Nord.
+        self.llm = get_llm_gateway()
+        self.system_message = """Tu es un expert scientifique en attractants pour la chasse au Québec et en Amérique du Nord.
             Tu analyses les produits de manière impartiale et scientifique basé sur 13 critères d'évaluation.
             Tu dois fournir des analyses détaillées basées sur les ingrédients, la composition chimique et les conditions d'utilisation.
             Tu prends en compte l'espèce cible, la saison de chasse, les conditions météorologiques et le type d'habitat.
             Réponds toujours en JSON valide."""
-        ).with_model("openai", "gpt-5.2")
     
     def detect_category(self, product_name: str) -> str:
         """Détecte automatiquement la catégorie du produit"""
@@ -714,7 +711,14 @@ Fournis une analyse JSON avec cette structure exacte:
 Sois précis et scientifique. Si des informations sont estimées, indique-le dans les notes."""
 
         try:
-            response = await self.chat.send_message(UserMessage(text=analysis_prompt))
+            response = await self.llm.complete(
+                analysis_prompt,
+                system_message=self.system_message,
+                feature="product_analysis",
+                provider="openai",
+                model="gpt-5.2",
+                api_key=self.api_key
+            )
             
             # Parser la réponse JSON
             # Nettoyer la réponse si nécessaire
@@ -1517,7 +1517,7 @@ async def ai_adjust_score(request: HybridAIRequest):
         from dotenv import load_dotenv
         load_dotenv()
         
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        from modules.llm_gateway import get_llm_gateway
         
         api_key = os.environ.get("EMERGENT_LLM_KEY")
         if not api_key:
@@ -1566,16 +1566,15 @@ RÉPONDS UNIQUEMENT AU FORMAT JSON SUIVANT (sans markdown):
 {{"adjustment": <entier entre -15 et +15>, "recommendations": ["rec1", "rec2", "rec3"], "confidence": <0.0-1.0>, "reasoning": "<explication courte>"}}
 """
 
-        # Initialize chat
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"bionic-adjust-{datetime.now().timestamp()}",
-            system_message="Tu es un expert en analyse de territoire de chasse. Réponds uniquement en JSON valide sans formatage markdown."
-        ).with_model("openai", "gpt-4o")
-        
-        # Send message
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        # Send message through the shared LLM gateway
+        response = await get_llm_gateway().complete(
+            prompt,
+            system_message="Tu es un expert en analyse de territoire de chasse. Réponds uniquement en JSON valide sans formatage markdown.",
+            feature="bionic_adjust",
+            provider="openai",
+            model="gpt-4o",
+            api_key=api_key
+        )
         
         # Parse response
         import json
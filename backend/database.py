@@ -170,6 +170,10 @@ async def init_database():
         # Users collection
         await db.users.create_index("email", unique=True)
         await db.users.create_index("username")
+        await db.users.create_index("user_id")
+        
+        # Revoked tokens (principal cache), purged at token expiry
+        await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
         
         # Products collection
         await db.products.create_index("category")
@@ -14,6 +14,8 @@ import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 
+from flag_snapshot import flag_snapshot
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -283,21 +285,16 @@ class FeatureLogEntry(BaseModel):
 # ============================================
 
 async def get_feature_status(feature_id: str) -> bool:
-    """Get the current status of a feature (enabled/disabled)"""
-    database = await get_db()
-    
+    """Get the current status of a feature (enabled/disabled) from the flag snapshot"""
     # Check if feature exists in definitions
     if feature_id not in FEATURE_DEFINITIONS:
         return False
     
-    # Check database for override
-    feature_doc = await database.feature_controls.find_one({"feature_id": feature_id}, {"_id": 0})
-    
-    if feature_doc:
-        return feature_doc.get("enabled", FEATURE_DEFINITIONS[feature_id]["default"])
+    # Loads once per process, then a dict lookup
+    if not flag_snapshot.loaded:
+        await flag_snapshot.ensure_loaded(await get_db())
     
-    # Return default value
-    return FEATURE_DEFINITIONS[feature_id]["default"]
+    return flag_snapshot.is_enabled(feature_id, FEATURE_DEFINITIONS[feature_id]["default"])
 
 
 async def is_feature_enabled(feature_id: str) -> bool:
@@ -305,6 +302,13 @@ async def is_feature_enabled(feature_id: str) -> bool:
     return await get_feature_status(feature_id)
 
 
+def feature_enabled_now(feature_id: str) -> bool:
+    """Synchronous check against the loaded snapshot (defaults until it is loaded)"""
+    if feature_id not in FEATURE_DEFINITIONS:
+        return False
+    return flag_snapshot.is_enabled(feature_id, FEATURE_DEFINITIONS[feature_id]["default"])
+
+
 async def log_feature_change(feature_id: str, old_value: bool, new_value: bool, 
                              changed_by: str, reason: Optional[str] = None):
     """Log a feature change to the audit log"""
@@ -340,11 +344,10 @@ async def get_feature_definitions():
 @feature_controls_router.get("/status")
 async def get_all_feature_status():
     """Get current status of all features"""
-    database = await get_db()
+    snapshot = await flag_snapshot.ensure_loaded(await get_db())
     
-    # Get all overrides from database
-    overrides = await database.feature_controls.find({}, {"_id": 0}).to_list(100)
-    override_map = {doc["feature_id"]: doc["enabled"] for doc in overrides}
+    # Overrides come from the in-process snapshot
+    override_map = snapshot.features
     
     # Build status map
     status = {}
@@ -366,7 +369,8 @@ async def get_all_feature_status():
             "total": len(status),
             "enabled": enabled_count,
             "disabled": disabled_count
-        }
+        },
+        "snapshot_version": snapshot.version
     }
 
 
@@ -412,6 +416,7 @@ async def toggle_feature(
         },
         upsert=True
     )
+    flag_snapshot.apply_features({request.feature_id: request.enabled})
     
     # Log the change
     await log_feature_change(
@@ -439,6 +444,7 @@ async def toggle_features_bulk(
     database = await get_db()
     
     results = []
+    applied = {}
     for feature_id, enabled in request.features.items():
         if feature_id not in FEATURE_DEFINITIONS:
             results.append({"feature_id": feature_id, "success": False, "error": "Feature not found"})
@@ -458,6 +464,7 @@ async def toggle_features_bulk(
             },
             upsert=True
         )
+        applied[feature_id] = enabled
         
         await log_feature_change(
             feature_id=feature_id,
@@ -469,6 +476,10 @@ async def toggle_features_bulk(
         
         results.append({"feature_id": feature_id, "success": True, "enabled": enabled})
     
+    # One snapshot swap for the whole batch
+    if applied:
+        flag_snapshot.apply_features(applied)
+    
     return {
         "success": True,
         "results": results,
@@ -489,6 +500,7 @@ async def reset_to_defaults(admin_email: str = Query(..., description="Admin ema
     
     # Delete all overrides
     await database.feature_controls.delete_many({})
+    flag_snapshot.apply_features({}, replace=True)
     
     # Log all changes
     for feature_id, old_value in current_statuses.items():
@@ -509,6 +521,12 @@ async def reset_to_defaults(admin_email: str = Query(..., description="Admin ema
     }
 
 
+@feature_controls_router.get("/snapshot")
+async def get_flag_snapshot_stats():
+    """Version and refresh mode of the in-process flag snapshot"""
+    return flag_snapshot.stats()
+
+
 @feature_controls_router.get("/logs")
 async def get_feature_logs(
     limit: int = Query(50, ge=1, le=500),
@@ -0,0 +1,246 @@
+"""
+Flag Snapshot Module
+- Immutable in-process map of feature flags and site/maintenance/master switches
+- Refreshed from a MongoDB change stream, with a polling fallback when the
+  server does not support change streams (standalone mongod)
+- Admin writes apply their change locally right away, so the process that
+  toggled a flag sees it on the very next request
+
+Lookups (is_enabled, document) are plain dict reads: no I/O once loaded.
+Every swap bumps the snapshot version; a reload that raced with a local
+change is discarded and retried so it cannot roll the change back.
+"""
+
+import asyncio
+import copy
+import logging
+import os
+import time
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+FLAG_POLL_INTERVAL = float(os.environ.get("FLAG_SNAPSHOT_POLL_INTERVAL", "5"))
+
+# Error returned by a standalone server for $changeStream
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+FEATURES_COLLECTION = "feature_controls"
+
+
+def _freeze(doc: Optional[dict]) -> Optional[Mapping]:
+    if doc is None:
+        return None
+    doc = {k: v for k, v in doc.items() if k != "_id"}
+    return MappingProxyType(copy.deepcopy(doc))
+
+
+class FlagSnapshot:
+    """One immutable view of every flag and switch document"""
+
+    __slots__ = ("version", "loaded_at", "features", "documents")
+
+    def __init__(self, version: int, features: Dict[str, bool], documents: Dict[str, Optional[dict]]):
+        self.version = version
+        self.loaded_at = time.time()
+        self.features = MappingProxyType(dict(features))
+        self.documents = MappingProxyType({name: _freeze(doc) for name, doc in documents.items()})
+
+    def content(self) -> tuple:
+        return dict(self.features), {k: dict(v) if v is not None else None for k, v in self.documents.items()}
+
+
+class FlagSnapshotService:
+    """
+    Holds the current FlagSnapshot and keeps it in step with MongoDB.
+
+    `singletons` maps a collection name to the filter of its single
+    config document (e.g. {"site_config": {"_id": "main"}}). With
+    `features=True` the feature_controls overrides are loaded as well.
+    """
+
+    def __init__(self, singletons: Dict[str, dict], features: bool = False,
+                 poll_interval: float = FLAG_POLL_INTERVAL):
+        self.singletons = singletons
+        self.with_features = features
+        self.poll_interval = poll_interval
+        self._snapshot: Optional[FlagSnapshot] = None
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.mode = "idle"
+        self.reloads = 0
+        self.local_updates = 0
+
+    # ----- reads -----
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def snapshot(self) -> FlagSnapshot:
+        if self._snapshot is None:
+            raise RuntimeError("Flag snapshot not loaded")
+        return self._snapshot
+
+    async def ensure_loaded(self, db) -> FlagSnapshot:
+        """First call loads from MongoDB; every later call is I/O free"""
+        if self._snapshot is None:
+            await self.refresh(db)
+        return self._snapshot
+
+    def is_enabled(self, feature_id: str, default: bool = False) -> bool:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return default
+        return snapshot.features.get(feature_id, default)
+
+    def document(self, name: str) -> Optional[dict]:
+        """Mutable copy of a singleton document (None if it does not exist yet)"""
+        doc = self.snapshot.documents.get(name)
+        return copy.deepcopy(dict(doc)) if doc is not None else None
+
+    # ----- writes -----
+
+    def _swap(self, features: Dict[str, bool], documents: Dict[str, Optional[dict]]):
+        self._version += 1
+        self._snapshot = FlagSnapshot(self._version, features, documents)
+
+    def apply_features(self, changes: Dict[str, bool], replace: bool = False):
+        """Apply feature overrides written by this process (replace=True drops all others)"""
+        if self._snapshot is None:
+            return
+        features, documents = self._snapshot.content()
+        if replace:
+            features = {}
+        features.update(changes)
+        self.local_updates += 1
+        self._swap(features, documents)
+
+    def apply_document(self, name: str, doc: Optional[dict]):
+        """Replace one singleton document after this process wrote it"""
+        if self._snapshot is None:
+            return
+        features, documents = self._snapshot.content()
+        documents[name] = doc
+        self.local_updates += 1
+        self._swap(features, documents)
+
+    async def _load(self, db):
+        names = list(self.singletons)
+        reads = [db[name].find_one(self.singletons[name]) for name in names]
+        if self.with_features:
+            reads.append(db[FEATURES_COLLECTION].find({}, {"_id": 0, "feature_id": 1, "enabled": 1}).to_list(None))
+        results = await asyncio.gather(*reads)
+        documents = dict(zip(names, results[:len(names)]))
+        features = {}
+        if self.with_features:
+            features = {d["feature_id"]: bool(d.get("enabled")) for d in results[-1] if d.get("feature_id")}
+        return features, documents
+
+    async def refresh(self, db, attempts: int = 3) -> bool:
+        """
+        Reload everything from MongoDB. Swaps (and bumps the version) only
+        when the content changed. Returns True on swap.
+        """
+        async with self._lock:
+            for _ in range(attempts):
+                started_at = self._version
+                features, documents = await self._load(db)
+                if self._version != started_at:
+                    # A local change landed during the read: the result may predate it
+                    continue
+                self.reloads += 1
+                fresh = FlagSnapshot(0, features, documents).content()
+                if self._snapshot is not None and fresh == self._snapshot.content():
+                    return False
+                self._swap(features, documents)
+                return True
+            return False
+
+    # ----- background refresh -----
+
+    async def start(self, db):
+        """
+        Initial load, then background refresh. The refresh loop is scheduled
+        even if the initial load fails: it keeps retrying, and until then
+        ensure_loaded() reads from MongoDB on demand.
+        """
+        try:
+            await self.refresh(db)
+        except PyMongoError as e:
+            logger.warning(f"Initial flag snapshot load failed, retrying in background: {e}")
+        finally:
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "idle"
+
+    async def _run(self, db):
+        collections = list(self.singletons) + ([FEATURES_COLLECTION] if self.with_features else [])
+        pipeline = [{"$match": {"ns.coll": {"$in": collections}}}]
+        while True:
+            try:
+                async with db.watch(pipeline) as stream:
+                    self.mode = "change_stream"
+                    # Catch up on anything written before the stream opened
+                    await self.refresh(db)
+                    async for _change in stream:
+                        await self.refresh(db)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED or "replica set" in str(e):
+                    logger.info("Change streams unavailable, polling flags every %ss", self.poll_interval)
+                    await self._poll(db)
+                    return
+                logger.warning(f"Flag change stream failed: {e}")
+            except PyMongoError as e:
+                logger.warning(f"Flag change stream interrupted: {e}")
+            self.mode = "reconnecting"
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self, db):
+        self.mode = "polling"
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh(db)
+            except PyMongoError as e:
+                logger.warning(f"Flag snapshot poll failed: {e}")
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "loaded": snapshot is not None,
+            "version": snapshot.version if snapshot else 0,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "mode": self.mode,
+            "reloads": self.reloads,
+            "local_updates": self.local_updates,
+            "features_overridden": len(snapshot.features) if snapshot else 0
+        }
+
+
+# Feature controls, site access and maintenance share DB_NAME "bionic_territory"
+flag_snapshot = FlagSnapshotService(
+    singletons={"site_config": {"_id": "main"}, "maintenance_mode": {"_id": "config"}},
+    features=True
+)
+
+# Global master switch lives in its own module database
+switch_snapshot = FlagSnapshotService(
+    singletons={"global_master_switch": {"switch_id": "BIONIC_GLOBAL"}, "ad_master_switch": {"switch_id": "global"}}
+)
@@ -6,6 +6,7 @@ Endpoints:
 - GET /api/hydro/water-features - Récupère les surfaces d'eau d'une zone
 - POST /api/hydro/check-point - Vérifie si un point est dans l'eau
 - GET /api/hydro/sources - Liste les sources hydrographiques disponibles
+- GET /api/hydro/cache/stats - État du cache mémoire et des tuiles sur disque
 
 Sources officielles supportées:
 - Québec: Hydrographie MRNF/MSP (WFS)
@@ -27,6 +28,7 @@ from hydrography_service import (
     is_point_in_water,
     get_water_exclusion_stats,
     detect_region,
+    get_hydro_cache_stats,
     SHORE_TOLERANCE_METERS,
     WATER_TYPES,
     HYDRO_SERVICES,
@@ -249,6 +251,13 @@ async def get_hydro_sources():
         "fallback": "OpenStreetMap est utilisé si aucune source officielle n'est disponible"
     }
 
+@router.get("/cache/stats")
+async def get_hydro_cache_status():
+    """
+    Retourne l'état du cache mémoire et du stockage de tuiles persistant
+    """
+    return get_hydro_cache_stats()
+
 @router.get("/sources/detect")
 async def detect_sources_for_location(lat: float, lng: float):
     """
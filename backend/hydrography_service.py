@@ -22,11 +22,17 @@ import math
 import logging
 import asyncio
 import httpx
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional, Set
 from datetime import datetime, timedelta
 from functools import lru_cache
 from enum import Enum
 
+from hydrography_tiles import (
+    HydroTileStore, bbox_around, tiles_for_bbox, tiles_envelope, bbox_center_radius,
+    split_into_tiles, feature_bbox, bboxes_intersect, MAX_TILES_PER_QUERY
+)
+
 logger = logging.getLogger(__name__)
 
 # ============================================
@@ -39,12 +45,23 @@ SHORE_TOLERANCE_METERS = 5
 # Cache des données hydrographiques (durée en secondes)
 HYDRO_CACHE_DURATION = 3600  # 1 heure
 
+# Réponse partielle (source officielle en échec ou annulée): gardée peu
+# de temps en mémoire et jamais persistée en tuiles
+HYDRO_PARTIAL_CACHE_DURATION = 300  # 5 minutes
+
 # Rayon de recherche pour les données hydrographiques (mètres)
 HYDRO_SEARCH_RADIUS = 5000  # 5 km
 
 # Timeout pour les requêtes API (secondes)
 API_TIMEOUT = 15
 
+# Nombre maximal d'entrées du cache mémoire (par worker)
+HYDRO_CACHE_MAX_ENTRIES = 512
+
+# Délai de fusion: après le premier résultat officiel avec des surfaces,
+# les autres sources officielles ont ce délai pour répondre (secondes)
+HYDRO_MERGE_GRACE = 1.5
+
 # ============================================
 # SOURCES HYDROGRAPHIQUES OFFICIELLES
 # ============================================
@@ -146,11 +163,12 @@ OSM_WATER_TAGS = [
 # ============================================
 
 class HydrographyCache:
-    """Cache en mémoire pour les données hydrographiques"""
+    """Cache en mémoire (LRU borné) pour les données hydrographiques"""
     
-    def __init__(self):
-        self._cache: Dict[str, dict] = {}
-        self._timestamps: Dict[str, datetime] = {}
+    def __init__(self, max_entries: int = HYDRO_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._expires: Dict[str, datetime] = {}
     
     def _get_cache_key(self, lat: float, lng: float, radius: float) -> str:
         """Génère une clé de cache basée sur la position (arrondie)"""
@@ -163,29 +181,40 @@ class HydrographyCache:
         """Récupère les données du cache si disponibles et non expirées"""
         key = self._get_cache_key(lat, lng, radius)
         if key in self._cache:
-            timestamp = self._timestamps.get(key)
-            if timestamp and (datetime.now() - timestamp).total_seconds() < HYDRO_CACHE_DURATION:
+            expires = self._expires.get(key)
+            if expires and datetime.now() < expires:
+                self._cache.move_to_end(key)
                 return self._cache[key]
             else:
                 # Cache expiré
                 del self._cache[key]
-                del self._timestamps[key]
+                self._expires.pop(key, None)
         return None
     
-    def set(self, lat: float, lng: float, radius: float, data: dict):
-        """Stocke les données dans le cache"""
+    def set(self, lat: float, lng: float, radius: float, data: dict, ttl: float = HYDRO_CACHE_DURATION):
+        """Stocke les données dans le cache pour ttl secondes"""
         key = self._get_cache_key(lat, lng, radius)
         self._cache[key] = data
-        self._timestamps[key] = datetime.now()
+        self._cache.move_to_end(key)
+        self._expires[key] = datetime.now() + timedelta(seconds=ttl)
+        while len(self._cache) > self.max_entries:
+            oldest, _ = self._cache.popitem(last=False)
+            self._expires.pop(oldest, None)
     
     def clear(self):
         """Vide le cache"""
         self._cache.clear()
-        self._timestamps.clear()
+        self._expires.clear()
 
 # Instance globale du cache
 _hydro_cache = HydrographyCache()
 
+# Stockage persistant par tuile (partagé entre workers)
+_tile_store = HydroTileStore()
+
+# Persistances de tuiles en attente de sources officielles lentes
+_late_persists: Set[asyncio.Task] = set()
+
 # ============================================
 # FONCTIONS GÉOMÉTRIQUES
 # ============================================
@@ -526,10 +555,169 @@ async def fetch_water_features_osm_with_retry(lat: float, lng: float, radius_met
 # FONCTION PRINCIPALE - MULTI-SOURCE
 # ============================================
 
+# Fonctions de récupération et délai maximal par source (secondes)
+SOURCE_FETCHERS = {
+    HydroSource.QUEBEC_MRNF: fetch_water_features_quebec,
+    HydroSource.CANADA_CANVEC: fetch_water_features_canada,
+    HydroSource.USA_NHD: fetch_water_features_usa,
+    HydroSource.OSM_FALLBACK: fetch_water_features_osm_with_retry  # Avec retry
+}
+
+SOURCE_DEADLINES = {
+    HydroSource.QUEBEC_MRNF: 8.0,
+    HydroSource.CANADA_CANVEC: 8.0,
+    HydroSource.USA_NHD: 10.0,
+    HydroSource.OSM_FALLBACK: 25.0
+}
+
+async def _fetch_source(source: HydroSource, lat: float, lng: float, radius_meters: float) -> Dict:
+    """Une source, bornée par son délai; ne lève jamais d'exception"""
+    try:
+        return await asyncio.wait_for(
+            SOURCE_FETCHERS[source](lat, lng, radius_meters),
+            timeout=SOURCE_DEADLINES.get(source, API_TIMEOUT)
+        )
+    except asyncio.TimeoutError:
+        return {"features": [], "source": source.value, "success": False, "error": "deadline exceeded"}
+    except Exception as e:
+        logger.warning(f"Source {source.value} failed: {e}")
+        return {"features": [], "source": source.value, "success": False, "error": str(e)}
+
+def _merge_official(official: List[Dict]) -> Tuple[List[Dict], List[str]]:
+    """Surfaces des sources officielles, par ordre de priorité"""
+    priority = {source.value: config["priority"] for source, config in HYDRO_SERVICES.items()}
+    features: List[Dict] = []
+    sources_used: List[str] = []
+    for result in sorted(official, key=lambda r: priority.get(r.get("source"), 99)):
+        features.extend(result["features"])
+        sources_used.append(result["source"])
+    return features, sources_used
+
+async def fetch_sources_concurrently(
+    lat: float, lng: float, radius_meters: float, sources: List[HydroSource],
+    keep_late: bool = False
+) -> Dict:
+    """
+    Interroge toutes les sources en parallèle, chacune avec son délai.
+    
+    - OSM n'est retenu que si aucune source officielle n'a de surfaces:
+      il est annulé dès qu'une source officielle en renvoie
+    - Le premier résultat officiel avec des surfaces ouvre un délai de
+      fusion (HYDRO_MERGE_GRACE); les sources encore en cours sont ensuite
+      annulées, ou laissées en cours avec keep_late (clé "late")
+    - complete: toutes les sources officielles ont répondu sans erreur
+      (OSM seul s'il n'y a aucune source officielle pour la région)
+    
+    Returns:
+        {"features", "sources_used", "errors", "any_success", "complete",
+         "official", "late"}
+    """
+    tasks = {
+        asyncio.ensure_future(_fetch_source(source, lat, lng, radius_meters)): source
+        for source in sources if source in SOURCE_FETCHERS
+    }
+    official: List[Dict] = []
+    osm_result: Optional[Dict] = None
+    errors: List[str] = []
+    any_success = False
+    answered: Set[HydroSource] = set()
+    expected = {s for s in tasks.values() if s != HydroSource.OSM_FALLBACK} or set(tasks.values())
+    late: Dict[asyncio.Future, HydroSource] = {}
+    grace_deadline = None
+    loop = asyncio.get_running_loop()
+    
+    try:
+        pending = set(tasks)
+        while pending:
+            timeout = None if grace_deadline is None else max(0.0, grace_deadline - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Délai de fusion écoulé: si seules les sources en cours manquent
+                # aux tuiles, elles peuvent finir sans retenir la réponse
+                if keep_late and expected <= answered | {tasks[t] for t in pending}:
+                    late = {t: tasks[t] for t in pending if tasks[t] != HydroSource.OSM_FALLBACK}
+                for task in pending:
+                    state = "not awaited" if task in late else "cancelled"
+                    errors.append(f"{tasks[task].value}: {state} after first sufficient result")
+                break
+            
+            for task in done:
+                source = tasks[task]
+                result = task.result()
+                if result.get("success"):
+                    any_success = True
+                    answered.add(source)
+                elif result.get("error"):
+                    errors.append(f"{source.value}: {result['error']}")
+                
+                if source == HydroSource.OSM_FALLBACK:
+                    osm_result = result
+                elif result.get("success") and result.get("features"):
+                    official.append(result)
+                    logger.info(f"Source {source.value}: {len(result['features'])} features")
+                    if grace_deadline is None:
+                        grace_deadline = loop.time() + HYDRO_MERGE_GRACE
+            
+            if official:
+                # OSM ne servira pas: inutile de l'attendre
+                for task in [t for t in pending if tasks[t] == HydroSource.OSM_FALLBACK]:
+                    task.cancel()
+                    pending.discard(task)
+    finally:
+        for task in tasks:
+            if not task.done() and task not in late:
+                task.cancel()
+    
+    features: List[Dict] = []
+    sources_used: List[str] = []
+    if official:
+        features, sources_used = _merge_official(official)
+    elif osm_result and osm_result.get("success") and osm_result.get("features"):
+        features = osm_result["features"]
+        sources_used.append("osm_fallback")
+    
+    complete = bool(expected) and expected <= answered
+    
+    return {
+        "features": features, "sources_used": sources_used, "errors": errors,
+        "any_success": any_success, "complete": complete,
+        "official": official, "late": late
+    }
+
+async def _persist_after_late_sources(fetched: Dict, missing: List) -> None:
+    """
+    Attend les sources officielles laissées en cours après le délai de
+    fusion (chacune bornée par son délai) et persiste les tuiles si toutes
+    ont répondu: la réponse n'a pas attendu, le stockage reste complet.
+    """
+    late = fetched["late"]
+    try:
+        results = await asyncio.gather(*late)
+    finally:
+        for task in late:
+            task.cancel()
+    
+    failed = [r.get("source") for r in results if not r.get("success")]
+    if failed:
+        logger.info(f"Hydro tiles not persisted, late sources failed: {failed}")
+        return
+    
+    features, sources_used = _merge_official(fetched["official"] + [r for r in results if r.get("features")])
+    await _tile_store.put_many(split_into_tiles(deduplicate_features(features), missing), sources_used)
+
+def _schedule_late_persist(fetched: Dict, missing: List) -> None:
+    task = asyncio.create_task(_persist_after_late_sources(fetched, missing))
+    _late_persists.add(task)
+    task.add_done_callback(_late_persists.discard)
+
 async def fetch_water_features_multi_source(lat: float, lng: float, radius_meters: float = HYDRO_SEARCH_RADIUS) -> Dict:
     """
     Récupère les surfaces d'eau depuis les sources officielles appropriées à la région.
-    Utilise un système de fallback: sources officielles → OSM global
+    
+    1. Cache mémoire (par worker)
+    2. Stockage de tuiles sur disque (partagé, persistant)
+    3. Tuiles manquantes: une seule requête couvrant leur enveloppe,
+       toutes sources en parallèle (sources officielles → OSM global)
     
     Args:
         lat: Latitude du centre
@@ -549,54 +737,47 @@ async def fetch_water_features_multi_source(lat: float, lng: float, radius_meter
     sources = detect_region(lat, lng)
     logger.info(f"Detected hydro sources for ({lat:.4f}, {lng:.4f}): {[s.value for s in sources]}")
     
-    all_features = []
-    sources_used = []
-    errors = []
-    osm_tried = False
-    
-    # Mapper les sources aux fonctions de fetch
-    fetch_functions = {
-        HydroSource.QUEBEC_MRNF: fetch_water_features_quebec,
-        HydroSource.CANADA_CANVEC: fetch_water_features_canada,
-        HydroSource.USA_NHD: fetch_water_features_usa,
-        HydroSource.OSM_FALLBACK: fetch_water_features_osm_with_retry  # Avec retry
-    }
+    query_bbox = bbox_around(lat, lng, radius_meters)
+    tiles = tiles_for_bbox(query_bbox)
+    use_tiles = len(tiles) <= MAX_TILES_PER_QUERY
     
-    # Essayer chaque source dans l'ordre de priorité
-    for source in sources:
-        if source == HydroSource.OSM_FALLBACK:
-            osm_tried = True
-            # OSM en dernier recours - skip si on a déjà des données
-            if len(all_features) > 0:
-                continue
-            
-        fetch_func = fetch_functions.get(source)
-        if fetch_func:
-            try:
-                result = await fetch_func(lat, lng, radius_meters)
-                if result.get("success") and result.get("features"):
-                    all_features.extend(result["features"])
-                    sources_used.append(result.get("source", source.value))
-                    logger.info(f"Source {source.value}: {len(result.get('features', []))} features")
-                elif not result.get("success"):
-                    errors.append(f"{source.value}: {result.get('error', 'Unknown error')}")
-            except Exception as e:
-                errors.append(f"{source.value}: {str(e)}")
-                logger.warning(f"Source {source.value} failed: {e}")
-    
-    # Si aucune donnée trouvée et OSM non encore essayé, forcer OSM avec retry
-    if len(all_features) == 0 and not osm_tried:
-        logger.info("No official data found, forcing OSM fallback with retry")
-        try:
-            result = await fetch_water_features_osm_with_retry(lat, lng, radius_meters)
-            if result.get("success") and result.get("features"):
-                all_features.extend(result["features"])
-                sources_used.append("osm_fallback")
-        except Exception as e:
-            errors.append(f"osm_fallback_forced: {str(e)}")
-    
-    # Dédupliquer les features par position approximative
-    unique_features = deduplicate_features(all_features)
+    stored = await _tile_store.get_many(tiles) if use_tiles else {}
+    missing = [t for t in tiles if t not in stored]
+    
+    all_features: List[Dict] = []
+    sources_used: List[str] = []
+    errors: List[str] = []
+    complete = True
+    for tile_features, tile_sources in stored.values():
+        all_features.extend(tile_features)
+        sources_used.extend(s for s in tile_sources if s not in sources_used)
+    
+    if missing:
+        if use_tiles:
+            fetch_lat, fetch_lng, fetch_radius = bbox_center_radius(tiles_envelope(missing))
+        else:
+            fetch_lat, fetch_lng, fetch_radius = lat, lng, radius_meters
+        
+        fetched = await fetch_sources_concurrently(fetch_lat, fetch_lng, fetch_radius, sources, keep_late=use_tiles)
+        fresh = deduplicate_features(fetched["features"])
+        all_features.extend(fresh)
+        sources_used.extend(s for s in fetched["sources_used"] if s not in sources_used)
+        errors.extend(fetched["errors"])
+        
+        # Seule une réponse de toutes les sources officielles (même sans eau) est
+        # persistée: une source en échec laisserait des tuiles incomplètes pour
+        # HYDRO_TILE_TTL. Les sources lentes finissent en arrière-plan.
+        complete = fetched["complete"]
+        if use_tiles and complete:
+            await _tile_store.put_many(split_into_tiles(fresh, missing), fetched["sources_used"])
+        elif fetched["late"]:
+            _schedule_late_persist(fetched, missing)
+    
+    # Dédupliquer les features par position approximative, limiter à la zone demandée
+    unique_features = [
+        f for f in deduplicate_features(all_features)
+        if bboxes_intersect(feature_bbox(f), query_bbox)
+    ]
     
     # Construire le résultat
     result = {
@@ -607,15 +788,27 @@ async def fetch_water_features_multi_source(lat: float, lng: float, radius_meter
         "sources_used": sources_used,
         "sources_available": [s.value for s in sources],
         "feature_count": len(unique_features),
+        "tiles": {"total": len(tiles) if use_tiles else 0, "from_store": len(stored)},
         "errors": errors if errors else None
     }
     
-    # Stocker dans le cache
-    _hydro_cache.set(lat, lng, radius_meters, result)
+    # Stocker dans le cache (brièvement si une source officielle manque)
+    _hydro_cache.set(
+        lat, lng, radius_meters, result,
+        ttl=HYDRO_CACHE_DURATION if complete else HYDRO_PARTIAL_CACHE_DURATION
+    )
     
     logger.info(f"Multi-source hydro fetch complete: {len(unique_features)} features from {sources_used}")
     return result
 
+def get_hydro_cache_stats() -> Dict:
+    """Statistiques du cache mémoire et du stockage de tuiles"""
+    return {
+        "memory_entries": len(_hydro_cache._cache),
+        "memory_max_entries": _hydro_cache.max_entries,
+        "tile_store": _tile_store.stats()
+    }
+
 def deduplicate_features(features: List[Dict], precision: int = 4) -> List[Dict]:
     """
     Déduplique les features par position approximative du centroïde
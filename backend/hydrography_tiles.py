@@ -0,0 +1,254 @@
+"""
+Hydrography Tiles - Stockage persistant des surfaces d'eau par tuile
+
+Les surfaces d'eau normalisées (format parse_geojson_features /
+parse_osm_water_features) sont rangées par tuile z/x/y (grille Web
+Mercator) dans une base SQLite sur disque:
+- partagée entre les workers (mode WAL) et conservée entre déploiements
+- une surface est écrite dans chaque tuile que sa bbox recoupe
+- une tuile sans eau est stockée vide: c'est une réponse valide
+- les tuiles expirent après HYDRO_TILE_TTL secondes
+
+Les appels SQLite sont exécutés hors de la boucle asyncio (to_thread).
+
+Auteur: BIONIC™ Team
+"""
+
+import os
+import json
+import math
+import time
+import sqlite3
+import logging
+import asyncio
+import threading
+from typing import List, Dict, Tuple, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+# Zoom des tuiles (z13 ≈ 4,9 km à l'équateur, ≈ 3,4 km au 46e parallèle)
+HYDRO_TILE_ZOOM = int(os.environ.get("HYDRO_TILE_ZOOM", 13))
+
+# Durée de validité d'une tuile (secondes) - l'hydrographie change peu
+HYDRO_TILE_TTL = int(os.environ.get("HYDRO_TILE_TTL", 30 * 24 * 3600))
+
+# Fichier SQLite partagé
+HYDRO_TILE_STORE = os.environ.get("HYDRO_TILE_STORE", "/app/backend/cache/hydro_tiles.sqlite")
+
+# Au-delà, la requête contourne le stockage (vue très dézoomée)
+MAX_TILES_PER_QUERY = 256
+
+Tile = Tuple[int, int, int]
+
+# ============================================
+# GRILLE DE TUILES
+# ============================================
+
+def lat_lng_to_tile(lat: float, lng: float, zoom: int = HYDRO_TILE_ZOOM) -> Tuple[int, int]:
+    """Tuile (x, y) contenant le point"""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(tile: Tile) -> Dict[str, float]:
+    """Limites {north, south, east, west} d'une tuile"""
+    z, x, y = tile
+    n = 2 ** z
+
+    def lat_of(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return {
+        "north": lat_of(y),
+        "south": lat_of(y + 1),
+        "west": x / n * 360.0 - 180.0,
+        "east": (x + 1) / n * 360.0 - 180.0
+    }
+
+
+def bbox_around(lat: float, lng: float, radius_meters: float) -> Dict[str, float]:
+    """Bbox carrée autour d'un point (mêmes deltas que les fetchers)"""
+    lat_delta = radius_meters / 111320
+    lng_delta = radius_meters / (111320 * math.cos(math.radians(lat)))
+    return {"north": lat + lat_delta, "south": lat - lat_delta,
+            "east": lng + lng_delta, "west": lng - lng_delta}
+
+
+def tiles_for_bbox(bbox: Dict[str, float], zoom: int = HYDRO_TILE_ZOOM) -> List[Tile]:
+    """Toutes les tuiles recoupant la bbox"""
+    x_min, y_min = lat_lng_to_tile(bbox["north"], bbox["west"], zoom)
+    x_max, y_max = lat_lng_to_tile(bbox["south"], bbox["east"], zoom)
+    return [(zoom, x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+
+def tiles_envelope(tiles: Iterable[Tile]) -> Dict[str, float]:
+    """Bbox englobant un ensemble de tuiles"""
+    bounds = [tile_bounds(t) for t in tiles]
+    return {
+        "north": max(b["north"] for b in bounds),
+        "south": min(b["south"] for b in bounds),
+        "east": max(b["east"] for b in bounds),
+        "west": min(b["west"] for b in bounds)
+    }
+
+
+def bbox_center_radius(bbox: Dict[str, float]) -> Tuple[float, float, float]:
+    """Centre et rayon (mètres) dont la bbox carrée couvre la bbox donnée"""
+    lat = (bbox["north"] + bbox["south"]) / 2
+    lng = (bbox["east"] + bbox["west"]) / 2
+    half_lat = (bbox["north"] - bbox["south"]) / 2 * 111320
+    half_lng = (bbox["east"] - bbox["west"]) / 2 * 111320 * math.cos(math.radians(lat))
+    return lat, lng, max(half_lat, half_lng)
+
+
+def feature_bbox(feature: Dict) -> Optional[Dict[str, float]]:
+    polygon = feature.get("polygon") or []
+    if not polygon:
+        return None
+    lats = [p[0] for p in polygon]
+    lngs = [p[1] for p in polygon]
+    return {"north": max(lats), "south": min(lats), "east": max(lngs), "west": min(lngs)}
+
+
+def bboxes_intersect(a: Dict[str, float], b: Dict[str, float]) -> bool:
+    return not (a["east"] < b["west"] or a["west"] > b["east"] or
+                a["north"] < b["south"] or a["south"] > b["north"])
+
+
+def split_into_tiles(features: List[Dict], tiles: List[Tile]) -> Dict[Tile, List[Dict]]:
+    """Répartit les surfaces dans chaque tuile recoupée (tuiles vides incluses)"""
+    result: Dict[Tile, List[Dict]] = {tile: [] for tile in tiles}
+    if not tiles:
+        return result
+    zoom = tiles[0][0]
+    wanted = set(tiles)
+    envelope = tiles_envelope(tiles)
+    for feature in features:
+        box = feature_bbox(feature)
+        if box is None or not bboxes_intersect(box, envelope):
+            continue
+        # Borner aux tuiles demandées (un fleuve couvre des milliers de tuiles)
+        box = {
+            "north": min(box["north"], envelope["north"]), "south": max(box["south"], envelope["south"]),
+            "east": min(box["east"], envelope["east"]), "west": max(box["west"], envelope["west"])
+        }
+        for tile in tiles_for_bbox(box, zoom):
+            if tile in wanted:
+                result[tile].append(feature)
+    return result
+
+# ============================================
+# STOCKAGE SQLITE
+# ============================================
+
+class HydroTileStore:
+    """Tuiles hydrographiques persistées dans SQLite"""
+
+    def __init__(self, path: str = HYDRO_TILE_STORE, ttl: int = HYDRO_TILE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._disabled = False
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS hydro_tiles ("
+                " z INTEGER, x INTEGER, y INTEGER,"
+                " fetched_at REAL, sources TEXT, features TEXT,"
+                " PRIMARY KEY (z, x, y))"
+            )
+            conn.commit()
+            self._conn = conn
+        except (OSError, sqlite3.Error) as e:
+            # Sans stockage, les requêtes passent directement aux sources
+            logger.warning(f"Hydro tile store unavailable ({self.path}): {e}")
+            self._disabled = True
+        return self._conn
+
+    def _get_many_sync(self, tiles: List[Tile]) -> Dict[Tile, Tuple[List[Dict], List[str]]]:
+        found: Dict[Tile, Tuple[List[Dict], List[str]]] = {}
+        with self._lock:
+            conn = self._connection()
+            if conn is None or not tiles:
+                return found
+            oldest = time.time() - self.ttl
+            for tile in tiles:
+                row = conn.execute(
+                    "SELECT features, sources FROM hydro_tiles WHERE z=? AND x=? AND y=? AND fetched_at>=?",
+                    (*tile, oldest)
+                ).fetchone()
+                if row:
+                    found[tile] = (json.loads(row[0]), json.loads(row[1]))
+        self.hits += len(found)
+        self.misses += len(tiles) - len(found)
+        return found
+
+    def _put_many_sync(self, entries: Dict[Tile, List[Dict]], sources: List[str]):
+        with self._lock:
+            conn = self._connection()
+            if conn is None or not entries:
+                return
+            now = time.time()
+            sources_json = json.dumps(sources)
+            conn.executemany(
+                "INSERT OR REPLACE INTO hydro_tiles (z, x, y, fetched_at, sources, features) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*tile, now, sources_json, json.dumps(features)) for tile, features in entries.items()]
+            )
+            conn.commit()
+        self.writes += len(entries)
+
+    async def get_many(self, tiles: List[Tile]) -> Dict[Tile, Tuple[List[Dict], List[str]]]:
+        """Tuiles valides présentes dans le stockage: {tuile: (features, sources)}"""
+        return await asyncio.to_thread(self._get_many_sync, tiles)
+
+    async def put_many(self, entries: Dict[Tile, List[Dict]], sources: List[str]):
+        """Écrit (ou remplace) des tuiles complètes"""
+        await asyncio.to_thread(self._put_many_sync, entries, sources)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                conn.execute("DELETE FROM hydro_tiles")
+                conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict:
+        tiles = 0
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                tiles = conn.execute("SELECT COUNT(*) FROM hydro_tiles").fetchone()[0]
+        return {
+            "path": self.path,
+            "enabled": not self._disabled,
+            "zoom": HYDRO_TILE_ZOOM,
+            "ttl_seconds": self.ttl,
+            "tiles": tiles,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes
+        }
@@ -15,6 +15,8 @@ import hashlib
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from flag_snapshot import flag_snapshot
+
 router = APIRouter(prefix="/api/maintenance", tags=["Maintenance Mode"])
 
 # Setup logging
@@ -95,9 +97,10 @@ def generate_bypass_token() -> str:
 
 
 async def get_maintenance_config() -> dict:
-    """Get current maintenance configuration from database"""
+    """Get current maintenance configuration (in-process flag snapshot, loaded once)"""
     database = await get_db()
-    config = await database.maintenance_mode.find_one({"_id": "config"})
+    await flag_snapshot.ensure_loaded(database)
+    config = flag_snapshot.document("maintenance_mode")
     
     if not config:
         # Initialize with maintenance DISABLED by default
@@ -116,7 +119,8 @@ async def get_maintenance_config() -> dict:
             "allowed_bypass_tokens": []
         }
         await database.maintenance_mode.insert_one(default_config)
-        config = default_config
+        config = {k: v for k, v in default_config.items() if k != "_id"}
+        flag_snapshot.apply_document("maintenance_mode", config)
     
     return config
 
@@ -231,6 +235,7 @@ async def toggle_maintenance_mode(request: MaintenanceToggleRequest):
         {"_id": "config"},
         {"$set": update_data}
     )
+    flag_snapshot.apply_document("maintenance_mode", {**config, **update_data})
     
     # Log the action
     await log_maintenance_action(
@@ -252,6 +257,7 @@ async def toggle_maintenance_mode(request: MaintenanceToggleRequest):
         }},
         upsert=True
     )
+    await flag_snapshot.refresh(database)
     
     action_text = "activé" if new_state else "désactivé"
     return {
@@ -303,6 +309,7 @@ async def update_maintenance_settings(request: MaintenanceUpdateRequest):
         {"_id": "config"},
         {"$set": update_data}
     )
+    flag_snapshot.apply_document("maintenance_mode", {**config, **update_data})
     
     await log_maintenance_action("SETTINGS_UPDATED", {
         "changes": {k: v for k, v in update_data.items() if k != "last_modified_at"}
@@ -347,6 +354,7 @@ async def get_admin_bypass_token(request: AdminBypassRequest):
         {"_id": "config"},
         {"$set": {"allowed_bypass_tokens": allowed_tokens}}
     )
+    flag_snapshot.apply_document("maintenance_mode", {**config, "allowed_bypass_tokens": allowed_tokens})
     
     await log_maintenance_action("BYPASS_TOKEN_GENERATED", {
         "token_count": len(allowed_tokens)
@@ -379,6 +387,7 @@ async def revoke_all_bypass_tokens(request: AdminBypassRequest):
         {"_id": "config"},
         {"$set": {"allowed_bypass_tokens": []}}
     )
+    await flag_snapshot.refresh(database)
     
     await log_maintenance_action("ALL_TOKENS_REVOKED", {})
     
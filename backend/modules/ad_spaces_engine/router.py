@@ -20,8 +20,11 @@ from pydantic import BaseModel, Field
 from enum import Enum
 import os
 import logging
+import random
 import uuid
 
+from .serving_cache import serving_cache, ad_counters, record_impression, record_click
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/ad-spaces", tags=["Ad Spaces Engine"])
@@ -512,6 +515,7 @@ async def reserve_ad_slot(
     }
     
     await db.ad_slot_reservations.insert_one(reservation)
+    serving_cache.invalidate()
     
     # Log action
     await _log_space_action(db, space_id, "slot_reserved", "system", {
@@ -560,6 +564,7 @@ async def activate_slot(reservation_id: str):
             }
         }
     )
+    serving_cache.invalidate()
     
     await _log_space_action(db, reservation["space_id"], "slot_activated", "system", {
         "reservation_id": reservation_id
@@ -599,6 +604,7 @@ async def deactivate_slot(
             }
         }
     )
+    serving_cache.invalidate()
     
     await _log_space_action(db, reservation["space_id"], "slot_deactivated", "admin", {
         "reservation_id": reservation_id,
@@ -707,12 +713,16 @@ async def render_ad_for_space(
     """
     Obtenir la publicité à afficher pour un espace donné.
     Utilisé par le frontend BIONIC pour injecter les pubs.
+    
+    Décision servie depuis le cache en mémoire; les impressions sont
+    tamponnées et persistées périodiquement.
     """
     db = get_db()
+    await serving_cache.ensure_fresh(db)
+    ad_counters.start(db)
     
     # Check master switch
-    master_switch = await db.ad_master_switch.find_one({"switch_id": "global"})
-    if not master_switch or not master_switch.get("is_active"):
+    if not serving_cache.master_switch_active():
         return {
             "success": True,
             "render": False,
@@ -724,15 +734,9 @@ async def render_ad_for_space(
         raise HTTPException(status_code=404, detail="Espace publicitaire non trouvé")
     
     space = AD_SPACES_CATALOG[space_id]
-    now = datetime.now(timezone.utc).isoformat()
     
     # Get active reservations for this space
-    reservations = await db.ad_slot_reservations.find({
-        "space_id": space_id,
-        "status": SpaceStatus.ACTIVE.value,
-        "start_date": {"$lte": now},
-        "end_date": {"$gte": now}
-    }).sort("priority", -1).to_list(space["max_concurrent"])
+    reservations = serving_cache.active_reservations(space_id, space["max_concurrent"])
     
     if not reservations:
         return {
@@ -744,29 +748,16 @@ async def render_ad_for_space(
     
     # Handle rotation if enabled
     if space["rotation_enabled"] and len(reservations) > 1:
-        import random
         selected = random.choice(reservations)
     else:
         selected = reservations[0]
     
     # Get ad creative from deployed_ads
-    deployed_ad = await db.deployed_ads.find_one({
-        "opportunity_id": selected.get("opportunity_id"),
-        "is_active": True
-    })
+    deployed_ad = serving_cache.get_deployed_ad(selected.get("opportunity_id"))
     
     # Track impression
     if deployed_ad:
-        await db.deployed_ads.update_one(
-            {"ad_id": deployed_ad["ad_id"]},
-            {"$inc": {"impressions": 1}}
-        )
-        await db.ad_opportunities.update_one(
-            {"opportunity_id": selected["opportunity_id"]},
-            {"$inc": {"impressions": 1}}
-        )
-    
-    selected.pop("_id", None)
+        record_impression(deployed_ad["ad_id"], selected.get("opportunity_id"))
     
     return {
         "success": True,
@@ -793,29 +784,25 @@ async def track_ad_click(reservation_id: str):
     Tracker un clic sur une publicité.
     """
     db = get_db()
+    await serving_cache.ensure_fresh(db)
+    ad_counters.start(db)
     
-    reservation = await db.ad_slot_reservations.find_one({"reservation_id": reservation_id})
+    reservation = serving_cache.get_reservation(reservation_id)
+    if not reservation:
+        reservation = await db.ad_slot_reservations.find_one({"reservation_id": reservation_id})
     
     if not reservation:
         return {"success": False, "error": "Reservation not found"}
     
-    # Update deployed ad
-    await db.deployed_ads.update_one(
-        {"opportunity_id": reservation.get("opportunity_id")},
-        {"$inc": {"clicks": 1}}
-    )
+    opportunity_id = reservation.get("opportunity_id")
+    deployed_ad = serving_cache.get_deployed_ad(opportunity_id)
     
-    # Update opportunity
-    opp = await db.ad_opportunities.find_one({"opportunity_id": reservation.get("opportunity_id")})
-    if opp:
-        new_clicks = opp.get("clicks", 0) + 1
-        new_impressions = opp.get("impressions", 1)
-        new_ctr = round((new_clicks / max(new_impressions, 1)) * 100, 2)
-        
-        await db.ad_opportunities.update_one(
-            {"opportunity_id": reservation["opportunity_id"]},
-            {"$inc": {"clicks": 1}, "$set": {"ctr": new_ctr}}
-        )
+    if deployed_ad:
+        record_click(deployed_ad["ad_id"], opportunity_id)
+    else:
+        # Creative hors cache: compteur indexé par opportunité
+        ad_counters.increment("deployed_ads", "opportunity_id", opportunity_id, "clicks")
+        record_click(None, opportunity_id)
     
     await _log_space_action(db, reservation["space_id"], "ad_click", "visitor", {
         "reservation_id": reservation_id
@@ -830,10 +817,10 @@ async def render_all_ads_for_page(page: str):
     Obtenir toutes les publicités à afficher pour une page donnée.
     """
     db = get_db()
+    await serving_cache.ensure_fresh(db)
     
     # Check master switch
-    master_switch = await db.ad_master_switch.find_one({"switch_id": "global"})
-    if not master_switch or not master_switch.get("is_active"):
+    if not serving_cache.master_switch_active():
         return {
             "success": True,
             "mode": "PRE_PRODUCTION",
@@ -950,7 +937,8 @@ async def get_ad_spaces_dashboard():
         if active > 0:
             space_usage[space_id] = active
     
-    # Total impressions and clicks
+    # Total impressions and clicks (including buffered deltas)
+    await ad_counters.flush(db)
     total_impressions = 0
     total_clicks = 0
     opps = await db.ad_opportunities.find({}).to_list(1000)
@@ -980,7 +968,9 @@ async def get_ad_spaces_dashboard():
                 "total_impressions": total_impressions,
                 "total_clicks": total_clicks,
                 "overall_ctr": round((total_clicks / max(total_impressions, 1)) * 100, 2)
-            }
+            },
+            "serving_cache": serving_cache.stats(),
+            "counters": ad_counters.stats()
         }
     }
 
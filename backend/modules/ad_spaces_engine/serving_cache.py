@@ -0,0 +1,177 @@
+"""
+BIONIC Ad Spaces Engine - Serving Cache
+=======================================
+
+Cache de décision publicitaire en mémoire et compteurs tamponnés:
+- AdServingCache: état du Master Switch, réservations actives par espace
+  et créatifs déployés, rafraîchis sur TTL court ou invalidés à l'écriture
+- ad_counters (AdCounterBuffer, basé sur utils.counter_buffer.CounterBuffer):
+  impressions/clics accumulés en mémoire puis vidés périodiquement par un
+  bulk_write non ordonné par collection
+
+Le rendu d'une publicité ne coûte ainsi aucun aller-retour MongoDB sur
+le chemin chaud. Le CTR n'est plus stocké: il est calculé à la lecture.
+
+Architecture LEGO V5-ULTIME - Module isolé.
+"""
+
+from typing import Optional, List, Dict, Any
+from datetime import datetime, timezone
+from collections import defaultdict
+import asyncio
+import logging
+import time
+
+from utils.counter_buffer import CounterBuffer
+
+logger = logging.getLogger(__name__)
+
+# TTL du snapshot de décision (secondes)
+SERVING_CACHE_TTL = 30
+
+# Intervalle de vidage des compteurs (secondes)
+COUNTER_FLUSH_INTERVAL = 10
+
+
+def compute_ctr(clicks: int, impressions: int) -> float:
+    """CTR en pourcentage, calculé à la lecture"""
+    return round((clicks / max(impressions, 1)) * 100, 2)
+
+
+class AdServingCache:
+    """
+    Snapshot en mémoire des données de décision publicitaire.
+
+    Un seul chargement regroupe le Master Switch, toutes les réservations
+    actives (indexées par espace et par reservation_id) et les créatifs
+    déployés actifs (indexés par opportunity_id).
+    """
+
+    def __init__(self, ttl: int = SERVING_CACHE_TTL):
+        self.ttl = ttl
+        self._loaded_at: Optional[float] = None
+        self._master_switch_active = False
+        self._reservations_by_space: Dict[str, List[Dict]] = {}
+        self._reservations_by_id: Dict[str, Dict] = {}
+        self._ads_by_opportunity: Dict[str, Dict] = {}
+        self._ads_by_id: Dict[str, Dict] = {}
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.refreshes = 0
+
+    def is_fresh(self) -> bool:
+        """Le snapshot est-il encore valide?"""
+        return self._loaded_at is not None and (time.monotonic() - self._loaded_at) < self.ttl
+
+    def invalidate(self):
+        """Forcer un rechargement au prochain accès (appelé à l'écriture)"""
+        self._loaded_at = None
+
+    async def ensure_fresh(self, db):
+        """Recharger le snapshot si expiré ou invalidé"""
+        if self.is_fresh():
+            self.hits += 1
+            return
+        async with self._lock:
+            if not self.is_fresh():
+                await self._refresh(db)
+
+    async def _refresh(self, db):
+        master_switch = await db.ad_master_switch.find_one({"switch_id": "global"})
+
+        reservations = await db.ad_slot_reservations.find(
+            {"status": "active"}, {"_id": 0}
+        ).sort("priority", -1).to_list(None)
+
+        opportunity_ids = list({r.get("opportunity_id") for r in reservations if r.get("opportunity_id")})
+        deployed_ads = []
+        if opportunity_ids:
+            deployed_ads = await db.deployed_ads.find(
+                {"opportunity_id": {"$in": opportunity_ids}, "is_active": True},
+                {"_id": 0}
+            ).to_list(None)
+
+        by_space: Dict[str, List[Dict]] = defaultdict(list)
+        for reservation in reservations:
+            by_space[reservation["space_id"]].append(reservation)
+
+        self._master_switch_active = bool(master_switch and master_switch.get("is_active"))
+        self._reservations_by_space = dict(by_space)
+        self._reservations_by_id = {r["reservation_id"]: r for r in reservations if r.get("reservation_id")}
+        self._ads_by_opportunity = {ad["opportunity_id"]: ad for ad in deployed_ads}
+        self._ads_by_id = {ad["ad_id"]: ad for ad in deployed_ads if ad.get("ad_id")}
+        self._loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    def master_switch_active(self) -> bool:
+        return self._master_switch_active
+
+    def active_reservations(self, space_id: str, limit: int, now: Optional[str] = None) -> List[Dict]:
+        """Réservations actives dans leur fenêtre de diffusion, triées par priorité"""
+        now = now or datetime.now(timezone.utc).isoformat()
+        eligible = [
+            r for r in self._reservations_by_space.get(space_id, [])
+            if r.get("start_date", "") <= now <= r.get("end_date", "")
+        ]
+        return eligible[:limit]
+
+    def get_reservation(self, reservation_id: str) -> Optional[Dict]:
+        return self._reservations_by_id.get(reservation_id)
+
+    def get_deployed_ad(self, opportunity_id: Optional[str]) -> Optional[Dict]:
+        if not opportunity_id:
+            return None
+        return self._ads_by_opportunity.get(opportunity_id)
+
+    def get_deployed_ad_by_id(self, ad_id: str) -> Optional[Dict]:
+        return self._ads_by_id.get(ad_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fresh": self.is_fresh(),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "spaces_cached": len(self._reservations_by_space),
+            "reservations_cached": len(self._reservations_by_id),
+            "ads_cached": len(self._ads_by_opportunity)
+        }
+
+
+class AdCounterBuffer(CounterBuffer):
+    """
+    Compteurs d'impressions et de clics en mémoire.
+
+    Les incréments sont coalescés par (collection, champ clé, valeur) et
+    vidés par un bulk_write non ordonné par collection. Une perte est
+    bornée à l'intervalle de vidage en cas d'arrêt brutal.
+    """
+
+    def __init__(self, flush_interval: int = COUNTER_FLUSH_INTERVAL):
+        super().__init__(name="Ad", flush_interval=flush_interval)
+
+
+# Instances partagées par ad_spaces_engine et affiliate_ads_engine
+serving_cache = AdServingCache()
+ad_counters = AdCounterBuffer()
+
+
+def record_impression(ad_id: Optional[str], opportunity_id: Optional[str]):
+    """Impression sur le créatif déployé et l'opportunité associée"""
+    if ad_id:
+        ad_counters.increment("deployed_ads", "ad_id", ad_id, "impressions")
+    if opportunity_id:
+        ad_counters.increment("ad_opportunities", "opportunity_id", opportunity_id, "impressions")
+
+
+def record_click(ad_id: Optional[str], opportunity_id: Optional[str]):
+    """Clic sur le créatif déployé et l'opportunité associée"""
+    if ad_id:
+        ad_counters.increment("deployed_ads", "ad_id", ad_id, "clicks")
+    if opportunity_id:
+        ad_counters.increment("ad_opportunities", "opportunity_id", opportunity_id, "clicks")
+
+
+async def shutdown_ad_counters():
+    """Vider les compteurs à l'arrêt du serveur"""
+    await ad_counters.stop()
@@ -58,6 +58,8 @@ from .services.partners_admin import PartnersAdminService
 from .services.branding_admin import BrandingAdminService
 # Marketing Controls (Global ON/OFF)
 from .services.marketing_controls import MarketingControlsService
+# Métriques matérialisées des dashboards
+from .services.metrics_admin import MetricsAdminService
 
 logger = logging.getLogger(__name__)
 
@@ -860,6 +862,21 @@ async def remove_tag_from_contact(contact_id: str, tag: str):
     return await ContactsAdminService.remove_tag_from_contact(get_db(), contact_id, tag)
 
 
+# ==============================================
+# DASHBOARD METRICS (snapshot matérialisé)
+# ==============================================
+
+@router.get("/metrics/snapshot")
+async def get_metrics_snapshot():
+    """Snapshot des métriques des dashboards (avec fraîcheur)"""
+    return await MetricsAdminService.get_full_snapshot(get_db())
+
+@router.post("/metrics/reconcile")
+async def reconcile_metrics():
+    """Recalculer immédiatement toutes les métriques des dashboards"""
+    return await MetricsAdminService.force_reconcile(get_db())
+
+
 # ==============================================
 # HOTSPOTS ADMIN (Phase 4 Migration - Terres)
 # ==============================================
@@ -9,7 +9,7 @@ Service d'administration des hotspots et terres à louer:
 - Validation des annonces
 - Gestion propriétaires/locataires
 
-Module isolé - aucun import croisé.
+Module isolé - seul le service de métriques admin est importé.
 Phase 4 Migration - Cœur métier HUNTIQ.
 """
 
@@ -18,6 +18,8 @@ from typing import Optional, List, Dict, Any
 import logging
 import uuid
 
+from .metrics_admin import MetricsAdminService, transition
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,47 +29,26 @@ class HotspotsAdminService:
     # ============ DASHBOARD & STATS ============
     @staticmethod
     async def get_dashboard_stats(db) -> dict:
-        """Statistiques globales du module Terres"""
-        # Listings
-        total_listings = await db.land_listings.count_documents({})
-        active_listings = await db.land_listings.count_documents({"status": "active"})
-        pending_listings = await db.land_listings.count_documents({"status": "pending"})
-        featured_listings = await db.land_listings.count_documents({"is_featured": True})
-        
-        # Users
-        total_owners = await db.land_owners.count_documents({})
-        total_renters = await db.land_renters.count_documents({})
-        premium_renters = await db.land_renters.count_documents({
-            "subscription_tier": {"$in": ["basic", "pro", "vip"]}
-        })
-        
-        # Agreements
-        total_agreements = await db.land_agreements.count_documents({})
-        signed_agreements = await db.land_agreements.count_documents({"status": "signed"})
-        
-        # Revenue
-        purchases = await db.lands_purchases.find({"status": "completed"}).to_list(length=10000)
-        total_revenue = sum(p.get("amount", 0) for p in purchases)
-        
-        # Recent activity
-        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-        new_listings_week = await db.land_listings.count_documents({
-            "created_at": {"$gte": week_ago.isoformat()}
-        })
+        """Statistiques globales du module Terres (snapshot matérialisé)"""
+        metrics, freshness = await MetricsAdminService.get_section(db, "hotspots")
+        listings_by_status = metrics["listings"]["by_status"]
+        renters_by_tier = metrics["renters"]["by_tier"]
+        total_agreements = metrics["agreements"]["total"]
+        signed_agreements = metrics["agreements"]["by_status"].get("signed", 0)
         
         return {
             "success": True,
             "stats": {
                 "listings": {
-                    "total": total_listings,
-                    "active": active_listings,
-                    "pending": pending_listings,
-                    "featured": featured_listings
+                    "total": metrics["listings"]["total"],
+                    "active": listings_by_status.get("active", 0),
+                    "pending": listings_by_status.get("pending", 0),
+                    "featured": metrics["listings"]["featured"]
                 },
                 "users": {
-                    "owners": total_owners,
-                    "renters": total_renters,
-                    "premium_renters": premium_renters
+                    "owners": metrics["owners"]["total"],
+                    "renters": metrics["renters"]["total"],
+                    "premium_renters": sum(renters_by_tier.get(t, 0) for t in ["basic", "pro", "vip"])
                 },
                 "agreements": {
                     "total": total_agreements,
@@ -75,13 +56,14 @@ class HotspotsAdminService:
                     "conversion_rate": round((signed_agreements / max(total_agreements, 1)) * 100, 1)
                 },
                 "revenue": {
-                    "total": round(total_revenue, 2),
-                    "transactions": len(purchases)
+                    "total": round(metrics["revenue"]["total"], 2),
+                    "transactions": metrics["revenue"]["transactions"]
                 },
                 "activity": {
-                    "new_listings_week": new_listings_week
+                    "new_listings_week": metrics["listings"]["new_week"]
                 }
-            }
+            },
+            "freshness": freshness
         }
     
     # ============ LISTINGS MANAGEMENT ============
@@ -105,16 +87,20 @@ class HotspotsAdminService:
         
         total = await db.land_listings.count_documents(query)
         
-        # Status counts
-        status_counts = {}
-        for s in ["draft", "pending", "active", "rented", "expired", "suspended"]:
-            status_counts[s] = await db.land_listings.count_documents({"status": s})
+        # Status counts (snapshot)
+        metrics, freshness = await MetricsAdminService.get_section(db, "hotspots")
+        by_status = metrics["listings"]["by_status"]
+        status_counts = {
+            s: by_status.get(s, 0)
+            for s in ["draft", "pending", "active", "rented", "expired", "suspended"]
+        }
         
         return {
             "success": True,
             "total": total,
             "status_counts": status_counts,
-            "listings": listings
+            "listings": listings,
+            "freshness": freshness
         }
     
     @staticmethod
@@ -147,14 +133,19 @@ class HotspotsAdminService:
         if new_status not in valid_statuses:
             return {"success": False, "error": f"Invalid status. Must be one of: {valid_statuses}"}
         
-        result = await db.land_listings.update_one(
+        listing = await db.land_listings.find_one_and_update(
             {"id": listing_id},
-            {"$set": {"status": new_status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+            {"$set": {"status": new_status, "updated_at": datetime.now(timezone.utc).isoformat()}},
+            projection={"status": 1}
         )
         
-        if result.matched_count == 0:
+        if not listing:
             return {"success": False, "error": "Listing not found"}
         
+        await MetricsAdminService.record(
+            db, transition("hotspots.listings.by_status", listing.get("status"), new_status)
+        )
+        
         return {"success": True, "listing_id": listing_id, "new_status": new_status}
     
     @staticmethod
@@ -168,24 +159,39 @@ class HotspotsAdminService:
         if is_featured:
             update["featured_at"] = datetime.now(timezone.utc).isoformat()
         
-        result = await db.land_listings.update_one(
+        listing = await db.land_listings.find_one_and_update(
             {"id": listing_id},
-            {"$set": update}
+            {"$set": update},
+            projection={"is_featured": 1}
         )
         
-        if result.matched_count == 0:
+        if not listing:
             return {"success": False, "error": "Listing not found"}
         
+        if bool(listing.get("is_featured")) != is_featured:
+            await MetricsAdminService.record(db, {"hotspots.listings.featured": 1 if is_featured else -1})
+        
         return {"success": True, "listing_id": listing_id, "is_featured": is_featured}
     
     @staticmethod
     async def delete_listing(db, listing_id: str) -> dict:
         """Supprimer une annonce"""
-        result = await db.land_listings.delete_one({"id": listing_id})
+        listing = await db.land_listings.find_one_and_delete(
+            {"id": listing_id}, {"status": 1, "is_featured": 1, "created_at": 1}
+        )
         
-        if result.deleted_count == 0:
+        if not listing:
             return {"success": False, "error": "Listing not found"}
         
+        changes = {"hotspots.listings.total": -1}
+        changes.update(transition("hotspots.listings.by_status", listing.get("status"), None))
+        if listing.get("is_featured"):
+            changes["hotspots.listings.featured"] = -1
+        week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+        if (listing.get("created_at") or "") >= week_ago:
+            changes["hotspots.listings.new_week"] = -1
+        await MetricsAdminService.record(db, changes)
+        
         return {"success": True, "listing_id": listing_id, "deleted": True}
     
     # ============ PRICING MANAGEMENT ============
@@ -285,16 +291,17 @@ class HotspotsAdminService:
         
         total = await db.land_renters.count_documents(query)
         
-        # Tier distribution
-        tier_counts = {}
-        for tier in ["free", "basic", "pro", "vip"]:
-            tier_counts[tier] = await db.land_renters.count_documents({"subscription_tier": tier})
+        # Tier distribution (snapshot)
+        metrics, freshness = await MetricsAdminService.get_section(db, "hotspots")
+        by_tier = metrics["renters"]["by_tier"]
+        tier_counts = {tier: by_tier.get(tier, 0) for tier in ["free", "basic", "pro", "vip"]}
         
         return {
             "success": True,
             "total": total,
             "tier_counts": tier_counts,
-            "renters": renters
+            "renters": renters,
+            "freshness": freshness
         }
     
     # ============ AGREEMENTS MANAGEMENT ============
@@ -311,16 +318,20 @@ class HotspotsAdminService:
         
         total = await db.land_agreements.count_documents(query)
         
-        # Status counts
-        status_counts = {}
-        for s in ["draft", "pending_owner", "pending_renter", "signed", "cancelled", "completed", "disputed"]:
-            status_counts[s] = await db.land_agreements.count_documents({"status": s})
+        # Status counts (snapshot)
+        metrics, freshness = await MetricsAdminService.get_section(db, "hotspots")
+        by_status = metrics["agreements"]["by_status"]
+        status_counts = {
+            s: by_status.get(s, 0)
+            for s in ["draft", "pending_owner", "pending_renter", "signed", "cancelled", "completed", "disputed"]
+        }
         
         return {
             "success": True,
             "total": total,
             "status_counts": status_counts,
-            "agreements": agreements
+            "agreements": agreements,
+            "freshness": freshness
         }
     
     @staticmethod
@@ -9,15 +9,17 @@ Service d'administration du marketing:
 - Segmentation audience
 - Automations
 
-Module isolé - aucun import croisé.
+Module isolé - seul le service de métriques admin est importé.
 Phase 5 Migration - Communication.
 """
 
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 import logging
 import uuid
 
+from .metrics_admin import MetricsAdminService, transition
+
 logger = logging.getLogger(__name__)
 
 
@@ -45,68 +47,46 @@ class MarketingAdminService:
     # ============ DASHBOARD & STATS ============
     @staticmethod
     async def get_dashboard_stats(db) -> dict:
-        """Statistiques globales du marketing"""
+        """Statistiques globales du marketing (snapshot matérialisé)"""
         try:
-            # Campagnes
-            total_campaigns = await db.marketing_campaigns.count_documents({})
-            active_campaigns = await db.marketing_campaigns.count_documents({"status": "active"})
-            draft_campaigns = await db.marketing_campaigns.count_documents({"status": "draft"})
-            
-            # Publications
-            total_posts = await db.marketing_posts.count_documents({})
-            published_posts = await db.marketing_posts.count_documents({"status": "published"})
-            scheduled_posts = await db.marketing_posts.count_documents({"status": "scheduled"})
-            
-            # Engagement (derniers 30 jours)
-            thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
-            recent_posts = await db.marketing_posts.find({
-                "published_at": {"$gte": thirty_days_ago}
-            }).to_list(1000)
-            
-            total_impressions = sum(p.get("impressions", 0) for p in recent_posts)
-            total_clicks = sum(p.get("clicks", 0) for p in recent_posts)
-            total_engagement = sum(p.get("engagement", 0) for p in recent_posts)
-            
-            # Segments
-            total_segments = await db.marketing_segments.count_documents({})
-            
-            # Automations
-            total_automations = await db.marketing_automations.count_documents({})
-            active_automations = await db.marketing_automations.count_documents({"is_active": True})
-            
-            # Stats par plateforme
-            by_platform = {}
-            for platform in ["facebook", "instagram", "twitter", "linkedin"]:
-                by_platform[platform] = await db.marketing_posts.count_documents({"platform": platform})
+            metrics, freshness = await MetricsAdminService.get_section(db, "marketing")
+            campaigns_by_status = metrics["campaigns"]["by_status"]
+            posts_by_status = metrics["posts"]["by_status"]
+            posts_by_platform = metrics["posts"]["by_platform"]
+            engagement = metrics["engagement_30d"]
             
             return {
                 "success": True,
                 "stats": {
                     "campaigns": {
-                        "total": total_campaigns,
-                        "active": active_campaigns,
-                        "draft": draft_campaigns
+                        "total": metrics["campaigns"]["total"],
+                        "active": campaigns_by_status.get("active", 0),
+                        "draft": campaigns_by_status.get("draft", 0)
                     },
                     "posts": {
-                        "total": total_posts,
-                        "published": published_posts,
-                        "scheduled": scheduled_posts
+                        "total": metrics["posts"]["total"],
+                        "published": posts_by_status.get("published", 0),
+                        "scheduled": posts_by_status.get("scheduled", 0)
                     },
                     "engagement_30d": {
-                        "impressions": total_impressions,
-                        "clicks": total_clicks,
-                        "engagement": total_engagement,
-                        "ctr": round((total_clicks / max(total_impressions, 1)) * 100, 2)
+                        "impressions": engagement["impressions"],
+                        "clicks": engagement["clicks"],
+                        "engagement": engagement["engagement"],
+                        "ctr": round((engagement["clicks"] / max(engagement["impressions"], 1)) * 100, 2)
                     },
                     "segments": {
-                        "total": total_segments
+                        "total": metrics["segments"]["total"]
                     },
                     "automations": {
-                        "total": total_automations,
-                        "active": active_automations
+                        "total": metrics["automations"]["total"],
+                        "active": metrics["automations"]["active"]
                     },
-                    "by_platform": by_platform
-                }
+                    "by_platform": {
+                        platform: posts_by_platform.get(platform, 0)
+                        for platform in ["facebook", "instagram", "twitter", "linkedin"]
+                    }
+                },
+                "freshness": freshness
             }
         except Exception as e:
             logger.error(f"Error in get_dashboard_stats: {e}")
@@ -127,16 +107,20 @@ class MarketingAdminService:
             
             total = await db.marketing_campaigns.count_documents(query)
             
-            # Stats par statut
-            status_counts = {}
-            for s in ["draft", "active", "paused", "completed", "archived"]:
-                status_counts[s] = await db.marketing_campaigns.count_documents({"status": s})
+            # Stats par statut (snapshot)
+            metrics, freshness = await MetricsAdminService.get_section(db, "marketing")
+            by_status = metrics["campaigns"]["by_status"]
+            status_counts = {
+                s: by_status.get(s, 0)
+                for s in ["draft", "active", "paused", "completed", "archived"]
+            }
             
             return {
                 "success": True,
                 "total": total,
                 "status_counts": status_counts,
-                "campaigns": campaigns
+                "campaigns": campaigns,
+                "freshness": freshness
             }
         except Exception as e:
             logger.error(f"Error in get_campaigns: {e}")
@@ -199,6 +183,11 @@ class MarketingAdminService:
             if "_id" in campaign:
                 del campaign["_id"]
             
+            await MetricsAdminService.record(db, {
+                "marketing.campaigns.total": 1,
+                "marketing.campaigns.by_status.draft": 1
+            })
+            
             return {
                 "success": True,
                 "campaign": campaign
@@ -215,14 +204,20 @@ class MarketingAdminService:
             updates.pop("id", None)
             updates.pop("created_at", None)
             
-            result = await db.marketing_campaigns.update_one(
+            campaign = await db.marketing_campaigns.find_one_and_update(
                 {"id": campaign_id},
-                {"$set": updates}
+                {"$set": updates},
+                projection={"status": 1}
             )
             
-            if result.matched_count == 0:
+            if not campaign:
                 return {"success": False, "error": "Campagne non trouvée"}
             
+            if "status" in updates:
+                await MetricsAdminService.record(
+                    db, transition("marketing.campaigns.by_status", campaign.get("status"), updates["status"])
+                )
+            
             return {"success": True, "campaign_id": campaign_id}
         except Exception as e:
             logger.error(f"Error in update_campaign: {e}")
@@ -246,14 +241,19 @@ class MarketingAdminService:
             elif status == "completed":
                 update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
             
-            result = await db.marketing_campaigns.update_one(
+            campaign = await db.marketing_campaigns.find_one_and_update(
                 {"id": campaign_id},
-                {"$set": update_data}
+                {"$set": update_data},
+                projection={"status": 1}
             )
             
-            if result.matched_count == 0:
+            if not campaign:
                 return {"success": False, "error": "Campagne non trouvée"}
             
+            await MetricsAdminService.record(
+                db, transition("marketing.campaigns.by_status", campaign.get("status"), status)
+            )
+            
             return {"success": True, "campaign_id": campaign_id, "status": status}
         except Exception as e:
             logger.error(f"Error in update_campaign_status: {e}")
@@ -263,13 +263,20 @@ class MarketingAdminService:
     async def delete_campaign(db, campaign_id: str) -> dict:
         """Supprimer une campagne"""
         try:
-            result = await db.marketing_campaigns.delete_one({"id": campaign_id})
+            campaign = await db.marketing_campaigns.find_one_and_delete({"id": campaign_id}, {"status": 1})
             
-            if result.deleted_count == 0:
+            if not campaign:
                 return {"success": False, "error": "Campagne non trouvée"}
             
             # Supprimer les posts associés
-            await db.marketing_posts.delete_many({"campaign_id": campaign_id})
+            posts_result = await db.marketing_posts.delete_many({"campaign_id": campaign_id})
+            
+            changes = {"marketing.campaigns.total": -1}
+            changes.update(transition("marketing.campaigns.by_status", campaign.get("status"), None))
+            await MetricsAdminService.record(db, changes)
+            if posts_result.deleted_count:
+                # Répartition des posts supprimés inconnue: recalcul complet
+                MetricsAdminService.request_reconcile(db)
             
             return {"success": True, "deleted": True}
         except Exception as e:
@@ -347,6 +354,11 @@ class MarketingAdminService:
             if "_id" in post:
                 del post["_id"]
             
+            changes = {"marketing.posts.total": 1}
+            changes.update(transition("marketing.posts.by_status", None, post["status"]))
+            changes.update(transition("marketing.posts.by_platform", None, post["platform"]))
+            await MetricsAdminService.record(db, changes)
+            
             return {
                 "success": True,
                 "post": post
@@ -359,18 +371,23 @@ class MarketingAdminService:
     async def schedule_post(db, post_id: str, scheduled_at: str) -> dict:
         """Programmer une publication"""
         try:
-            result = await db.marketing_posts.update_one(
+            post = await db.marketing_posts.find_one_and_update(
                 {"id": post_id},
                 {"$set": {
                     "status": "scheduled",
                     "scheduled_at": scheduled_at,
                     "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
+                }},
+                projection={"status": 1}
             )
             
-            if result.matched_count == 0:
+            if not post:
                 return {"success": False, "error": "Publication non trouvée"}
             
+            await MetricsAdminService.record(
+                db, transition("marketing.posts.by_status", post.get("status"), "scheduled")
+            )
+            
             return {"success": True, "post_id": post_id, "scheduled_at": scheduled_at}
         except Exception as e:
             logger.error(f"Error in schedule_post: {e}")
@@ -382,18 +399,23 @@ class MarketingAdminService:
         try:
             now = datetime.now(timezone.utc).isoformat()
             
-            result = await db.marketing_posts.update_one(
+            post = await db.marketing_posts.find_one_and_update(
                 {"id": post_id},
                 {"$set": {
                     "status": "published",
                     "published_at": now,
                     "updated_at": now
-                }}
+                }},
+                projection={"status": 1}
             )
             
-            if result.matched_count == 0:
+            if not post:
                 return {"success": False, "error": "Publication non trouvée"}
             
+            await MetricsAdminService.record(
+                db, transition("marketing.posts.by_status", post.get("status"), "published")
+            )
+            
             return {
                 "success": True,
                 "post_id": post_id,
@@ -408,11 +430,18 @@ class MarketingAdminService:
     async def delete_post(db, post_id: str) -> dict:
         """Supprimer une publication"""
         try:
-            result = await db.marketing_posts.delete_one({"id": post_id})
+            post = await db.marketing_posts.find_one_and_delete(
+                {"id": post_id}, {"status": 1, "platform": 1, "published_at": 1}
+            )
             
-            if result.deleted_count == 0:
+            if not post:
                 return {"success": False, "error": "Publication non trouvée"}
             
+            changes = {"marketing.posts.total": -1}
+            changes.update(transition("marketing.posts.by_status", post.get("status"), None))
+            changes.update(transition("marketing.posts.by_platform", post.get("platform"), None))
+            await MetricsAdminService.record(db, changes)
+            
             return {"success": True, "deleted": True}
         except Exception as e:
             logger.error(f"Error in delete_post: {e}")
@@ -530,6 +559,8 @@ class MarketingAdminService:
             if "_id" in segment:
                 del segment["_id"]
             
+            await MetricsAdminService.record(db, {"marketing.segments.total": 1})
+            
             return {"success": True, "segment": segment}
         except Exception as e:
             logger.error(f"Error in create_segment: {e}")
@@ -590,14 +621,18 @@ class MarketingAdminService:
     async def toggle_automation(db, automation_id: str, is_active: bool) -> dict:
         """Activer/désactiver une automation"""
         try:
-            result = await db.marketing_automations.update_one(
+            automation = await db.marketing_automations.find_one_and_update(
                 {"id": automation_id},
-                {"$set": {"is_active": is_active, "updated_at": datetime.now(timezone.utc).isoformat()}}
+                {"$set": {"is_active": is_active, "updated_at": datetime.now(timezone.utc).isoformat()}},
+                projection={"is_active": 1}
             )
             
-            if result.matched_count == 0:
+            if not automation:
                 return {"success": False, "error": "Automation non trouvée"}
             
+            if bool(automation.get("is_active")) != is_active:
+                await MetricsAdminService.record(db, {"marketing.automations.active": 1 if is_active else -1})
+            
             return {"success": True, "automation_id": automation_id, "is_active": is_active}
         except Exception as e:
             logger.error(f"Error in toggle_automation: {e}")
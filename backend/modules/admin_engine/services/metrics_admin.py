@@ -0,0 +1,364 @@
+"""
+Metrics Admin Service - V5-ULTIME Administration Premium
+========================================================
+
+Métriques matérialisées des dashboards d'administration:
+- Un document snapshot unique sert les dashboards Hotspots, Networking, Marketing
+- Compteurs et sommes maintenus par hooks d'écriture ($inc sur le snapshot)
+- Réconciliation périodique: une agrégation $facet par collection
+- Fenêtres glissantes (7j / 30j) recalculées à chaque réconciliation
+- Fraîcheur du snapshot exposée dans chaque réponse
+
+Module isolé - aucun import croisé.
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List, Dict, Any, Tuple
+from collections import defaultdict
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLLECTION = "admin_metrics_snapshot"
+SNAPSHOT_ID = "dashboards"
+
+# Âge maximal (secondes) avant réconciliation en arrière-plan
+RECONCILE_INTERVAL = int(os.environ.get('ADMIN_METRICS_RECONCILE_INTERVAL', 300))
+
+# Copie locale du snapshot (évite une lecture Mongo par page admin)
+LOCAL_CACHE_TTL = 10
+
+
+# ==============================================
+# METRIC DEFINITIONS
+# ==============================================
+#
+# Chemin -> spécification:
+# - collection: collection source
+# - filter: filtre Mongo (optionnel)
+# - sum: champs additionnés (sinon comptage)
+# - group_by: comptage par valeur d'un champ (dictionnaire)
+# - window_days / date_field: fenêtre glissante, exacte après réconciliation
+
+METRIC_DEFINITIONS: Dict[str, Dict[str, Any]] = {
+    # ---------- Networking ----------
+    "networking.posts.total": {"collection": "content_posts"},
+    "networking.posts.this_week": {"collection": "content_posts", "window_days": 7, "date_field": "created_at"},
+    "networking.leads.total": {"collection": "leads"},
+    "networking.leads.by_status": {"collection": "leads", "group_by": "status"},
+    "networking.contacts.total": {"collection": "contacts"},
+    "networking.groups.total": {"collection": "groups"},
+    "networking.groups.active": {"collection": "groups", "filter": {"is_active": True}},
+    "networking.groups.by_type": {"collection": "groups", "group_by": "group_type"},
+    "networking.referrals.total": {"collection": "referrals"},
+    "networking.referrals.by_status": {"collection": "referrals", "group_by": "status"},
+    "networking.referrals.rewards_distributed": {
+        "collection": "referrals", "filter": {"status": "rewarded"},
+        "sum": ["referrer_reward_amount", "referee_reward_amount"]
+    },
+    "networking.wallets.total": {"collection": "wallets"},
+    "networking.wallets.total_credits": {"collection": "wallets", "sum": ["balance_credits"]},
+    "networking.wallets.total_earned": {"collection": "wallets", "sum": ["total_earned"]},
+
+    # ---------- Hotspots / Terres ----------
+    "hotspots.listings.total": {"collection": "land_listings"},
+    "hotspots.listings.by_status": {"collection": "land_listings", "group_by": "status"},
+    "hotspots.listings.featured": {"collection": "land_listings", "filter": {"is_featured": True}},
+    "hotspots.listings.new_week": {"collection": "land_listings", "window_days": 7, "date_field": "created_at"},
+    "hotspots.owners.total": {"collection": "land_owners"},
+    "hotspots.renters.total": {"collection": "land_renters"},
+    "hotspots.renters.by_tier": {"collection": "land_renters", "group_by": "subscription_tier"},
+    "hotspots.agreements.total": {"collection": "land_agreements"},
+    "hotspots.agreements.by_status": {"collection": "land_agreements", "group_by": "status"},
+    "hotspots.revenue.total": {"collection": "lands_purchases", "filter": {"status": "completed"}, "sum": ["amount"]},
+    "hotspots.revenue.transactions": {"collection": "lands_purchases", "filter": {"status": "completed"}},
+
+    # ---------- Marketing ----------
+    "marketing.campaigns.total": {"collection": "marketing_campaigns"},
+    "marketing.campaigns.by_status": {"collection": "marketing_campaigns", "group_by": "status"},
+    "marketing.posts.total": {"collection": "marketing_posts"},
+    "marketing.posts.by_status": {"collection": "marketing_posts", "group_by": "status"},
+    "marketing.posts.by_platform": {"collection": "marketing_posts", "group_by": "platform"},
+    "marketing.engagement_30d.impressions": {
+        "collection": "marketing_posts", "sum": ["impressions"], "window_days": 30, "date_field": "published_at"
+    },
+    "marketing.engagement_30d.clicks": {
+        "collection": "marketing_posts", "sum": ["clicks"], "window_days": 30, "date_field": "published_at"
+    },
+    "marketing.engagement_30d.engagement": {
+        "collection": "marketing_posts", "sum": ["engagement"], "window_days": 30, "date_field": "published_at"
+    },
+    "marketing.segments.total": {"collection": "marketing_segments"},
+    "marketing.automations.total": {"collection": "marketing_automations"},
+    "marketing.automations.active": {"collection": "marketing_automations", "filter": {"is_active": True}},
+}
+
+
+# ==============================================
+# PIPELINE HELPERS
+# ==============================================
+
+def _metric_for_path(path: str) -> Optional[str]:
+    """Métrique définie pour un chemin (ex: networking.leads.by_status.new)"""
+    if path in METRIC_DEFINITIONS:
+        return path
+    parent, _, _ = path.rpartition(".")
+    if parent in METRIC_DEFINITIONS and "group_by" in METRIC_DEFINITIONS[parent]:
+        return parent
+    return None
+
+
+def build_collection_facets(now: datetime) -> Dict[str, Tuple[List[str], Dict[str, list]]]:
+    """
+    Construire une étape $facet par collection.
+
+    Retourne {collection: ([chemins dans l'ordre des facettes], {facette: pipeline})}.
+    """
+    by_collection: Dict[str, Tuple[List[str], Dict[str, list]]] = {}
+
+    for path, spec in METRIC_DEFINITIONS.items():
+        paths, facets = by_collection.setdefault(spec["collection"], ([], {}))
+        match = dict(spec.get("filter", {}))
+        if spec.get("window_days"):
+            since = now - timedelta(days=spec["window_days"])
+            match[spec["date_field"]] = {"$gte": since.isoformat()}
+
+        pipeline = [{"$match": match}] if match else []
+        if "group_by" in spec:
+            pipeline.append({"$group": {"_id": f"${spec['group_by']}", "value": {"$sum": 1}}})
+        elif "sum" in spec:
+            terms = [{"$ifNull": [f"${name}", 0]} for name in spec["sum"]]
+            expression = terms[0] if len(terms) == 1 else {"$add": terms}
+            pipeline.append({"$group": {"_id": None, "value": {"$sum": expression}}})
+        else:
+            pipeline.append({"$count": "value"})
+
+        # Les noms de facettes ne peuvent pas contenir de points
+        facets[f"m{len(paths)}"] = pipeline
+        paths.append(path)
+
+    return by_collection
+
+
+def parse_facet_result(paths: List[str], result: Dict[str, list]) -> Dict[str, Any]:
+    """Convertir le résultat $facet en {chemin: valeur}"""
+    values = {}
+    for index, path in enumerate(paths):
+        rows = result.get(f"m{index}", [])
+        spec = METRIC_DEFINITIONS[path]
+        if "group_by" in spec:
+            values[path] = {
+                str(row["_id"]): row["value"] for row in rows
+                if row.get("_id") is not None and "." not in str(row["_id"]) and not str(row["_id"]).startswith("$")
+            }
+        else:
+            value = rows[0]["value"] if rows else 0
+            values[path] = round(value, 2) if isinstance(value, float) else value
+    return values
+
+
+def nest_metrics(values: Dict[str, Any]) -> Dict[str, Any]:
+    """{"a.b.c": 1} -> {"a": {"b": {"c": 1}}}"""
+    nested: Dict[str, Any] = {}
+    for path, value in values.items():
+        node = nested
+        parts = path.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return nested
+
+
+def transition(prefix: str, old_value: Any, new_value: Any) -> Dict[str, int]:
+    """Variations pour un changement de valeur d'un compteur group_by"""
+    if old_value == new_value:
+        return {}
+    changes = {}
+    if old_value is not None:
+        changes[f"{prefix}.{old_value}"] = -1
+    if new_value is not None:
+        changes[f"{prefix}.{new_value}"] = 1
+    return changes
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MetricsAdminService:
+    """Service isolé pour les métriques matérialisées des dashboards admin"""
+
+    _cache: Optional[Dict[str, Any]] = None
+    _cache_at: float = 0.0
+    _lock: Optional[asyncio.Lock] = None
+    _reconcile_task: Optional[asyncio.Task] = None
+
+    # ============ WRITE HOOKS ============
+    @staticmethod
+    async def record(db, changes: Dict[str, float]) -> bool:
+        """
+        Appliquer des variations au snapshot ($inc atomique).
+
+        Appelé après chaque écriture concernée. Ne lève jamais d'exception:
+        la réconciliation corrige toute variation perdue.
+        """
+        increments = {}
+        for path, amount in changes.items():
+            if not amount:
+                continue
+            if _metric_for_path(path) is None:
+                logger.warning(f"Unknown admin metric: {path}")
+                continue
+            increments[f"metrics.{path}"] = amount
+
+        if not increments:
+            return False
+
+        try:
+            await db[SNAPSHOT_COLLECTION].update_one(
+                {"_id": SNAPSHOT_ID},
+                {
+                    "$inc": increments,
+                    "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+                }
+            )
+        except Exception as e:
+            logger.error(f"Admin metrics hook failed: {e}")
+            return False
+
+        MetricsAdminService._cache = None
+        return True
+
+    # ============ RECONCILIATION ============
+    @staticmethod
+    async def reconcile(db) -> Dict[str, Any]:
+        """Recalculer toutes les métriques (une agrégation par collection)"""
+        if MetricsAdminService._lock is None:
+            MetricsAdminService._lock = asyncio.Lock()
+
+        async with MetricsAdminService._lock:
+            started = time.perf_counter()
+            now = datetime.now(timezone.utc)
+            values: Dict[str, Any] = {}
+
+            for collection, (paths, facets) in build_collection_facets(now).items():
+                results = await db[collection].aggregate([{"$facet": facets}]).to_list(length=1)
+                values.update(parse_facet_result(paths, results[0] if results else {}))
+
+            previous = await db[SNAPSHOT_COLLECTION].find_one({"_id": SNAPSHOT_ID}, {"version": 1})
+            snapshot = {
+                "_id": SNAPSHOT_ID,
+                "metrics": nest_metrics(values),
+                "reconciled_at": now.isoformat(),
+                "updated_at": now.isoformat(),
+                "reconcile_ms": round((time.perf_counter() - started) * 1000, 1),
+                "version": (previous or {}).get("version", 0) + 1
+            }
+            await db[SNAPSHOT_COLLECTION].replace_one({"_id": SNAPSHOT_ID}, snapshot, upsert=True)
+
+            MetricsAdminService._cache = snapshot
+            MetricsAdminService._cache_at = time.monotonic()
+            logger.info(f"Admin metrics reconciled in {snapshot['reconcile_ms']}ms (v{snapshot['version']})")
+            return snapshot
+
+    @staticmethod
+    def request_reconcile(db):
+        """Planifier une réconciliation en arrière-plan (écritures en masse)"""
+        task = MetricsAdminService._reconcile_task
+        if task is not None and not task.done():
+            return
+
+        async def run():
+            try:
+                await MetricsAdminService.reconcile(db)
+            except Exception as e:
+                logger.error(f"Admin metrics reconciliation failed: {e}")
+
+        MetricsAdminService._reconcile_task = asyncio.create_task(run())
+
+    # ============ READ ============
+    @staticmethod
+    async def get_snapshot(db) -> Dict[str, Any]:
+        """Snapshot courant; réconciliation en arrière-plan s'il est périmé"""
+        snapshot = MetricsAdminService._cache
+        if snapshot is None or time.monotonic() - MetricsAdminService._cache_at > LOCAL_CACHE_TTL:
+            snapshot = await db[SNAPSHOT_COLLECTION].find_one({"_id": SNAPSHOT_ID})
+            if snapshot is None:
+                return await MetricsAdminService.reconcile(db)
+            MetricsAdminService._cache = snapshot
+            MetricsAdminService._cache_at = time.monotonic()
+
+        reconciled_at = _parse_time(snapshot.get("reconciled_at"))
+        if reconciled_at is None or (datetime.now(timezone.utc) - reconciled_at).total_seconds() > RECONCILE_INTERVAL:
+            MetricsAdminService.request_reconcile(db)
+
+        return snapshot
+
+    @staticmethod
+    def freshness(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Métadonnées de fraîcheur incluses dans les réponses des dashboards"""
+        now = datetime.now(timezone.utc)
+        reconciled_at = _parse_time(snapshot.get("reconciled_at"))
+        updated_at = _parse_time(snapshot.get("updated_at"))
+        age = (now - reconciled_at).total_seconds() if reconciled_at else None
+
+        return {
+            "source": "snapshot",
+            "version": snapshot.get("version", 0),
+            "reconciled_at": snapshot.get("reconciled_at"),
+            "updated_at": snapshot.get("updated_at"),
+            "age_seconds": round(age, 1) if age is not None else None,
+            "last_write_seconds": round((now - updated_at).total_seconds(), 1) if updated_at else None,
+            "stale": age is None or age > RECONCILE_INTERVAL,
+            "reconcile_interval": RECONCILE_INTERVAL
+        }
+
+    @staticmethod
+    async def get_section(db, section: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Métriques d'un dashboard (networking, hotspots, marketing) + fraîcheur"""
+        snapshot = await MetricsAdminService.get_snapshot(db)
+        metrics = snapshot.get("metrics", {}).get(section, {})
+        return _with_defaults(section, metrics), MetricsAdminService.freshness(snapshot)
+
+    @staticmethod
+    async def get_full_snapshot(db) -> dict:
+        """Snapshot complet (diagnostic)"""
+        snapshot = await MetricsAdminService.get_snapshot(db)
+        return {
+            "success": True,
+            "metrics": snapshot.get("metrics", {}),
+            "reconcile_ms": snapshot.get("reconcile_ms"),
+            "freshness": MetricsAdminService.freshness(snapshot)
+        }
+
+    @staticmethod
+    async def force_reconcile(db) -> dict:
+        """Réconciliation immédiate (admin)"""
+        snapshot = await MetricsAdminService.reconcile(db)
+        return {
+            "success": True,
+            "version": snapshot["version"],
+            "reconcile_ms": snapshot["reconcile_ms"],
+            "freshness": MetricsAdminService.freshness(snapshot)
+        }
+
+
+def _with_defaults(section: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Compléter une section avec des zéros pour les métriques absentes"""
+    defaults = defaultdict(dict)
+    prefix = f"{section}."
+    for path, spec in METRIC_DEFINITIONS.items():
+        if not path.startswith(prefix):
+            continue
+        group, name = path[len(prefix):].split(".", 1)
+        current = metrics.get(group, {}).get(name)
+        defaults[group][name] = current if current is not None else ({} if "group_by" in spec else 0)
+    return dict(defaults)
@@ -9,7 +9,8 @@ Service d'administration du réseau social chasseurs:
 - Parrainages et récompenses
 - Portefeuilles virtuels
 
-Module isolé - aucun import croisé.
+Module isolé - seuls le service de métriques admin et le grand livre
+des portefeuilles (networking_wallet) sont importés.
 Phase 4 Migration - Cœur métier HUNTIQ.
 """
 
@@ -18,75 +19,65 @@ from typing import Optional, List, Dict, Any
 import logging
 import uuid
 
+import networking_wallet as ledger
+
+from .metrics_admin import MetricsAdminService, transition
+
 logger = logging.getLogger(__name__)
 
 
+def _new_wallet(user_id: str) -> dict:
+    """Portefeuille créé par un premier crédit"""
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "balance_credits": 0,
+        "total_earned": 0,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
 class NetworkingAdminService:
     """Service isolé pour l'administration du réseau social"""
     
     # ============ DASHBOARD & STATS ============
     @staticmethod
     async def get_dashboard_stats(db) -> dict:
-        """Statistiques globales du networking"""
-        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-        
-        # Posts
-        total_posts = await db.content_posts.count_documents({})
-        posts_this_week = await db.content_posts.count_documents({
-            "created_at": {"$gte": week_ago.isoformat()}
-        })
-        
-        # Leads
-        total_leads = await db.leads.count_documents({})
-        new_leads = await db.leads.count_documents({"status": "new"})
-        converted_leads = await db.leads.count_documents({"status": "converted"})
-        
-        # Contacts
-        total_contacts = await db.contacts.count_documents({})
-        
-        # Groups
-        total_groups = await db.groups.count_documents({})
-        active_groups = await db.groups.count_documents({"is_active": True})
-        
-        # Referrals
-        total_referrals = await db.referrals.count_documents({})
-        pending_referrals = await db.referrals.count_documents({"status": "pending"})
-        rewarded_referrals = await db.referrals.count_documents({"status": "rewarded"})
-        
-        # Wallets
-        total_wallets = await db.wallets.count_documents({})
-        wallets = await db.wallets.find({}, {"balance_credits": 1, "_id": 0}).to_list(length=10000)
-        total_credits = sum(w.get("balance_credits", 0) for w in wallets)
+        """Statistiques globales du networking (snapshot matérialisé)"""
+        metrics, freshness = await MetricsAdminService.get_section(db, "networking")
+        leads_by_status = metrics["leads"]["by_status"]
+        referrals_by_status = metrics["referrals"]["by_status"]
         
         return {
             "success": True,
             "stats": {
                 "posts": {
-                    "total": total_posts,
-                    "this_week": posts_this_week
+                    "total": metrics["posts"]["total"],
+                    "this_week": metrics["posts"]["this_week"]
                 },
                 "leads": {
-                    "total": total_leads,
-                    "new": new_leads,
-                    "converted": converted_leads
+                    "total": metrics["leads"]["total"],
+                    "new": leads_by_status.get("new", 0),
+                    "converted": leads_by_status.get("converted", 0)
                 },
                 "contacts": {
-                    "total": total_contacts
+                    "total": metrics["contacts"]["total"]
                 },
                 "groups": {
-                    "total": total_groups,
-                    "active": active_groups
+                    "total": metrics["groups"]["total"],
+                    "active": metrics["groups"]["active"]
                 },
                 "referrals": {
-                    "total": total_referrals,
-                    "pending": pending_referrals,
-                    "rewarded": rewarded_referrals
+                    "total": metrics["referrals"]["total"],
+                    "pending": referrals_by_status.get("pending", 0),
+                    "rewarded": referrals_by_status.get("rewarded", 0)
                 },
                 "wallets": {
-                    "total": total_wallets,
-                    "total_credits": round(total_credits, 2)
+                    "total": metrics["wallets"]["total"],
+                    "total_credits": round(metrics["wallets"]["total_credits"], 2)
                 }
-            }
+            },
+            "freshness": freshness
         }
     
     # ============ POSTS MANAGEMENT ============
@@ -146,11 +137,17 @@ class NetworkingAdminService:
     async def delete_post(db, post_id: str) -> dict:
         """Supprimer une publication (admin)"""
         # Supprimer le post
-        result = await db.content_posts.delete_one({"id": post_id})
+        post = await db.content_posts.find_one_and_delete({"id": post_id}, {"created_at": 1})
         
-        if result.deleted_count == 0:
+        if not post:
             return {"success": False, "error": "Post not found"}
         
+        changes = {"networking.posts.total": -1}
+        week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
+        if (post.get("created_at") or "") >= week_ago:
+            changes["networking.posts.this_week"] = -1
+        await MetricsAdminService.record(db, changes)
+        
         # Supprimer les commentaires et likes associés
         await db.content_comments.delete_many({"post_id": post_id})
         await db.content_likes.delete_many({"target_id": post_id})
@@ -175,16 +172,20 @@ class NetworkingAdminService:
         
         total = await db.groups.count_documents(query)
         
-        # Type counts
-        type_counts = {}
-        for gt in ["hunting_club", "family", "business", "friends", "custom"]:
-            type_counts[gt] = await db.groups.count_documents({"group_type": gt})
+        # Type counts (snapshot)
+        metrics, freshness = await MetricsAdminService.get_section(db, "networking")
+        by_type = metrics["groups"]["by_type"]
+        type_counts = {
+            gt: by_type.get(gt, 0)
+            for gt in ["hunting_club", "family", "business", "friends", "custom"]
+        }
         
         return {
             "success": True,
             "total": total,
             "type_counts": type_counts,
-            "groups": groups
+            "groups": groups,
+            "freshness": freshness
         }
     
     @staticmethod
@@ -212,24 +213,34 @@ class NetworkingAdminService:
     @staticmethod
     async def toggle_group_active(db, group_id: str, is_active: bool) -> dict:
         """Activer/désactiver un groupe"""
-        result = await db.groups.update_one(
+        group = await db.groups.find_one_and_update(
             {"id": group_id},
-            {"$set": {"is_active": is_active}}
+            {"$set": {"is_active": is_active}},
+            projection={"is_active": 1}
         )
         
-        if result.matched_count == 0:
+        if not group:
             return {"success": False, "error": "Group not found"}
         
+        if bool(group.get("is_active")) != is_active:
+            await MetricsAdminService.record(db, {"networking.groups.active": 1 if is_active else -1})
+        
         return {"success": True, "group_id": group_id, "is_active": is_active}
     
     @staticmethod
     async def delete_group(db, group_id: str) -> dict:
         """Supprimer un groupe (admin)"""
-        result = await db.groups.delete_one({"id": group_id})
+        group = await db.groups.find_one_and_delete({"id": group_id}, {"is_active": 1, "group_type": 1})
         
-        if result.deleted_count == 0:
+        if not group:
             return {"success": False, "error": "Group not found"}
         
+        changes = {"networking.groups.total": -1}
+        changes.update(transition("networking.groups.by_type", group.get("group_type"), None))
+        if group.get("is_active"):
+            changes["networking.groups.active"] = -1
+        await MetricsAdminService.record(db, changes)
+        
         # Supprimer les memberships
         await db.group_memberships.delete_many({"group_id": group_id})
         
@@ -253,10 +264,13 @@ class NetworkingAdminService:
         
         total = await db.leads.count_documents(query)
         
-        # Status counts
-        status_counts = {}
-        for s in ["new", "contacted", "interested", "negotiating", "converted", "lost"]:
-            status_counts[s] = await db.leads.count_documents({"status": s})
+        # Status counts (snapshot)
+        metrics, freshness = await MetricsAdminService.get_section(db, "networking")
+        by_status = metrics["leads"]["by_status"]
+        status_counts = {
+            s: by_status.get(s, 0)
+            for s in ["new", "contacted", "interested", "negotiating", "converted", "lost"]
+        }
         
         # Calculate values
         total_estimated = sum(l.get("estimated_value", 0) for l in leads)
@@ -270,7 +284,8 @@ class NetworkingAdminService:
                 "total_estimated": round(total_estimated, 2),
                 "total_actual": round(total_actual, 2)
             },
-            "leads": leads
+            "leads": leads,
+            "freshness": freshness
         }
     
     # ============ REFERRALS MANAGEMENT ============
@@ -287,21 +302,19 @@ class NetworkingAdminService:
         
         total = await db.referrals.count_documents(query)
         
-        # Status counts
-        status_counts = {}
-        for s in ["pending", "verified", "rewarded", "expired"]:
-            status_counts[s] = await db.referrals.count_documents({"status": s})
-        
-        # Total rewards distributed
-        rewarded = await db.referrals.find({"status": "rewarded"}).to_list(length=10000)
-        total_rewards = sum(r.get("referrer_reward_amount", 0) + r.get("referee_reward_amount", 0) for r in rewarded)
+        # Status counts & total rewards distributed (snapshot)
+        metrics, freshness = await MetricsAdminService.get_section(db, "networking")
+        by_status = metrics["referrals"]["by_status"]
+        status_counts = {s: by_status.get(s, 0) for s in ["pending", "verified", "rewarded", "expired"]}
+        total_rewards = metrics["referrals"]["rewards_distributed"]
         
         return {
             "success": True,
             "total": total,
             "status_counts": status_counts,
             "total_rewards_distributed": round(total_rewards, 2),
-            "referrals": referrals
+            "referrals": referrals,
+            "freshness": freshness
         }
     
     @staticmethod
@@ -329,43 +342,24 @@ class NetworkingAdminService:
         if referral.get("status") != "pending":
             return {"success": False, "error": "Referral already processed"}
         
-        now = datetime.now(timezone.utc)
-        
-        # Update referral status
-        await db.referrals.update_one(
-            {"id": referral_id},
-            {"$set": {
-                "status": "rewarded",
-                "verified_at": now.isoformat(),
-                "rewarded_at": now.isoformat()
-            }}
+        # Même identifiant de règlement que /networking/referral/{id}/verify:
+        # une validation concurrente ou rejouée ne paie qu'une fois, et les
+        # portefeuilles sont crédités par upsert (jamais de doublon user_id)
+        summary = await ledger.settle_referrals(
+            db, _new_wallet, [referral_id], settlement_id=f"referral_{referral_id}"
         )
+        if not summary["settled"]:
+            return {"success": False, "error": "Referral already processed"}
         
-        # Add credits to wallets
-        for user_id, amount in [
-            (referral["referrer_id"], referral.get("referrer_reward_amount", 10)),
-            (referral["referee_id"], referral.get("referee_reward_amount", 5))
-        ]:
-            # Get or create wallet
-            wallet = await db.wallets.find_one({"user_id": user_id})
-            if not wallet:
-                wallet = {
-                    "id": str(uuid.uuid4()),
-                    "user_id": user_id,
-                    "balance_credits": 0,
-                    "total_earned": 0,
-                    "created_at": now.isoformat()
-                }
-                await db.wallets.insert_one(wallet)
-            
-            # Add credits
-            await db.wallets.update_one(
-                {"user_id": user_id},
-                {
-                    "$inc": {"balance_credits": amount, "total_earned": amount},
-                    "$set": {"updated_at": now.isoformat()}
-                }
-            )
+        rewards = summary["total_rewards"]
+        changes = transition("networking.referrals.by_status", "pending", "rewarded")
+        changes["networking.referrals.rewards_distributed"] = rewards
+        changes["networking.wallets.total_credits"] = rewards
+        changes["networking.wallets.total_earned"] = rewards
+        if summary["created_wallets"]:
+            changes["networking.wallets.total"] = summary["created_wallets"]
+        
+        await MetricsAdminService.record(db, changes)
         
         return {
             "success": True,
@@ -390,6 +384,8 @@ class NetworkingAdminService:
         if result.matched_count == 0:
             return {"success": False, "error": "Referral not found or already processed"}
         
+        await MetricsAdminService.record(db, transition("networking.referrals.by_status", "pending", "expired"))
+        
         return {"success": True, "referral_id": referral_id, "rejected": True}
     
     # ============ WALLETS MANAGEMENT ============
@@ -400,19 +396,16 @@ class NetworkingAdminService:
             {}, {"_id": 0}
         ).sort("balance_credits", -1).limit(limit).to_list(length=limit)
         
-        total = await db.wallets.count_documents({})
-        
-        # Total credits
-        all_wallets = await db.wallets.find({}, {"balance_credits": 1, "_id": 0}).to_list(length=10000)
-        total_credits = sum(w.get("balance_credits", 0) for w in all_wallets)
-        total_earned = sum(w.get("total_earned", 0) for w in all_wallets)
+        # Totaux (snapshot)
+        metrics, freshness = await MetricsAdminService.get_section(db, "networking")
         
         return {
             "success": True,
-            "total": total,
-            "total_credits_circulation": round(total_credits, 2),
-            "total_earned_all_time": round(total_earned, 2),
-            "wallets": wallets
+            "total": metrics["wallets"]["total"],
+            "total_credits_circulation": round(metrics["wallets"]["total_credits"], 2),
+            "total_earned_all_time": round(metrics["wallets"]["total_earned"], 2),
+            "wallets": wallets,
+            "freshness": freshness
         }
     
     @staticmethod
@@ -442,6 +435,7 @@ class NetworkingAdminService:
                                    reason: str, adjustment_type: str = "manual") -> dict:
         """Ajuster le solde d'un portefeuille (admin)"""
         wallet = await db.wallets.find_one({"user_id": user_id})
+        changes = {}
         
         if not wallet:
             # Create wallet
@@ -453,6 +447,7 @@ class NetworkingAdminService:
                 "created_at": datetime.now(timezone.utc).isoformat()
             }
             await db.wallets.insert_one(wallet)
+            changes["networking.wallets.total"] = 1
         
         balance_before = wallet.get("balance_credits", 0)
         balance_after = balance_before + amount
@@ -488,12 +483,16 @@ class NetworkingAdminService:
                 {"user_id": user_id},
                 {"$set": update, "$inc": {"total_earned": amount}}
             )
+            changes["networking.wallets.total_earned"] = amount
         else:
             await db.wallets.update_one(
                 {"user_id": user_id},
                 {"$set": update}
             )
         
+        changes["networking.wallets.total_credits"] = amount
+        await MetricsAdminService.record(db, changes)
+        
         return {
             "success": True,
             "user_id": user_id,
@@ -9,6 +9,8 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict, Any
 import logging
 
+from utils.principal_cache import principal_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -101,6 +103,8 @@ class UsersAdminService:
         if result.matched_count == 0:
             return {"success": False, "error": "User not found"}
         
+        principal_cache.invalidate_user(user_id=user_id, email=user_id if "@" in user_id else None)
+        
         return {
             "success": True,
             "user_id": user_id,
@@ -22,6 +22,10 @@ import os
 import logging
 import uuid
 
+from modules.ad_spaces_engine.serving_cache import (
+    serving_cache, ad_counters, record_impression, record_click, compute_ctr
+)
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/affiliate-ads", tags=["Affiliate Ad Automation Engine"])
@@ -589,6 +593,7 @@ async def _deploy_ad(db, opportunity_id: str) -> Dict:
     }
     
     await db.deployed_ads.insert_one(deployed_ad)
+    serving_cache.invalidate()
     
     # Update opportunity status
     await db.ad_opportunities.update_one(
@@ -735,19 +740,10 @@ async def track_impression(
 ):
     """Tracker une impression publicitaire"""
     db = get_db()
+    ad = await _resolve_deployed_ad(db, ad_id)
     
-    await db.deployed_ads.update_one(
-        {"ad_id": ad_id},
-        {"$inc": {"impressions": 1}}
-    )
-    
-    # Also update opportunity
-    ad = await db.deployed_ads.find_one({"ad_id": ad_id})
     if ad:
-        await db.ad_opportunities.update_one(
-            {"opportunity_id": ad["opportunity_id"]},
-            {"$inc": {"impressions": 1}}
-        )
+        record_impression(ad_id, ad.get("opportunity_id"))
     
     return {"success": True}
 
@@ -756,35 +752,27 @@ async def track_impression(
 async def track_click(
     ad_id: str = Body(..., embed=True)
 ):
-    """Tracker un clic publicitaire"""
+    """Tracker un clic publicitaire (CTR calculé à la lecture)"""
     db = get_db()
-    
-    ad = await db.deployed_ads.find_one({"ad_id": ad_id})
+    ad = await _resolve_deployed_ad(db, ad_id)
     
     if ad:
-        new_clicks = ad.get("clicks", 0) + 1
-        new_impressions = ad.get("impressions", 1)
-        new_ctr = round((new_clicks / max(new_impressions, 1)) * 100, 2)
-        
-        await db.deployed_ads.update_one(
-            {"ad_id": ad_id},
-            {
-                "$inc": {"clicks": 1},
-                "$set": {"ctr": new_ctr}
-            }
-        )
-        
-        await db.ad_opportunities.update_one(
-            {"opportunity_id": ad["opportunity_id"]},
-            {
-                "$inc": {"clicks": 1},
-                "$set": {"ctr": new_ctr}
-            }
-        )
+        record_click(ad_id, ad.get("opportunity_id"))
     
     return {"success": True}
 
 
+async def _resolve_deployed_ad(db, ad_id: str) -> Optional[Dict]:
+    """Créatif depuis le cache de diffusion, sinon depuis MongoDB"""
+    await serving_cache.ensure_fresh(db)
+    ad_counters.start(db)
+    
+    ad = serving_cache.get_deployed_ad_by_id(ad_id)
+    if not ad:
+        ad = await db.deployed_ads.find_one({"ad_id": ad_id}, {"_id": 0, "opportunity_id": 1})
+    return ad
+
+
 @router.get("/performance/{opportunity_id}")
 async def get_ad_performance(opportunity_id: str):
     """Obtenir les performances d'une campagne"""
@@ -795,9 +783,10 @@ async def get_ad_performance(opportunity_id: str):
     if not opp:
         raise HTTPException(status_code=404, detail="Opportunité non trouvée")
     
+    ad_counters.merge_pending(opp, "ad_opportunities", "opportunity_id")
     impressions = opp.get("impressions", 0)
     clicks = opp.get("clicks", 0)
-    ctr = round((clicks / max(impressions, 1)) * 100, 2)
+    ctr = compute_ctr(clicks, impressions)
     
     return {
         "success": True,
@@ -1219,6 +1208,8 @@ async def toggle_ad_master_switch(
         upsert=True
     )
     
+    serving_cache.invalidate()
+    
     # Log action
     await _log_ad_action(db, "MASTER_SWITCH", "toggle", admin_user, {
         "new_state": is_active,
@@ -1307,6 +1298,8 @@ async def deactivate_all_ads(
         }
     )
     
+    serving_cache.invalidate()
+    
     # 5. Log action
     await _log_ad_action(db, "SYSTEM", "global_deactivation", admin_user, {
         "reason": reason,
@@ -1393,6 +1386,8 @@ async def reactivate_all_ads(
         }
     )
     
+    serving_cache.invalidate()
+    
     # 5. Log action
     await _log_ad_action(db, "SYSTEM", "global_reactivation", admin_user, {
         "paused_reactivated": paused_result.modified_count,
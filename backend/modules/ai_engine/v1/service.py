@@ -12,8 +12,6 @@ import uuid
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone
 
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-
 from .models import (
     AIAnalysisReport, 
     ProductTechnicalSheet,
@@ -29,6 +27,7 @@ from .data.products import (
     get_competitors
 )
 from .data.references import get_scientific_references
+from modules.llm_gateway import get_llm_gateway
 
 # Import scoring service for score calculation
 import sys
@@ -39,25 +38,32 @@ from scoring_engine.v1.service import ScoringService
 class AIAnalysisService:
     """Service for AI-powered product analysis using GPT-5.2"""
     
+    SYSTEM_MESSAGE = """Tu es un expert scientifique en attractants pour la chasse au Québec et en Amérique du Nord.
+                Tu analyses les produits de manière impartiale et scientifique basé sur 13 critères d'évaluation.
+                Tu dois fournir des analyses détaillées basées sur les ingrédients, la composition chimique et les conditions d'utilisation.
+                Tu prends en compte l'espèce cible, la saison de chasse, les conditions météorologiques et le type d'habitat.
+                Réponds toujours en JSON valide."""
+    
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.environ.get('EMERGENT_LLM_KEY', '')
         self.scoring_service = ScoringService()
-        self._chat = None
+        self.llm = get_llm_gateway()
     
     @property
-    def chat(self):
-        """Lazy initialization of LLM chat"""
-        if self._chat is None and self.api_key:
-            self._chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"analyzer_{uuid.uuid4().hex[:8]}",
-                system_message="""Tu es un expert scientifique en attractants pour la chasse au Québec et en Amérique du Nord.
-                Tu analyses les produits de manière impartiale et scientifique basé sur 13 critères d'évaluation.
-                Tu dois fournir des analyses détaillées basées sur les ingrédients, la composition chimique et les conditions d'utilisation.
-                Tu prends en compte l'espèce cible, la saison de chasse, les conditions météorologiques et le type d'habitat.
-                Réponds toujours en JSON valide."""
-            ).with_model("openai", "gpt-5.2")
-        return self._chat
+    def llm_enabled(self) -> bool:
+        """LLM available only when an API key is configured"""
+        return bool(self.api_key)
+    
+    async def _ask(self, prompt: str) -> str:
+        """Send a prompt through the shared LLM gateway"""
+        return await self.llm.complete(
+            prompt,
+            system_message=self.SYSTEM_MESSAGE,
+            feature="product_analysis",
+            provider="openai",
+            model="gpt-5.2",
+            api_key=self.api_key
+        )
     
     def get_comparison(self, product_type: str, analyzed_score: float) -> CompetitorComparison:
         """Generate 3-column comparison table"""
@@ -195,8 +201,8 @@ Fournis une analyse JSON avec cette structure exacte:
 Sois précis et scientifique. Si des informations sont estimées, indique-le dans les notes."""
 
         try:
-            if self.chat:
-                response = await self.chat.send_message(UserMessage(text=analysis_prompt))
+            if self.llm_enabled:
+                response = await self._ask(analysis_prompt)
                 
                 # Parse JSON response
                 json_str = response
@@ -355,8 +361,8 @@ Fournis une analyse JSON avec:
 }}"""
 
         try:
-            if self.chat:
-                response = await self.chat.send_message(UserMessage(text=context_prompt))
+            if self.llm_enabled:
+                response = await self._ask(context_prompt)
                 
                 json_str = response
                 if "```json" in json_str:
@@ -438,8 +444,8 @@ Fournis une réponse JSON avec:
 Sois concis mais complet. Privilégie les informations pratiques et actionnables."""
 
         try:
-            if self.chat:
-                response = await self.chat.send_message(UserMessage(text=query_prompt))
+            if self.llm_enabled:
+                response = await self._ask(query_prompt)
                 
                 # Parse JSON
                 json_str = response
@@ -519,8 +525,8 @@ Fournis une analyse JSON avec:
 Sois objectif et scientifique dans ton évaluation."""
 
         try:
-            if self.chat:
-                response = await self.chat.send_message(UserMessage(text=compare_prompt))
+            if self.llm_enabled:
+                response = await self._ask(compare_prompt)
                 
                 json_str = response
                 if "```json" in json_str:
@@ -588,8 +594,8 @@ Fournis des suggestions JSON:
 Inclus des produits BIONIC si pertinents."""
 
         try:
-            if self.chat:
-                response = await self.chat.send_message(UserMessage(text=suggestion_prompt))
+            if self.llm_enabled:
+                response = await self._ask(suggestion_prompt)
                 
                 json_str = response
                 if "```json" in json_str:
@@ -14,6 +14,10 @@ from .models import (
     GoogleAuthCallback, PasswordReset
 )
 from .service import AuthService
+from utils.password_hashing import (
+    password_hasher, login_limiter, HashingOverloaded, TooManyLoginAttempts
+)
+from utils.principal_cache import principal_cache
 
 # Database dependency
 def get_db():
@@ -39,6 +43,15 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
+def _hashing_busy() -> HTTPException:
+    """503 when the bcrypt pool queue is full"""
+    return HTTPException(
+        status_code=503,
+        detail="Service d'authentification surchargé, réessayez dans un instant",
+        headers={"Retry-After": "2"}
+    )
+
+
 async def get_current_user(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
@@ -85,7 +98,10 @@ async def register(user_data: UserCreate, request: Request, response: Response):
     db = get_db()
     service = AuthService(db)
     
-    success, token_response, error = await service.register(user_data)
+    try:
+        success, token_response, error = await service.register(user_data)
+    except HashingOverloaded:
+        raise _hashing_busy()
     
     if not success:
         raise HTTPException(status_code=400, detail=error)
@@ -113,9 +129,19 @@ async def login(login_data: UserLogin, request: Request, response: Response):
     ip_address = get_client_ip(request)
     user_agent = request.headers.get("User-Agent")
     
-    success, token_response, error = await service.login(
-        login_data, ip_address, user_agent
-    )
+    try:
+        async with login_limiter.slot(ip_address):
+            success, token_response, error = await service.login(
+                login_data, ip_address, user_agent
+            )
+    except TooManyLoginAttempts:
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de tentatives de connexion simultanées",
+            headers={"Retry-After": "1"}
+        )
+    except HashingOverloaded:
+        raise _hashing_busy()
     
     if not success:
         raise HTTPException(status_code=401, detail=error)
@@ -327,11 +353,15 @@ async def reset_password(token: str, new_password: str):
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
     # Update password
-    new_hash = auth_service.hash_password(new_password)
+    try:
+        new_hash = await auth_service.hash_password(new_password)
+    except HashingOverloaded:
+        raise _hashing_busy()
     await auth_service.users_collection.update_one(
         {"user_id": user["user_id"]},
         {"$set": {"password_hash": new_hash, "updated_at": datetime.now(timezone.utc)}}
     )
+    principal_cache.invalidate_user(user["user_id"])
     
     # Mark token as used
     await email_service.mark_token_used(token)
@@ -364,6 +394,18 @@ async def verify_reset_token(token: str):
 # Health Check
 # ==========================================
 
+@router.get("/hashing/stats")
+async def hashing_stats(user: UserResponse = Depends(require_auth)):
+    """bcrypt pool and login limiter counters (admin)"""
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
+    return {
+        "success": True,
+        "hasher": password_hasher.stats(),
+        "login_limiter": login_limiter.stats()
+    }
+
+
 @router.get("/")
 async def auth_info():
     """Get auth engine info"""
@@ -387,6 +429,7 @@ async def auth_info():
             "GET /verify": "Verify token",
             "POST /logout": "Logout",
             "GET /auto-login": "Auto-login from trusted device",
-            "GET /ip-info": "Get IP trust info"
+            "GET /ip-info": "Get IP trust info",
+            "GET /hashing/stats": "Password hashing pool stats"
         }
     }
@@ -9,7 +9,6 @@ import logging
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Tuple
 import jwt
-from passlib.context import CryptContext
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import httpx
 
@@ -18,12 +17,11 @@ from .models import (
     SessionData, AuthProvider
 )
 from .email_service import EmailService
+from utils.password_hashing import password_hasher
+from utils.principal_cache import principal_cache, resolve_principal, revoke_token, TokenRevoked
 
 logger = logging.getLogger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT Configuration
 JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "huntiq_default_secret_change_me")
 JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
@@ -46,13 +44,13 @@ class AuthService:
     # Password Utilities
     # ==========================================
     
-    def hash_password(self, password: str) -> str:
-        """Hash a password"""
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        """Hash a password (bounded bcrypt pool, off the event loop)"""
+        return await password_hasher.hash(password)
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        return await password_hasher.verify(plain_password, hashed_password)
     
     def generate_user_id(self) -> str:
         """Generate a unique user ID"""
@@ -132,7 +130,7 @@ class AuthService:
         }
         
         if password:
-            user_doc["password_hash"] = self.hash_password(password)
+            user_doc["password_hash"] = await self.hash_password(password)
         
         await self.users_collection.insert_one(user_doc)
         
@@ -198,9 +196,17 @@ class AuthService:
         if "password_hash" not in user:
             return False, None, "Ce compte utilise Google pour se connecter"
         
-        # Verify password
-        if not self.verify_password(login_data.password, user["password_hash"]):
+        # Verify password (rehash if the stored cost factor is outdated)
+        valid, new_hash = await password_hasher.verify_and_update(
+            login_data.password, user["password_hash"]
+        )
+        if not valid:
             return False, None, "Email ou mot de passe incorrect"
+        if new_hash:
+            await self.users_collection.update_one(
+                {"user_id": user["user_id"], "password_hash": user["password_hash"]},
+                {"$set": {"password_hash": new_hash}}
+            )
         
         # Generate token
         token = self.create_access_token(user["user_id"], user["email"])
@@ -316,25 +322,28 @@ class AuthService:
         })
     
     async def logout(self, token: str) -> bool:
-        """Invalidate session"""
+        """Invalidate session and revoke the token for every worker"""
         result = await self.sessions_collection.delete_one({"token": token})
+        payload = self.verify_token(token)
+        if payload:
+            await revoke_token(self.db, token, payload.get("exp"))
         return result.deleted_count > 0
     
     async def verify_session(self, token: str) -> Optional[UserResponse]:
-        """Verify token and return user"""
-        payload = self.verify_token(token)
-        if not payload:
-            return None
-        
-        user_id = payload.get("sub")
-        if not user_id:
+        """Verify token and return user (principal cache first)"""
+        try:
+            user = principal_cache.lookup(token)
+            if user is None:
+                payload = self.verify_token(token)
+                if not payload:
+                    return None
+                user = await resolve_principal(self.db, token, payload)
+        except TokenRevoked:
             return None
         
-        user = await self.get_user_by_id(user_id)
         if not user:
             return None
         
-        user.pop("password_hash", None)
         return UserResponse(**user)
     
     # ==========================================
@@ -165,6 +165,16 @@ async def apply_rules(
     """Appliquer les règles à des conditions données"""
     return KnowledgeRulesManager.apply_rules(conditions, species, season)
 
+@router.post("/rules/apply/batch")
+async def apply_rules_batch(
+    species: str,
+    season: str,
+    conditions_list: List[dict] = Body(..., embed=True, max_length=10000)
+):
+    """Appliquer les règles à un lot de conditions (cellules de grille, heures de prévision)"""
+    results = KnowledgeRulesManager.apply_rules_batch(conditions_list, species, season)
+    return {"success": True, "count": len(results), "results": results}
+
 
 # ==============================================
 # SOURCES
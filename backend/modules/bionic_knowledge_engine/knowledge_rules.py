@@ -9,14 +9,16 @@ Règles basées sur:
 - Connaissances traditionnelles
 - Données capteurs
 
-Module isolé - aucun import croisé.
+Module isolé - seul le compilateur de règles partagé est importé.
 """
 
 from datetime import datetime, timezone
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import logging
 import uuid
 
+from modules.rules_engine.compiler import compile_weighted_conditions
+
 logger = logging.getLogger(__name__)
 
 
@@ -388,94 +390,77 @@ class KnowledgeRulesManager:
     
     # ============ RULE APPLICATION ============
     
+    # Règles de base compilées: (rule_id, règle, fonction de score)
+    _compiled_base_rules: Optional[List[Tuple[str, dict, Any]]] = None
+    
+    @classmethod
+    def _compiled_rules(cls) -> List[Tuple[str, dict, Any]]:
+        """Compiler les règles de base une seule fois"""
+        if cls._compiled_base_rules is None:
+            cls._compiled_base_rules = [
+                (rule_id, rule, compile_weighted_conditions(rule.get("conditions", {})))
+                for rule_id, rule in cls.BASE_RULES.items()
+                if rule.get("is_active", True)
+            ]
+        return cls._compiled_base_rules
+    
     @staticmethod
     def apply_rules(conditions: dict, species: str, season: str) -> dict:
         """Appliquer les règles pertinentes aux conditions données"""
-        applicable_rules = []
-        total_modifier = 0.0
-        location_preferences = []
+        return KnowledgeRulesManager.apply_rules_batch([conditions], species, season)[0]
+    
+    @staticmethod
+    def apply_rules_batch(conditions_list: List[dict], species: str, season: str) -> List[dict]:
+        """Appliquer les règles à de nombreuses conditions (cellules, heures) en un appel"""
+        # Filtrage espèce/saison fait une seule fois pour tout le lot
+        candidates = [
+            (rule_id, rule, score)
+            for rule_id, rule, score in KnowledgeRulesManager._compiled_rules()
+            if species in rule.get("species", [])
+            and (season in rule.get("seasons", []) or "all" in rule.get("seasons", []))
+        ]
         
-        for rule_id, rule in KnowledgeRulesManager.BASE_RULES.items():
-            if not rule.get("is_active", True):
-                continue
+        results = []
+        for conditions in conditions_list:
+            applicable_rules = []
+            total_modifier = 0.0
+            location_preferences = []
             
-            # Vérifier applicabilité espèce/saison
-            if species not in rule.get("species", []):
-                continue
-            if season not in rule.get("seasons", []) and "all" not in rule.get("seasons", []):
-                continue
-            
-            # Vérifier conditions
-            rule_conditions = rule.get("conditions", {})
-            match_score = KnowledgeRulesManager._evaluate_conditions(conditions, rule_conditions)
-            
-            if match_score > 0.5:
-                applicable_rules.append({
-                    "rule_id": rule_id,
-                    "name": rule["name_fr"],
-                    "match_score": match_score,
-                    "effect_type": rule["effect_type"],
-                    "effect_value": rule["effect_value"] * match_score,
-                    "confidence": rule["confidence_score"]
-                })
+            for rule_id, rule, score in candidates:
+                match_score = score(conditions)
                 
-                if rule["effect_type"] == "activity_modifier":
-                    total_modifier += rule["effect_value"] * match_score * rule["confidence_score"]
-                elif rule["effect_type"] == "location_preference":
-                    location_preferences.append({
-                        "habitats": rule.get("habitats", []),
-                        "strength": rule["effect_value"] * match_score
+                if match_score > 0.5:
+                    applicable_rules.append({
+                        "rule_id": rule_id,
+                        "name": rule["name_fr"],
+                        "match_score": match_score,
+                        "effect_type": rule["effect_type"],
+                        "effect_value": rule["effect_value"] * match_score,
+                        "confidence": rule["confidence_score"]
                     })
+                    
+                    if rule["effect_type"] == "activity_modifier":
+                        total_modifier += rule["effect_value"] * match_score * rule["confidence_score"]
+                    elif rule["effect_type"] == "location_preference":
+                        location_preferences.append({
+                            "habitats": rule.get("habitats", []),
+                            "strength": rule["effect_value"] * match_score
+                        })
+            
+            results.append({
+                "success": True,
+                "applicable_rules": applicable_rules,
+                "activity_modifier": round(total_modifier, 3),
+                "location_preferences": location_preferences,
+                "rules_evaluated": len(KnowledgeRulesManager.BASE_RULES)
+            })
         
-        return {
-            "success": True,
-            "applicable_rules": applicable_rules,
-            "activity_modifier": round(total_modifier, 3),
-            "location_preferences": location_preferences,
-            "rules_evaluated": len(KnowledgeRulesManager.BASE_RULES)
-        }
+        return results
     
     @staticmethod
     def _evaluate_conditions(actual: dict, required: dict) -> float:
         """Évaluer le degré de correspondance entre conditions actuelles et requises"""
-        if not required:
-            return 1.0
-        
-        total_score = 0
-        total_weight = 0
-        
-        for key, req_value in required.items():
-            if key not in actual:
-                continue
-            
-            actual_value = actual[key]
-            
-            if isinstance(req_value, dict):
-                if "min" in req_value and "max" in req_value:
-                    if req_value["min"] <= actual_value <= req_value["max"]:
-                        total_score += 1
-                    else:
-                        total_score += max(0, 1 - abs(actual_value - (req_value["min"] + req_value["max"])/2) / 10)
-                elif "min" in req_value:
-                    if actual_value >= req_value["min"]:
-                        total_score += 1
-                    else:
-                        total_score += max(0, actual_value / req_value["min"])
-                elif "max" in req_value:
-                    if actual_value <= req_value["max"]:
-                        total_score += 1
-                    else:
-                        total_score += max(0, req_value["max"] / actual_value)
-            elif isinstance(req_value, list):
-                if actual_value in req_value:
-                    total_score += 1
-            else:
-                if actual_value == req_value:
-                    total_score += 1
-            
-            total_weight += 1
-        
-        return total_score / max(total_weight, 1)
+        return compile_weighted_conditions(required)(actual)
     
     # ============ STATISTICS ============
     
@@ -6,13 +6,18 @@ Version: 1.0.0
 
 import os
 import math
-from typing import Optional, List, Dict, Any
+import asyncio
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timezone
 from pymongo import MongoClient
 from pydantic import BaseModel, Field
 from enum import Enum
 import uuid
 
+import numpy as np
+
+from .. import raster
+
 
 # ==============================================
 # MODELS
@@ -190,6 +195,9 @@ class AdvancedGeospatialDataLayer:
         self._client = None
         self._db = None
         
+        # Observations read per heatmap
+        self.max_heatmap_points = 5000
+        
         # Barrier types and their impact
         self.barrier_types = {
             "highway": {"severity": 0.9, "crossable": False},
@@ -428,56 +436,13 @@ class AdvancedGeospatialDataLayer:
         east: float,
         west: float,
         species: Optional[str] = None,
-        resolution_m: float = 100
+        resolution_m: float = 100,
+        max_dim: int = raster.DEFAULT_MAX_DIM
     ) -> ActivityHeatmapData:
         """Generate activity heatmap"""
-        # Calculate grid dimensions
-        lat_range = north - south
-        lng_range = east - west
-        
-        m_per_deg_lat = 111000
-        m_per_deg_lng = 111000 * abs(math.cos(math.radians((north + south) / 2)))
-        
-        rows = min(100, int((lat_range * m_per_deg_lat) / resolution_m))
-        cols = min(100, int((lng_range * m_per_deg_lng) / resolution_m))
-        
-        rows = max(10, rows)
-        cols = max(10, cols)
-        
-        # Generate heatmap data
-        import random
-        
-        cells = []
-        max_intensity = 0
-        hotspot_count = 0
-        
-        # Create some hotspot centers
-        hotspot_centers = [
-            (random.uniform(0.2, 0.8), random.uniform(0.2, 0.8))
-            for _ in range(random.randint(2, 5))
-        ]
-        
-        for i in range(rows):
-            row = []
-            for j in range(cols):
-                # Calculate intensity based on distance to hotspots
-                row_pct = i / rows
-                col_pct = j / cols
-                
-                intensity = 0.1
-                for hc_row, hc_col in hotspot_centers:
-                    dist = math.sqrt((row_pct - hc_row)**2 + (col_pct - hc_col)**2)
-                    intensity += max(0, 0.5 - dist) * random.uniform(0.8, 1.2)
-                
-                intensity = min(1.0, intensity)
-                row.append(round(intensity, 3))
-                
-                if intensity > max_intensity:
-                    max_intensity = intensity
-                if intensity > 0.7:
-                    hotspot_count += 1
-            
-            cells.append(row)
+        grid, values, total_observations = await self.compute_heatmap_raster(
+            north, south, east, west, species, resolution_m, max_dim
+        )
         
         return ActivityHeatmapData(
             north=north,
@@ -485,38 +450,111 @@ class AdvancedGeospatialDataLayer:
             east=east,
             west=west,
             resolution_m=resolution_m,
-            rows=rows,
-            cols=cols,
-            cells=cells,
+            rows=grid.rows,
+            cols=grid.cols,
+            cells=np.round(values, 3).tolist(),
             species=species,
-            max_intensity=round(max_intensity, 3),
-            hotspot_count=hotspot_count
+            total_observations=total_observations,
+            max_intensity=round(float(values.max()), 3),
+            hotspot_count=int(np.count_nonzero(values > 0.7))
+        )
+    
+    async def compute_heatmap_raster(
+        self,
+        north: float,
+        south: float,
+        east: float,
+        west: float,
+        species: Optional[str] = None,
+        resolution_m: float = 100,
+        max_dim: int = raster.DEFAULT_MAX_DIM
+    ) -> Tuple[raster.RasterGrid, np.ndarray, int]:
+        """
+        Heatmap intensities (0-1) as an array [row, col], row 0 south.
+        Kernel density of the concentration zones observed in the area,
+        or a placeholder hotspot field when none are cached.
+        
+        The zone query (sync driver) and the KDE run in a worker thread so
+        large grids do not block the event loop.
+        """
+        return await asyncio.to_thread(
+            self._heatmap_raster, north, south, east, west, species, resolution_m, max_dim
         )
     
+    def _heatmap_raster(
+        self,
+        north: float,
+        south: float,
+        east: float,
+        west: float,
+        species: Optional[str],
+        resolution_m: float,
+        max_dim: int
+    ) -> Tuple[raster.RasterGrid, np.ndarray, int]:
+        grid = raster.RasterGrid.from_resolution(north, south, east, west, resolution_m, max_dim)
+        
+        query = {
+            "center.lat": {"$gte": south, "$lte": north},
+            "center.lng": {"$gte": west, "$lte": east}
+        }
+        if species:
+            query["species"] = species.lower()
+        zones = list(self.zones_collection.find(
+            query, {"_id": 0, "center": 1, "observation_count": 1}
+        ).limit(self.max_heatmap_points))
+        
+        if zones:
+            counts = np.array([max(1, z.get("observation_count") or 0) for z in zones], dtype=np.float64)
+            density = raster.kernel_density(
+                grid,
+                [z["center"]["lat"] for z in zones],
+                [z["center"]["lng"] for z in zones],
+                counts,
+                bandwidth_m=max(3 * resolution_m, 150)
+            )
+            return grid, raster.normalize(density), int(counts.sum())
+        
+        return grid, self._placeholder_heatmap(grid), 0
+    
+    def _placeholder_heatmap(self, grid: raster.RasterGrid) -> np.ndarray:
+        """Random hotspot field: 0.1 + sum of cones of radius 0.5 (grid fraction)"""
+        rng = np.random.default_rng()
+        row_pct, col_pct = grid.fractions()
+        
+        intensity = np.full(grid.shape, 0.1)
+        for _ in range(rng.integers(2, 6)):
+            hc_row, hc_col = rng.uniform(0.2, 0.8, size=2)
+            dist = np.hypot(row_pct - hc_row, col_pct - hc_col)
+            intensity += np.maximum(0, 0.5 - dist) * rng.uniform(0.8, 1.2, size=grid.shape)
+        
+        return np.minimum(1.0, intensity)
+    
     async def get_hotspots(
         self,
         heatmap: ActivityHeatmapData,
         threshold: float = 0.7
     ) -> List[Dict[str, Any]]:
         """Extract hotspots from heatmap"""
-        hotspots = []
+        cells = np.asarray(heatmap.cells, dtype=np.float64)
+        if cells.size == 0:
+            return []
         
         lat_step = (heatmap.north - heatmap.south) / heatmap.rows
         lng_step = (heatmap.east - heatmap.west) / heatmap.cols
         
-        for i, row in enumerate(heatmap.cells):
-            for j, value in enumerate(row):
-                if value >= threshold:
-                    hotspots.append({
-                        "lat": heatmap.south + (i + 0.5) * lat_step,
-                        "lng": heatmap.west + (j + 0.5) * lng_step,
-                        "intensity": value
-                    })
-        
-        # Sort by intensity
-        hotspots.sort(key=lambda x: x["intensity"], reverse=True)
+        rows, cols = np.nonzero(cells >= threshold)
+        values = cells[rows, cols]
+        # Top 20 by intensity
+        top = np.argsort(-values, kind="stable")[:20]
         
-        return hotspots[:20]  # Top 20
+        return [
+            {
+                "lat": heatmap.south + (rows[k] + 0.5) * lat_step,
+                "lng": heatmap.west + (cols[k] + 0.5) * lng_step,
+                "intensity": float(values[k])
+            }
+            for k in top
+        ]
     
     # ===========================================
     # PLACEHOLDER GENERATORS
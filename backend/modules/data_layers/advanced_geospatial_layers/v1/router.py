@@ -9,6 +9,7 @@ from typing import Optional
 from pydantic import BaseModel
 
 from ..data_layer import get_advanced_geospatial_layer
+from ... import raster
 
 
 router = APIRouter(
@@ -195,13 +196,31 @@ async def generate_heatmap(
     east: float = Query(..., description="East boundary"),
     west: float = Query(..., description="West boundary"),
     species: Optional[str] = Query(None, description="Filter by species"),
-    resolution_m: float = Query(100, description="Cell resolution in meters")
+    resolution_m: float = Query(100, gt=0, description="Cell resolution in meters"),
+    max_dim: int = Query(raster.DEFAULT_MAX_DIM, ge=raster.MIN_DIM, le=raster.MAX_DIM, description="Max cells per side"),
+    encoding: Optional[str] = Query(None, description="png or u8: compact tile instead of cells")
 ):
     """Generate activity heatmap for an area"""
+    if south >= north or west >= east:
+        raise HTTPException(status_code=400, detail="Invalid bounds")
     layer = get_advanced_geospatial_layer()
-    heatmap = await layer.generate_heatmap(north, south, east, west, species, resolution_m)
+    if encoding is None:
+        heatmap = await layer.generate_heatmap(north, south, east, west, species, resolution_m, max_dim)
+        return heatmap.model_dump()
     
-    return heatmap.model_dump()
+    if encoding not in raster.ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"Unknown encoding: {encoding}")
+    grid, values, total_observations = await layer.compute_heatmap_raster(
+        north, south, east, west, species, resolution_m, max_dim
+    )
+    return {
+        "resolution_m": resolution_m,
+        "species": species,
+        "total_observations": total_observations,
+        "max_intensity": round(float(values.max()), 3),
+        "hotspot_count": int((values > 0.7).sum()),
+        "tile": raster.encode_tile(grid, values, encoding)
+    }
 
 
 @router.post("/heatmap/hotspots")
@@ -214,6 +233,8 @@ async def extract_hotspots(
     threshold: float = Query(0.7, description="Hotspot threshold (0-1)")
 ):
     """Extract hotspots from activity heatmap"""
+    if south >= north or west >= east:
+        raise HTTPException(status_code=400, detail="Invalid bounds")
     layer = get_advanced_geospatial_layer()
     
     # Generate heatmap
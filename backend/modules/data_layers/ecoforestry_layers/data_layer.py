@@ -5,12 +5,17 @@ Version: 1.0.0
 """
 
 import os
-from typing import Optional, List, Dict, Any
+import asyncio
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timezone
 from pymongo import MongoClient
 from pydantic import BaseModel, Field
 import uuid
 
+import numpy as np
+
+from .. import raster
+
 
 # ==============================================
 # MODELS
@@ -144,6 +149,13 @@ class EcoforestryDataLayer:
             "FRN": "Frêne noir",
             "TIL": "Tilleul d'Amérique"
         }
+        
+        # HSI preferences by species (placeholder model)
+        self.hsi_preferences = {
+            "deer": {"food": 0.8, "cover": 0.7, "water": 0.6},
+            "moose": {"food": 0.7, "cover": 0.75, "water": 0.9},
+            "bear": {"food": 0.85, "cover": 0.6, "water": 0.7}
+        }
     
     @property
     def db(self):
@@ -272,33 +284,41 @@ class EcoforestryDataLayer:
         lng: float
     ) -> HabitatSuitabilityData:
         """Compute HSI for a specific location"""
-        # Placeholder computation based on species preferences
-        species_prefs = {
-            "deer": {"food": 0.8, "cover": 0.7, "water": 0.6},
-            "moose": {"food": 0.7, "cover": 0.75, "water": 0.9},
-            "bear": {"food": 0.85, "cover": 0.6, "water": 0.7}
-        }
-        
-        prefs = species_prefs.get(species.lower(), {"food": 0.6, "cover": 0.6, "water": 0.6})
-        
-        # Simulate variation based on location
-        import math
-        variation = (math.sin(lat * 10) + math.cos(lng * 10)) * 0.1
-        
-        hsi_food = min(1, max(0, prefs["food"] + variation))
-        hsi_cover = min(1, max(0, prefs["cover"] - variation * 0.5))
-        hsi_water = min(1, max(0, prefs["water"] + variation * 0.3))
-        hsi_overall = (hsi_food * 0.4 + hsi_cover * 0.35 + hsi_water * 0.25)
+        hsi = raster.habitat_suitability(lat, lng, self._hsi_prefs(species))
         
         return HabitatSuitabilityData(
             coordinates={"lat": lat, "lng": lng},
             species=species.lower(),
-            hsi_food=round(hsi_food, 3),
-            hsi_cover=round(hsi_cover, 3),
-            hsi_water=round(hsi_water, 3),
-            hsi_overall=round(hsi_overall, 3)
+            hsi_food=round(float(hsi["food"]), 3),
+            hsi_cover=round(float(hsi["cover"]), 3),
+            hsi_water=round(float(hsi["water"]), 3),
+            hsi_overall=round(float(hsi["overall"]), 3)
         )
     
+    async def compute_hsi_grid(
+        self,
+        species: str,
+        north: float,
+        south: float,
+        east: float,
+        west: float,
+        resolution_m: float = 100,
+        max_dim: int = raster.DEFAULT_MAX_DIM
+    ) -> Tuple[raster.RasterGrid, Dict[str, np.ndarray]]:
+        """
+        HSI components over a whole grid (arrays [row, col], row 0 south).
+        Computed in a worker thread: a 1024x1024 grid would otherwise block
+        the event loop.
+        """
+        grid = raster.RasterGrid.from_resolution(north, south, east, west, resolution_m, max_dim)
+        lats, lngs = grid.centers()
+        hsi = await asyncio.to_thread(raster.habitat_suitability, lats, lngs, self._hsi_prefs(species))
+        return grid, hsi
+    
+    def _hsi_prefs(self, species: str) -> Dict[str, float]:
+        """Species preferences for the placeholder HSI model"""
+        return self.hsi_preferences.get(species.lower(), {"food": 0.6, "cover": 0.6, "water": 0.6})
+    
     # ===========================================
     # REFERENCE DATA
     # ===========================================
@@ -396,28 +416,30 @@ class EcoforestryDataLayer:
         radius_km: float
     ) -> List[HabitatSuitabilityData]:
         """Generate placeholder HSI data grid"""
-        import random
-        
-        hsi_data = []
         cell_size_deg = 0.01  # ~1km
         
         num_cells = int(radius_km * 2 / 1.0)
+        offsets = np.arange(num_cells) * cell_size_deg
+        cell_lats = (lat - radius_km/111 + offsets)[:, None]
+        cell_lngs = (lng - radius_km/111 + offsets)[None, :]
         
-        for i in range(num_cells):
-            for j in range(num_cells):
-                cell_lat = lat - radius_km/111 + (i * cell_size_deg)
-                cell_lng = lng - radius_km/111 + (j * cell_size_deg)
-                
-                hsi_data.append(HabitatSuitabilityData(
-                    coordinates={"lat": cell_lat, "lng": cell_lng},
-                    species=species.lower(),
-                    hsi_food=round(random.uniform(0.3, 0.9), 3),
-                    hsi_cover=round(random.uniform(0.3, 0.9), 3),
-                    hsi_water=round(random.uniform(0.2, 0.8), 3),
-                    hsi_overall=round(random.uniform(0.4, 0.8), 3)
-                ))
+        hsi = raster.habitat_suitability(cell_lats, cell_lngs, self._hsi_prefs(species))
+        food, cover, water, overall = (
+            np.round(hsi[k], 3).tolist() for k in ("food", "cover", "water", "overall")
+        )
         
-        return hsi_data
+        return [
+            HabitatSuitabilityData(
+                coordinates={"lat": float(cell_lats[i, 0]), "lng": float(cell_lngs[0, j])},
+                species=species.lower(),
+                hsi_food=food[i][j],
+                hsi_cover=cover[i][j],
+                hsi_water=water[i][j],
+                hsi_overall=overall[i][j]
+            )
+            for i in range(num_cells)
+            for j in range(num_cells)
+        ]
     
     # ===========================================
     # STATS
@@ -14,6 +14,7 @@ from ..data_layer import (
     ForestCutData,
     HabitatSuitabilityData
 )
+from ... import raster
 
 
 router = APIRouter(
@@ -206,6 +207,40 @@ async def compute_hsi_at_point(
     )
 
 
+@router.get("/hsi/{species}/raster")
+async def get_hsi_raster(
+    species: str,
+    north: float = Query(..., description="North boundary"),
+    south: float = Query(..., description="South boundary"),
+    east: float = Query(..., description="East boundary"),
+    west: float = Query(..., description="West boundary"),
+    resolution_m: float = Query(100, gt=0, description="Cell resolution in meters"),
+    max_dim: int = Query(raster.DEFAULT_MAX_DIM, ge=raster.MIN_DIM, le=raster.MAX_DIM, description="Max cells per side"),
+    component: str = Query("overall", description="food, cover, water or overall"),
+    encoding: str = Query("png", description="png or u8")
+):
+    """HSI over a whole area as a compact tile"""
+    if encoding not in raster.ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"Unknown encoding: {encoding}")
+    if south >= north or west >= east:
+        raise HTTPException(status_code=400, detail="Invalid bounds")
+    
+    layer = get_ecoforestry_layer()
+    grid, hsi = await layer.compute_hsi_grid(species, north, south, east, west, resolution_m, max_dim)
+    if component not in hsi:
+        raise HTTPException(status_code=400, detail=f"Unknown HSI component: {component}")
+    values = hsi[component]
+    
+    return {
+        "species": species.lower(),
+        "component": component,
+        "resolution_m": resolution_m,
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+        "tile": raster.encode_tile(grid, values, encoding)
+    }
+
+
 # ==============================================
 # REFERENCE DATA
 # ==============================================
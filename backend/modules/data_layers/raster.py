@@ -0,0 +1,213 @@
+"""Raster Engine - PHASE 5
+Whole-grid computations for the data layers (heatmaps, habitat suitability).
+
+Grids are NumPy arrays indexed [row, col], row 0 on the south edge (the
+same orientation as ActivityHeatmapData.cells). Encoded tiles are written
+north-up, like any image.
+
+Version: 1.0.0
+"""
+
+import base64
+import math
+import struct
+import zlib
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+M_PER_DEG_LAT = 111000
+
+MIN_DIM = 10
+DEFAULT_MAX_DIM = 100
+MAX_DIM = 1024
+
+ENCODINGS = ("png", "u8")
+
+
+# ==============================================
+# GRID
+# ==============================================
+
+class RasterGrid:
+    """Regular lat/lng grid over a bounding box"""
+
+    def __init__(self, north: float, south: float, east: float, west: float, rows: int, cols: int):
+        self.north = north
+        self.south = south
+        self.east = east
+        self.west = west
+        self.rows = rows
+        self.cols = cols
+
+    @classmethod
+    def from_resolution(
+        cls,
+        north: float,
+        south: float,
+        east: float,
+        west: float,
+        resolution_m: float,
+        max_dim: int = DEFAULT_MAX_DIM
+    ) -> "RasterGrid":
+        """
+        Grid with cells of about resolution_m, clamped to [MIN_DIM, max_dim] per side.
+        Raises ValueError when south >= north or west >= east.
+        """
+        if south >= north or west >= east:
+            raise ValueError("Invalid bounds: south must be below north and west below east")
+        max_dim = max(MIN_DIM, min(max_dim, MAX_DIM))
+        m_per_deg_lng = M_PER_DEG_LAT * abs(math.cos(math.radians((north + south) / 2)))
+
+        rows = int(((north - south) * M_PER_DEG_LAT) / resolution_m)
+        cols = int(((east - west) * m_per_deg_lng) / resolution_m)
+        return cls(
+            north, south, east, west,
+            max(MIN_DIM, min(max_dim, rows)),
+            max(MIN_DIM, min(max_dim, cols))
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.rows, self.cols
+
+    @property
+    def lat_step(self) -> float:
+        return (self.north - self.south) / self.rows
+
+    @property
+    def lng_step(self) -> float:
+        return (self.east - self.west) / self.cols
+
+    @property
+    def m_per_deg_lng(self) -> float:
+        return M_PER_DEG_LAT * abs(math.cos(math.radians((self.north + self.south) / 2)))
+
+    def centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Cell-center latitudes (rows, 1) and longitudes (1, cols), broadcastable"""
+        lats = self.south + (np.arange(self.rows) + 0.5) * self.lat_step
+        lngs = self.west + (np.arange(self.cols) + 0.5) * self.lng_step
+        return lats[:, None], lngs[None, :]
+
+    def fractions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Row i / rows and col j / cols, broadcastable"""
+        return (np.arange(self.rows) / self.rows)[:, None], (np.arange(self.cols) / self.cols)[None, :]
+
+
+# ==============================================
+# FORMULAS
+# ==============================================
+
+def kernel_density(
+    grid: RasterGrid,
+    lats,
+    lngs,
+    weights=None,
+    bandwidth_m: float = 300
+) -> np.ndarray:
+    """
+    Gaussian kernel density of points over the grid (unnormalized).
+
+    The kernel is separable, exp(-dy²/2h²) * exp(-dx²/2h²), so the whole
+    grid is one (rows x n) @ (n x cols) product.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if lats.size == 0:
+        return np.zeros(grid.shape)
+    weights = np.ones_like(lats) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    cell_lats, cell_lngs = grid.centers()
+    dy = (cell_lats - lats[None, :]) * M_PER_DEG_LAT            # (rows, n)
+    dx = (cell_lngs.T - lngs[None, :]) * grid.m_per_deg_lng     # (cols, n)
+    inv = -0.5 / (bandwidth_m * bandwidth_m)
+    ky = np.exp(dy * dy * inv) * weights[None, :]
+    kx = np.exp(dx * dx * inv)
+    return ky @ kx.T
+
+
+def normalize(values: np.ndarray) -> np.ndarray:
+    """Scale to [0, 1] by the maximum (all-zero grids stay zero)"""
+    peak = float(values.max()) if values.size else 0.0
+    if peak <= 0:
+        return np.zeros_like(values, dtype=np.float64)
+    return values / peak
+
+
+def habitat_suitability(lat, lng, prefs: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """
+    HSI components for scalars or broadcastable arrays of coordinates.
+    Returns food, cover, water and overall (0.4 / 0.35 / 0.25 weights).
+    """
+    variation = (np.sin(np.asarray(lat) * 10) + np.cos(np.asarray(lng) * 10)) * 0.1
+    food = np.clip(prefs["food"] + variation, 0, 1)
+    cover = np.clip(prefs["cover"] - variation * 0.5, 0, 1)
+    water = np.clip(prefs["water"] + variation * 0.3, 0, 1)
+    return {
+        "food": food,
+        "cover": cover,
+        "water": water,
+        "overall": food * 0.4 + cover * 0.35 + water * 0.25
+    }
+
+
+# ==============================================
+# ENCODING
+# ==============================================
+
+def quantize(values: np.ndarray, vmin: float = 0.0, vmax: float = 1.0) -> np.ndarray:
+    """Map [vmin, vmax] to 0-255 (uint8), north-up"""
+    span = (vmax - vmin) or 1.0
+    scaled = np.clip((np.asarray(values, dtype=np.float64) - vmin) / span, 0, 1)
+    return np.ascontiguousarray(np.rint(scaled * 255).astype(np.uint8)[::-1])
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+
+def encode_png(values: np.ndarray, vmin: float = 0.0, vmax: float = 1.0) -> bytes:
+    """8-bit grayscale PNG of the grid, north-up"""
+    pixels = quantize(values, vmin, vmax)
+    rows, cols = pixels.shape
+    # Filter type 0 (none) in front of every scanline
+    raw = np.hstack([np.zeros((rows, 1), dtype=np.uint8), pixels]).tobytes()
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", cols, rows, 8, 0, 0, 0, 0)),
+        _png_chunk(b"IDAT", zlib.compress(raw, 6)),
+        _png_chunk(b"IEND", b"")
+    ])
+
+
+def encode_tile(
+    grid: RasterGrid,
+    values: np.ndarray,
+    encoding: str = "png",
+    vmin: float = 0.0,
+    vmax: float = 1.0
+) -> Dict[str, object]:
+    """
+    Compact JSON-safe tile: "png" (grayscale image) or "u8" (raw row-major
+    bytes, north to south). Value = vmin + byte / 255 * (vmax - vmin).
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown raster encoding: {encoding}")
+    data = encode_png(values, vmin, vmax) if encoding == "png" else quantize(values, vmin, vmax).tobytes()
+    return {
+        "encoding": encoding,
+        "rows": grid.rows,
+        "cols": grid.cols,
+        "bounds": {"north": grid.north, "south": grid.south, "east": grid.east, "west": grid.west},
+        "scale": {"min": vmin, "max": vmax},
+        "data": base64.b64encode(data).decode("ascii")
+    }
+
+
+def decode_u8(tile: Dict[str, object]) -> np.ndarray:
+    """Inverse of a "u8" tile, back to [row, col] with row 0 south"""
+    pixels = np.frombuffer(base64.b64decode(tile["data"]), dtype=np.uint8)
+    pixels = pixels.reshape(tile["rows"], tile["cols"])[::-1]
+    scale = tile["scale"]
+    return scale["min"] + pixels / 255.0 * (scale["max"] - scale["min"])
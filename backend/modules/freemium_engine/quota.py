@@ -0,0 +1,293 @@
+"""
+Freemium Engine Quotas - V5-ULTIME Monétisation
+===============================================
+
+Application atomique des quotas freemium:
+- Cache des niveaux d'abonnement par utilisateur (TTL court, invalidé à l'upgrade)
+- Vérification + consommation en un seul $inc conditionnel avec upsert
+- Seaux de jetons locaux (par processus) qui rejettent les rafales
+  hors limite sans aller-retour Mongo
+
+Le document quota_usage du jour est unique par (user_id, feature, date);
+la condition "count <= limit - amount" garantit qu'aucune concurrence
+ne dépasse le quota. Les seaux locaux ne font que pré-filtrer: la base
+reste la source de vérité.
+
+Version: 1.0.0
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any, Tuple
+import os
+import time
+import logging
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from utils.performance import LRUCache
+
+logger = logging.getLogger(__name__)
+
+TIER_CACHE_TTL = int(os.environ.get('FREEMIUM_TIER_CACHE_TTL', 60))
+TIER_CACHE_SIZE = 10000
+BUCKETS_MAX = 50000
+INDEX_RETRY_SECONDS = 60
+
+UNLIMITED = -1
+
+
+def utc_day(now: Optional[datetime] = None) -> datetime:
+    """Début du jour UTC (clé des documents quota_usage)"""
+    now = now or datetime.now(timezone.utc)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Motor retourne des datetimes naïfs (UTC) par défaut
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+# ==============================================
+# SUBSCRIPTION TIER CACHE
+# ==============================================
+
+class TierCache:
+    """Niveau d'abonnement par utilisateur, mis en cache quelques secondes"""
+
+    def __init__(self, ttl: int = TIER_CACHE_TTL, maxsize: int = TIER_CACHE_SIZE):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    async def get_subscription(self, db, user_id: str) -> Dict[str, Any]:
+        """Document d'abonnement (tier, expires_at) depuis le cache ou Mongo"""
+        sub = self._cache.get(user_id)
+        if sub is not None:
+            self.hits += 1
+            return sub
+
+        self.misses += 1
+        doc = await db.subscriptions.find_one(
+            {"user_id": user_id}, {"_id": 0, "tier": 1, "expires_at": 1}
+        )
+        sub = {
+            "tier": (doc or {}).get("tier", "free"),
+            "expires_at": _as_utc((doc or {}).get("expires_at"))
+        }
+        self._cache.set(user_id, sub)
+        return sub
+
+    async def get_tier(self, db, user_id: str) -> Tuple[str, bool]:
+        """Niveau effectif (un abonnement expiré retombe en FREE) et indicateur d'expiration"""
+        sub = await self.get_subscription(db, user_id)
+        expires_at = sub.get("expires_at")
+        if expires_at and expires_at < datetime.now(timezone.utc):
+            return "free", True
+        return sub.get("tier", "free"), False
+
+    def invalidate(self, user_id: str):
+        self._cache.delete(user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update({"hits": self.hits, "misses": self.misses})
+        return stats
+
+
+# ==============================================
+# LOCAL TOKEN BUCKETS
+# ==============================================
+
+class QuotaBuckets:
+    """
+    Seaux de jetons locaux par (utilisateur, feature, jour, limite).
+
+    Capacité = limite journalière, rechargée à minuit UTC (nouvelle clé).
+    Les jetons ne dépassent jamais le restant connu en base: un seau vide
+    signifie que le quota est forcément épuisé.
+    """
+
+    def __init__(self, max_entries: int = BUCKETS_MAX):
+        self.max_entries = max_entries
+        self._tokens: Dict[Tuple[str, str, datetime, int], int] = {}
+        self.local_rejections = 0
+
+    def _key(self, user_id: str, feature: str, day: datetime, limit: int):
+        return (user_id, feature, day, limit)
+
+    def try_take(self, user_id: str, feature: str, day: datetime, limit: int, amount: int = 1) -> bool:
+        """Réserver des jetons localement; False = rejet sans aller-retour DB"""
+        key = self._key(user_id, feature, day, limit)
+        tokens = self._tokens.get(key, limit)
+        if tokens < amount:
+            self.local_rejections += 1
+            return False
+        if key not in self._tokens and len(self._tokens) >= self.max_entries:
+            self._prune(day)
+        self._tokens[key] = tokens - amount
+        return True
+
+    def sync(self, user_id: str, feature: str, day: datetime, limit: int, used: int):
+        """Aligner le seau sur l'usage confirmé par la base"""
+        self._tokens[self._key(user_id, feature, day, limit)] = max(0, limit - used)
+
+    def refund(self, user_id: str, feature: str, day: datetime, limit: int, amount: int = 1):
+        key = self._key(user_id, feature, day, limit)
+        if key in self._tokens:
+            self._tokens[key] = min(limit, self._tokens[key] + amount)
+
+    def forget_user(self, user_id: str):
+        """Oublier les seaux d'un utilisateur (changement de niveau)"""
+        for key in [k for k in self._tokens if k[0] == user_id]:
+            del self._tokens[key]
+
+    def _prune(self, today: datetime):
+        for key in [k for k in self._tokens if k[2] != today]:
+            del self._tokens[key]
+        if len(self._tokens) >= self.max_entries:
+            self._tokens.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"buckets": len(self._tokens), "local_rejections": self.local_rejections}
+
+
+# ==============================================
+# ATOMIC CHECK-AND-CONSUME
+# ==============================================
+
+class QuotaManager:
+    """Point d'entrée unique des quotas (cache de niveaux + seaux + $inc conditionnel)"""
+
+    def __init__(self, tier_limits: Dict[Any, Dict[str, Any]]):
+        self.tier_limits = {getattr(k, "value", k): v for k, v in tier_limits.items()}
+        self.tiers = TierCache()
+        self.buckets = QuotaBuckets()
+        self._indexes_ready = False
+        self._index_retry_at = 0.0
+        self.db_rejections = 0
+        self.consumed = 0
+
+    async def ensure_indexes(self, db):
+        """Index unique requis pour que l'upsert conditionnel ne duplique pas le document du jour"""
+        if self._indexes_ready or time.monotonic() < self._index_retry_at:
+            return
+        try:
+            await db.quota_usage.create_index(
+                [("user_id", 1), ("feature", 1), ("date", 1)],
+                unique=True, name="quota_usage_user_feature_day"
+            )
+        except Exception as e:
+            # Nouvel essai au plus tôt dans INDEX_RETRY_SECONDS
+            self._index_retry_at = time.monotonic() + INDEX_RETRY_SECONDS
+            logger.warning(f"Could not create quota_usage unique index: {e}")
+            return
+        self._indexes_ready = True
+
+    def limits_for(self, tier: str) -> Dict[str, Any]:
+        return self.tier_limits.get(tier, self.tier_limits["free"])
+
+    def invalidate(self, user_id: str):
+        """Appelé à chaque changement d'abonnement (upgrade, paiement)"""
+        self.tiers.invalidate(user_id)
+        self.buckets.forget_user(user_id)
+
+    async def get_usage(self, db, user_id: str, feature: str) -> Dict[str, Any]:
+        """Usage du jour pour une feature (une lecture, niveau en cache)"""
+        tier, _ = await self.tiers.get_tier(db, user_id)
+        limit = self.limits_for(tier).get(feature, 0)
+
+        if limit == UNLIMITED:
+            return {
+                "feature": feature, "used": 0, "limit": UNLIMITED,
+                "remaining": UNLIMITED, "unlimited": True, "reset_at": None
+            }
+
+        day = utc_day()
+        usage = await db.quota_usage.find_one(
+            {"user_id": user_id, "feature": feature, "date": day}, {"_id": 0, "count": 1}
+        )
+        used = usage.get("count", 0) if usage else 0
+        if isinstance(limit, int) and not isinstance(limit, bool):
+            self.buckets.sync(user_id, feature, day, limit, used)
+
+        return {
+            "feature": feature,
+            "used": used,
+            "limit": limit,
+            "remaining": max(0, limit - used),
+            "unlimited": False,
+            "reset_at": (day + timedelta(days=1)).isoformat()
+        }
+
+    async def consume(self, db, user_id: str, feature: str, amount: int = 1) -> Dict[str, Any]:
+        """
+        Vérifier et consommer un quota en une seule opération atomique.
+
+        Retourne allowed=False si le quota du jour ne permet pas `amount`.
+        """
+        tier, _ = await self.tiers.get_tier(db, user_id)
+        limit = self.limits_for(tier).get(feature)
+        day = utc_day()
+        reset_at = (day + timedelta(days=1)).isoformat()
+        result = {"feature": feature, "tier": tier, "limit": limit, "reset_at": reset_at}
+
+        # Features booléennes / inconnues: pas de compteur
+        if limit is None or isinstance(limit, bool):
+            result.update({"allowed": bool(limit), "used": None, "remaining": None, "source": "tier"})
+            return result
+
+        query = {"user_id": user_id, "feature": feature, "date": day}
+
+        if limit == UNLIMITED:
+            await db.quota_usage.update_one(query, {"$inc": {"count": amount}}, upsert=True)
+            self.consumed += amount
+            result.update({"allowed": True, "used": None, "remaining": UNLIMITED, "source": "db"})
+            return result
+
+        if amount > limit or not self.buckets.try_take(user_id, feature, day, limit, amount):
+            result.update({"allowed": False, "used": None, "remaining": 0, "source": "local"})
+            return result
+
+        await self.ensure_indexes(db)
+        try:
+            doc = await db.quota_usage.find_one_and_update(
+                {**query, "count": {"$lte": limit - amount}},
+                {"$inc": {"count": amount}},
+                projection={"_id": 0, "count": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Le document existe mais la condition a échoué: quota épuisé
+            doc = None
+        except Exception:
+            self.buckets.refund(user_id, feature, day, limit, amount)
+            raise
+
+        if doc is None:
+            self.db_rejections += 1
+            current = await db.quota_usage.find_one(query, {"_id": 0, "count": 1})
+            used = (current or {}).get("count", limit)
+            self.buckets.sync(user_id, feature, day, limit, used)
+            result.update({"allowed": False, "used": used, "remaining": max(0, limit - used), "source": "db"})
+            return result
+
+        used = doc.get("count", amount)
+        self.consumed += amount
+        self.buckets.sync(user_id, feature, day, limit, used)
+        result.update({"allowed": True, "used": used, "remaining": max(0, limit - used), "source": "db"})
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tier_cache": self.tiers.stats(),
+            "buckets": self.buckets.stats(),
+            "db_rejections": self.db_rejections,
+            "consumed": self.consumed
+        }
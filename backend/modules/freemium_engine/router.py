@@ -9,7 +9,9 @@ Niveaux:
 - PREMIUM: Accès complet, sans limitations
 - PRO: Fonctionnalités avancées + support prioritaire
 
-Version: 1.0.0
+Quotas: vérification + consommation atomiques (voir quota.py).
+
+Version: 1.1.0
 """
 
 from fastapi import APIRouter, HTTPException, Query, Depends
@@ -21,6 +23,8 @@ import os
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from .quota import QuotaManager
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/freemium", tags=["Freemium Engine - Monétisation"])
@@ -98,6 +102,9 @@ TIER_LIMITS = {
     }
 }
 
+# Quotas: cache des niveaux + seaux locaux + $inc conditionnel
+quota_manager = QuotaManager(TIER_LIMITS)
+
 # Feature descriptions for UI
 FEATURES = {
     "daily_strategy_generations": {
@@ -159,6 +166,7 @@ class QuotaUsage(BaseModel):
 class FeatureCheckRequest(BaseModel):
     user_id: str
     feature: str
+    consume: bool = False  # Consommer 1 unité de quota si l'accès est accordé
 
 # ==============================================
 # MODULE INFO
@@ -169,7 +177,7 @@ async def freemium_engine_info():
     """Get freemium engine information"""
     return {
         "module": "freemium_engine",
-        "version": "1.0.0",
+        "version": "1.1.0",
         "description": "Gestion freemium V5-ULTIME",
         "tiers": [t.value for t in SubscriptionTier],
         "features_count": len(FEATURES),
@@ -229,6 +237,7 @@ async def upgrade_subscription(user_id: str, tier: SubscriptionTier, duration_da
         {"$set": sub_data},
         upsert=True
     )
+    quota_manager.invalidate(user_id)
     
     return {
         "success": True,
@@ -240,60 +249,26 @@ async def upgrade_subscription(user_id: str, tier: SubscriptionTier, duration_da
 # QUOTA MANAGEMENT
 # ==============================================
 
+@router.get("/quota/stats")
+async def get_quota_stats():
+    """Statistiques du sous-système de quotas (cache, seaux locaux, rejets)"""
+    return {"success": True, "stats": quota_manager.stats()}
+
 @router.get("/quota/{user_id}/{feature}")
 async def get_quota_usage(user_id: str, feature: str):
     """Get quota usage for a specific feature"""
-    db = get_db()
-    
-    # Get user subscription
-    sub = await db.subscriptions.find_one({"user_id": user_id}, {"_id": 0})
-    tier = SubscriptionTier(sub.get("tier", "free")) if sub else SubscriptionTier.FREE
-    
-    # Get limit for feature
-    limits = TIER_LIMITS.get(tier, TIER_LIMITS[SubscriptionTier.FREE])
-    limit = limits.get(feature, 0)
-    
-    if limit == -1:  # Unlimited
-        return {
-            "success": True,
-            "quota": {
-                "feature": feature,
-                "used": 0,
-                "limit": -1,
-                "remaining": -1,
-                "unlimited": True,
-                "reset_at": None
-            }
-        }
-    
-    # Get usage for today
-    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    tomorrow = today + timedelta(days=1)
-    
-    usage = await db.quota_usage.find_one({
-        "user_id": user_id,
-        "feature": feature,
-        "date": {"$gte": today, "$lt": tomorrow}
-    }, {"_id": 0})
-    
-    used = usage.get("count", 0) if usage else 0
-    remaining = max(0, limit - used)
-    
-    return {
-        "success": True,
-        "quota": {
-            "feature": feature,
-            "used": used,
-            "limit": limit,
-            "remaining": remaining,
-            "unlimited": False,
-            "reset_at": tomorrow.isoformat()
-        }
-    }
+    quota = await quota_manager.get_usage(get_db(), user_id, feature)
+    return {"success": True, "quota": quota}
+
+@router.post("/quota/{user_id}/{feature}/consume")
+async def consume_quota(user_id: str, feature: str, amount: int = Query(1, ge=1)):
+    """Vérifier et consommer un quota en une opération atomique"""
+    result = await quota_manager.consume(get_db(), user_id, feature, amount)
+    return {"success": True, **result}
 
 @router.post("/quota/{user_id}/{feature}/increment")
 async def increment_quota(user_id: str, feature: str, amount: int = 1):
-    """Increment quota usage"""
+    """Increment quota usage (sans contrôle de limite - préférer /consume)"""
     db = get_db()
     
     today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
@@ -312,21 +287,17 @@ async def increment_quota(user_id: str, feature: str, amount: int = 1):
 
 @router.post("/check-access")
 async def check_feature_access(request: FeatureCheckRequest):
-    """Check if user has access to a feature"""
+    """Check if user has access to a feature (consume=True: check-and-consume atomique)"""
     db = get_db()
     
-    # Get user subscription
-    sub = await db.subscriptions.find_one({"user_id": request.user_id}, {"_id": 0})
-    tier = SubscriptionTier(sub.get("tier", "free")) if sub else SubscriptionTier.FREE
-    
-    # Check expiration
-    if sub and sub.get("expires_at"):
-        if sub["expires_at"] < datetime.now(timezone.utc):
-            tier = SubscriptionTier.FREE
+    # Niveau effectif (cache, expiration incluse)
+    tier_value, _ = await quota_manager.tiers.get_tier(db, request.user_id)
+    tier = SubscriptionTier(tier_value)
     
     # Get limits for tier
     limits = TIER_LIMITS.get(tier, TIER_LIMITS[SubscriptionTier.FREE])
     feature_value = limits.get(request.feature)
+    quota = None
     
     # Determine access
     if feature_value is None:
@@ -338,22 +309,22 @@ async def check_feature_access(request: FeatureCheckRequest):
     elif feature_value == -1:
         access = FeatureAccess.FULL
         can_access = True
+        if request.consume:
+            quota = await quota_manager.consume(db, request.user_id, request.feature)
     elif feature_value > 0:
-        # Check quota
-        quota_result = await get_quota_usage(request.user_id, request.feature)
-        remaining = quota_result["quota"]["remaining"]
-        
-        if remaining > 0:
-            access = FeatureAccess.FULL
-            can_access = True
+        # Check quota (ou check-and-consume en un seul $inc conditionnel)
+        if request.consume:
+            quota = await quota_manager.consume(db, request.user_id, request.feature)
+            can_access = quota["allowed"]
         else:
-            access = FeatureAccess.LIMITED
-            can_access = False
+            quota = await quota_manager.get_usage(db, request.user_id, request.feature)
+            can_access = quota["remaining"] > 0
+        access = FeatureAccess.FULL if can_access else FeatureAccess.LIMITED
     else:
         access = FeatureAccess.LOCKED
         can_access = False
     
-    return {
+    response = {
         "success": True,
         "feature": request.feature,
         "tier": tier.value,
@@ -361,6 +332,9 @@ async def check_feature_access(request: FeatureCheckRequest):
         "can_access": can_access,
         "upgrade_required": not can_access and tier == SubscriptionTier.FREE
     }
+    if quota is not None:
+        response["quota"] = quota
+    return response
 
 # ==============================================
 # TIER COMPARISON
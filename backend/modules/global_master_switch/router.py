@@ -28,6 +28,9 @@ import os
 import logging
 import uuid
 
+from flag_snapshot import switch_snapshot
+from modules.ad_spaces_engine.serving_cache import serving_cache
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/global-switch", tags=["Global Master Switch"])
@@ -47,6 +50,12 @@ def get_db():
     return _db
 
 
+async def _current_switch(db) -> Optional[Dict]:
+    """Document du Global Switch depuis le snapshot en mémoire (chargé une fois)"""
+    await switch_snapshot.ensure_loaded(db)
+    return switch_snapshot.document("global_master_switch")
+
+
 # ============================================
 # ENUMS & CONSTANTS
 # ============================================
@@ -116,7 +125,7 @@ async def get_module_info():
     db = get_db()
     
     # Get current state
-    switch = await db.global_master_switch.find_one({"switch_id": "BIONIC_GLOBAL"})
+    switch = await _current_switch(db)
     
     return {
         "module": "global_master_switch",
@@ -146,7 +155,7 @@ async def get_global_switch_status():
     """
     db = get_db()
     
-    switch = await db.global_master_switch.find_one({"switch_id": "BIONIC_GLOBAL"})
+    switch = await _current_switch(db)
     
     if not switch:
         # Initialize in LOCKED state (PRÉ-PRODUCTION)
@@ -162,11 +171,12 @@ async def get_global_switch_status():
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         await db.global_master_switch.insert_one(switch)
+        switch_snapshot.apply_document("global_master_switch", switch)
     
     switch.pop("_id", None)
     
     # Get ad system status
-    ad_master = await db.ad_master_switch.find_one({"switch_id": "global"})
+    ad_master = switch_snapshot.document("ad_master_switch")
     
     return {
         "success": True,
@@ -247,6 +257,7 @@ async def toggle_global_switch(
         {"switch_id": "BIONIC_GLOBAL"},
         {"$set": {"engines_status": engines_status}}
     )
+    await switch_snapshot.refresh(db)
     
     # If turning OFF or LOCKED, deactivate all ads
     if not is_active:
@@ -274,6 +285,9 @@ async def toggle_global_switch(
             {"$set": {"status": "paused", "paused_at": now}}
         )
     
+    # Le cache de diffusion ne doit pas servir une décision d'avant le switch
+    serving_cache.invalidate()
+    
     # Log action
     await _log_switch_action(db, "global_toggle", admin_user, {
         "previous_status": "unknown",
@@ -333,7 +347,7 @@ async def get_engines_status():
     """
     db = get_db()
     
-    switch = await db.global_master_switch.find_one({"switch_id": "BIONIC_GLOBAL"})
+    switch = await _current_switch(db)
     engines_status = switch.get("engines_status", {}) if switch else {}
     
     engines = []
@@ -365,7 +379,7 @@ async def toggle_engine(
     db = get_db()
     
     # Check global switch
-    switch = await db.global_master_switch.find_one({"switch_id": "BIONIC_GLOBAL"})
+    switch = await _current_switch(db)
     
     if switch and switch.get("status") == SwitchStatus.LOCKED.value:
         return {
@@ -387,6 +401,8 @@ async def toggle_engine(
         {"switch_id": "BIONIC_GLOBAL"},
         {"$set": {f"engines_status.{engine_id}": is_active}}
     )
+    await switch_snapshot.refresh(db)
+    serving_cache.invalidate()
     
     # Log action
     await _log_switch_action(db, "engine_toggle", admin_user, {
@@ -452,7 +468,7 @@ async def get_switch_dashboard():
     db = get_db()
     
     # Global switch
-    switch = await db.global_master_switch.find_one({"switch_id": "BIONIC_GLOBAL"})
+    switch = await _current_switch(db)
     
     # Ad system stats
     total_opportunities = await db.ad_opportunities.count_documents({})
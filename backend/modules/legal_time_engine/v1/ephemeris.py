@@ -0,0 +1,402 @@
+"""Legal Time Engine Ephemeris
+
+Vectorized solar ephemeris for season-scale sunrise/sunset tables.
+
+Runs the same NOAA algorithm as Astral (two-iteration transit solver,
+atmospheric refraction, apparent solar radius) with NumPy over a whole
+grid of locations x dates in one pass, then keeps each resolved day in a
+bounded LRU cache keyed by quantized lat/lng cell, timezone and date.
+
+Version: 1.0.0
+"""
+
+import os
+import math
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from utils.performance import LRUCache
+
+
+# Cell size used to share cached ephemerides between nearby locations.
+# 0.01 deg shifts sunrise/sunset by less than 3 seconds.
+CELL_DEGREES = float(os.environ.get('EPHEMERIS_CELL_DEGREES', 0.01))
+CACHE_SIZE = int(os.environ.get('EPHEMERIS_CACHE_SIZE', 50000))
+# Ephemerides never change; the TTL only bounds memory for idle cells
+CACHE_TTL = int(os.environ.get('EPHEMERIS_CACHE_TTL', 7 * 24 * 3600))
+
+SUN_APPARENT_RADIUS = 32.0 / (60.0 * 2.0)
+CIVIL_DEPRESSION = 6.0
+MAX_LATITUDE = 89.8
+
+RISING = 1
+SETTING = -1
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _refraction_at_zenith(zenith: float) -> float:
+    """Degrees of refraction for a given zenith (same model as Astral)"""
+    elevation = 90 - zenith
+    if elevation >= 85.0:
+        return 0.0
+
+    te = math.tan(math.radians(elevation))
+    if elevation > 5.0:
+        correction = 58.1 / te - 0.07 / te ** 3 + 0.000086 / te ** 5
+    elif elevation > -0.575:
+        correction = 1735.0 + elevation * (-518.2 + elevation * (103.4 + elevation * (-12.79 + elevation * 0.711)))
+    else:
+        correction = -20.774 / te
+    return correction / 3600.0
+
+
+def _corrected_zenith(zenith: float) -> float:
+    return zenith + _refraction_at_zenith(zenith)
+
+
+# (zenith incl. refraction, direction) for each event
+_EVENT_SPECS = {
+    "dawn": (_corrected_zenith(90.0 + CIVIL_DEPRESSION), RISING),
+    "sunrise": (_corrected_zenith(90.0 + SUN_APPARENT_RADIUS), RISING),
+    "sunset": (_corrected_zenith(90.0 + SUN_APPARENT_RADIUS), SETTING),
+    "dusk": (_corrected_zenith(90.0 + CIVIL_DEPRESSION), SETTING),
+}
+
+
+# ==============================================
+# VECTORIZED NOAA SOLVER
+# ==============================================
+
+def julian_days(dates: Sequence[date]) -> np.ndarray:
+    """Julian day number at 00:00 UTC for each date"""
+    ordinals = np.array([(d - _EPOCH).days for d in dates], dtype=np.float64)
+    return ordinals + 2440587.5
+
+
+def _solar_position(jc: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Declination (degrees) and equation of time (minutes) for Julian centuries"""
+    l0 = np.mod(280.46646 + jc * (36000.76983 + 0.0003032 * jc), 360.0)
+    m = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+    e = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+
+    mrad = np.radians(m)
+    c = (
+        np.sin(mrad) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + np.sin(2 * mrad) * (0.019993 - 0.000101 * jc)
+        + np.sin(3 * mrad) * 0.000289
+    )
+    omega = 125.04 - 1934.136 * jc
+    apparent_long = l0 + c - 0.00569 - 0.00478 * np.sin(np.radians(omega))
+
+    seconds = 21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))
+    obliquity = 23.0 + (26.0 + seconds / 60.0) / 60.0 + 0.00256 * np.cos(np.radians(omega))
+
+    declination = np.degrees(np.arcsin(np.sin(np.radians(obliquity)) * np.sin(np.radians(apparent_long))))
+
+    y = np.tan(np.radians(obliquity) / 2.0) ** 2
+    l0rad = np.radians(l0)
+    eqtime = 4.0 * np.degrees(
+        y * np.sin(2 * l0rad)
+        - 2.0 * e * np.sin(mrad)
+        + 4.0 * e * y * np.sin(mrad) * np.cos(2 * l0rad)
+        - 0.5 * y * y * np.sin(4 * l0rad)
+        - 1.25 * e * e * np.sin(2 * mrad)
+    )
+    return declination, eqtime
+
+
+def transit_minutes(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    jd: np.ndarray,
+    zenith: float,
+    direction: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Minutes after 00:00 UTC at which the sun crosses `zenith`, for every
+    (location, date) pair.
+
+    Args:
+        latitudes, longitudes: shape (N,)
+        jd: Julian days at 00:00 UTC, shape (D,)
+
+    Returns:
+        (minutes, polar) arrays of shape (N, D). minutes is NaN when the
+        zenith is never crossed; polar is +1 when the sun stays below it
+        all day, -1 when it stays above it.
+    """
+    lat = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))[:, None]
+    lng = np.asarray(longitudes, dtype=np.float64)[:, None]
+    jd = np.asarray(jd, dtype=np.float64)[None, :]
+    cos_zenith = math.cos(math.radians(zenith))
+
+    adjustment = np.zeros((lat.shape[0], jd.shape[1]))
+    minutes = adjustment
+    polar = np.zeros(adjustment.shape, dtype=np.int8)
+    for _ in range(2):
+        jc = (jd + adjustment - 2451545.0) / 36525.0
+        declination, eqtime = _solar_position(jc)
+        dec = np.radians(declination)
+        h = (cos_zenith - np.sin(lat) * np.sin(dec)) / (np.cos(lat) * np.cos(dec))
+        # Astral fails if either iteration leaves acos' domain
+        polar = np.where(polar != 0, polar, np.where(h > 1.0, 1, np.where(h < -1.0, -1, 0)))
+        hour_angle = np.arccos(np.clip(h, -1.0, 1.0)) * direction
+
+        offset = (-lng - np.degrees(hour_angle)) * 4.0 - eqtime
+        offset = np.where(offset < -720.0, offset + 1440.0, offset)
+        minutes = 720.0 + offset
+        adjustment = minutes / 1440.0
+
+    minutes = np.where(polar != 0, np.nan, minutes)
+    return minutes, polar
+
+
+# ==============================================
+# LOCAL DATE RESOLUTION
+# ==============================================
+
+@dataclass(frozen=True)
+class SolarDay:
+    """Resolved solar events for one location and local date"""
+    date: date
+    dawn: Optional[datetime]
+    sunrise: Optional[datetime]
+    sunset: Optional[datetime]
+    dusk: Optional[datetime]
+    # (event, "below" / "above" / "missing") for events that do not occur
+    polar: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def day_length_minutes(self) -> Optional[float]:
+        if self.sunrise is None or self.sunset is None:
+            return None
+        return (self.sunset - self.sunrise).total_seconds() / 60
+
+    def require(self) -> "SolarDay":
+        """Raise like Astral's sun() when an event does not occur"""
+        if self.polar:
+            event, state = self.polar[0]
+            if state == "missing":
+                raise ValueError(f"Unable to find a {event} time on the date specified")
+            raise ValueError(f"Sun is always {state} the horizon on this day, at this location.")
+        return self
+
+
+def _utc_offsets(tz: ZoneInfo, days: Sequence[date]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTC offset (minutes) at noon UTC of each day, and a mask of days near a DST change"""
+    def offset(d: date) -> float:
+        instant = datetime(d.year, d.month, d.day, 12, tzinfo=timezone.utc)
+        return instant.astimezone(tz).utcoffset().total_seconds() / 60
+
+    offsets = np.array([offset(d) for d in days])
+    before = np.array([offset(d - timedelta(days=1)) for d in days[:1]] + list(offsets[:-1]))
+    after = np.array(list(offsets[1:]) + [offset(days[-1] + timedelta(days=1))])
+    return offsets, (before != offsets) | (after != offsets)
+
+
+def resolve_local_days(
+    utc_dates: List[date],
+    minutes: np.ndarray,
+    polar: np.ndarray,
+    tz: ZoneInfo
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pick, for each local date utc_dates[1:-1], the event that falls on it.
+
+    Mirrors Astral: use the transit computed for the same date; if it lands
+    on the previous (next) local day, use the transit of the next
+    (previous) date instead.
+
+    Returns:
+        (index, ok) of shape (N, D-2): column of `minutes` to use per local
+        date, and whether a matching event exists.
+    """
+    n_dates = len(utc_dates)
+    offsets, near_change = _utc_offsets(tz, utc_dates)
+    local = minutes + offsets[None, :]
+
+    # Exact conversion around DST changes
+    for j in np.nonzero(near_change)[0]:
+        base = datetime(utc_dates[j].year, utc_dates[j].month, utc_dates[j].day, tzinfo=timezone.utc)
+        for i in np.nonzero(~np.isnan(minutes[:, j]))[0]:
+            instant = base + timedelta(minutes=float(minutes[i, j]))
+            local[i, j] = minutes[i, j] + instant.astimezone(tz).utcoffset().total_seconds() / 60
+
+    # Local day shift relative to the UTC date of the computation
+    shift = np.floor(local / 1440.0)
+
+    targets = np.arange(1, n_dates - 1)
+    first = shift[:, targets]
+    index = np.where(first < 0, targets + 1, np.where(first > 0, targets - 1, targets))
+
+    rows = np.arange(minutes.shape[0])[:, None]
+    chosen_shift = shift[rows, index] + (index - targets[None, :])
+    ok = (chosen_shift == 0) & ~np.isnan(minutes[rows, index])
+    # A date adjacent to a polar period inherits its reason
+    ok &= polar[:, targets] == 0
+    return index, ok
+
+
+# ==============================================
+# CACHED EPHEMERIS
+# ==============================================
+
+def quantize(latitude: float, longitude: float, cell: float = CELL_DEGREES) -> Tuple[int, int]:
+    """Integer cell coordinates of a location"""
+    return int(round(latitude / cell)), int(round(longitude / cell))
+
+
+class SolarEphemeris:
+    """Bounded cache of solar days, filled by vectorized batch computations"""
+
+    def __init__(self, cell_degrees: float = CELL_DEGREES, maxsize: int = CACHE_SIZE, ttl: int = CACHE_TTL):
+        self.cell_degrees = cell_degrees
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        # Season tables are computed in worker threads; LRUCache is not synchronized
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.computed_days = 0
+
+    def _key(self, cell: Tuple[int, int], tz_name: str, day: date) -> str:
+        return f"{cell[0]}:{cell[1]}:{tz_name}:{day.isoformat()}"
+
+    def get_day(self, latitude: float, longitude: float, tz_name: str, day: date) -> SolarDay:
+        """Solar events for a single location and local date"""
+        return self.get_range([(latitude, longitude, tz_name)], day, day)[0][0]
+
+    def get_range(
+        self,
+        locations: Sequence[Tuple[float, float, str]],
+        start_date: date,
+        end_date: date
+    ) -> List[List[SolarDay]]:
+        """
+        Solar events for every location over [start_date, end_date].
+
+        Cache misses for all locations are computed together in one
+        vectorized pass.
+
+        Args:
+            locations: (latitude, longitude, timezone) tuples
+
+        Returns:
+            One list of SolarDay per location, ordered by date
+        """
+        if end_date < start_date:
+            raise ValueError("end_date must not be before start_date")
+
+        days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        cells = [quantize(lat, lng, self.cell_degrees) for lat, lng, _ in locations]
+
+        results: List[List[Optional[SolarDay]]] = []
+        missing: Dict[Tuple[Tuple[int, int], str], List[date]] = {}
+        with self._lock:
+            for cell, (_, _, tz_name) in zip(cells, locations):
+                row = []
+                for day in days:
+                    cached = self._cache.get(self._key(cell, tz_name, day))
+                    if cached is None:
+                        self.misses += 1
+                        missing.setdefault((cell, tz_name), []).append(day)
+                    else:
+                        self.hits += 1
+                    row.append(cached)
+                results.append(row)
+
+        if missing:
+            computed = self._compute(missing)
+            for row, cell, (_, _, tz_name) in zip(results, cells, locations):
+                for i, day in enumerate(days):
+                    if row[i] is None:
+                        row[i] = computed[(cell, tz_name)][day]
+
+        return results
+
+    def _compute(
+        self,
+        missing: Dict[Tuple[Tuple[int, int], str], List[date]]
+    ) -> Dict[Tuple[Tuple[int, int], str], Dict[date, SolarDay]]:
+        """Compute and cache the missing days of every (cell, timezone)"""
+        keys = list(missing)
+        first = min(min(d) for d in missing.values())
+        last = max(max(d) for d in missing.values())
+        # One extra day on each side for events that land on a neighbouring local date
+        utc_dates = [first + timedelta(days=i) for i in range(-1, (last - first).days + 2)]
+
+        lats = np.array([cell[0] * self.cell_degrees for cell, _ in keys])
+        lngs = np.array([cell[1] * self.cell_degrees for cell, _ in keys])
+        jd = julian_days(utc_dates)
+
+        solved = {
+            event: transit_minutes(lats, lngs, jd, zenith, direction)
+            for event, (zenith, direction) in _EVENT_SPECS.items()
+        }
+        self.batches += 1
+
+        by_tz: Dict[str, List[int]] = {}
+        for i, (_, tz_name) in enumerate(keys):
+            by_tz.setdefault(tz_name, []).append(i)
+
+        midnights = [datetime(d.year, d.month, d.day, tzinfo=timezone.utc) for d in utc_dates]
+        output: Dict[Tuple[Tuple[int, int], str], Dict[date, SolarDay]] = {key: {} for key in keys}
+
+        for tz_name, rows in by_tz.items():
+            tz = ZoneInfo(tz_name)
+            resolved = {}
+            for event, (minutes, polar) in solved.items():
+                sub_minutes, sub_polar = minutes[rows], polar[rows]
+                index, ok = resolve_local_days(utc_dates, sub_minutes, sub_polar, tz)
+                resolved[event] = (sub_minutes, sub_polar, index, ok)
+
+            for r, i in enumerate(rows):
+                wanted = set(missing[keys[i]])
+                for t, day in enumerate(utc_dates[1:-1]):
+                    if day not in wanted:
+                        continue
+                    events = {}
+                    polar_events = []
+                    for event, (sub_minutes, sub_polar, index, ok) in resolved.items():
+                        if ok[r, t]:
+                            j = index[r, t]
+                            instant = midnights[j] + timedelta(minutes=float(sub_minutes[r, j]))
+                            events[event] = instant.astimezone(tz)
+                        else:
+                            events[event] = None
+                            state = {1: "below", -1: "above"}.get(int(sub_polar[r, t + 1]), "missing")
+                            polar_events.append((event, state))
+                    solar_day = SolarDay(date=day, polar=tuple(polar_events), **events)
+                    output[keys[i]][day] = solar_day
+                    with self._lock:
+                        self._cache.set(self._key(keys[i][0], keys[i][1], day), solar_day)
+                        self.computed_days += 1
+
+        return output
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, object]:
+        stats = self._cache.stats()
+        lookups = self.hits + self.misses
+        stats.update({
+            "cell_degrees": self.cell_degrees,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "batches": self.batches,
+            "computed_days": self.computed_days
+        })
+        return stats
+
+
+# Shared process-wide ephemeris
+ephemeris = SolarEphemeris()
@@ -68,3 +68,10 @@ class MultiDayForecast(BaseModel):
     start_date: date
     days: int
     schedules: List[DailyHuntingSchedule] = []
+
+
+class SeasonTableRequest(BaseModel):
+    """Batch request for a season table of sun times"""
+    locations: List[LocationInput] = Field(min_length=1, max_length=200)
+    start_date: date
+    end_date: date
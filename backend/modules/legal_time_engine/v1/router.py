@@ -6,19 +6,25 @@ Version: 1.0.0
 API Prefix: /api/v1/legal-time
 """
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Query
 from datetime import date, datetime
 from typing import Optional
 from zoneinfo import ZoneInfo
 
 from .service import LegalTimeService
-from .models import LocationInput, SunTimes, LegalHuntingWindow, DailyHuntingSchedule
+from .ephemeris import ephemeris
+from .models import LocationInput, SunTimes, LegalHuntingWindow, DailyHuntingSchedule, SeasonTableRequest
 
 router = APIRouter(prefix="/api/v1/legal-time", tags=["Legal Time Engine"])
 
 # Initialize service
 _service = LegalTimeService()
 
+# Season tables are capped at one year per location
+MAX_SEASON_DAYS = 366
+
 
 @router.get("/")
 async def legal_time_engine_info():
@@ -43,6 +49,7 @@ async def legal_time_engine_info():
             "Fenêtre de chasse légale",
             "Périodes de chasse recommandées",
             "Prévisions multi-jours",
+            "Tables de saison multi-localisations",
             "Vérification de légalité en temps réel"
         ]
     }
@@ -359,3 +366,44 @@ async def get_forecast(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur de calcul: {str(e)}")
+
+
+@router.post("/season-table")
+async def get_season_table(request: SeasonTableRequest):
+    """
+    Get sun times and legal windows for several locations over a season.
+    
+    All locations and dates are computed in one vectorized ephemeris pass
+    and cached per location cell. The computation runs in a worker thread
+    so a cold season does not block the event loop.
+    """
+    days = (request.end_date - request.start_date).days + 1
+    if days < 1:
+        raise HTTPException(status_code=400, detail="end_date doit être postérieure ou égale à start_date")
+    if days > MAX_SEASON_DAYS:
+        raise HTTPException(status_code=400, detail=f"Période maximale: {MAX_SEASON_DAYS} jours")
+    
+    try:
+        table = await asyncio.to_thread(
+            _service.get_season_table, request.locations, request.start_date, request.end_date
+        )
+        
+        return {
+            "success": True,
+            "start_date": request.start_date.isoformat(),
+            "end_date": request.end_date.isoformat(),
+            "days": days,
+            "locations": table,
+            "regulation": "30 minutes avant le lever du soleil jusqu'à 30 minutes après le coucher"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur de calcul: {str(e)}")
+
+
+@router.get("/ephemeris/stats")
+async def get_ephemeris_stats():
+    """Get ephemeris cache statistics"""
+    return {
+        "success": True,
+        "ephemeris": ephemeris.stats()
+    }
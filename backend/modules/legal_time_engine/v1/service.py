@@ -1,7 +1,8 @@
 """Legal Time Engine Service
 
 Business logic for calculating legal hunting times based on sunrise/sunset.
-Uses the Astral library for accurate astronomical calculations.
+Sun times come from a vectorized, cached ephemeris (see ephemeris.py)
+that reproduces the Astral library's calculations.
 
 Quebec Hunting Regulations:
 - Legal hunting starts 30 minutes BEFORE sunrise
@@ -11,11 +12,10 @@ Version: 1.0.0
 """
 
 from datetime import datetime, date, time, timedelta, timezone
-from typing import List, Optional, Tuple
-from astral import LocationInfo
-from astral.sun import sun
+from typing import Any, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
+from .ephemeris import SolarDay, ephemeris
 from .models import (
     LocationInput, SunTimes, LegalHuntingWindow, 
     HuntingTimeSlot, DailyHuntingSchedule, MultiDayForecast
@@ -51,37 +51,19 @@ class LegalTimeService:
         """
         loc = location or self.DEFAULT_LOCATION
         
-        # Create Astral location
-        loc_info = LocationInfo(
-            name="Custom",
-            region="Custom",
-            timezone=loc.timezone,
-            latitude=loc.latitude,
-            longitude=loc.longitude
-        )
-        
-        # Get timezone
-        tz = ZoneInfo(loc.timezone)
-        
-        # Calculate sun times
-        s = sun(loc_info.observer, date=target_date, tzinfo=tz)
-        
-        # Extract times
-        sunrise_dt = s["sunrise"]
-        sunset_dt = s["sunset"]
-        dawn_dt = s["dawn"]  # Civil dawn
-        dusk_dt = s["dusk"]  # Civil dusk
-        
-        # Calculate day length
-        day_length = (sunset_dt - sunrise_dt).total_seconds() / 60
-        
+        # Cached per (lat/lng cell, timezone, date); raises on polar days
+        solar_day = ephemeris.get_day(loc.latitude, loc.longitude, loc.timezone, target_date)
+        return self._to_sun_times(solar_day.require())
+    
+    def _to_sun_times(self, solar_day: SolarDay) -> SunTimes:
+        """Convert a resolved ephemeris day to SunTimes"""
         return SunTimes(
-            date=target_date,
-            sunrise=sunrise_dt.time(),
-            sunset=sunset_dt.time(),
-            dawn=dawn_dt.time(),
-            dusk=dusk_dt.time(),
-            day_length_minutes=int(day_length)
+            date=solar_day.date,
+            sunrise=solar_day.sunrise.time(),
+            sunset=solar_day.sunset.time(),
+            dawn=solar_day.dawn.time(),  # Civil dawn
+            dusk=solar_day.dusk.time(),  # Civil dusk
+            day_length_minutes=int(solar_day.day_length_minutes)
         )
     
     def get_legal_hunting_window(
@@ -305,6 +287,14 @@ class LegalTimeService:
         """
         loc = location or self.DEFAULT_LOCATION
         
+        # Fill the ephemeris cache for the whole range (plus tomorrow's
+        # window lookup) in one vectorized pass
+        ephemeris.get_range(
+            [(loc.latitude, loc.longitude, loc.timezone)],
+            start_date,
+            start_date + timedelta(days=days)
+        )
+        
         schedules = []
         for i in range(days):
             day = start_date + timedelta(days=i)
@@ -318,6 +308,55 @@ class LegalTimeService:
             schedules=schedules
         )
     
+    def get_season_table(
+        self,
+        locations: List[LocationInput],
+        start_date: date,
+        end_date: date
+    ) -> List[Dict[str, Any]]:
+        """
+        Sun times and legal windows for many locations over a whole season.
+        
+        All locations and dates are computed in a single ephemeris batch.
+        Days without sunrise/sunset (polar day/night) are reported with
+        null times instead of failing the whole table.
+        
+        Returns:
+            One entry per location with its daily rows
+        """
+        ranges = ephemeris.get_range(
+            [(loc.latitude, loc.longitude, loc.timezone) for loc in locations],
+            start_date,
+            end_date
+        )
+        offset = timedelta(minutes=self.LEGAL_OFFSET_MINUTES)
+        
+        def fmt(value: Optional[datetime]) -> Optional[str]:
+            return value.strftime("%H:%M") if value else None
+        
+        table = []
+        for loc, solar_days in zip(locations, ranges):
+            rows = []
+            for solar_day in solar_days:
+                has_sun = solar_day.sunrise is not None and solar_day.sunset is not None
+                rows.append({
+                    "date": solar_day.date.isoformat(),
+                    "dawn": fmt(solar_day.dawn),
+                    "sunrise": fmt(solar_day.sunrise),
+                    "sunset": fmt(solar_day.sunset),
+                    "dusk": fmt(solar_day.dusk),
+                    "legal_start": fmt(solar_day.sunrise - offset) if has_sun else None,
+                    "legal_end": fmt(solar_day.sunset + offset) if has_sun else None,
+                    "day_length_minutes": int(solar_day.day_length_minutes) if has_sun else None,
+                    "polar": dict(solar_day.polar) or None
+                })
+            table.append({
+                "location": loc.model_dump(),
+                "days": rows
+            })
+        
+        return table
+    
     def is_time_legal(
         self,
         check_datetime: datetime,
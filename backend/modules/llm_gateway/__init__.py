@@ -0,0 +1,28 @@
+"""LLM Gateway Module
+Single entry point for LLM calls: response cache, request coalescing,
+concurrency limits, token budgets and metrics.
+
+Version: 1.0.0
+"""
+from .router import router
+from .gateway import (
+    LLMGateway,
+    LLMGatewayError,
+    LLMBudgetExceeded,
+    LLMTimeout,
+    get_llm_gateway,
+    set_llm_gateway
+)
+from .backends import EmergentLlmBackend, StubLlmBackend
+
+__all__ = [
+    "router",
+    "LLMGateway",
+    "LLMGatewayError",
+    "LLMBudgetExceeded",
+    "LLMTimeout",
+    "get_llm_gateway",
+    "set_llm_gateway",
+    "EmergentLlmBackend",
+    "StubLlmBackend"
+]
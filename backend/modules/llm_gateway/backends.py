@@ -0,0 +1,96 @@
+"""
+LLM Gateway Backends
+====================
+
+Backends d'exécution des requêtes LLM:
+- EmergentLlmBackend: emergentintegrations LlmChat (production)
+- StubLlmBackend: réponses déterministes locales (tests, développement hors-ligne)
+
+Version: 1.0.0
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+from typing import Optional, Dict, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class EmergentLlmBackend:
+    """Backend emergentintegrations (une session éphémère par requête)"""
+
+    name = "emergent"
+
+    async def send(
+        self,
+        prompt: str,
+        system_message: str,
+        provider: str,
+        model: str,
+        api_key: Optional[str] = None,
+        session_prefix: str = "gateway"
+    ) -> str:
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+        chat = LlmChat(
+            api_key=api_key or os.environ.get('EMERGENT_LLM_KEY', ''),
+            session_id=f"{session_prefix}_{uuid.uuid4().hex[:8]}",
+            system_message=system_message
+        ).with_model(provider, model)
+
+        return await chat.send_message(UserMessage(text=prompt))
+
+
+class StubLlmBackend:
+    """
+    Backend déterministe sans réseau.
+
+    La réponse dépend uniquement du prompt: soit une réponse enregistrée
+    (responses / responder), soit un JSON contenant l'empreinte du prompt.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, str]] = None,
+        responder: Optional[Callable[[str, str], str]] = None
+    ):
+        self.responses = responses or {}
+        self.responder = responder
+        self.calls = 0
+
+    async def send(
+        self,
+        prompt: str,
+        system_message: str,
+        provider: str,
+        model: str,
+        api_key: Optional[str] = None,
+        session_prefix: str = "gateway"
+    ) -> str:
+        self.calls += 1
+
+        if prompt in self.responses:
+            return self.responses[prompt]
+        if self.responder is not None:
+            return self.responder(prompt, system_message)
+
+        digest = hashlib.sha256(f"{system_message}\n{prompt}".encode()).hexdigest()[:16]
+        return json.dumps({
+            "stub": True,
+            "model": f"{provider}/{model}",
+            "digest": digest
+        })
+
+
+def create_backend(name: Optional[str] = None):
+    """Backend configuré par LLM_GATEWAY_BACKEND (emergent | stub)"""
+    name = (name or os.environ.get('LLM_GATEWAY_BACKEND', 'emergent')).lower()
+    if name == "stub":
+        logger.info("LLM Gateway using deterministic stub backend")
+        return StubLlmBackend()
+    return EmergentLlmBackend()
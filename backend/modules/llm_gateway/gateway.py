@@ -0,0 +1,488 @@
+"""
+LLM Gateway
+===========
+
+Point d'entrée unique pour tous les appels LLM de la plateforme:
+- Canonicalisation du prompt en clé de cache (modèle + système + prompt)
+- Cache de réponses en mémoire (LRU + TTL) et store persistant MongoDB
+- Coalescence des prompts identiques en vol (un seul appel backend)
+- Limites de concurrence globale et par fonctionnalité
+- Budgets de tokens par fonctionnalité (fenêtre glissante d'une heure)
+- Timeout par appel et métriques de latence / tokens
+
+Version: 1.0.0
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any, Tuple
+
+from .backends import create_backend
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+
+MAX_CONCURRENCY = int(os.environ.get('LLM_GATEWAY_MAX_CONCURRENCY', '8'))
+DEFAULT_FEATURE_CONCURRENCY = int(os.environ.get('LLM_GATEWAY_FEATURE_CONCURRENCY', '4'))
+DEFAULT_TIMEOUT = float(os.environ.get('LLM_GATEWAY_TIMEOUT', '90'))
+DEFAULT_CACHE_TTL = int(os.environ.get('LLM_GATEWAY_CACHE_TTL', '3600'))
+DEFAULT_TOKENS_PER_HOUR = 500_000
+# Tokens de réponse réservés avant l'appel, réglés au montant réel ensuite
+DEFAULT_COMPLETION_RESERVE = 1000
+MEMORY_CACHE_SIZE = 500
+
+# Politique par fonctionnalité (concurrence, budget horaire, TTL de cache)
+FEATURE_POLICIES: Dict[str, Dict[str, Any]] = {
+    "product_analysis": {"concurrency": 4, "tokens_per_hour": 600_000, "cache_ttl": 86400},
+    "product_discovery": {"concurrency": 2, "tokens_per_hour": 800_000, "cache_ttl": 7 * 86400},
+    "bionic_adjust": {"concurrency": 4, "tokens_per_hour": 300_000, "cache_ttl": 900},
+    "seo_content": {"concurrency": 2, "tokens_per_hour": 1_000_000, "cache_ttl": 7 * 86400},
+    "seo_analytics": {"concurrency": 2, "tokens_per_hour": 400_000, "cache_ttl": 86400},
+    "marketing_content": {"concurrency": 2, "tokens_per_hour": 300_000, "cache_ttl": 3600},
+    "waypoint_recommendation": {"concurrency": 4, "tokens_per_hour": 300_000, "cache_ttl": 900},
+    "waypoint_briefing": {"concurrency": 2, "tokens_per_hour": 200_000, "cache_ttl": 6 * 3600},
+}
+
+_WHITESPACE_RUN = re.compile(r"[ \t]+")
+
+
+class LLMGatewayError(Exception):
+    """Erreur de base du gateway LLM"""
+
+
+class LLMBudgetExceeded(LLMGatewayError):
+    """Budget de tokens de la fonctionnalité épuisé pour la fenêtre courante"""
+
+
+class LLMTimeout(LLMGatewayError):
+    """Le backend n'a pas répondu dans le délai imparti"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière (~4 caractères par token)"""
+    return max(1, len(text or "") // 4)
+
+
+def canonicalize_prompt(text: str) -> str:
+    """Normaliser fins de ligne et espaces non significatifs"""
+    text = (text or "").replace("\r\n", "\n").replace("\r", "\n")
+    lines = [_WHITESPACE_RUN.sub(" ", line).strip() for line in text.split("\n")]
+    return "\n".join(lines).strip()
+
+
+def make_cache_key(provider: str, model: str, system_message: str, prompt: str) -> str:
+    payload = json.dumps(
+        [provider, model, canonicalize_prompt(system_message), canonicalize_prompt(prompt)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ==============================================
+# CACHE & STORE
+# ==============================================
+
+class ResponseCache:
+    """Cache LRU en mémoire avec expiration par entrée"""
+
+    def __init__(self, maxsize: int = MEMORY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MongoResponseStore:
+    """Store persistant des réponses (collection llm_response_cache, index TTL)"""
+
+    def __init__(self, db, collection: str = "llm_response_cache"):
+        self.collection = db[collection]
+        self._indexed = False
+
+    async def _ensure_index(self):
+        if not self._indexed:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+
+    async def get(self, key: str) -> Optional[str]:
+        doc = await self.collection.find_one({"_id": key}, {"response": 1, "expires_at": 1})
+        if not doc:
+            return None
+        expires_at = doc.get("expires_at")
+        if expires_at is not None:
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at < datetime.now(timezone.utc):
+                return None
+        return doc.get("response")
+
+    async def set(self, key: str, value: str, ttl: int, feature: str, model: str):
+        await self._ensure_index()
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "response": value,
+                "feature": feature,
+                "model": model,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl)
+            }},
+            upsert=True
+        )
+
+
+# ==============================================
+# METRICS & BUDGETS
+# ==============================================
+
+class FeatureMetrics:
+    """Compteurs et latences d'une fonctionnalité"""
+
+    def __init__(self):
+        self.requests = 0
+        self.backend_calls = 0
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.budget_rejections = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies_ms: deque = deque(maxlen=200)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1)
+
+        return {
+            "requests": self.requests,
+            "backend_calls": self.backend_calls,
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "budget_rejections": self.budget_rejections,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(latencies[-1], 1) if latencies else None
+            }
+        }
+
+
+class TokenBudget:
+    """
+    Budget de tokens sur fenêtre glissante.
+
+    Les appels réservent leur estimation avant de partir (vérification et
+    réservation en une étape, donc sans dépassement entre appels
+    concurrents), puis règlent le montant réel à la réponse.
+    """
+
+    def __init__(self, limit: int, window_seconds: int = 3600):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        # Entrées [horodatage, tokens, encore dans la fenêtre]
+        self._usage: deque = deque()
+        self._total = 0
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self._usage and self._usage[0][0] < cutoff:
+            entry = self._usage.popleft()
+            self._total -= entry[1]
+            entry[2] = False
+
+    def can_spend(self, tokens: int) -> bool:
+        self._prune()
+        return self._total + tokens <= self.limit
+
+    def reserve(self, tokens: int) -> Optional[list]:
+        """Réserver des tokens; None si le budget ne les couvre pas"""
+        if not self.can_spend(tokens):
+            return None
+        entry = [time.monotonic(), tokens, True]
+        self._usage.append(entry)
+        self._total += tokens
+        return entry
+
+    def settle(self, reservation: list, tokens: int):
+        """Remplacer la réservation par le montant réel (0 pour l'annuler)"""
+        if reservation[2]:
+            self._total += tokens - reservation[1]
+        reservation[1] = tokens
+
+    def spend(self, tokens: int):
+        self._usage.append([time.monotonic(), tokens, True])
+        self._total += tokens
+
+    def used(self) -> int:
+        self._prune()
+        return self._total
+
+
+def _consume_exception(task: asyncio.Future):
+    # Éviter "exception was never retrieved" quand tous les appelants sont partis
+    if not task.cancelled():
+        task.exception()
+
+
+# ==============================================
+# GATEWAY
+# ==============================================
+
+class LLMGateway:
+    """Gateway LLM partagé (cache, coalescence, limites, métriques)"""
+
+    def __init__(
+        self,
+        backend=None,
+        store=None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        policies: Optional[Dict[str, Dict[str, Any]]] = None,
+        timeout: float = DEFAULT_TIMEOUT
+    ):
+        self.backend = backend if backend is not None else create_backend()
+        self.store = store
+        self.timeout = timeout
+        self.policies = policies if policies is not None else FEATURE_POLICIES
+        self.memory_cache = ResponseCache()
+        self._global_limit = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self._feature_limits: Dict[str, asyncio.Semaphore] = {}
+        self._budgets: Dict[str, TokenBudget] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.metrics: Dict[str, FeatureMetrics] = {}
+
+    def _policy(self, feature: str) -> Dict[str, Any]:
+        return self.policies.get(feature, {})
+
+    def _feature_limit(self, feature: str) -> asyncio.Semaphore:
+        if feature not in self._feature_limits:
+            limit = self._policy(feature).get("concurrency", DEFAULT_FEATURE_CONCURRENCY)
+            self._feature_limits[feature] = asyncio.Semaphore(limit)
+        return self._feature_limits[feature]
+
+    def _budget(self, feature: str) -> TokenBudget:
+        if feature not in self._budgets:
+            limit = self._policy(feature).get("tokens_per_hour", DEFAULT_TOKENS_PER_HOUR)
+            self._budgets[feature] = TokenBudget(limit)
+        return self._budgets[feature]
+
+    def _metrics(self, feature: str) -> FeatureMetrics:
+        if feature not in self.metrics:
+            self.metrics[feature] = FeatureMetrics()
+        return self.metrics[feature]
+
+    async def complete(
+        self,
+        prompt: str,
+        system_message: str = "",
+        feature: str = "default",
+        provider: str = "openai",
+        model: str = "gpt-5.2",
+        api_key: Optional[str] = None,
+        cache_ttl: Optional[int] = None,
+        use_cache: bool = True,
+        timeout: Optional[float] = None
+    ) -> str:
+        """
+        Exécuter un prompt via le gateway.
+
+        Raises:
+            LLMBudgetExceeded: budget de la fonctionnalité épuisé
+            LLMTimeout: délai dépassé
+            Exception: erreur du backend (propagée aux appelants, qui ont leurs fallbacks)
+        """
+        metrics = self._metrics(feature)
+        metrics.requests += 1
+
+        ttl = cache_ttl if cache_ttl is not None else self._policy(feature).get("cache_ttl", DEFAULT_CACHE_TTL)
+        use_cache = use_cache and ttl > 0
+        key = make_cache_key(provider, model, system_message, prompt)
+
+        if use_cache:
+            cached = self.memory_cache.get(key)
+            if cached is not None:
+                metrics.memory_hits += 1
+                return cached
+
+        # Coalescence: l'appel backend est une tâche détachée, chaque appelant
+        # l'attend via shield; l'annulation d'un appelant n'annule pas les autres
+        task = self._in_flight.get(key)
+        if task is not None:
+            metrics.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._resolve_in_flight(
+                key, prompt, system_message, feature, provider, model,
+                api_key, ttl, use_cache, timeout or self.timeout, metrics
+            ))
+            task.add_done_callback(_consume_exception)
+            self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _resolve_in_flight(self, key, *args) -> str:
+        try:
+            return await self._resolve(key, *args)
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _resolve(
+        self, key, prompt, system_message, feature, provider, model,
+        api_key, ttl, use_cache, timeout, metrics: FeatureMetrics
+    ) -> str:
+        if use_cache and self.store is not None:
+            try:
+                stored = await self.store.get(key)
+            except Exception as e:
+                logger.warning(f"LLM response store read failed: {e}")
+                stored = None
+            if stored is not None:
+                metrics.store_hits += 1
+                self.memory_cache.set(key, stored, ttl)
+                return stored
+
+        prompt_tokens = estimate_tokens(system_message) + estimate_tokens(prompt)
+        budget = self._budget(feature)
+        completion_reserve = self._policy(feature).get("completion_reserve", DEFAULT_COMPLETION_RESERVE)
+        reservation = budget.reserve(prompt_tokens + completion_reserve)
+        if reservation is None:
+            metrics.budget_rejections += 1
+            raise LLMBudgetExceeded(f"Token budget exhausted for feature '{feature}'")
+
+        try:
+            async with self._global_limit, self._feature_limit(feature):
+                started = time.perf_counter()
+                metrics.backend_calls += 1
+                try:
+                    response = await asyncio.wait_for(
+                        self.backend.send(
+                            prompt=prompt,
+                            system_message=system_message,
+                            provider=provider,
+                            model=model,
+                            api_key=api_key,
+                            session_prefix=feature
+                        ),
+                        timeout=timeout
+                    )
+                except asyncio.TimeoutError:
+                    metrics.timeouts += 1
+                    raise LLMTimeout(f"LLM call for feature '{feature}' exceeded {timeout}s")
+                except Exception:
+                    metrics.errors += 1
+                    raise
+                finally:
+                    metrics.latencies_ms.append((time.perf_counter() - started) * 1000)
+        except BaseException:
+            # Appel non abouti: la réservation est rendue
+            budget.settle(reservation, 0)
+            raise
+
+        completion_tokens = estimate_tokens(response)
+        budget.settle(reservation, prompt_tokens + completion_tokens)
+        metrics.prompt_tokens += prompt_tokens
+        metrics.completion_tokens += completion_tokens
+
+        if use_cache:
+            self.memory_cache.set(key, response, ttl)
+            if self.store is not None:
+                try:
+                    await self.store.set(key, response, ttl, feature, f"{provider}/{model}")
+                except Exception as e:
+                    logger.warning(f"LLM response store write failed: {e}")
+
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": getattr(self.backend, "name", type(self.backend).__name__),
+            "persistent_store": self.store is not None,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._in_flight),
+            "memory_cache_entries": len(self.memory_cache),
+            "features": {
+                feature: {
+                    **metrics.to_dict(),
+                    "tokens_used_last_hour": self._budget(feature).used(),
+                    "tokens_per_hour_limit": self._budget(feature).limit
+                }
+                for feature, metrics in self.metrics.items()
+            }
+        }
+
+
+# ==============================================
+# SHARED INSTANCE
+# ==============================================
+
+_gateway: Optional[LLMGateway] = None
+
+
+def _default_store():
+    """Store MongoDB si MONGO_URL est configuré"""
+    mongo_url = os.environ.get('MONGO_URL')
+    if not mongo_url:
+        return None
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongo_url)
+        return MongoResponseStore(client[os.environ.get('DB_NAME', 'bionic_db')])
+    except Exception as e:
+        logger.warning(f"LLM response store unavailable: {e}")
+        return None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Instance partagée du gateway (créée au premier appel)"""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(store=_default_store())
+    return _gateway
+
+
+def set_llm_gateway(gateway: Optional[LLMGateway]):
+    """Remplacer l'instance partagée (tests, backend stub)"""
+    global _gateway
+    _gateway = gateway
@@ -0,0 +1,39 @@
+"""LLM Gateway Router
+
+Observabilité du gateway LLM partagé (métriques, cache).
+
+Version: 1.0.0
+API Prefix: /api/v1/llm-gateway
+"""
+
+from fastapi import APIRouter
+
+from .gateway import get_llm_gateway, FEATURE_POLICIES
+
+router = APIRouter(prefix="/api/v1/llm-gateway", tags=["LLM Gateway"])
+
+
+@router.get("/")
+async def llm_gateway_info():
+    """Get LLM gateway information"""
+    return {
+        "module": "llm_gateway",
+        "version": "1.0.0",
+        "description": "Gateway LLM partagé: cache, coalescence, limites de concurrence et budgets",
+        "features": list(FEATURE_POLICIES.keys())
+    }
+
+
+@router.get("/metrics")
+async def get_llm_gateway_metrics():
+    """Latence, tokens et taux de cache par fonctionnalité"""
+    return {"success": True, "metrics": get_llm_gateway().stats()}
+
+
+@router.post("/cache/clear")
+async def clear_llm_gateway_cache():
+    """Vider le cache mémoire (le store persistant expire par TTL)"""
+    gateway = get_llm_gateway()
+    cleared = len(gateway.memory_cache)
+    gateway.memory_cache.clear()
+    return {"success": True, "cleared": cleared}
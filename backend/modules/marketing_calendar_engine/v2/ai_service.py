@@ -83,7 +83,7 @@ Mets en avant: innovation BIONIC, simplicité, résultats, communauté."""
         start_time = time.time()
         
         try:
-            from emergentintegrations.llm.chat import LlmChat, UserMessage
+            from modules.llm_gateway import get_llm_gateway
             
             # Construire le prompt système
             system_prompt = self._build_system_prompt(audience_type, tone)
@@ -93,16 +93,15 @@ Mets en avant: innovation BIONIC, simplicité, résultats, communauté."""
                 audience_type, tone, product_focus, custom_keywords, platform
             )
             
-            # Initialiser le chat GPT-5.2
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"marketing_{int(time.time())}",
-                system_message=system_prompt
-            ).with_model("openai", "gpt-5.2")
-            
-            # Envoyer le message
-            user_message = UserMessage(text=user_prompt)
-            response = await chat.send_message(user_message)
+            # Envoyer le message (GPT-5.2 via le gateway partagé)
+            response = await get_llm_gateway().complete(
+                user_prompt,
+                system_message=system_prompt,
+                feature="marketing_content",
+                provider="openai",
+                model="gpt-5.2",
+                api_key=self.api_key
+            )
             
             # Parser la réponse
             content = self._parse_response(response, audience_type, tone)
@@ -22,13 +22,18 @@ PIPELINE AUTOMATISÉ:
 """
 
 from fastapi import APIRouter, Body, Query, HTTPException
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from enum import Enum
+import asyncio
 import os
 import logging
+import re
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -96,6 +101,16 @@ class PipelineStep(str, Enum):
     LOGGING = "logging"
 
 
+# Envoi par lots (mode TOUS)
+INSERT_CHUNK_SIZE = 500
+SEND_CHUNK_SIZE = 200
+SEND_JOB_STALE_SECONDS = 300
+SEND_JOBS_COLLECTION = "message_send_jobs"
+
+# message_id dérivé du preview_id: une reprise ne peut pas créer de doublon
+_MESSAGE_ID_NAMESPACE = uuid.UUID("6f1c2b0e-8d1a-4c5e-9b7f-2a4d6e8f0b13")
+
+
 # ============================================
 # BIONIC BRANDING
 # ============================================
@@ -266,6 +281,7 @@ async def get_module_info():
             "Entête BIONIC + logo",
             "Personnalisation complète (company_name, contact_name, category, country)",
             "Journalisation complète (7 étapes)",
+            "Envoi massif par lots avec reprise (jobs)",
             "Règle permanente de communication bilingue"
         ],
         "send_modes": [SendMode.ALL.value, SendMode.ONE_BY_ONE.value],
@@ -356,6 +372,56 @@ def inject_variables(text: str, variables: Dict[str, str]) -> str:
     return result
 
 
+_PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+TEMPLATE_SECTIONS = ("subject", "greeting", "body", "closing", "signature")
+
+
+@lru_cache(maxsize=None)
+def compile_template(template_name: str) -> Dict[str, Dict[str, Tuple[str, ...]]]:
+    """
+    Découper un template une seule fois par langue et par section.
+    Chaque section devient (texte, variable, texte, variable, ..., texte).
+    """
+    template = BILINGUAL_TEMPLATES[template_name]
+    return {
+        lang: {
+            section: tuple(_PLACEHOLDER_RE.split(template[lang][section]))
+            for section in TEMPLATE_SECTIONS
+        }
+        for lang in ("fr", "en")
+    }
+
+
+def render_compiled(compiled: Dict, variables: Dict[str, str]) -> Dict:
+    """Injection des variables dans un template compilé (même résultat que personalize_template)."""
+    def render(parts):
+        out = []
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                out.append(part)
+            elif part in variables:
+                value = variables[part]
+                out.append(str(value) if value else "")
+            else:
+                out.append(f"{{{{{part}}}}}")
+        return "".join(out)
+
+    return {
+        lang: {section: render(parts) for section, parts in sections.items()}
+        for lang, sections in compiled.items()
+    }
+
+
+def recipient_variables(recipient: Dict) -> Dict[str, str]:
+    """Variables de personnalisation d'un destinataire."""
+    return {
+        "company_name": recipient.get("company_name", ""),
+        "contact_name": recipient.get("contact_name", recipient.get("company_name", "")),
+        "category": recipient.get("category", ""),
+        "country": recipient.get("country", "")
+    }
+
+
 def personalize_template(template: Dict, variables: Dict[str, str]) -> Dict:
     """Personnaliser un template complet avec les variables."""
     return {
@@ -472,23 +538,20 @@ async def generate_message_preview(
     if not recipients:
         raise HTTPException(status_code=400, detail="Au moins un destinataire requis")
     
-    # Generate previews
+    # Generate previews (template compilé une fois, insertion par lots)
+    compiled = compile_template(template_name)
+    full_display = send_mode == SendMode.ONE_BY_ONE.value
     previews = []
+    preview_records = []
     batch_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
     
     for recipient in recipients:
-        variables = {
-            "company_name": recipient.get("company_name", ""),
-            "contact_name": recipient.get("contact_name", recipient.get("company_name", "")),
-            "category": recipient.get("category", ""),
-            "country": recipient.get("country", "")
-        }
-        
-        personalized = personalize_template(template, variables)
-        preview = generate_preview(personalized, {**recipient, "variables": variables})
+        variables = recipient_variables(recipient)
+        personalized = render_compiled(compiled, variables)
         
         preview_id = str(uuid.uuid4())
-        preview_record = {
+        preview_records.append({
             "preview_id": preview_id,
             "batch_id": batch_id,
             "send_mode": send_mode,
@@ -500,14 +563,18 @@ async def generate_message_preview(
             "validated": False,
             "sent": False,
             "pipeline_step": PipelineStep.PREVIEW_GENERATION.value,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": now,
             "created_by": preview_request.get("created_by", "admin")
-        }
-        
-        await db.message_previews.insert_one(preview_record)
+        })
         
-        preview["preview_id"] = preview_id
-        previews.append(preview)
+        # Mode TOUS: seul l'échantillon est affiché
+        if full_display or not previews:
+            preview = generate_preview(personalized, {**recipient, "variables": variables})
+            preview["preview_id"] = preview_id
+            previews.append(preview)
+    
+    for i in range(0, len(preview_records), INSERT_CHUNK_SIZE):
+        await db.message_previews.insert_many(preview_records[i:i + INSERT_CHUNK_SIZE], ordered=False)
     
     # Log pipeline step
     await _log_pipeline_action(db, batch_id, PipelineStep.PREVIEW_GENERATION.value, "admin", {
@@ -521,12 +588,12 @@ async def generate_message_preview(
         "batch_id": batch_id,
         "send_mode": send_mode,
         "template": template_name,
-        "previews_generated": len(previews),
+        "previews_generated": len(preview_records),
         "previews": previews if send_mode == SendMode.ONE_BY_ONE.value else previews[:1],  # Sample for TOUS mode
         "sample_preview": previews[0] if previews else None,
         "all_recipients": [r.get("company_name") for r in recipients],
         "requires_validation": True,
-        "message": f"✅ {len(previews)} pré-visuel(s) généré(s) - Validation obligatoire avant envoi"
+        "message": f"✅ {len(preview_records)} pré-visuel(s) généré(s) - Validation obligatoire avant envoi"
     }
 
 
@@ -720,6 +787,11 @@ async def send_all_messages(
 ):
     """
     Envoyer TOUS les messages validés d'un batch (mode TOUS).
+    
+    L'envoi est un job repris par lots (SEND_CHUNK_SIZE): un insert_many
+    des messages + un bulk_write des statuts par lot. Les gros batchs
+    partent en arrière-plan (suivi: GET /send/jobs/{job_id}) sauf si
+    "wait": true.
     """
     db = get_db()
     
@@ -729,84 +801,296 @@ async def send_all_messages(
     if not batch_id:
         raise HTTPException(status_code=400, detail="batch_id requis")
     
-    # Get all validated, unsent previews
-    previews = await db.message_previews.find({
-        "batch_id": batch_id,
-        "validated": True,
-        "sent": False
-    }).to_list(1000)
+    pending = await db.message_previews.count_documents(_sendable_query(batch_id))
     
-    if not previews:
+    if not pending:
         return {
             "success": False,
             "error": "Aucun message validé à envoyer ou tous déjà envoyés"
         }
     
-    now = datetime.now(timezone.utc).isoformat()
-    sent_count = 0
-    sent_messages = []
+    job = await _create_send_job(db, batch_id, admin_user, pending)
     
-    for preview in previews:
-        message_id = str(uuid.uuid4())
-        
-        message = {
-            "message_id": message_id,
-            "preview_id": preview.get("preview_id"),
+    if send_request.get("wait") or pending <= SEND_CHUNK_SIZE:
+        job = await run_send_job(db, job["job_id"], collect=True)
+        return {
+            "success": True,
             "batch_id": batch_id,
             "send_mode": SendMode.ALL.value,
-            "template": preview.get("template"),
-            "recipient": preview.get("recipient"),
-            "variables": preview.get("variables"),
-            "content": preview.get("personalized_content"),
-            "status": MessageStatus.SENT.value,
-            "validated_by": preview.get("validated_by"),
-            "validated_at": preview.get("validated_at"),
-            "sent_at": now,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "sent_count": job["sent"],
+            "failed_count": job["failed"],
+            "sent_at": job.get("completed_at"),
             "sent_by": admin_user,
-            "pipeline_step": PipelineStep.SENDING.value,
-            "created_at": now
+            "sent_messages": job.get("sent_messages", []),
+            "message": f"✅ {job['sent']} messages envoyés (mode TOUS)"
         }
-        
-        await db.bilingual_messages.insert_one(message)
-        
-        await db.message_previews.update_one(
-            {"preview_id": preview.get("preview_id")},
-            {
-                "$set": {
+    
+    _start_send_task(db, job["job_id"])
+    
+    return {
+        "success": True,
+        "batch_id": batch_id,
+        "send_mode": SendMode.ALL.value,
+        "job_id": job["job_id"],
+        "status": "running",
+        "total": pending,
+        "sent_by": admin_user,
+        "message": f"⏳ Envoi de {pending} messages lancé en arrière-plan (mode TOUS)"
+    }
+
+
+@router.get("/send/jobs/{job_id}")
+async def get_send_job(job_id: str):
+    """Progression d'un job d'envoi massif."""
+    db = get_db()
+    
+    job = await db[SEND_JOBS_COLLECTION].find_one({"job_id": job_id}, {"_id": 0})
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job d'envoi non trouvé")
+    
+    return {"success": True, "job": job}
+
+
+@router.post("/send/jobs/{job_id}/resume")
+async def resume_send_job(
+    job_id: str,
+    retry_failed: bool = Body(False, embed=True)
+):
+    """
+    Reprendre un job interrompu ou partiel.
+    Les messages déjà envoyés ne sont jamais renvoyés; retry_failed
+    repasse aussi sur les pré-visuels en échec.
+    """
+    db = get_db()
+    
+    job = await db[SEND_JOBS_COLLECTION].find_one({"job_id": job_id}, {"_id": 0})
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job d'envoi non trouvé")
+    
+    if job["status"] == "completed":
+        return {"success": False, "error": "Job déjà terminé", "job": job}
+    
+    if retry_failed:
+        await db[SEND_JOBS_COLLECTION].update_one(
+            {"job_id": job_id},
+            {"$set": {"cursor": "", "failed": 0, "failed_preview_ids": []}}
+        )
+    
+    _start_send_task(db, job_id)
+    
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": "running",
+        "message": "⏳ Reprise de l'envoi en arrière-plan"
+    }
+
+
+# ============================================
+# BULK DISPATCH PIPELINE
+# ============================================
+
+_send_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _sendable_query(batch_id: str) -> Dict:
+    return {"batch_id": batch_id, "validated": True, "sent": False}
+
+
+def message_id_for(preview_id: str) -> str:
+    return str(uuid.uuid5(_MESSAGE_ID_NAMESPACE, preview_id))
+
+
+def _message_from_preview(preview: Dict, admin_user: str, now: str) -> Dict:
+    message_id = message_id_for(preview["preview_id"])
+    return {
+        "_id": message_id,
+        "message_id": message_id,
+        "preview_id": preview["preview_id"],
+        "batch_id": preview.get("batch_id"),
+        "send_mode": SendMode.ALL.value,
+        "template": preview.get("template"),
+        "recipient": preview.get("recipient"),
+        "variables": preview.get("variables"),
+        "content": preview.get("personalized_content"),
+        "status": MessageStatus.SENT.value,
+        "validated_by": preview.get("validated_by"),
+        "validated_at": preview.get("validated_at"),
+        "sent_at": now,
+        "sent_by": admin_user,
+        "pipeline_step": PipelineStep.SENDING.value,
+        "created_at": now
+    }
+
+
+async def _create_send_job(db, batch_id: str, admin_user: str, total: int) -> Dict:
+    now = datetime.now(timezone.utc).isoformat()
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "batch_id": batch_id,
+        "admin_user": admin_user,
+        "status": "pending",
+        "total": total,
+        "sent": 0,
+        "failed": 0,
+        "chunks_done": 0,
+        "cursor": "",
+        "failed_preview_ids": [],
+        "last_error": None,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": None
+    }
+    await db[SEND_JOBS_COLLECTION].insert_one(dict(job))
+    return job
+
+
+async def _claim_send_job(db, job_id: str) -> Optional[Dict]:
+    """Prendre la main sur un job (un seul exécutant, même entre workers)."""
+    now = datetime.now(timezone.utc)
+    stale = (now - timedelta(seconds=SEND_JOB_STALE_SECONDS)).isoformat()
+    result = await db[SEND_JOBS_COLLECTION].update_one(
+        {
+            "job_id": job_id,
+            "$or": [
+                {"status": {"$in": ["pending", "interrupted", "partial"]}},
+                {"status": "running", "updated_at": {"$lt": stale}}
+            ]
+        },
+        {"$set": {"status": "running", "updated_at": now.isoformat()}}
+    )
+    if result.matched_count == 0:
+        return None
+    return await db[SEND_JOBS_COLLECTION].find_one({"job_id": job_id}, {"_id": 0})
+
+
+async def _dispatch_chunk(db, previews: List[Dict], admin_user: str) -> Tuple[List[Dict], List[str]]:
+    """
+    Un lot: insert_many des messages puis un seul bulk_write des statuts.
+    Un message déjà présent (reprise après coupure) compte comme envoyé.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    messages = [_message_from_preview(p, admin_user, now) for p in previews]
+    failed_indexes = set()
+    
+    try:
+        await db.bilingual_messages.insert_many(messages, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            if err.get("code") != 11000:
+                failed_indexes.add(err["index"])
+    
+    sent = [m for i, m in enumerate(messages) if i not in failed_indexes]
+    failed = [messages[i]["preview_id"] for i in sorted(failed_indexes)]
+    
+    if sent:
+        await db.message_previews.bulk_write([
+            UpdateOne(
+                {"preview_id": m["preview_id"], "sent": False},
+                {"$set": {
                     "sent": True,
                     "sent_at": now,
                     "sent_by": admin_user,
-                    "message_id": message_id,
+                    "message_id": m["message_id"],
                     "status": MessageStatus.SENT.value,
                     "pipeline_step": PipelineStep.SENDING.value
-                }
+                }}
+            )
+            for m in sent
+        ], ordered=False)
+    
+    return sent, failed
+
+
+async def run_send_job(db, job_id: str, collect: bool = False) -> Optional[Dict]:
+    """
+    Exécuter (ou reprendre) un job d'envoi, lot par lot.
+    La progression est enregistrée après chaque lot: une interruption
+    reprend au curseur (preview_id) sans renvoyer les messages partis.
+    """
+    job = await _claim_send_job(db, job_id)
+    if job is None:
+        return await db[SEND_JOBS_COLLECTION].find_one({"job_id": job_id}, {"_id": 0})
+    
+    batch_id = job["batch_id"]
+    admin_user = job["admin_user"]
+    cursor = job.get("cursor") or ""
+    recipients: List[str] = []
+    sent_messages: List[Dict] = []
+    
+    try:
+        while True:
+            query = {**_sendable_query(batch_id), "preview_id": {"$gt": cursor}}
+            previews = await db.message_previews.find(query, {"_id": 0}).sort(
+                "preview_id", 1
+            ).limit(SEND_CHUNK_SIZE).to_list(SEND_CHUNK_SIZE)
+            if not previews:
+                break
+            
+            sent, failed = await _dispatch_chunk(db, previews, admin_user)
+            cursor = previews[-1]["preview_id"]
+            
+            update = {
+                "$inc": {"sent": len(sent), "failed": len(failed), "chunks_done": 1},
+                "$set": {"cursor": cursor, "updated_at": datetime.now(timezone.utc).isoformat()}
             }
+            if failed:
+                update["$push"] = {"failed_preview_ids": {"$each": failed}}
+            await db[SEND_JOBS_COLLECTION].update_one({"job_id": job_id}, update)
+            
+            for m in sent:
+                name = (m.get("recipient") or {}).get("company_name")
+                if len(recipients) < 1000:
+                    recipients.append(name)
+                if collect:
+                    sent_messages.append({"message_id": m["message_id"], "recipient": name})
+    except Exception as e:
+        logger.error(f"Send job {job_id} interrupted: {e}")
+        await db[SEND_JOBS_COLLECTION].update_one(
+            {"job_id": job_id},
+            {"$set": {"status": "interrupted", "last_error": str(e),
+                      "updated_at": datetime.now(timezone.utc).isoformat()}}
         )
-        
-        sent_count += 1
-        sent_messages.append({
-            "message_id": message_id,
-            "recipient": preview.get("recipient", {}).get("company_name")
-        })
+        job = await db[SEND_JOBS_COLLECTION].find_one({"job_id": job_id}, {"_id": 0})
+        if collect:
+            job["sent_messages"] = sent_messages
+        return job
+    
+    job = await db[SEND_JOBS_COLLECTION].find_one({"job_id": job_id}, {"_id": 0})
+    now = datetime.now(timezone.utc).isoformat()
+    status = "completed" if not job.get("failed") else "partial"
+    await db[SEND_JOBS_COLLECTION].update_one(
+        {"job_id": job_id},
+        {"$set": {"status": status, "completed_at": now, "updated_at": now}}
+    )
+    job.update({"status": status, "completed_at": now})
     
     # Log
     await _log_pipeline_action(db, batch_id, PipelineStep.SENDING.value, admin_user, {
         "action": "send_all",
         "mode": SendMode.ALL.value,
-        "sent_count": sent_count,
-        "recipients": [m["recipient"] for m in sent_messages]
+        "job_id": job_id,
+        "sent_count": job["sent"],
+        "failed_count": job["failed"],
+        "recipients": recipients
     })
     
-    return {
-        "success": True,
-        "batch_id": batch_id,
-        "send_mode": SendMode.ALL.value,
-        "sent_count": sent_count,
-        "sent_at": now,
-        "sent_by": admin_user,
-        "sent_messages": sent_messages,
-        "message": f"✅ {sent_count} messages envoyés (mode TOUS)"
-    }
+    if collect:
+        job["sent_messages"] = sent_messages
+    return job
+
+
+def _start_send_task(db, job_id: str):
+    running = _send_tasks.get(job_id)
+    if running and not running.done():
+        return
+    task = asyncio.create_task(run_send_job(db, job_id))
+    _send_tasks[job_id] = task
+    task.add_done_callback(lambda t: _send_tasks.pop(job_id, None))
 
 
 # ============================================
@@ -852,7 +1136,8 @@ async def send_prelaunch_to_affiliates(
         await validate_all_previews(preview_result["batch_id"], "COPILOT_MAITRE")
         send_result = await send_all_messages({
             "batch_id": preview_result["batch_id"],
-            "admin_user": "COPILOT_MAITRE"
+            "admin_user": "COPILOT_MAITRE",
+            "wait": True
         })
         
         return {
@@ -328,6 +328,10 @@ async def _process_successful_payment(db, user_id: str, tier: str, duration_days
         "processed_at": datetime.now(timezone.utc)
     })
     
+    # Invalider le niveau en cache du moteur freemium
+    from modules.freemium_engine.router import quota_manager
+    quota_manager.invalidate(user_id)
+    
     logger.info(f"User {user_id} upgraded to {tier} until {expires_at}")
 
 # ==============================================
@@ -163,8 +163,9 @@ class ProductSearchRequest(BaseModel):
     score_min: Optional[int] = None
     sort_by: str = "rank"
     sort_order: str = "asc"
-    limit: int = 50
-    offset: int = 0
+    limit: int = Field(default=50, ge=1, le=200)
+    offset: int = Field(default=0, ge=0)
+    cursor: Optional[str] = None  # Keyset cursor (next_cursor of the previous page)
 
 
 class ProductFilterOptions(BaseModel):
@@ -47,7 +47,7 @@ async def health_check():
     return HealthResponse(
         status="operational",
         engine="products_engine",
-        version="1.0.0",
+        version="1.1.0",
         message=f"Engine opérationnel - {stats['total_products']} produits"
     )
 
@@ -149,9 +149,12 @@ async def delete_product(
 
 @router.post("/search")
 async def search_products(request: ProductSearchRequest):
-    """Advanced product search"""
+    """Advanced product search (keyset pagination via next_cursor)"""
     service = get_products_service()
-    return await service.search(request)
+    try:
+        return await service.search(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # ==============================================
@@ -0,0 +1,309 @@
+"""Products Engine Search - Indexed catalogue search
+Search backend for the products catalogue:
+- Text index (name/brand/description/scent) + compound filter/sort indexes
+- Keyset pagination on (sort field, id) with opaque cursors
+- Facet counts from a single $facet aggregation, kept as an in-process
+  snapshot invalidated on every catalogue write
+
+Version: 1.0.0
+"""
+
+import re
+import json
+import time
+import base64
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+
+from .models import ProductSearchRequest
+
+logger = logging.getLogger(__name__)
+
+TEXT_INDEX_NAME = "products_text"
+
+# Fields allowed as search sort keys (each has a compound index with id)
+SORT_FIELDS = {"rank", "price", "score", "cost_benefit_score", "views", "created_at", "name"}
+
+FEATURE_FIELDS = {
+    "rainproof": "rainproof",
+    "pheromones": "has_pheromones",
+    "natural": "ingredients_natural",
+    "certified": "certified_food",
+}
+
+# Other workers pick up writes they did not see after this delay
+FACET_SNAPSHOT_TTL = 300
+
+
+# ==============================================
+# INDEXES
+# ==============================================
+
+async def ensure_search_indexes(collection) -> bool:
+    """Create the text and compound indexes used by search (idempotent)"""
+    try:
+        await collection.create_index(
+            [("name", "text"), ("brand", "text"), ("scent_flavor", "text"), ("description", "text")],
+            name=TEXT_INDEX_NAME,
+            weights={"name": 10, "brand": 5, "scent_flavor": 3, "description": 1},
+            default_language="french"
+        )
+        for field in sorted(SORT_FIELDS):
+            await collection.create_index([(field, 1), ("id", 1)], name=f"products_{field}_id")
+        await collection.create_index([("category", 1), ("rank", 1), ("id", 1)], name="products_category_rank")
+        await collection.create_index([("product_format", 1), ("rank", 1)], name="products_format_rank")
+        await collection.create_index([("brand", 1), ("rank", 1)], name="products_brand_rank")
+    except Exception as e:
+        logger.warning(f"Could not create products search indexes: {e}")
+        return False
+
+    # Fails on catalogues that already hold duplicate ids; search works
+    # without it, so it must not block (or endlessly retry) the others
+    try:
+        await collection.create_index("id", unique=True, name="products_id")
+    except Exception as e:
+        logger.error(f"Could not create unique products id index (duplicate ids?): {e}")
+    return True
+
+
+# ==============================================
+# QUERY BUILDING
+# ==============================================
+
+def build_filter(request: ProductSearchRequest, text_mode: str = "text") -> Dict[str, Any]:
+    """
+    Build the Mongo filter for a search request.
+
+    Args:
+        text_mode: "text" uses the $text index, "regex" an escaped
+            case-insensitive substring match (fallback)
+    """
+    clauses: List[Dict[str, Any]] = []
+
+    if request.query:
+        if text_mode == "text":
+            clauses.append({"$text": {"$search": request.query}})
+        else:
+            pattern = re.escape(request.query.strip())
+            clauses.append({"$or": [
+                {field: {"$regex": pattern, "$options": "i"}}
+                for field in ("name", "brand", "description", "scent_flavor")
+            ]})
+
+    if request.categories:
+        clauses.append({"category": {"$in": request.categories}})
+    if request.formats:
+        clauses.append({"product_format": {"$in": request.formats}})
+    if request.brands:
+        clauses.append({"brand": {"$in": request.brands}})
+    if request.animals:
+        clauses.append({"$or": [
+            {"animal_type": {"$in": request.animals}},
+            {"target_animals": {"$in": request.animals}}
+        ]})
+    if request.seasons:
+        clauses.append({"season": {"$in": request.seasons}})
+
+    for feature in request.features or []:
+        if feature in FEATURE_FIELDS:
+            clauses.append({FEATURE_FIELDS[feature]: True})
+
+    if request.price_min is not None or request.price_max is not None:
+        price = {}
+        if request.price_min is not None:
+            price["$gte"] = request.price_min
+        if request.price_max is not None:
+            price["$lte"] = request.price_max
+        clauses.append({"price": price})
+
+    if request.score_min is not None:
+        clauses.append({"score": {"$gte": request.score_min}})
+
+    if not clauses:
+        return {}
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def sort_spec(request: ProductSearchRequest) -> Tuple[str, int]:
+    """Validated (field, direction) for a search request"""
+    field = request.sort_by if request.sort_by in SORT_FIELDS else "rank"
+    return field, 1 if request.sort_order == "asc" else -1
+
+
+# ==============================================
+# KEYSET CURSORS
+# ==============================================
+
+def encode_cursor(sort_field: str, value: Any, product_id: str, mode: Optional[str] = None) -> str:
+    """
+    Opaque cursor pointing after (value, id) for a sort field.
+
+    `mode` records the text matching ("text" / "regex") that produced the
+    page, so the next pages keep the same result set.
+    """
+    data = {"f": sort_field, "v": value, "id": product_id}
+    if mode:
+        data["m"] = mode
+    if isinstance(value, datetime):
+        # Kept as a date so the keyset comparison stays on the same BSON type
+        data["v"], data["d"] = value.isoformat(), True
+    raw = json.dumps(data, default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        value = datetime.fromisoformat(data["v"]) if data.get("d") else data["v"]
+        mode = data.get("m")
+        if mode not in (None, "text", "regex"):
+            raise ValueError(mode)
+        return {"field": data["f"], "value": value, "id": data["id"], "mode": mode}
+    except Exception:
+        raise ValueError("Curseur de pagination invalide")
+
+
+def keyset_clause(sort_field: str, direction: int, cursor: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Filter selecting documents strictly after the cursor in (field, id) order.
+
+    Null and missing values sort before every other value, so they come
+    first in ascending order and last in descending order; $gt/$lt never
+    match them and they need their own branch.
+    """
+    op = "$gt" if direction == 1 else "$lt"
+    value = cursor["value"]
+    if value is None:
+        same_null = {sort_field: None, "id": {op: cursor["id"]}}
+        if direction == 1:
+            return {"$or": [same_null, {sort_field: {"$ne": None}}]}
+        return same_null
+
+    clauses = [
+        {sort_field: {op: value}},
+        {sort_field: value, "id": {op: cursor["id"]}}
+    ]
+    if direction == -1:
+        clauses.append({sort_field: None})
+    return {"$or": clauses}
+
+
+# ==============================================
+# FACET SNAPSHOT
+# ==============================================
+
+def build_facet_pipeline() -> List[Dict[str, Any]]:
+    """Single aggregation computing every filter-panel facet"""
+    def count_by(field: str) -> List[Dict[str, Any]]:
+        return [
+            {"$match": {field: {"$nin": [None, ""]}}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+        ]
+
+    return [{"$facet": {
+        "total": [{"$count": "count"}],
+        "categories": count_by("category"),
+        "formats": count_by("product_format"),
+        "brands": count_by("brand"),
+        "scent_flavors": count_by("scent_flavor"),
+        "seasons": count_by("season"),
+        "animals": [
+            {"$project": {"animals": {"$setUnion": [
+                {"$cond": [{"$in": ["$animal_type", [None, ""]]}, [], ["$animal_type"]]},
+                {"$ifNull": ["$target_animals", []]}
+            ]}}},
+            {"$unwind": "$animals"},
+            {"$group": {"_id": "$animals", "count": {"$sum": 1}}}
+        ],
+        "price": [
+            {"$match": {"price": {"$gt": 0}}},
+            {"$group": {"_id": None, "min": {"$min": "$price"}, "max": {"$max": "$price"}}}
+        ],
+        "features": [
+            {"$group": {
+                "_id": None,
+                **{
+                    feature: {"$sum": {"$cond": [{"$eq": [f"${field}", True]}, 1, 0]}}
+                    for feature, field in FEATURE_FIELDS.items()
+                }
+            }}
+        ]
+    }}]
+
+
+def parse_facets(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn the raw $facet document into {facet: {value: count}} maps"""
+    def counts(name: str) -> Dict[str, int]:
+        return {str(row["_id"]): row["count"] for row in result.get(name, []) if row.get("_id") is not None}
+
+    total = result.get("total") or [{"count": 0}]
+    price = (result.get("price") or [{}])[0]
+    features = (result.get("features") or [{}])[0]
+
+    return {
+        "total": total[0]["count"],
+        "categories": counts("categories"),
+        "formats": counts("formats"),
+        "brands": counts("brands"),
+        "scent_flavors": counts("scent_flavors"),
+        "seasons": counts("seasons"),
+        "animals": counts("animals"),
+        "price_range": {"min": price.get("min") or 0, "max": price.get("max") or 0},
+        "features": {feature: features.get(feature, 0) for feature in FEATURE_FIELDS}
+    }
+
+
+class FacetSnapshot:
+    """Facet counts computed once and reused until a catalogue write"""
+
+    def __init__(self, ttl: int = FACET_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._facets: Optional[Dict[str, Any]] = None
+        self._computed_at = 0.0
+        self._version = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self.rebuilds = 0
+        self.hits = 0
+
+    def invalidate(self):
+        """Called on every product create/update/delete"""
+        self._facets = None
+        self._version += 1
+
+    async def get(self, collection) -> Dict[str, Any]:
+        if self._facets is not None and time.time() - self._computed_at < self.ttl:
+            self.hits += 1
+            return self._facets
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have rebuilt it while we waited
+            if self._facets is not None and time.time() - self._computed_at < self.ttl:
+                self.hits += 1
+                return self._facets
+
+            version = self._version
+            docs = await collection.aggregate(build_facet_pipeline()).to_list(1)
+            facets = parse_facets(docs[0] if docs else {})
+            self.rebuilds += 1
+            # A write during the aggregation makes this result stale already
+            if version == self._version:
+                self._facets = facets
+                self._computed_at = time.time()
+            return facets
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": self._facets is not None,
+            "age_seconds": round(time.time() - self._computed_at, 1) if self._facets is not None else None,
+            "version": self._version,
+            "rebuilds": self.rebuilds,
+            "hits": self.hits
+        }
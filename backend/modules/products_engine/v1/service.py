@@ -1,15 +1,41 @@
 """Products Engine Service - PHASE 7 EXTRACTION
 Business logic extracted from server.py.
 
-Version: 1.0.0
+Version: 1.2.0
+- Async driver (motor), indexed search with keyset pagination
+- Filter options served from a $facet snapshot invalidated on write
+- Engagement counters (views/clicks/comparisons) buffered in memory and
+  flushed with one unordered bulk_write
+- Stats/health served from the facet snapshot and a TTL snapshot of the
+  engagement totals (no collection scan per call)
 """
 
 import os
+import time
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+
+from utils.counter_buffer import CounterBuffer
+from utils.performance import LRUCache
 
 from .models import Product, ProductCreate, ProductUpdate, ProductSearchRequest
+from .search import (
+    FacetSnapshot, ensure_search_indexes, build_filter, sort_spec,
+    encode_cursor, decode_cursor, keyset_clause
+)
+
+# Max seconds of engagement counts lost on a hard crash
+COUNTER_FLUSH_INTERVAL = int(os.environ.get('PRODUCT_COUNTER_FLUSH_INTERVAL', 10))
+
+ENGAGEMENT_FIELDS = ("views", "clicks", "comparisons")
+
+# Persisted engagement totals are re-aggregated at most this often
+ENGAGEMENT_SNAPSHOT_TTL = int(os.environ.get('PRODUCT_ENGAGEMENT_SNAPSHOT_TTL', 300))
+
+# Seconds before retrying a failed search index creation
+INDEX_RETRY_INTERVAL = int(os.environ.get('PRODUCT_INDEX_RETRY_INTERVAL', 300))
 
 
 class ProductsService:
@@ -20,11 +46,21 @@ class ProductsService:
         self.db_name = os.environ.get('DB_NAME', 'test_database')
         self._client = None
         self._db = None
+        self._indexes_ready = False
+        self._indexes_retry_at = 0.0
+        self.facets = FacetSnapshot()
+        self.counters = CounterBuffer(name="Product", flush_interval=COUNTER_FLUSH_INTERVAL)
+        # Product ids known to exist, so tracking can 404 without a write
+        self._known_ids = LRUCache(maxsize=10000, ttl=300)
+        # Persisted engagement totals and the flushed counts they already include
+        self._engagement: Optional[Dict[str, int]] = None
+        self._engagement_flushed: Dict[str, int] = {}
+        self._engagement_at = 0.0
     
     @property
     def db(self):
         if self._db is None:
-            self._client = MongoClient(self.mongo_url)
+            self._client = AsyncIOMotorClient(self.mongo_url)
             self._db = self._client[self.db_name]
         return self._db
     
@@ -55,7 +91,7 @@ class ProductsService:
         if sale_mode:
             query["sale_mode"] = sale_mode
         
-        products = list(self.collection.find(query, {"_id": 0}).sort("rank", 1).limit(limit))
+        products = await self.collection.find(query, {"_id": 0}).sort("rank", 1).to_list(limit)
         
         for product in products:
             if isinstance(product.get('created_at'), str):
@@ -65,7 +101,7 @@ class ProductsService:
     
     async def get_top(self, limit: int = 5) -> List[Product]:
         """Get top products by rank"""
-        products = list(self.collection.find({}, {"_id": 0}).sort("rank", 1).limit(limit))
+        products = await self.collection.find({}, {"_id": 0}).sort("rank", 1).to_list(limit)
         
         for product in products:
             if isinstance(product.get('created_at'), str):
@@ -75,12 +111,14 @@ class ProductsService:
     
     async def get_by_id(self, product_id: str) -> Optional[Product]:
         """Get product by ID and increment views"""
-        product = self.collection.find_one({"id": product_id}, {"_id": 0})
+        product = await self.collection.find_one({"id": product_id}, {"_id": 0})
         if not product:
             return None
+        self._known_ids.set(product_id, True)
         
-        # Increment views
-        self.collection.update_one({"id": product_id}, {"$inc": {"views": 1}})
+        # Counters as of now (pending deltas included), then buffer this view
+        self.counters.merge_pending(product, "products", "id")
+        self._increment(product_id, "views")
         
         if isinstance(product.get('created_at'), str):
             product['created_at'] = datetime.fromisoformat(product['created_at'])
@@ -95,7 +133,8 @@ class ProductsService:
         doc = product_obj.model_dump()
         doc['created_at'] = doc['created_at'].isoformat()
         
-        self.collection.insert_one(doc)
+        await self.collection.insert_one(doc)
+        self.facets.invalidate()
         return product_obj
     
     async def update(self, product_id: str, update_data: ProductUpdate) -> Optional[Product]:
@@ -105,12 +144,16 @@ class ProductsService:
         if not update_dict:
             return await self.get_by_id(product_id)
         
-        self.collection.update_one({"id": product_id}, {"$set": update_dict})
+        await self.collection.update_one({"id": product_id}, {"$set": update_dict})
+        self.facets.invalidate()
         return await self.get_by_id(product_id)
     
     async def delete(self, product_id: str) -> bool:
         """Delete a product"""
-        result = self.collection.delete_one({"id": product_id})
+        result = await self.collection.delete_one({"id": product_id})
+        self._known_ids.delete(product_id)
+        if result.deleted_count > 0:
+            self.facets.invalidate()
         return result.deleted_count > 0
     
     # ===========================================
@@ -118,32 +161,13 @@ class ProductsService:
     # ===========================================
     
     async def get_filter_options(self) -> Dict[str, Any]:
-        """Get all available filter options based on existing products"""
-        products = list(self.collection.find({}, {"_id": 0}).limit(1000))
-        
-        formats = set()
-        brands = set()
-        scents = set()
-        animals = set()
-        seasons = set()
-        price_ranges = {"min": float('inf'), "max": 0}
+        """
+        Get all available filter options based on existing products.
         
-        for product in products:
-            if product.get("product_format"):
-                formats.add(product["product_format"])
-            if product.get("brand"):
-                brands.add(product["brand"])
-            if product.get("scent_flavor"):
-                scents.add(product["scent_flavor"])
-            if product.get("animal_type"):
-                animals.add(product["animal_type"])
-            if product.get("target_animals"):
-                animals.update(product["target_animals"])
-            if product.get("season"):
-                seasons.add(product["season"])
-            if product.get("price"):
-                price_ranges["min"] = min(price_ranges["min"], product["price"])
-                price_ranges["max"] = max(price_ranges["max"], product["price"])
+        Counts come from the facet snapshot (one $facet aggregation,
+        rebuilt only after a catalogue write).
+        """
+        facets = await self.facets.get(self.collection)
         
         return {
             "formats": [
@@ -154,8 +178,8 @@ class ProductsService:
                 {"id": "liquide", "name": "Liquide / Spray", "icon": "💨"},
                 {"id": "poudre", "name": "Poudre / Additif", "icon": "✨"}
             ],
-            "brands": sorted(list(brands)),
-            "scent_flavors": sorted(list(scents)),
+            "brands": sorted(facets["brands"]),
+            "scent_flavors": sorted(facets["scent_flavors"]),
             "animals": [
                 {"id": "cerf", "name": "Cerf de Virginie", "icon": "🦌"},
                 {"id": "orignal", "name": "Orignal", "icon": "🫎"},
@@ -178,9 +202,15 @@ class ProductsService:
                 {"id": "natural", "name": "100% Naturel", "icon": "🌿", "field": "ingredients_natural"},
                 {"id": "certified", "name": "Certifié alimentaire", "icon": "✅", "field": "certified_food"}
             ],
-            "price_range": {
-                "min": 0 if price_ranges["min"] == float('inf') else price_ranges["min"],
-                "max": price_ranges["max"]
+            "price_range": facets["price_range"],
+            "counts": {
+                "total": facets["total"],
+                "categories": facets["categories"],
+                "formats": facets["formats"],
+                "brands": facets["brands"],
+                "animals": facets["animals"],
+                "seasons": facets["seasons"],
+                "features": facets["features"]
             }
         }
     
@@ -188,78 +218,71 @@ class ProductsService:
     # ADVANCED SEARCH
     # ===========================================
     
+    async def ensure_indexes(self):
+        """Create search indexes once per process (failures retried after a delay)"""
+        if self._indexes_ready or time.time() < self._indexes_retry_at:
+            return
+        self._indexes_ready = await ensure_search_indexes(self.collection)
+        if not self._indexes_ready:
+            self._indexes_retry_at = time.time() + INDEX_RETRY_INTERVAL
+    
     async def search(self, request: ProductSearchRequest) -> Dict[str, Any]:
-        """Advanced product search"""
-        query = {}
-        
-        # Text search
-        if request.query:
-            query["$or"] = [
-                {"name": {"$regex": request.query, "$options": "i"}},
-                {"brand": {"$regex": request.query, "$options": "i"}},
-                {"description": {"$regex": request.query, "$options": "i"}},
-                {"scent_flavor": {"$regex": request.query, "$options": "i"}}
-            ]
-        
-        # Category filter
-        if request.categories:
-            query["category"] = {"$in": request.categories}
-        
-        # Format filter
-        if request.formats:
-            query["product_format"] = {"$in": request.formats}
-        
-        # Brand filter
-        if request.brands:
-            query["brand"] = {"$in": request.brands}
+        """
+        Advanced product search.
         
-        # Animal filter
-        if request.animals:
-            query["$or"] = query.get("$or", []) + [
-                {"animal_type": {"$in": request.animals}},
-                {"target_animals": {"$in": request.animals}}
-            ]
+        Text queries use the text index (regex fallback when it has no
+        match or is unavailable). Pass `cursor` from a previous page for
+        keyset pagination; the cursor carries the text mode of the first
+        page. `offset` is still honoured without a cursor.
+        """
+        await self.ensure_indexes()
         
-        # Season filter
-        if request.seasons:
-            query["season"] = {"$in": request.seasons}
+        sort_field, sort_direction = sort_spec(request)
+        cursor = decode_cursor(request.cursor) if request.cursor else None
+        if cursor and cursor["field"] != sort_field:
+            raise ValueError("Le curseur ne correspond pas au tri demandé")
         
-        # Features filter
-        if request.features:
-            for feature in request.features:
-                if feature == "rainproof":
-                    query["rainproof"] = True
-                elif feature == "pheromones":
-                    query["has_pheromones"] = True
-                elif feature == "natural":
-                    query["ingredients_natural"] = True
-                elif feature == "certified":
-                    query["certified_food"] = True
+        if cursor and cursor["mode"]:
+            modes = [cursor["mode"]]
+        else:
+            modes = ["text", "regex"] if request.query else ["text"]
+        for mode in modes:
+            query = build_filter(request, text_mode=mode)
+            page_query = query
+            if cursor:
+                clause = keyset_clause(sort_field, sort_direction, cursor)
+                page_query = {"$and": [query, clause]} if query else clause
+            
+            find = self.collection.find(page_query, {"_id": 0}).sort(
+                [(sort_field, sort_direction), ("id", sort_direction)]
+            )
+            if not cursor and request.offset:
+                find = find.skip(request.offset)
+            try:
+                # One extra document tells whether another page exists
+                products = await find.limit(request.limit + 1).to_list(request.limit + 1)
+            except OperationFailure:
+                # No text index on this deployment
+                if mode != modes[-1]:
+                    continue
+                raise
+            if products or cursor or mode == "regex" or not request.query:
+                break
         
-        # Price filter
-        if request.price_min is not None or request.price_max is not None:
-            query["price"] = {}
-            if request.price_min is not None:
-                query["price"]["$gte"] = request.price_min
-            if request.price_max is not None:
-                query["price"]["$lte"] = request.price_max
+        has_more = len(products) > request.limit
+        products = products[:request.limit]
         
-        # Score filter
-        if request.score_min is not None:
-            query["score"] = {"$gte": request.score_min}
+        # Totals are only counted for the first page
+        total = None
+        if not cursor:
+            total = await self.collection.count_documents(query)
         
-        # Sorting
-        sort_direction = 1 if request.sort_order == "asc" else -1
-        sort_field = request.sort_by
-        
-        # Execute query with pagination
-        total = self.collection.count_documents(query)
-        products = list(
-            self.collection.find(query, {"_id": 0})
-            .sort(sort_field, sort_direction)
-            .skip(request.offset)
-            .limit(request.limit)
-        )
+        next_cursor = None
+        if has_more and products:
+            last = products[-1]
+            next_cursor = encode_cursor(
+                sort_field, last.get(sort_field), last["id"], mode if request.query else None
+            )
         
         for product in products:
             if isinstance(product.get('created_at'), str):
@@ -270,55 +293,93 @@ class ProductsService:
             "total": total,
             "limit": request.limit,
             "offset": request.offset,
-            "has_more": (request.offset + len(products)) < total
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+            "search_mode": mode if request.query else None
         }
     
     # ===========================================
     # TRACKING
     # ===========================================
     
+    def _increment(self, product_id: str, field: str):
+        self.counters.start(self.db)
+        self.counters.increment("products", "id", product_id, field)
+    
+    async def _exists(self, product_id: str) -> bool:
+        """Existence check served from the known-ids cache when possible"""
+        if self._known_ids.get(product_id):
+            return True
+        doc = await self.collection.find_one({"id": product_id}, {"_id": 0, "id": 1})
+        if doc:
+            self._known_ids.set(product_id, True)
+        return doc is not None
+    
+    async def _track(self, product_id: str, field: str) -> bool:
+        if not await self._exists(product_id):
+            return False
+        self._increment(product_id, field)
+        return True
+    
     async def track_analyze(self, product_id: str) -> bool:
         """Track product analysis action"""
-        result = self.collection.update_one(
-            {"id": product_id},
-            {"$inc": {"views": 1}}
-        )
-        return result.modified_count > 0
+        return await self._track(product_id, "views")
     
     async def track_compare(self, product_id: str) -> bool:
         """Track product comparison action"""
-        result = self.collection.update_one(
-            {"id": product_id},
-            {"$inc": {"comparisons": 1}}
-        )
-        return result.modified_count > 0
+        return await self._track(product_id, "comparisons")
     
     async def track_click(self, product_id: str) -> bool:
         """Track product click action"""
-        result = self.collection.update_one(
-            {"id": product_id},
-            {"$inc": {"clicks": 1}}
-        )
-        return result.modified_count > 0
+        return await self._track(product_id, "clicks")
+    
+    async def flush_counters(self) -> int:
+        """Persist buffered engagement counters now"""
+        return await self.counters.flush(self.db)
     
     # ===========================================
     # STATS
     # ===========================================
     
-    async def get_stats(self) -> Dict[str, Any]:
-        """Get service statistics"""
-        total = self.collection.count_documents({})
+    async def get_engagement_totals(self) -> Dict[str, int]:
+        """
+        Engagement totals for the whole catalogue.
         
-        by_category = {}
-        pipeline = [{"$group": {"_id": "$category", "count": {"$sum": 1}}}]
-        for doc in self.collection.aggregate(pipeline):
-            by_category[doc["_id"]] = doc["count"]
+        The persisted sums come from a $group refreshed every
+        ENGAGEMENT_SNAPSHOT_TTL seconds; this process's flushes since the
+        snapshot and the deltas not flushed yet are added on top.
+        """
+        if self._engagement is None or time.time() - self._engagement_at >= ENGAGEMENT_SNAPSHOT_TTL:
+            flushed = self.counters.flushed_totals("products", ENGAGEMENT_FIELDS)
+            totals = await self.collection.aggregate([{"$group": {
+                "_id": None,
+                **{field: {"$sum": {"$ifNull": [f"${field}", 0]}} for field in ENGAGEMENT_FIELDS}
+            }}]).to_list(1)
+            persisted = totals[0] if totals else {}
+            self._engagement = {field: persisted.get(field, 0) for field in ENGAGEMENT_FIELDS}
+            self._engagement_flushed = flushed
+            self._engagement_at = time.time()
+        
+        flushed = self.counters.flushed_totals("products", ENGAGEMENT_FIELDS)
+        pending = self.counters.pending_totals("products", ENGAGEMENT_FIELDS)
+        return {
+            field: self._engagement[field] + flushed[field] - self._engagement_flushed[field] + pending[field]
+            for field in ENGAGEMENT_FIELDS
+        }
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get service statistics (snapshots only, cheap enough for the health check)"""
+        facets = await self.facets.get(self.collection)
+        engagement = await self.get_engagement_totals()
         
         return {
             "engine": "products_engine",
-            "version": "1.0.0",
-            "total_products": total,
-            "by_category": by_category,
+            "version": "1.2.0",
+            "total_products": facets["total"],
+            "by_category": facets["categories"],
+            "engagement": engagement,
+            "facet_snapshot": self.facets.stats(),
+            "counters": self.counters.stats(),
             "status": "operational"
         }
 
@@ -332,3 +393,9 @@ def get_products_service() -> ProductsService:
     if _service_instance is None:
         _service_instance = ProductsService()
     return _service_instance
+
+
+async def shutdown_product_counters():
+    """Flush buffered engagement counters on server shutdown"""
+    if _service_instance is not None:
+        await _service_instance.counters.stop()
@@ -10,6 +10,7 @@ import os
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
+from utils.principal_cache import principal_cache, resolve_principal, TokenRevoked
 from .models import UserRole, UserWithRole, ROLE_PERMISSIONS
 
 logger = logging.getLogger(__name__)
@@ -92,6 +93,9 @@ async def get_current_user_with_role(
     """
     Get current user with role information.
     Raises 401 if not authenticated.
+    
+    The token → user snapshot is served from the principal cache when
+    possible (no JWT decode, no database round-trip).
     """
     token = extract_token_from_request(request, credentials)
     
@@ -101,27 +105,31 @@ async def get_current_user_with_role(
             detail="Authentification requise"
         )
     
-    payload = decode_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=401,
-            detail="Token invalide ou expiré"
-        )
-    
-    user_id = payload.get("sub")
-    if not user_id:
+    try:
+        user = principal_cache.lookup(token)
+        
+        if user is None:
+            payload = decode_token(token)
+            if not payload:
+                raise HTTPException(
+                    status_code=401,
+                    detail="Token invalide ou expiré"
+                )
+            
+            if not payload.get("sub"):
+                raise HTTPException(
+                    status_code=401,
+                    detail="Token invalide"
+                )
+            
+            # Get user from database with role (cached for next requests)
+            user = await resolve_principal(get_db(), token, payload)
+    except TokenRevoked:
         raise HTTPException(
             status_code=401,
-            detail="Token invalide"
+            detail="Session révoquée"
         )
     
-    # Get user from database with role
-    db = get_db()
-    user = await db['users'].find_one(
-        {"user_id": user_id},
-        {"_id": 0}
-    )
-    
     if not user:
         raise HTTPException(
             status_code=401,
@@ -13,6 +13,7 @@ from .models import (
     ROLE_METADATA, PermissionCheck
 )
 from .service import RolesService
+from utils.principal_cache import principal_cache
 
 # Import role-based auth dependencies
 from .dependencies import require_admin, get_current_user_with_role
@@ -245,6 +246,14 @@ async def get_role_statistics(
     }
 
 
+@router.get("/principal-cache/stats", summary="Cache d'authentification (admin)")
+async def get_principal_cache_stats(
+    admin: UserWithRole = Depends(require_admin)
+):
+    """Get principal cache hit/miss metrics"""
+    return {"success": True, "cache": principal_cache.stats()}
+
+
 @router.get("/logs", summary="Historique des changements (admin)")
 async def get_role_change_logs(
     user_id: Optional[str] = Query(None),
@@ -7,6 +7,7 @@ from datetime import datetime, timezone
 from typing import Optional, List, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from utils.principal_cache import principal_cache
 from .models import (
     UserRole, UserWithRole, RoleUpdate, RoleChangeLog,
     ROLE_PERMISSIONS, ROLE_METADATA, RoleInfo
@@ -139,6 +140,8 @@ class RolesService:
         if result.modified_count == 0:
             return False, "Échec de la mise à jour du rôle"
         
+        principal_cache.invalidate_user(user_id)
+        
         # Log the change
         log_entry = {
             "user_id": user_id,
@@ -260,6 +263,7 @@ class RolesService:
         )
         
         if result.modified_count > 0:
+            principal_cache.invalidate_all()
             logger.info(f"Migrated {result.modified_count} users to default hunter role")
         
         return result.modified_count
@@ -233,6 +233,11 @@ from modules.partner_engine.router import router as partner_router
 # ==============================================
 from routes.bionic_engine_router import router as bionic_engine_router
 
+# ==============================================
+# LLM GATEWAY (Shared LLM access)
+# ==============================================
+from modules.llm_gateway import router as llm_gateway_router
+
 
 # List of all available routers with their metadata
 CORE_ROUTERS: List[Tuple[APIRouter, dict]] = [
@@ -833,6 +838,16 @@ CORE_ROUTERS: List[Tuple[APIRouter, dict]] = [
         "phase": "NSE",
         "description": "🎯 BIONIC Next Step Engine - User Context, Setup Builder, Chasseur Jumeau, Score Préparation"
     }),
+    
+    # ==========================================
+    # LLM GATEWAY
+    # ==========================================
+    (llm_gateway_router, {
+        "name": "llm_gateway",
+        "version": "1.0.0",
+        "phase": "INFRA",
+        "description": "LLM Gateway - Cache, coalescence, limites de concurrence et budgets tokens"
+    }),
 ]
 
 
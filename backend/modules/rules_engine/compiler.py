@@ -0,0 +1,314 @@
+"""
+Rules Engine Compiler - V5-ULTIME Plan Maître
+=============================================
+
+Compilation des règles stockées en prédicats (closures) réutilisables.
+
+Les règles sont compilées une seule fois puis mises en cache par source;
+le cache est invalidé à chaque écriture (create/update/delete/toggle).
+Chaque règle est indexée par les champs qu'elle référence: un contexte
+auquel il manque un champ requis écarte la règle sans l'évaluer.
+
+Trois dialectes de conditions sont pris en charge:
+- rules_engine: [{"field", "operator", "value"}] (toutes doivent être vraies)
+- trigger_engine: {clé: valeur | {"$gte": x, "$lte": y}}
+- bionic_knowledge_engine: {clé: valeur | liste | {"min", "max"}} pondéré (score 0..1)
+
+Version: 1.0.0
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+from collections import defaultdict
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+Predicate = Callable[[Dict[str, Any]], bool]
+Scorer = Callable[[Dict[str, Any]], float]
+
+# TTL de sécurité pour les règles partagées entre workers (secondes)
+RULESET_CACHE_TTL = 60
+
+
+# ==============================================
+# CONDITION COMPILERS
+# ==============================================
+
+_COMPARATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "in": lambda a, b: a in b,
+    "not_in": lambda a, b: a not in b,
+}
+
+
+def _never(context: Dict[str, Any]) -> bool:
+    return False
+
+
+def compile_condition(condition: dict) -> Predicate:
+    """Compiler une condition {field, operator, value} en prédicat"""
+    field_name = condition["field"]
+    operator = condition["operator"]
+    value = condition["value"]
+
+    if operator == "between":
+        if not (isinstance(value, list) and len(value) == 2):
+            return _never
+        low, high = value
+
+        def predicate(context: Dict[str, Any]) -> bool:
+            ctx_value = context.get(field_name)
+            if ctx_value is None:
+                return False
+            try:
+                return low <= ctx_value <= high
+            except Exception:
+                return False
+        return predicate
+
+    compare = _COMPARATORS.get(operator)
+    if compare is None:
+        return _never
+
+    if operator in ("in", "not_in") and isinstance(value, list):
+        try:
+            value = frozenset(value)
+        except TypeError:
+            pass
+
+    def predicate(context: Dict[str, Any]) -> bool:
+        ctx_value = context.get(field_name)
+        if ctx_value is None:
+            return False
+        try:
+            return compare(ctx_value, value)
+        except Exception:
+            return False
+    return predicate
+
+
+def compile_conditions(conditions: List[dict]) -> Tuple[Predicate, FrozenSet[str]]:
+    """Conjonction de conditions rules_engine; retourne (prédicat, champs requis)"""
+    predicates = [compile_condition(c) for c in conditions]
+    fields = frozenset(c["field"] for c in conditions)
+
+    if not predicates:
+        return (lambda context: True), fields
+    if len(predicates) == 1:
+        return predicates[0], fields
+
+    def predicate(context: Dict[str, Any]) -> bool:
+        for p in predicates:
+            if not p(context):
+                return False
+        return True
+    return predicate, fields
+
+
+def compile_trigger_condition(condition: dict) -> Tuple[Predicate, FrozenSet[str]]:
+    """Compiler une condition de trigger {clé: valeur | {$gte, $lte}}"""
+    checks: List[Predicate] = []
+
+    for key, value in condition.items():
+        if isinstance(value, dict):
+            if "$gte" in value:
+                checks.append(_bound_check(key, value["$gte"], lower=True))
+            if "$lte" in value:
+                checks.append(_bound_check(key, value["$lte"], lower=False))
+        else:
+            checks.append(lambda context, key=key, value=value: context.get(key) == value)
+
+    def predicate(context: Dict[str, Any]) -> bool:
+        for check in checks:
+            if not check(context):
+                return False
+        return True
+
+    # Une égalité à None peut matcher un champ absent: on n'indexe que les bornes
+    required = frozenset(
+        key for key, value in condition.items()
+        if isinstance(value, dict) and ("$gte" in value or "$lte" in value)
+    )
+    return predicate, required
+
+
+def _bound_check(key: str, bound: Any, lower: bool) -> Predicate:
+    def check(context: Dict[str, Any]) -> bool:
+        ctx_value = context.get(key)
+        if ctx_value is None:
+            return False
+        return ctx_value >= bound if lower else ctx_value <= bound
+    return check
+
+
+def compile_weighted_conditions(required: dict) -> Scorer:
+    """
+    Compiler des conditions pondérées (knowledge rules) en fonction de score.
+
+    Score = moyenne des correspondances sur les clés présentes dans le contexte.
+    """
+    if not required:
+        return lambda actual: 1.0
+
+    scorers: List[Tuple[str, Callable[[Any], float]]] = []
+
+    for key, req_value in required.items():
+        if isinstance(req_value, dict):
+            if "min" in req_value and "max" in req_value:
+                low, high = req_value["min"], req_value["max"]
+                mid = (low + high) / 2
+                scorers.append((key, lambda v, low=low, high=high, mid=mid:
+                                1.0 if low <= v <= high else max(0, 1 - abs(v - mid) / 10)))
+            elif "min" in req_value:
+                low = req_value["min"]
+                scorers.append((key, lambda v, low=low: 1.0 if v >= low else max(0, v / low)))
+            elif "max" in req_value:
+                high = req_value["max"]
+                scorers.append((key, lambda v, high=high: 1.0 if v <= high else max(0, high / v)))
+            else:
+                scorers.append((key, lambda v: 0.0))
+        elif isinstance(req_value, list):
+            scorers.append((key, lambda v, options=req_value: 1.0 if v in options else 0.0))
+        else:
+            scorers.append((key, lambda v, expected=req_value: 1.0 if v == expected else 0.0))
+
+    def score(actual: Dict[str, Any]) -> float:
+        total_score = 0.0
+        total_weight = 0
+        for key, scorer in scorers:
+            if key not in actual:
+                continue
+            total_score += scorer(actual[key])
+            total_weight += 1
+        return total_score / max(total_weight, 1)
+
+    return score
+
+
+# ==============================================
+# COMPILED RULE SET
+# ==============================================
+
+@dataclass
+class CompiledRule:
+    """Règle compilée: prédicat + champs requis + document source"""
+    name: str
+    predicate: Predicate
+    fields: FrozenSet[str]
+    rule: Dict[str, Any] = field(default_factory=dict)
+
+
+class CompiledRuleSet:
+    """
+    Ensemble de règles compilées, indexé par champ référencé.
+
+    L'ordre des règles est conservé (priorité définie par la source).
+    """
+
+    def __init__(self, rules: List[CompiledRule]):
+        self.rules = rules
+        self.by_field: Dict[str, List[int]] = defaultdict(list)
+        for index, rule in enumerate(rules):
+            for field_name in rule.fields:
+                self.by_field[field_name].append(index)
+        self._candidates_cache: Dict[FrozenSet[str], List[CompiledRule]] = {}
+
+    @classmethod
+    def from_rules(cls, rules: Iterable[dict]) -> "CompiledRuleSet":
+        """Compiler des règles au format rules_engine"""
+        compiled = []
+        for rule in rules:
+            predicate, fields = compile_conditions(rule.get("conditions", []))
+            compiled.append(CompiledRule(rule["name"], predicate, fields, rule))
+        return cls(compiled)
+
+    @classmethod
+    def from_triggers(cls, triggers: Iterable[dict]) -> "CompiledRuleSet":
+        """Compiler des triggers marketing au format trigger_engine"""
+        compiled = []
+        for trigger in triggers:
+            predicate, fields = compile_trigger_condition(trigger.get("condition", {}))
+            compiled.append(CompiledRule(trigger.get("id"), predicate, fields, trigger))
+        return cls(compiled)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def rules_for_field(self, field_name: str) -> List[CompiledRule]:
+        """Règles qui référencent un champ donné"""
+        return [self.rules[i] for i in self.by_field.get(field_name, [])]
+
+    def _candidates(self, keys: FrozenSet[str]) -> List[CompiledRule]:
+        candidates = self._candidates_cache.get(keys)
+        if candidates is None:
+            candidates = [rule for rule in self.rules if rule.fields <= keys]
+            if len(self._candidates_cache) < 1024:
+                self._candidates_cache[keys] = candidates
+        return candidates
+
+    def evaluate(self, context: Dict[str, Any]) -> List[CompiledRule]:
+        """Règles satisfaites par un contexte"""
+        present = frozenset(k for k, v in context.items() if v is not None)
+        return [rule for rule in self._candidates(present) if rule.predicate(context)]
+
+    def evaluate_batch(self, contexts: List[Dict[str, Any]]) -> List[List[CompiledRule]]:
+        """
+        Évaluer l'ensemble contre de nombreux contextes en un appel.
+
+        Les contextes partageant les mêmes champs partagent la sélection
+        des règles candidates.
+        """
+        return [self.evaluate(context) for context in contexts]
+
+
+class RuleSetCache:
+    """
+    Cache des ensembles compilés, par clé, avec invalidation à l'écriture.
+
+    Le TTL borne la durée pendant laquelle un autre worker peut servir
+    une version périmée après une écriture.
+    """
+
+    def __init__(self, ttl: int = RULESET_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, int, CompiledRuleSet]] = {}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CompiledRuleSet]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        loaded_at, version, ruleset = entry
+        if version != self.version or time.monotonic() - loaded_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ruleset
+
+    def set(self, key: Hashable, ruleset: CompiledRuleSet):
+        self._entries[key] = (time.monotonic(), self.version, ruleset)
+
+    def invalidate(self):
+        """Appelé à chaque écriture de règle"""
+        self.version += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "version": self.version,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
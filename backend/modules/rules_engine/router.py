@@ -23,6 +23,8 @@ import os
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from .compiler import CompiledRuleSet, RuleSetCache, compile_condition
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/rules", tags=["Rules Engine - Plan Maître"])
@@ -81,6 +83,10 @@ class RuleEvaluationRequest(BaseModel):
     context: Dict[str, Any]  # weather, location, time, user_profile
     rule_types: List[RuleType] = []
 
+class RuleBatchEvaluationRequest(BaseModel):
+    contexts: List[Dict[str, Any]] = Field(..., max_length=10000)  # contacts, grid cells, forecast hours
+    rule_types: List[RuleType] = []
+
 # ==============================================
 # DEFAULT RULES (Plan Maître)
 # ==============================================
@@ -274,6 +280,10 @@ DEFAULT_RULES = [
     }
 ]
 
+# Compiled rule sets (invalidated on every rule write)
+_ruleset_cache = RuleSetCache()
+DEFAULT_RULESET = CompiledRuleSet.from_rules([r for r in DEFAULT_RULES if r.get("enabled", True)])
+
 # ==============================================
 # MODULE INFO
 # ==============================================
@@ -352,6 +362,7 @@ async def create_rule(rule: HuntingRule):
     rule_dict["created_at"] = datetime.now(timezone.utc)
     
     await db.hunting_rules.insert_one(rule_dict)
+    _ruleset_cache.invalidate()
     del rule_dict["_id"]
     
     return {"success": True, "rule": rule_dict}
@@ -367,6 +378,7 @@ async def update_rule(rule_name: str, updates: dict):
         {"name": rule_name},
         {"$set": updates}
     )
+    _ruleset_cache.invalidate()
     
     return {
         "success": result.modified_count > 0,
@@ -378,6 +390,7 @@ async def delete_rule(rule_name: str):
     """Delete a rule"""
     db = get_db()
     result = await db.hunting_rules.delete_one({"name": rule_name})
+    _ruleset_cache.invalidate()
     
     return {
         "success": result.deleted_count > 0,
@@ -390,47 +403,20 @@ async def delete_rule(rule_name: str):
 
 def evaluate_condition(condition: dict, context: dict) -> bool:
     """Evaluate a single condition against context"""
-    field = condition["field"]
-    operator = condition["operator"]
-    value = condition["value"]
-    
-    ctx_value = context.get(field)
-    if ctx_value is None:
-        return False
-    
-    try:
-        if operator == "eq":
-            return ctx_value == value
-        elif operator == "ne":
-            return ctx_value != value
-        elif operator == "gt":
-            return ctx_value > value
-        elif operator == "gte":
-            return ctx_value >= value
-        elif operator == "lt":
-            return ctx_value < value
-        elif operator == "lte":
-            return ctx_value <= value
-        elif operator == "in":
-            return ctx_value in value
-        elif operator == "not_in":
-            return ctx_value not in value
-        elif operator == "between":
-            if isinstance(value, list) and len(value) == 2:
-                return value[0] <= ctx_value <= value[1]
-        return False
-    except Exception:
-        return False
+    return compile_condition(condition)(context)
 
-@router.post("/evaluate")
-async def evaluate_rules(request: RuleEvaluationRequest):
-    """Evaluate rules against a context and return triggered actions"""
-    db = get_db()
+async def load_ruleset(db, rule_types: List[RuleType] = None) -> CompiledRuleSet:
+    """Get compiled enabled rules for the given types (cached until next write)"""
+    type_values = sorted(t.value for t in rule_types or [])
+    cache_key = tuple(type_values)
+    
+    ruleset = _ruleset_cache.get(cache_key)
+    if ruleset is not None:
+        return ruleset
     
-    # Get applicable rules
     query = {"enabled": True}
-    if request.rule_types:
-        query["type"] = {"$in": [t.value for t in request.rule_types]}
+    if type_values:
+        query["type"] = {"$in": type_values}
     
     rules = await db.hunting_rules.find(query, {"_id": 0}).to_list(length=100)
     
@@ -438,50 +424,79 @@ async def evaluate_rules(request: RuleEvaluationRequest):
     if not rules:
         rules = [r for r in DEFAULT_RULES if (
             r.get("enabled", True) and
-            (not request.rule_types or r["type"] in [t.value for t in request.rule_types])
+            (not type_values or r["type"] in type_values)
         )]
     
-    # Evaluate each rule
+    ruleset = CompiledRuleSet.from_rules(rules)
+    _ruleset_cache.set(cache_key, ruleset)
+    return ruleset
+
+def summarize_matches(matches) -> dict:
+    """Build triggered rules, actions and cumulative modifier from matched rules"""
     triggered_rules = []
     actions = []
     score_modifier = 1.0
     
-    for rule in rules:
-        # Check all conditions
-        all_conditions_met = True
-        for condition in rule.get("conditions", []):
-            if not evaluate_condition(condition, request.context):
-                all_conditions_met = False
-                break
+    for compiled in matches:
+        rule = compiled.rule
+        triggered_rules.append({
+            "name": rule["name"],
+            "type": rule["type"],
+            "priority": rule.get("priority", "medium")
+        })
         
-        if all_conditions_met:
-            triggered_rules.append({
-                "name": rule["name"],
-                "type": rule["type"],
-                "priority": rule.get("priority", "medium")
+        # Collect actions
+        for action in rule.get("actions", []):
+            actions.append({
+                "rule": rule["name"],
+                "type": action["type"],
+                "params": action.get("params", {})
             })
             
-            # Collect actions
-            for action in rule.get("actions", []):
-                actions.append({
-                    "rule": rule["name"],
-                    "type": action["type"],
-                    "params": action.get("params", {})
-                })
-                
-                # Apply score modifiers
-                if action["type"] == "score_modifier":
-                    score_modifier *= action["params"].get("modifier", 1.0)
+            # Apply score modifiers
+            if action["type"] == "score_modifier":
+                score_modifier *= action["params"].get("modifier", 1.0)
     
     return {
-        "success": True,
-        "context_evaluated": request.context,
         "triggered_rules_count": len(triggered_rules),
         "triggered_rules": triggered_rules,
         "actions": actions,
         "cumulative_score_modifier": round(score_modifier, 2)
     }
 
+@router.post("/evaluate")
+async def evaluate_rules(request: RuleEvaluationRequest):
+    """Evaluate rules against a context and return triggered actions"""
+    ruleset = await load_ruleset(get_db(), request.rule_types)
+    
+    return {
+        "success": True,
+        "context_evaluated": request.context,
+        **summarize_matches(ruleset.evaluate(request.context))
+    }
+
+@router.post("/evaluate/batch")
+async def evaluate_rules_batch(request: RuleBatchEvaluationRequest):
+    """Evaluate one rule set against many contexts in a single call"""
+    ruleset = await load_ruleset(get_db(), request.rule_types)
+    
+    results = [
+        {"index": i, **summarize_matches(matches)}
+        for i, matches in enumerate(ruleset.evaluate_batch(request.contexts))
+    ]
+    
+    return {
+        "success": True,
+        "rules_evaluated": len(ruleset),
+        "contexts_evaluated": len(request.contexts),
+        "results": results
+    }
+
+@router.get("/cache/stats")
+async def get_ruleset_cache_stats():
+    """Compiled rule set cache statistics"""
+    return {"success": True, "cache": _ruleset_cache.stats()}
+
 # ==============================================
 # RULE TEMPLATES
 # ==============================================
@@ -546,6 +561,8 @@ async def initialize_default_rules():
             await db.hunting_rules.insert_one(rule)
             inserted += 1
     
+    _ruleset_cache.invalidate()
+    
     return {
         "success": True,
         "message": f"Initialized {inserted} default rules",
@@ -5,14 +5,13 @@ BIONIC SEO Content Generator (IA) - V5-ULTIME
 Génération de contenu SEO via LLM.
 Utilise Emergent Universal Key pour OpenAI/Claude/Gemini.
 
-Module isolé - aucun import croisé.
+Module isolé - seul le gateway LLM partagé est importé.
 """
 
 from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 import logging
 import os
-import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -37,7 +36,7 @@ class SEOContentGenerator:
     ) -> dict:
         """Générer le contenu complet d'une page pilier"""
         try:
-            from emergentintegrations.llm.chat import LlmChat, UserMessage
+            from modules.llm_gateway import get_llm_gateway
             
             # Préparer les données du Knowledge Layer
             species_info = knowledge_data.get("species", {})
@@ -60,12 +59,6 @@ RÈGLES:
 9. Optimise pour le mot-clé principal sans sur-optimisation
 """
 
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"seo_pillar_{uuid.uuid4().hex[:8]}",
-                system_message=system_message
-            ).with_model(self.model_provider, self.model_name)
-            
             # Construire le prompt avec les données Knowledge Layer
             prompt = self._build_pillar_prompt(
                 species_id=species_id,
@@ -76,10 +69,15 @@ RÈGLES:
                 language=language
             )
             
-            user_message = UserMessage(text=prompt)
-            
             # Générer le contenu
-            content = await chat.send_message(user_message)
+            content = await get_llm_gateway().complete(
+                prompt,
+                system_message=system_message,
+                feature="seo_content",
+                provider=self.model_provider,
+                model=self.model_name,
+                api_key=self.api_key
+            )
             
             # Parser et structurer la réponse
             structured_content = self._parse_generated_content(content, keyword)
@@ -18,6 +18,8 @@ from typing import Optional, List, Dict, Any
 import logging
 import uuid
 
+from .seo_similarity import SEOSimilarityIndex, TEXT_FIELDS
+
 logger = logging.getLogger(__name__)
 
 
@@ -234,6 +236,8 @@ class SEOPagesManager:
                 "content_format": page_data.get("content_format", "article"),
                 "h1": page_data.get("h1", ""),
                 "h2_list": page_data.get("h2_list", []),
+                "content_markdown": page_data.get("content_markdown", ""),
+                "content_html": page_data.get("content_html", ""),
                 "word_count": page_data.get("word_count", 0),
                 "reading_time_min": page_data.get("reading_time_min", 0),
                 "primary_keyword": page_data.get("primary_keyword", ""),
@@ -264,6 +268,7 @@ class SEOPagesManager:
             
             await db.seo_pages.insert_one(page)
             page.pop("_id", None)
+            await SEOPagesManager._refresh_fingerprint(db, page)
             
             return {"success": True, "page": page}
         except Exception as e:
@@ -288,6 +293,11 @@ class SEOPagesManager:
             if result.matched_count == 0:
                 return {"success": False, "error": "Page non trouvée"}
             
+            if any(field in updates for field in TEXT_FIELDS):
+                page = await db.seo_pages.find_one({"id": page_id}, {"_id": 0})
+                if page:
+                    await SEOPagesManager._refresh_fingerprint(db, page)
+            
             return {"success": True, "message": "Page mise à jour"}
         except Exception as e:
             logger.error(f"Error updating page: {e}")
@@ -323,11 +333,20 @@ class SEOPagesManager:
             if result.deleted_count == 0:
                 return {"success": False, "error": "Page non trouvée"}
             
+            await SEOSimilarityIndex.remove_page(db, page_id)
             return {"success": True, "message": "Page supprimée"}
         except Exception as e:
             logger.error(f"Error deleting page: {e}")
             return {"success": False, "error": str(e)}
     
+    @staticmethod
+    async def _refresh_fingerprint(db, page: dict):
+        """Empreinte quasi-doublons (un échec n'annule pas l'écriture de la page)"""
+        try:
+            await SEOSimilarityIndex.index_page(db, page)
+        except Exception as e:
+            logger.warning(f"Fingerprint update failed for {page.get('id')}: {e}")
+    
     # ============================================
     # TEMPLATES
     # ============================================
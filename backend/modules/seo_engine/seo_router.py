@@ -9,6 +9,7 @@ Endpoints:
 - /dashboard : Dashboard SEO
 - /clusters/* : Gestion des clusters
 - /pages/* : Gestion des pages
+- /duplicates/* : Quasi-doublons de contenu (MinHash/LSH)
 - /jsonld/* : Schémas JSON-LD
 - /analytics/* : Analytics et KPIs
 - /automation/* : Automatisation
@@ -31,6 +32,7 @@ from .seo_jsonld import SEOJsonLDManager
 from .seo_analytics import SEOAnalyticsManager
 from .seo_automation import SEOAutomationManager
 from .seo_generation import SEOGenerationManager
+from .seo_similarity import SEOSimilarityIndex
 from .seo_models import (
     GenerateOutlineRequest,
     GenerateMetaTagsRequest,
@@ -77,12 +79,14 @@ async def seo_engine_info():
             "seo_jsonld",
             "seo_analytics",
             "seo_automation",
-            "seo_generation"
+            "seo_generation",
+            "seo_similarity"
         ],
         "endpoints": {
             "dashboard": "/dashboard",
             "clusters": "/clusters/*",
             "pages": "/pages/*",
+            "duplicates": "/duplicates/*",
             "jsonld": "/jsonld/*",
             "analytics": "/analytics/*",
             "automation": "/automation/*",
@@ -205,6 +209,33 @@ async def get_page_optimization(page_id: str):
     """Recommandations d'optimisation"""
     return await SEOService.optimize_page(get_db(), page_id)
 
+@router.get("/pages/{page_id}/similar")
+async def get_similar_pages(
+    page_id: str,
+    threshold: float = Query(0.8, ge=0.5, le=1.0),
+    limit: int = Query(20, le=100)
+):
+    """Pages au contenu quasi identique (similarité ≥ threshold)"""
+    return await SEOSimilarityIndex.similar_to_page(get_db(), page_id, threshold, limit)
+
+
+# ==============================================
+# QUASI-DOUBLONS
+# ==============================================
+
+@router.get("/duplicates/report")
+async def get_duplicates_report(
+    threshold: float = Query(0.8, ge=0.5, le=1.0),
+    max_groups: int = Query(100, le=1000)
+):
+    """Rapport global des groupes de pages quasi dupliquées"""
+    return await SEOSimilarityIndex.duplicate_report(get_db(), threshold, max_groups)
+
+@router.post("/duplicates/reindex")
+async def reindex_fingerprints():
+    """Recalculer les empreintes manquantes ou périmées"""
+    return await SEOSimilarityIndex.reindex_all(get_db())
+
 
 # ==============================================
 # JSON-LD
@@ -20,6 +20,8 @@ import logging
 import hashlib
 import re
 
+from .seo_similarity import SEOSimilarityIndex
+
 logger = logging.getLogger(__name__)
 
 
@@ -261,7 +263,7 @@ class SEORulesEngine:
             "threshold": 0.80,
             "action": "WARN",
             "check_fields": ["content_html", "content_markdown"],
-            "algorithm": "simhash",
+            "algorithm": "minhash_lsh",
             "is_active": True
         },
         "meta_duplicate": {
@@ -631,6 +633,20 @@ class SEORulesEngine:
                     "action": "WARN"
                 })
         
+        # Check near-duplicate content (index MinHash/LSH)
+        content_rule = SEORulesEngine.DUPLICATE_RULES["content_duplicate"]
+        if content_rule["is_active"]:
+            similar = await SEOSimilarityIndex.find_similar(
+                db, page_data, threshold=content_rule["threshold"], limit=5
+            )
+            for match in similar:
+                results["duplicates"].append({
+                    "type": "content",
+                    "existing_id": match["page_id"],
+                    "similarity": match["similarity"],
+                    "action": content_rule["action"]
+                })
+        
         return results
     
     @staticmethod
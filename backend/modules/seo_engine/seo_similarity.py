@@ -0,0 +1,350 @@
+"""
+BIONIC SEO Similarity - V5-ULTIME
+=================================
+
+Détection des quasi-doublons de contenu entre pages SEO.
+
+Les contrôles exacts (titre, slug, mot-clé) ne voient pas les pages
+générées à partir du même gabarit. Ici chaque page reçoit une empreinte
+MinHash (shingles de mots) indexée par LSH dans MongoDB:
+
+- Empreinte recalculée à la création / mise à jour d'une page
+- Requête "pages similaires ≥ X%" via l'index multiclé sur les bandes
+  LSH (seules les pages partageant une bande sont comparées)
+- Rapport global par regroupement des bandes, sans comparaison paire
+  à paire de toutes les pages
+
+Avec NUM_PERM=128 et 16 bandes de 8 lignes, le seuil de détection LSH
+se situe vers 0.7: les paires ≥ 0.8 sont retrouvées avec une probabilité
+> 99%. En dessous de ~0.6, le rappel baisse.
+
+Module isolé - Architecture LEGO V5.
+"""
+
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from collections import defaultdict
+import asyncio
+import hashlib
+import logging
+import re
+import zlib
+
+import numpy as np
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINTS_COLLECTION = "seo_page_fingerprints"
+
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# Seuil par défaut (règle content_duplicate)
+DEFAULT_THRESHOLD = 0.80
+
+# Champs textuels pris en compte pour l'empreinte
+TEXT_FIELDS = ("h1", "h2_list", "meta_description", "meta_description_fr",
+               "content_markdown", "content_html")
+
+# Permutations MinHash: h(x) = (a*x + b) mod p, avec x < 2^32 et p > 2^32
+# (a*x tient dans un uint64). Graine fixe: les empreintes stockées restent
+# comparables d'un redémarrage à l'autre.
+_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(20260218)
+_PERM_A = _rng.randint(1, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_ensure_lock = asyncio.Lock()
+_indexes_ready = False
+
+
+# ============================================
+# EMPREINTES
+# ============================================
+
+def page_text(page: dict) -> str:
+    """Texte comparé: corps + titres de sections + meta (sans balises HTML)"""
+    parts = []
+    for field in TEXT_FIELDS:
+        value = page.get(field)
+        if not value:
+            continue
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value)
+        parts.append(_TAG_RE.sub(" ", str(value)))
+    return " ".join(parts)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Ensemble des n-grammes de mots (hachés sur 32 bits)"""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return set()
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+
+def minhash(hashed_shingles: Iterable[int]) -> Optional[np.ndarray]:
+    """Signature MinHash (NUM_PERM valeurs), None si aucun shingle"""
+    values = np.fromiter(hashed_shingles, dtype=np.uint64)
+    if values.size == 0:
+        return None
+    permuted = (np.outer(_PERM_A, values) + _PERM_B[:, None]) % _PRIME
+    return np.minimum(permuted, _MAX_HASH).min(axis=1)
+
+
+def band_keys(signature: np.ndarray) -> List[str]:
+    """Clés LSH: une par bande, préfixée par son numéro"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+
+def estimate_similarity(sig_a, sig_b) -> float:
+    """Similarité de Jaccard estimée entre deux signatures"""
+    return float(np.mean(np.asarray(sig_a, dtype=np.uint64) == np.asarray(sig_b, dtype=np.uint64)))
+
+
+def fingerprint(page: dict) -> Optional[Dict[str, Any]]:
+    """Empreinte complète d'une page (None si la page n'a pas de texte)"""
+    text = page_text(page)
+    signature = minhash(shingles(text))
+    if signature is None:
+        return None
+    return {
+        "signature": [int(v) for v in signature],
+        "band_keys": band_keys(signature),
+        "text_hash": hashlib.sha1(text.encode("utf-8")).hexdigest()
+    }
+
+
+def _group_pairs(pairs: List[Tuple[str, str, float]]) -> List[List[str]]:
+    """Regrouper les paires en groupes connexes (union-find)"""
+    parent: Dict[str, str] = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in pairs:
+        parent[find(a)] = find(b)
+
+    groups = defaultdict(list)
+    for node in parent:
+        groups[find(node)].append(node)
+    return sorted((sorted(g) for g in groups.values()), key=len, reverse=True)
+
+
+class SEOSimilarityIndex:
+    """Index MinHash/LSH des pages SEO"""
+
+    @staticmethod
+    async def ensure_indexes(db):
+        global _indexes_ready
+        if _indexes_ready:
+            return
+        async with _ensure_lock:
+            if _indexes_ready:
+                return
+            await db[FINGERPRINTS_COLLECTION].create_index("page_id", unique=True)
+            await db[FINGERPRINTS_COLLECTION].create_index("band_keys")
+            _indexes_ready = True
+
+    # ============================================
+    # MAINTENANCE INCRÉMENTALE
+    # ============================================
+
+    @staticmethod
+    async def index_page(db, page: dict) -> bool:
+        """Calculer et stocker l'empreinte d'une page (création / mise à jour)"""
+        await SEOSimilarityIndex.ensure_indexes(db)
+        fp = await asyncio.to_thread(fingerprint, page)
+        if fp is None:
+            await db[FINGERPRINTS_COLLECTION].delete_one({"page_id": page["id"]})
+            return False
+        await db[FINGERPRINTS_COLLECTION].update_one(
+            {"page_id": page["id"]},
+            {"$set": {**fp, "updated_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+        return True
+
+    @staticmethod
+    async def remove_page(db, page_id: str):
+        await db[FINGERPRINTS_COLLECTION].delete_one({"page_id": page_id})
+
+    @staticmethod
+    async def reindex_all(db, batch_size: int = 500) -> dict:
+        """Recalculer les empreintes manquantes ou périmées (texte modifié)"""
+        await SEOSimilarityIndex.ensure_indexes(db)
+        existing = {}
+        async for doc in db[FINGERPRINTS_COLLECTION].find({}, {"_id": 0, "page_id": 1, "text_hash": 1}):
+            existing[doc["page_id"]] = doc.get("text_hash")
+
+        projection = {"_id": 0, "id": 1, **{f: 1 for f in TEXT_FIELDS}}
+        seen = set()
+        ops: List[UpdateOne] = []
+        indexed = 0
+        now = datetime.now(timezone.utc).isoformat()
+
+        async for page in db.seo_pages.find({}, projection):
+            seen.add(page["id"])
+            text = page_text(page)
+            if existing.get(page["id"]) == hashlib.sha1(text.encode("utf-8")).hexdigest():
+                continue
+            fp = await asyncio.to_thread(fingerprint, page)
+            if fp is None:
+                continue
+            ops.append(UpdateOne({"page_id": page["id"]}, {"$set": {**fp, "updated_at": now}}, upsert=True))
+            indexed += 1
+            if len(ops) >= batch_size:
+                await db[FINGERPRINTS_COLLECTION].bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            await db[FINGERPRINTS_COLLECTION].bulk_write(ops, ordered=False)
+
+        orphans = [pid for pid in existing if pid not in seen]
+        if orphans:
+            await db[FINGERPRINTS_COLLECTION].delete_many({"page_id": {"$in": orphans}})
+
+        return {"success": True, "indexed": indexed, "removed": len(orphans), "total_pages": len(seen)}
+
+    # ============================================
+    # REQUÊTES
+    # ============================================
+
+    @staticmethod
+    async def find_similar(
+        db,
+        page: dict,
+        threshold: float = DEFAULT_THRESHOLD,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Pages dont la similarité estimée avec `page` est ≥ threshold.
+        Seules les pages partageant au moins une bande LSH sont lues.
+        """
+        await SEOSimilarityIndex.ensure_indexes(db)
+        fp = await asyncio.to_thread(fingerprint, page)
+        if fp is None:
+            return []
+
+        query = {"band_keys": {"$in": fp["band_keys"]}}
+        if page.get("id"):
+            query["page_id"] = {"$ne": page["id"]}
+
+        matches = []
+        async for cand in db[FINGERPRINTS_COLLECTION].find(query, {"_id": 0, "page_id": 1, "signature": 1}):
+            similarity = estimate_similarity(fp["signature"], cand["signature"])
+            if similarity >= threshold:
+                matches.append({"page_id": cand["page_id"], "similarity": round(similarity, 3)})
+
+        matches.sort(key=lambda m: m["similarity"], reverse=True)
+        return matches[:limit]
+
+    @staticmethod
+    async def similar_to_page(db, page_id: str, threshold: float = DEFAULT_THRESHOLD, limit: int = 20) -> dict:
+        """Pages similaires à une page existante"""
+        try:
+            page = await db.seo_pages.find_one({"id": page_id}, {"_id": 0})
+            if not page:
+                return {"success": False, "error": "Page non trouvée"}
+            matches = await SEOSimilarityIndex.find_similar(db, page, threshold, limit)
+            await SEOSimilarityIndex._attach_titles(db, matches)
+            return {"success": True, "page_id": page_id, "threshold": threshold,
+                    "total": len(matches), "similar": matches}
+        except Exception as e:
+            logger.error(f"Error finding similar pages: {e}")
+            return {"success": False, "error": str(e)}
+
+    @staticmethod
+    async def duplicate_report(db, threshold: float = DEFAULT_THRESHOLD, max_groups: int = 100) -> dict:
+        """
+        Rapport global des quasi-doublons.
+
+        Les empreintes sont regroupées par clé de bande: seules les pages
+        d'un même seau sont comparées entre elles.
+        """
+        try:
+            await SEOSimilarityIndex.ensure_indexes(db)
+            signatures: Dict[str, list] = {}
+            buckets: Dict[str, List[str]] = defaultdict(list)
+            async for doc in db[FINGERPRINTS_COLLECTION].find({}, {"_id": 0, "page_id": 1, "signature": 1, "band_keys": 1}):
+                signatures[doc["page_id"]] = doc["signature"]
+                for key in doc["band_keys"]:
+                    buckets[key].append(doc["page_id"])
+
+            pairs = await asyncio.to_thread(SEOSimilarityIndex._score_buckets, buckets, signatures, threshold)
+            groups = _group_pairs(pairs)
+
+            best = defaultdict(float)
+            for a, b, sim in pairs:
+                best[a] = max(best[a], sim)
+                best[b] = max(best[b], sim)
+
+            return {
+                "success": True,
+                "threshold": threshold,
+                "pages_indexed": len(signatures),
+                "duplicate_pairs": len(pairs),
+                "total_groups": len(groups),
+                "groups": [
+                    {"pages": g, "size": len(g), "max_similarity": round(max(best[p] for p in g), 3)}
+                    for g in groups[:max_groups]
+                ],
+                "pairs": [
+                    {"page_a": a, "page_b": b, "similarity": round(s, 3)}
+                    for a, b, s in sorted(pairs, key=lambda p: p[2], reverse=True)[:max_groups * 5]
+                ],
+                "generated_at": datetime.now(timezone.utc).isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Error building duplicate report: {e}")
+            return {"success": False, "error": str(e)}
+
+    @staticmethod
+    def _score_buckets(buckets: Dict[str, List[str]], signatures: Dict[str, list], threshold: float):
+        """Paires ≥ threshold parmi les pages partageant un seau (comparaisons vectorisées par seau)"""
+        pairs: Dict[Tuple[str, str], float] = {}
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            matrix = np.asarray([signatures[m] for m in members], dtype=np.uint64)
+            for i in range(len(members) - 1):
+                scores = (matrix[i + 1:] == matrix[i]).mean(axis=1)
+                for j in np.nonzero(scores >= threshold)[0]:
+                    a, b = members[i], members[i + 1 + j]
+                    pairs[(a, b) if a < b else (b, a)] = float(scores[j])
+        return [(a, b, sim) for (a, b), sim in pairs.items()]
+
+    @staticmethod
+    async def _attach_titles(db, matches: List[Dict[str, Any]]):
+        if not matches:
+            return
+        ids = [m["page_id"] for m in matches]
+        titles = {}
+        async for p in db.seo_pages.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "title_fr": 1, "slug": 1}):
+            titles[p["id"]] = p
+        for m in matches:
+            page = titles.get(m["page_id"], {})
+            m["title_fr"] = page.get("title_fr")
+            m["slug"] = page.get("slug")
+
+
+logger.info("SEOSimilarityIndex initialized - MinHash/LSH near-duplicate detection")
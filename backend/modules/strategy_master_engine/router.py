@@ -311,37 +311,28 @@ async def generate_strategy(request: StrategyRequest):
     base_score = 70
     
     # Evaluate rules to get modifiers and recommendations
-    from modules.rules_engine.router import evaluate_condition, DEFAULT_RULES
+    from modules.rules_engine.router import DEFAULT_RULESET
     
     score_modifier = 1.0
     recommendations = []
     alerts = []
     
-    for rule in DEFAULT_RULES:
-        if not rule.get("enabled", True):
-            continue
-            
-        all_met = True
-        for condition in rule.get("conditions", []):
-            if not evaluate_condition(condition, context):
-                all_met = False
-                break
-        
-        if all_met:
-            for action in rule.get("actions", []):
-                if action["type"] == "score_modifier":
-                    score_modifier *= action["params"].get("modifier", 1.0)
-                elif action["type"] == "recommend":
-                    recommendations.append({
-                        "rule": rule["name"],
-                        "strategy": action["params"].get("strategy"),
-                        "reason": action["params"].get("reason", "")
-                    })
-                elif action["type"] == "alert":
-                    alerts.append({
-                        "level": action["params"].get("level", "info"),
-                        "message": action["params"].get("message", "")
-                    })
+    for compiled in DEFAULT_RULESET.evaluate(context):
+        rule = compiled.rule
+        for action in rule.get("actions", []):
+            if action["type"] == "score_modifier":
+                score_modifier *= action["params"].get("modifier", 1.0)
+            elif action["type"] == "recommend":
+                recommendations.append({
+                    "rule": rule["name"],
+                    "strategy": action["params"].get("strategy"),
+                    "reason": action["params"].get("reason", "")
+                })
+            elif action["type"] == "alert":
+                alerts.append({
+                    "level": action["params"].get("level", "info"),
+                    "message": action["params"].get("message", "")
+                })
     
     # Calculate final score
     final_score = min(100, int(base_score * score_modifier))
@@ -19,6 +19,8 @@ import os
 import logging
 import uuid
 
+from modules.rules_engine.compiler import CompiledRuleSet, RuleSetCache
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/trigger-engine", tags=["Marketing Trigger Engine X300%"])
@@ -149,6 +151,33 @@ DEFAULT_TRIGGERS = [
 ]
 
 
+# Compiled active triggers (invalidated on every trigger write)
+_trigger_cache = RuleSetCache()
+
+
+async def load_active_triggers(db) -> CompiledRuleSet:
+    """Triggers actifs compilés, triés par priorité"""
+    ruleset = _trigger_cache.get("active")
+    if ruleset is None:
+        triggers = await db.marketing_triggers.find({"is_active": True}, {"_id": 0}).sort("priority", 1).to_list(100)
+        ruleset = CompiledRuleSet.from_triggers(triggers)
+        _trigger_cache.set("active", ruleset)
+    return ruleset
+
+
+def _triggered_payload(matches) -> List[Dict[str, Any]]:
+    return [
+        {
+            "trigger_id": compiled.rule.get("id"),
+            "name": compiled.rule.get("name_fr"),
+            "action": compiled.rule.get("action"),
+            "action_config": compiled.rule.get("action_config"),
+            "priority": compiled.rule.get("priority")
+        }
+        for compiled in matches
+    ]
+
+
 # ============================================
 # TRIGGERS CRUD
 # ============================================
@@ -168,6 +197,7 @@ async def get_triggers():
         for trigger in DEFAULT_TRIGGERS:
             trigger["created_at"] = datetime.now(timezone.utc).isoformat()
             await db.marketing_triggers.insert_one(trigger.copy())
+        _trigger_cache.invalidate()
     
     triggers = await db.marketing_triggers.find({}).to_list(100)
     
@@ -211,6 +241,7 @@ async def create_trigger(
     }
     
     await db.marketing_triggers.insert_one(trigger)
+    _trigger_cache.invalidate()
     trigger.pop("_id", None)
     
     return {"success": True, "trigger": trigger}
@@ -227,6 +258,7 @@ async def toggle_trigger(trigger_id: str, is_active: bool = Body(..., embed=True
         {"id": trigger_id},
         {"$set": {"is_active": is_active, "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
+    _trigger_cache.invalidate()
     
     if result.modified_count == 0:
         return {"success": False, "error": "Trigger non trouvé"}
@@ -242,6 +274,7 @@ async def delete_trigger(trigger_id: str):
     db = get_db()
     
     result = await db.marketing_triggers.delete_one({"id": trigger_id})
+    _trigger_cache.invalidate()
     
     if result.deleted_count == 0:
         return {"success": False, "error": "Trigger non trouvé"}
@@ -304,42 +337,8 @@ async def check_triggers_for_contact(
     """
     Vérifie quels triggers doivent être déclenchés pour un contact.
     """
-    db = get_db()
-    
-    # Get active triggers sorted by priority
-    triggers = await db.marketing_triggers.find({"is_active": True}).sort("priority", 1).to_list(100)
-    
-    triggered = []
-    
-    for trigger in triggers:
-        # Simple condition matching (can be extended)
-        should_trigger = True
-        condition = trigger.get("condition", {})
-        
-        for key, value in condition.items():
-            contact_value = contact_data.get(key)
-            
-            if isinstance(value, dict):
-                # Handle operators like $gte, $lte
-                if "$gte" in value and (contact_value is None or contact_value < value["$gte"]):
-                    should_trigger = False
-                    break
-                if "$lte" in value and (contact_value is None or contact_value > value["$lte"]):
-                    should_trigger = False
-                    break
-            else:
-                if contact_value != value:
-                    should_trigger = False
-                    break
-        
-        if should_trigger:
-            triggered.append({
-                "trigger_id": trigger.get("id"),
-                "name": trigger.get("name_fr"),
-                "action": trigger.get("action"),
-                "action_config": trigger.get("action_config"),
-                "priority": trigger.get("priority")
-            })
+    ruleset = await load_active_triggers(get_db())
+    triggered = _triggered_payload(ruleset.evaluate(contact_data))
     
     return {
         "success": True,
@@ -348,6 +347,28 @@ async def check_triggers_for_contact(
     }
 
 
+@router.post("/check/batch")
+async def check_triggers_for_contacts(
+    contacts: List[Dict[str, Any]] = Body(..., embed=True, max_length=10000)
+):
+    """
+    Vérifie les triggers pour un lot de contacts en un seul appel.
+    """
+    ruleset = await load_active_triggers(get_db())
+    
+    results = []
+    for i, matches in enumerate(ruleset.evaluate_batch(contacts)):
+        triggered = _triggered_payload(matches)
+        results.append({"index": i, "triggered": triggered, "count": len(triggered)})
+    
+    return {
+        "success": True,
+        "triggers_evaluated": len(ruleset),
+        "contacts_evaluated": len(contacts),
+        "results": results
+    }
+
+
 # ============================================
 # EXECUTION HISTORY
 # ============================================
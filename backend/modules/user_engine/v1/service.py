@@ -12,6 +12,8 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone, timedelta
 from pymongo import MongoClient
 
+from utils.principal_cache import principal_cache
+
 from .models import (
     User, UserProfile, UserPreferences, UserCreate, UserUpdate,
     UserRole, UserStatus, UserSession, UserActivity
@@ -300,6 +302,7 @@ class UserService:
             {"id": user_id},
             {"$set": {"role": new_role.value, "updated_at": datetime.now(timezone.utc)}}
         )
+        principal_cache.invalidate_user(user_id)
         await self.log_activity(user_id, "role_changed", {"new_role": new_role.value})
         return await self.get_user(user_id)
     
@@ -312,6 +315,7 @@ class UserService:
                 "updated_at": datetime.now(timezone.utc)
             }}
         )
+        principal_cache.invalidate_user(user_id)
         
         # Invalidate all sessions
         self.sessions_collection.update_many(
@@ -331,5 +335,6 @@ class UserService:
                 "updated_at": datetime.now(timezone.utc)
             }}
         )
+        principal_cache.invalidate_user(user_id)
         await self.log_activity(user_id, "account_reactivated")
         return await self.get_user(user_id)
@@ -4,7 +4,6 @@ AI Recommendations Service - GPT-5.2 powered hunting recommendations
 import os
 import logging
 from typing import List, Optional, Dict
-from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -37,7 +36,7 @@ class AIRecommendationService:
             )
         
         try:
-            from emergentintegrations.llm.chat import LlmChat, UserMessage
+            from modules.llm_gateway import get_llm_gateway
             
             # Build context
             context = self._build_context(
@@ -50,15 +49,14 @@ Tu fournis des conseils personnalisés basés sur les données de waypoints, la
 Réponds en français, de manière concise et actionnable (max 3 phrases).
 Inclus un conseil tactique spécifique basé sur les conditions."""
             
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"huntiq-recommendation-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                system_message=system_message
-            ).with_model(self.model_provider, self.model_name)
-            
-            user_message = UserMessage(text=context)
-            
-            response = await chat.send_message(user_message)
+            response = await get_llm_gateway().complete(
+                context,
+                system_message=system_message,
+                feature="waypoint_recommendation",
+                provider=self.model_provider,
+                model=self.model_name,
+                api_key=self.api_key
+            )
             logger.info("AI recommendation generated successfully")
             
             return response
@@ -169,7 +167,7 @@ Inclus un conseil tactique spécifique basé sur les conditions."""
             return self._generate_fallback_briefing(waypoints, weather_forecast, target_species)
         
         try:
-            from emergentintegrations.llm.chat import LlmChat, UserMessage
+            from modules.llm_gateway import get_llm_gateway
             
             # Build briefing context
             waypoints_summary = "\n".join([
@@ -191,13 +189,14 @@ Donne-moi un plan d'action pour la journée en 4-5 points clés."""
 Génère un briefing matinal concis et actionnable.
 Utilise des emojis pour structurer. Réponds en français."""
             
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"huntiq-briefing-{datetime.now().strftime('%Y%m%d')}",
-                system_message=system_message
-            ).with_model(self.model_provider, self.model_name)
-            
-            response = await chat.send_message(UserMessage(text=context))
+            response = await get_llm_gateway().complete(
+                context,
+                system_message=system_message,
+                feature="waypoint_briefing",
+                provider=self.model_provider,
+                model=self.model_name,
+                api_key=self.api_key
+            )
             return response
             
         except Exception as e:
@@ -4,31 +4,60 @@ Version: 1.0.0
 
 Provides real-time weather data from OpenWeatherMap API
 with caching, normalization, and error handling.
+
+Acquisition layer:
+- Coordinates are snapped to a grid cell (WEATHER_GRID_STEP degrees);
+  the cell is the cache key and the point actually fetched
+- Size- and TTL-bounded LRU cache (WEATHER_CACHE_SIZE entries)
+- Concurrent requests for the same cell share one upstream fetch
+- get_weather_batch() resolves many points to unique cells first
 """
 
 import os
-import httpx
+import asyncio
 import logging
 import math
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, Any, List, Tuple
-from functools import lru_cache
+
+from utils.performance import LRUCache
 
 from .models import (
     WeatherLocation, WindData, WeatherConditionDetail, PrecipitationData,
     SunData, CurrentWeather, HourlyForecast, DailyForecast,
     DailyTemperature, MoonData, HuntingAnalysis, FullWeatherResponse
 )
+from .providers import WeatherProvider, create_provider
 
 logger = logging.getLogger(__name__)
 
+# Grid cell size in degrees (0.01° ≈ 1.1 km of latitude)
+WEATHER_GRID_STEP = float(os.environ.get("WEATHER_GRID_STEP", "0.01"))
+WEATHER_CACHE_SIZE = int(os.environ.get("WEATHER_CACHE_SIZE", "2000"))
+
+# Upstream fetches running at once for one batch
+BATCH_CONCURRENCY = 8
+
+
+def grid_cell(lat: float, lng: float, step: float = WEATHER_GRID_STEP) -> Tuple[float, float]:
+    """Snap a coordinate to the center of its grid cell"""
+    decimals = max(0, -int(math.floor(math.log10(step)))) + 1
+    return (
+        round(math.floor(lat / step) * step + step / 2, decimals),
+        round(math.floor(lng / step) * step + step / 2, decimals)
+    )
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    """Mark a fetch error as retrieved when every waiter went away"""
+    if not task.cancelled():
+        task.exception()
+
 
 class OpenWeatherMapService:
     """Service for fetching and normalizing OpenWeatherMap data"""
     
     # API Configuration - Using 2.5 API (free tier)
-    BASE_URL = "https://api.openweathermap.org/data/2.5"
-    FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
     ICON_BASE_URL = "https://openweathermap.org/img/wn"
     
     # Cache configuration
@@ -72,36 +101,36 @@ class OpenWeatherMapService:
         ("waning_crescent", "Dernier croissant")
     ]
     
-    def __init__(self):
-        self.api_key = os.environ.get("OPENWEATHERMAP_API_KEY")
-        self._cache: Dict[str, Tuple[datetime, Any]] = {}
-        
-        if not self.api_key:
+    def __init__(self, provider: Optional[WeatherProvider] = None,
+                 cache_size: int = WEATHER_CACHE_SIZE, grid_step: float = WEATHER_GRID_STEP):
+        self.provider = provider or create_provider()
+        self.grid_step = grid_step
+        self._cache = LRUCache(maxsize=cache_size, ttl=self.CACHE_TTL_MINUTES * 60)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_fetches = 0
+        
+        if not os.environ.get("OPENWEATHERMAP_API_KEY") and self.provider.name == "openweathermap":
             logger.warning("OPENWEATHERMAP_API_KEY not configured")
     
     def _get_cache_key(self, lat: float, lng: float) -> str:
-        """Generate cache key from coordinates (rounded to 2 decimals)"""
-        return f"{round(lat, 2)}_{round(lng, 2)}"
-    
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Check if cached data is still valid"""
-        if cache_key not in self._cache:
-            return False
-        
-        cached_time, _ = self._cache[cache_key]
-        return datetime.now(timezone.utc) - cached_time < timedelta(minutes=self.CACHE_TTL_MINUTES)
+        """Generate cache key from the coordinates' grid cell"""
+        cell_lat, cell_lng = grid_cell(lat, lng, self.grid_step)
+        return f"{cell_lat}_{cell_lng}"
     
     def _get_cached(self, cache_key: str) -> Optional[Any]:
         """Get data from cache if valid"""
-        if self._is_cache_valid(cache_key):
-            _, data = self._cache[cache_key]
+        data = self._cache.get(cache_key)
+        if data is not None:
+            self.hits += 1
             logger.debug(f"Cache hit for {cache_key}")
-            return data
-        return None
+        return data
     
     def _set_cache(self, cache_key: str, data: Any) -> None:
-        """Store data in cache"""
-        self._cache[cache_key] = (datetime.now(timezone.utc), data)
+        """Store data in cache (evicts the least recently used cell when full)"""
+        self._cache.set(cache_key, data)
         logger.debug(f"Cached data for {cache_key}")
     
     def _degrees_to_cardinal(self, degrees: int) -> str:
@@ -231,7 +260,7 @@ class OpenWeatherMapService:
         return [f"{morning_start}-{morning_end}", f"{evening_start}-{evening_end}"]
     
     async def get_full_weather(self, lat: float, lng: float) -> FullWeatherResponse:
-        """Get complete weather data with hunting analysis"""
+        """Get complete weather data with hunting analysis for the point's grid cell"""
         cache_key = self._get_cache_key(lat, lng)
         
         # Check cache
@@ -239,68 +268,74 @@ class OpenWeatherMapService:
         if cached:
             return cached
         
-        now = datetime.now(timezone.utc)
-        
-        # Try to fetch real data from OpenWeatherMap 2.5 API
-        current_data = None
-        forecast_data = []
-        api_success = False
-        
-        if self.api_key:
-            try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    # Fetch current weather
-                    current_response = await client.get(
-                        f"{self.BASE_URL}/weather",
-                        params={
-                            "lat": lat,
-                            "lon": lng,
-                            "appid": self.api_key,
-                            "units": "metric",
-                            "lang": "fr"
-                        }
-                    )
-                    
-                    # Fetch 5-day forecast (3-hour intervals)
-                    forecast_response = await client.get(
-                        self.FORECAST_URL,
-                        params={
-                            "lat": lat,
-                            "lon": lng,
-                            "appid": self.api_key,
-                            "units": "metric",
-                            "lang": "fr"
-                        }
-                    )
-                    
-                    if current_response.status_code == 200:
-                        current_data = current_response.json()
-                        api_success = True
-                        logger.info(f"OpenWeatherMap current weather fetched for {lat},{lng}")
-                    else:
-                        logger.warning(f"OpenWeatherMap current API error: {current_response.status_code}")
-                    
-                    if forecast_response.status_code == 200:
-                        forecast_data = forecast_response.json().get("list", [])
-                        logger.info(f"OpenWeatherMap forecast fetched: {len(forecast_data)} entries")
-                    else:
-                        logger.warning(f"OpenWeatherMap forecast API error: {forecast_response.status_code}")
-                        
-            except httpx.RequestError as e:
-                logger.warning(f"OpenWeatherMap request failed, using fallback: {e}")
+        # Join a fetch already running for this cell. The fetch is its own
+        # task so a caller that disconnects does not cancel it for the others
+        task = self._inflight.get(cache_key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch_and_store(cache_key, lat, lng))
+            task.add_done_callback(_consume_exception)
+            self._inflight[cache_key] = task
         else:
-            logger.warning("OpenWeatherMap API key not configured, using simulated data")
+            self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    async def _fetch_and_store(self, cache_key: str, lat: float, lng: float) -> FullWeatherResponse:
+        try:
+            result = await self._fetch_cell(*grid_cell(lat, lng, self.grid_step))
+            self._set_cache(cache_key, result)
+            return result
+        finally:
+            self._inflight.pop(cache_key, None)
+    
+    async def _fetch_cell(self, lat: float, lng: float) -> FullWeatherResponse:
+        """One upstream fetch for a grid cell center, simulated on failure"""
+        now = datetime.now(timezone.utc)
+        self.upstream_fetches += 1
+        current_data, forecast_data = await self.provider.fetch(lat, lng)
         
         # Use real data or generate simulated data
-        if api_success and current_data:
-            result = self._build_response_from_api(lat, lng, current_data, forecast_data, now)
-        else:
-            result = self._build_simulated_response(lat, lng, now)
-        
-        # Store in cache
-        self._set_cache(cache_key, result)
-        
-        return result
+        if current_data:
+            return self._build_response_from_api(lat, lng, current_data, forecast_data, now)
+        return self._build_simulated_response(lat, lng, now)
+    
+    async def get_weather_batch(
+        self, points: List[Tuple[float, float]], concurrency: int = BATCH_CONCURRENCY
+    ) -> List[FullWeatherResponse]:
+        """
+        Weather for many points, in input order. Points are resolved to
+        unique grid cells first, so nearby points cost one fetch.
+        """
+        cells: Dict[str, Tuple[float, float]] = {}
+        for lat, lng in points:
+            cells.setdefault(self._get_cache_key(lat, lng), (lat, lng))
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def resolve(point: Tuple[float, float]) -> FullWeatherResponse:
+            async with semaphore:
+                return await self.get_full_weather(*point)
+        
+        resolved = await asyncio.gather(*(resolve(point) for point in cells.values()))
+        by_cell = dict(zip(cells.keys(), resolved))
+        return [by_cell[self._get_cache_key(lat, lng)] for lat, lng in points]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache and upstream counters"""
+        return {
+            **self._cache.stats(),
+            "provider": self.provider.name,
+            "grid_step": self.grid_step,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_fetches": self.upstream_fetches,
+            "inflight": len(self._inflight)
+        }
+    
+    async def close(self) -> None:
+        """Close the provider's shared HTTP client"""
+        await self.provider.close()
     
     def _build_response_from_api(
         self, lat: float, lng: float, 
@@ -170,3 +170,14 @@ class FullWeatherResponse(BaseModel):
     hunting_analysis: HuntingAnalysis
     cached_at: datetime
     cache_expires: datetime
+
+
+class WeatherPoint(BaseModel):
+    """One coordinate of a batch request"""
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+
+
+class WeatherBatchRequest(BaseModel):
+    """Weather for many points (e.g. every marker of a map screen)"""
+    points: List[WeatherPoint] = Field(min_length=1, max_length=200)
@@ -0,0 +1,151 @@
+"""
+Weather Providers - Upstream data sources
+Version: 1.0.0
+
+A provider turns a coordinate into the raw OpenWeatherMap 2.5 payloads
+(current conditions + 3-hour forecast list). OpenWeatherMapProvider
+keeps one keep-alive httpx client for the whole process; the fake
+provider serves deterministic payloads locally for tests and offline
+development (WEATHER_PROVIDER=fake).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# (current_data, forecast_list); current_data is None when unavailable
+ProviderResult = Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]
+
+
+class WeatherProvider:
+    """Base class for weather data sources"""
+
+    name = "base"
+
+    async def fetch(self, lat: float, lng: float) -> ProviderResult:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class OpenWeatherMapProvider(WeatherProvider):
+    """OpenWeatherMap 2.5 API over one shared keep-alive client"""
+
+    name = "openweathermap"
+
+    BASE_URL = "https://api.openweathermap.org/data/2.5"
+
+    def __init__(self, api_key: Optional[str], timeout: float = 30.0, max_connections: int = 20):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.BASE_URL,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0
+                )
+            )
+        return self._client
+
+    async def fetch(self, lat: float, lng: float) -> ProviderResult:
+        if not self.api_key:
+            logger.warning("OpenWeatherMap API key not configured, using simulated data")
+            return None, []
+
+        params = {"lat": lat, "lon": lng, "appid": self.api_key, "units": "metric", "lang": "fr"}
+        client = self._get_client()
+        try:
+            current_response, forecast_response = await asyncio.gather(
+                client.get("/weather", params=params),
+                client.get("/forecast", params=params)
+            )
+        except httpx.RequestError as e:
+            logger.warning(f"OpenWeatherMap request failed, using fallback: {e}")
+            return None, []
+
+        current_data = None
+        forecast_data: List[Dict[str, Any]] = []
+        if current_response.status_code == 200:
+            current_data = current_response.json()
+            logger.info(f"OpenWeatherMap current weather fetched for {lat},{lng}")
+        else:
+            logger.warning(f"OpenWeatherMap current API error: {current_response.status_code}")
+
+        if forecast_response.status_code == 200:
+            forecast_data = forecast_response.json().get("list", [])
+            logger.info(f"OpenWeatherMap forecast fetched: {len(forecast_data)} entries")
+        else:
+            logger.warning(f"OpenWeatherMap forecast API error: {forecast_response.status_code}")
+
+        return current_data, forecast_data
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class FakeWeatherProvider(WeatherProvider):
+    """
+    Deterministic local provider. Payloads depend only on the coordinate,
+    and every call is recorded so tests can count upstream fetches.
+    """
+
+    name = "fake"
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls: List[Tuple[float, float]] = []
+
+    async def fetch(self, lat: float, lng: float) -> ProviderResult:
+        self.calls.append((lat, lng))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            return None, []
+
+        now = int(time.time())
+        temp = round(5 + (lat % 1) * 10 - (lng % 1) * 5, 1)
+        current = {
+            "name": f"Grid {lat:.2f},{lng:.2f}",
+            "dt": now,
+            "sys": {"country": "CA", "sunrise": now - 6 * 3600, "sunset": now + 4 * 3600},
+            "main": {"temp": temp, "feels_like": temp - 2, "humidity": 70, "pressure": 1018},
+            "wind": {"speed": 3.0, "deg": 225},
+            "visibility": 10000,
+            "clouds": {"all": 40},
+            "weather": [{"main": "Clouds", "description": "nuageux", "icon": "03d"}]
+        }
+        forecast = [
+            {
+                "dt": now + i * 3 * 3600,
+                "main": {"temp": temp + (i % 4) - 2, "feels_like": temp - 2, "humidity": 70, "pressure": 1016},
+                "wind": {"speed": 2.5},
+                "weather": [{"main": "Clouds", "description": "nuageux", "icon": "04d"}],
+                "pop": 0.1
+            }
+            for i in range(16)
+        ]
+        return current, forecast
+
+
+def create_provider() -> WeatherProvider:
+    """Provider selected by WEATHER_PROVIDER (default: openweathermap)"""
+    if os.environ.get("WEATHER_PROVIDER", "openweathermap").lower() == "fake":
+        return FakeWeatherProvider()
+    return OpenWeatherMapProvider(os.environ.get("OPENWEATHERMAP_API_KEY"))
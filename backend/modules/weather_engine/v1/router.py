@@ -12,9 +12,10 @@ from datetime import datetime, timezone
 from .service import WeatherService
 from .models import (
     WeatherCondition, WeatherRequest, 
-    CurrentWeather, HourlyForecast, DailyForecast, FullWeatherResponse
+    CurrentWeather, HourlyForecast, DailyForecast, FullWeatherResponse,
+    WeatherBatchRequest
 )
-from .external_service import get_openweathermap_service
+from .external_service import get_openweathermap_service, grid_cell
 
 router = APIRouter(prefix="/api/v1/weather", tags=["Weather Engine"])
 
@@ -44,7 +45,8 @@ async def weather_engine_info():
             "current": "/api/v1/weather/current?lat=&lng=",
             "hourly": "/api/v1/weather/hourly?lat=&lng=",
             "daily": "/api/v1/weather/daily?lat=&lng=",
-            "full": "/api/v1/weather/full?lat=&lng="
+            "full": "/api/v1/weather/full?lat=&lng=",
+            "batch": "POST /api/v1/weather/batch"
         },
         "optimal_conditions": _service.OPTIMAL_CONDITIONS
     }
@@ -320,3 +322,37 @@ async def get_full_weather(
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Weather service error: {str(e)}")
+
+
+@router.post("/batch")
+async def get_weather_batch(request: WeatherBatchRequest):
+    """
+    Get complete weather data for many points at once.
+    
+    Points are resolved to weather grid cells before fetching: nearby
+    points (same cell) share one upstream call and one cache entry.
+    Results are returned in the order of the request points.
+    """
+    points = [(p.lat, p.lng) for p in request.points]
+    try:
+        results = await _external_service.get_weather_batch(points)
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Weather service error: {str(e)}")
+    
+    return {
+        "success": True,
+        "count": len(results),
+        "unique_cells": len({grid_cell(lat, lng, _external_service.grid_step) for lat, lng in points}),
+        "results": [
+            {"lat": lat, "lng": lng, "weather": result}
+            for (lat, lng), result in zip(points, results)
+        ]
+    }
+
+
+@router.get("/cache/stats")
+async def get_weather_cache_stats():
+    """Weather cache size, hit/miss counters and upstream fetch count"""
+    return {"success": True, "stats": _external_service.stats()}
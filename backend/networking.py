@@ -13,9 +13,12 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Literal
 from datetime import datetime, timezone, timedelta
 import uuid
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 
+logger = logging.getLogger(__name__)
+
 # Router
 router = APIRouter(prefix="/networking", tags=["Networking"])
 
@@ -41,6 +44,20 @@ except ImportError:
     NOTIFICATIONS_ENABLED = False
     print("Notifications module not available for networking")
 
+# Admin metrics snapshot (write hooks)
+from modules.admin_engine.services.metrics_admin import MetricsAdminService, transition
+
+# Keyset paging, fan-out timelines and likes
+import networking_feed as feed
+
+# Atomic wallet ledger (conditional debits, idempotent transfers)
+import networking_wallet as ledger
+
+
+async def _record_metrics(changes: dict):
+    """Répercuter une écriture sur le snapshot des métriques admin"""
+    await MetricsAdminService.record(db, changes)
+
 # ============================================
 # MODELS - Content Sharing
 # ============================================
@@ -244,10 +261,15 @@ async def get_posts(
     visibility: Optional[str] = None,
     tag: Optional[str] = None,
     species: Optional[str] = None,
-    limit: int = 20,
+    limit: int = Query(20, ge=1, le=feed.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     offset: int = 0
 ):
-    """Get content posts with filters"""
+    """
+    Get content posts with filters, newest first.
+    Pass next_cursor back as `cursor` for the following page; `offset`
+    (with its total count) is kept for older clients only.
+    """
     query = {}
     if user_id:
         query["author_id"] = user_id
@@ -258,10 +280,30 @@ async def get_posts(
     if species:
         query["species"] = species
     
-    posts = await db.content_posts.find(query, {"_id": 0}).sort("created_at", -1).skip(offset).limit(limit).to_list(limit)
-    total = await db.content_posts.count_documents(query)
+    if offset and not cursor:
+        posts = await db.content_posts.find(query, {"_id": 0}).sort("created_at", -1).skip(offset).limit(limit).to_list(limit)
+        total = await db.content_posts.count_documents(query)
+        return {"posts": posts, "total": total, "limit": limit, "offset": offset}
+    
+    try:
+        posts, next_cursor = await feed.fetch_posts_page(db, query, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    return {"posts": posts, "total": total, "limit": limit, "offset": offset}
+    return {"posts": posts, "limit": limit, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+
+@router.get("/feed/{user_id}")
+async def get_home_feed(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=feed.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Home timeline: own posts plus posts fanned out from contacts and groups"""
+    try:
+        posts, next_cursor = await feed.fetch_timeline(db, feed.user_feed(user_id), limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"posts": posts, "next_cursor": next_cursor, "has_more": next_cursor is not None}
 
 @router.get("/posts/{post_id}")
 async def get_post(post_id: str):
@@ -285,9 +327,10 @@ async def create_post(
     tags: List[str] = [],
     location: Optional[str] = None,
     species: Optional[str] = None,
-    visibility: str = "public"
+    visibility: str = "public",
+    allowed_groups: List[str] = []
 ):
-    """Create a new post"""
+    """Create a new post and write it to its audience's timelines"""
     post = ContentPost(
         author_id=author_id,
         author_name=author_name,
@@ -298,13 +341,21 @@ async def create_post(
         tags=tags,
         location=location,
         species=species,
-        visibility=visibility
+        visibility=visibility,
+        allowed_groups=allowed_groups
     )
     
     doc = post.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.content_posts.insert_one(doc)
+    await _record_metrics({"networking.posts.total": 1, "networking.posts.this_week": 1})
+    
+    try:
+        await feed.fan_out_post(db, doc)
+    except Exception as e:
+        # The post stays reachable through /posts
+        logger.warning(f"Timeline fan-out failed for post {post.id}: {e}")
     
     # Remove MongoDB _id before returning
     doc.pop('_id', None)
@@ -344,6 +395,12 @@ async def delete_post(post_id: str, author_id: str):
     await db.content_posts.delete_one({"id": post_id})
     await db.content_comments.delete_many({"post_id": post_id})
     await db.content_likes.delete_many({"target_id": post_id})
+    await feed.remove_post(db, post_id)
+    
+    changes = {"networking.posts.total": -1}
+    if post.get("created_at", "") >= (datetime.now(timezone.utc) - timedelta(days=7)).isoformat():
+        changes["networking.posts.this_week"] = -1
+    await _record_metrics(changes)
     
     return {"success": True}
 
@@ -403,43 +460,40 @@ async def delete_comment(comment_id: str, author_id: str):
 # LIKES ENDPOINTS
 # ============================================
 
+async def _notify_like(user_id: str, user_name: str, target_type: str, target_id: str, target: Optional[dict]):
+    if NOTIFICATIONS_ENABLED and target_type == "post" and target and target.get("author_id") != user_id:
+        await notify_post_liked(
+            target["author_id"],
+            user_name,
+            user_id,
+            target_id,
+            target.get("title")
+        )
+
 @router.post("/like")
 async def toggle_like(user_id: str, user_name: str = "Utilisateur", target_type: str = "post", target_id: str = ""):
-    """Toggle like on post or comment"""
-    existing = await db.content_likes.find_one({
-        "user_id": user_id,
-        "target_type": target_type,
-        "target_id": target_id
-    })
-    
-    if existing:
-        # Unlike
-        await db.content_likes.delete_one({"id": existing["id"]})
-        collection = "content_posts" if target_type == "post" else "content_comments"
-        await db[collection].update_one({"id": target_id}, {"$inc": {"likes_count": -1}})
-        return {"success": True, "action": "unliked"}
-    else:
-        # Like
-        like = ContentLike(user_id=user_id, target_type=target_type, target_id=target_id)
-        doc = like.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        await db.content_likes.insert_one(doc)
-        collection = "content_posts" if target_type == "post" else "content_comments"
-        await db[collection].update_one({"id": target_id}, {"$inc": {"likes_count": 1}})
-        
-        # Send notification to content owner
-        if NOTIFICATIONS_ENABLED and target_type == "post":
-            post = await db.content_posts.find_one({"id": target_id}, {"_id": 0})
-            if post and post.get("author_id") != user_id:
-                await notify_post_liked(
-                    post["author_id"],
-                    user_name,
-                    user_id,
-                    target_id,
-                    post.get("title")
-                )
-        
+    """Toggle like on post or comment (like = one upsert on the unique like key)"""
+    created, target = await feed.add_like(db, user_id, target_type, target_id)
+    if created:
+        await _notify_like(user_id, user_name, target_type, target_id, target)
         return {"success": True, "action": "liked"}
+    
+    await feed.remove_like(db, user_id, target_type, target_id)
+    return {"success": True, "action": "unliked"}
+
+@router.put("/like")
+async def set_like(user_id: str, user_name: str = "Utilisateur", target_type: str = "post", target_id: str = ""):
+    """Like a post or comment (idempotent)"""
+    created, target = await feed.add_like(db, user_id, target_type, target_id)
+    if created:
+        await _notify_like(user_id, user_name, target_type, target_id, target)
+    return {"success": True, "action": "liked", "changed": created}
+
+@router.delete("/like")
+async def unset_like(user_id: str, target_type: str = "post", target_id: str = ""):
+    """Remove a like (idempotent)"""
+    removed = await feed.remove_like(db, user_id, target_type, target_id)
+    return {"success": True, "action": "unliked", "changed": removed}
 
 @router.get("/likes/{target_type}/{target_id}")
 async def get_likes(target_type: str, target_id: str):
@@ -516,6 +570,7 @@ async def create_lead(
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.leads.insert_one(doc)
+    await _record_metrics({"networking.leads.total": 1, f"networking.leads.by_status.{doc['status']}": 1})
     
     # Remove MongoDB _id before returning
     doc.pop('_id', None)
@@ -562,6 +617,8 @@ async def update_lead(
     
     if update_data:
         await db.leads.update_one({"id": lead_id}, {"$set": update_data})
+        if status:
+            await _record_metrics(transition("networking.leads.by_status", lead.get("status"), status))
     
     return {"success": True}
 
@@ -590,9 +647,12 @@ async def add_lead_note(lead_id: str, owner_id: str, note: str):
 @router.delete("/leads/{lead_id}")
 async def delete_lead(lead_id: str, owner_id: str):
     """Delete a lead"""
-    result = await db.leads.delete_one({"id": lead_id, "owner_id": owner_id})
-    if result.deleted_count == 0:
+    lead = await db.leads.find_one_and_delete({"id": lead_id, "owner_id": owner_id}, {"status": 1})
+    if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
+    changes = {"networking.leads.total": -1}
+    changes.update(transition("networking.leads.by_status", lead.get("status"), None))
+    await _record_metrics(changes)
     return {"success": True}
 
 # ============================================
@@ -651,6 +711,7 @@ async def create_contact(
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.contacts.insert_one(doc)
+    await _record_metrics({"networking.contacts.total": 1})
     
     # Remove MongoDB _id before returning
     doc.pop('_id', None)
@@ -707,6 +768,7 @@ async def delete_contact(contact_id: str, owner_id: str):
     result = await db.contacts.delete_one({"id": contact_id, "owner_id": owner_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Contact not found")
+    await _record_metrics({"networking.contacts.total": -1})
     return {"success": True}
 
 # ============================================
@@ -742,6 +804,19 @@ async def get_group(group_id: str):
     
     return {"group": group, "members": members}
 
+@router.get("/groups/{group_id}/feed")
+async def get_group_feed(
+    group_id: str,
+    limit: int = Query(20, ge=1, le=feed.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Posts shared with a group, newest first"""
+    try:
+        posts, next_cursor = await feed.fetch_timeline(db, feed.group_feed(group_id), limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"posts": posts, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+
 @router.post("/groups")
 async def create_group(
     owner_id: str,
@@ -767,6 +842,11 @@ async def create_group(
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.groups.insert_one(doc)
+    await _record_metrics({
+        "networking.groups.total": 1,
+        "networking.groups.active": 1,
+        f"networking.groups.by_type.{group_type}": 1
+    })
     
     # Add owner as member
     membership = GroupMembership(
@@ -859,6 +939,12 @@ async def delete_group(group_id: str, owner_id: str):
     await db.groups.delete_one({"id": group_id})
     await db.group_memberships.delete_many({"group_id": group_id})
     
+    changes = {"networking.groups.total": -1}
+    changes.update(transition("networking.groups.by_type", group.get("group_type"), None))
+    if group.get("is_active"):
+        changes["networking.groups.active"] = -1
+    await _record_metrics(changes)
+    
     return {"success": True}
 
 # ============================================
@@ -932,6 +1018,7 @@ async def use_referral_code(referee_id: str, code: str, action_type: str = "sign
     doc = referral.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.referrals.insert_one(doc)
+    await _record_metrics({"networking.referrals.total": 1, "networking.referrals.by_status.pending": 1})
     
     # Update code uses count
     await db.referral_codes.update_one({"code": code}, {"$inc": {"uses_count": 1}})
@@ -942,6 +1029,26 @@ async def use_referral_code(referee_id: str, code: str, action_type: str = "sign
     
     return {"success": True, "referral_id": referral.id}
 
+async def _record_settlement(summary: dict):
+    """Metrics and notifications for a referral settlement"""
+    settled = summary["settled"]
+    if not settled:
+        return
+    rewards = summary["total_rewards"]
+    await _record_metrics({
+        "networking.referrals.by_status.pending": -settled,
+        "networking.referrals.by_status.rewarded": settled,
+        "networking.referrals.rewards_distributed": rewards,
+        "networking.wallets.total": summary["created_wallets"],
+        "networking.wallets.total_credits": rewards,
+        "networking.wallets.total_earned": rewards
+    })
+    
+    if NOTIFICATIONS_ENABLED:
+        for referral in summary["referrals"]:
+            await notify_referral_rewarded(referral["referrer_id"], referral["referrer_reward_amount"], is_referrer=True)
+            await notify_referral_rewarded(referral["referee_id"], referral["referee_reward_amount"], is_referrer=False)
+
 @router.post("/referral/{referral_id}/verify")
 async def verify_referral(referral_id: str):
     """Verify and reward a referral (admin or system)"""
@@ -952,28 +1059,43 @@ async def verify_referral(referral_id: str):
     if referral["status"] != "pending":
         raise HTTPException(status_code=400, detail="Referral already processed")
     
-    now = datetime.now(timezone.utc).isoformat()
-    
-    # Update referral status
-    await db.referrals.update_one(
-        {"id": referral_id},
-        {"$set": {"status": "rewarded", "verified_at": now, "rewarded_at": now}}
+    # Fixed settlement id: a retried verification resumes instead of paying twice
+    summary = await ledger.settle_referrals(
+        db, _new_wallet_doc, [referral_id], settlement_id=f"referral_{referral_id}"
     )
-    
-    # Add rewards to wallets
-    for user_id, amount, desc in [
-        (referral["referrer_id"], referral["referrer_reward_amount"], "Bonus de parrainage"),
-        (referral["referee_id"], referral["referee_reward_amount"], "Bonus de bienvenue")
-    ]:
-        await _add_wallet_credits(user_id, amount, "referral_bonus", referral_id, desc)
-    
-    # Notify both users
-    if NOTIFICATIONS_ENABLED:
-        await notify_referral_rewarded(referral["referrer_id"], referral["referrer_reward_amount"], is_referrer=True)
-        await notify_referral_rewarded(referral["referee_id"], referral["referee_reward_amount"], is_referrer=False)
+    if not summary["settled"]:
+        raise HTTPException(status_code=400, detail="Referral already processed")
+    await _record_settlement(summary)
     
     return {"success": True}
 
+@router.post("/admin/referrals/settle")
+async def settle_pending_referrals(
+    referral_ids: Optional[List[str]] = Query(None),
+    settlement_id: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=ledger.MAX_SETTLEMENT_SIZE)
+):
+    """
+    Pay pending referrals in one batch (the given ids, or the oldest
+    `limit`). Pass the returned settlement_id again to resume an
+    interrupted settlement; settlements interrupted before their id
+    reached the caller are resumed first.
+    """
+    for resumed in await ledger.resume_stale_settlements(db, _new_wallet_doc):
+        await _record_settlement(resumed)
+    
+    summary = await ledger.settle_referrals(
+        db, _new_wallet_doc, referral_ids, settlement_id=settlement_id, limit=limit
+    )
+    await _record_settlement(summary)
+    return {
+        "success": True,
+        "settlement_id": summary["settlement_id"],
+        "settled": summary["settled"],
+        "total_rewards": summary["total_rewards"],
+        "wallets_credited": summary["wallets_credited"]
+    }
+
 @router.get("/referrals/{user_id}")
 async def get_user_referrals(user_id: str):
     """Get referrals made by a user"""
@@ -984,53 +1106,18 @@ async def get_user_referrals(user_id: str):
 # WALLET ENDPOINTS
 # ============================================
 
+def _new_wallet_doc(user_id: str) -> dict:
+    doc = Wallet(user_id=user_id).model_dump()
+    doc['created_at'] = doc['created_at'].isoformat()
+    return doc
+
 async def _get_or_create_wallet(user_id: str) -> dict:
-    """Get or create wallet for user"""
-    wallet = await db.wallets.find_one({"user_id": user_id}, {"_id": 0})
-    if not wallet:
-        new_wallet = Wallet(user_id=user_id)
-        doc = new_wallet.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        await db.wallets.insert_one(doc)
-        # Remove MongoDB _id before returning
-        doc.pop('_id', None)
-        wallet = doc
+    """Get or create wallet for user (single upsert, safe under concurrency)"""
+    wallet, created = await ledger.ensure_wallet(db, user_id, _new_wallet_doc)
+    if created:
+        await _record_metrics({"networking.wallets.total": 1})
     return wallet
 
-async def _add_wallet_credits(user_id: str, amount: float, tx_type: str, reference_id: str, description: str):
-    """Add credits to wallet"""
-    wallet = await _get_or_create_wallet(user_id)
-    
-    balance_before = wallet.get("balance_credits", 0)
-    balance_after = balance_before + amount
-    
-    # Create transaction
-    tx = WalletTransaction(
-        wallet_id=wallet["id"],
-        user_id=user_id,
-        transaction_type="reward",
-        amount=amount,
-        currency="credits",
-        balance_before=balance_before,
-        balance_after=balance_after,
-        reference_type=tx_type,
-        reference_id=reference_id,
-        description=description
-    )
-    
-    tx_doc = tx.model_dump()
-    tx_doc['created_at'] = tx_doc['created_at'].isoformat()
-    await db.wallet_transactions.insert_one(tx_doc)
-    
-    # Update wallet
-    await db.wallets.update_one(
-        {"user_id": user_id},
-        {
-            "$set": {"balance_credits": balance_after, "updated_at": datetime.now(timezone.utc).isoformat()},
-            "$inc": {"total_earned": amount}
-        }
-    )
-
 @router.get("/wallet/{user_id}")
 async def get_wallet(user_id: str):
     """Get wallet for a user"""
@@ -1057,70 +1144,37 @@ async def get_wallet_transactions(
     return {"transactions": transactions, "total": total}
 
 @router.post("/wallet/transfer")
-async def transfer_credits(from_user_id: str, to_user_id: str, amount: float, description: str = "Transfer"):
-    """Transfer credits between users"""
-    if amount <= 0:
-        raise HTTPException(status_code=400, detail="Amount must be positive")
-    
-    from_wallet = await _get_or_create_wallet(from_user_id)
-    if from_wallet.get("balance_credits", 0) < amount:
-        raise HTTPException(status_code=400, detail="Insufficient balance")
-    
-    to_wallet = await _get_or_create_wallet(to_user_id)
-    
-    now = datetime.now(timezone.utc).isoformat()
-    
-    # Debit from sender
-    from_balance_before = from_wallet.get("balance_credits", 0)
-    from_balance_after = from_balance_before - amount
-    
-    tx_out = WalletTransaction(
-        wallet_id=from_wallet["id"],
-        user_id=from_user_id,
-        transaction_type="transfer_out",
-        amount=-amount,
-        currency="credits",
-        balance_before=from_balance_before,
-        balance_after=from_balance_after,
-        reference_type="transfer",
-        reference_id=to_user_id,
-        description=f"Transfert vers utilisateur: {description}"
-    )
-    tx_out_doc = tx_out.model_dump()
-    tx_out_doc['created_at'] = now
-    await db.wallet_transactions.insert_one(tx_out_doc)
-    
-    await db.wallets.update_one(
-        {"user_id": from_user_id},
-        {"$set": {"balance_credits": from_balance_after, "updated_at": now}, "$inc": {"total_spent": amount}}
-    )
-    
-    # Credit to receiver
-    to_balance_before = to_wallet.get("balance_credits", 0)
-    to_balance_after = to_balance_before + amount
-    
-    tx_in = WalletTransaction(
-        wallet_id=to_wallet["id"],
-        user_id=to_user_id,
-        transaction_type="transfer_in",
-        amount=amount,
-        currency="credits",
-        balance_before=to_balance_before,
-        balance_after=to_balance_after,
-        reference_type="transfer",
-        reference_id=from_user_id,
-        description=f"Transfert reçu: {description}"
-    )
-    tx_in_doc = tx_in.model_dump()
-    tx_in_doc['created_at'] = now
-    await db.wallet_transactions.insert_one(tx_in_doc)
-    
-    await db.wallets.update_one(
-        {"user_id": to_user_id},
-        {"$set": {"balance_credits": to_balance_after, "updated_at": now}, "$inc": {"total_earned": amount}}
-    )
-    
-    return {"success": True, "from_balance": from_balance_after, "to_balance": to_balance_after}
+async def transfer_credits(
+    from_user_id: str,
+    to_user_id: str,
+    amount: float,
+    description: str = "Transfer",
+    transfer_id: Optional[str] = None
+):
+    """
+    Transfer credits between users. The debit only applies if the balance
+    covers it; retrying with the same transfer_id never moves credits twice.
+    """
+    try:
+        result = await ledger.transfer(
+            db, transfer_id or str(uuid.uuid4()), from_user_id, to_user_id, amount, description, _new_wallet_doc
+        )
+    except ledger.TransferError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    if not result["replayed"]:
+        # Transfert: crédits en circulation inchangés
+        await _record_metrics({
+            "networking.wallets.total_earned": amount,
+            "networking.wallets.total": int(result["created_wallet"])
+        })
+    
+    return {
+        "success": True,
+        "transfer_id": result["transfer_id"],
+        "from_balance": result["from_balance"],
+        "to_balance": result["to_balance"]
+    }
 
 # ============================================
 # ADMIN ENDPOINTS
@@ -1128,42 +1182,39 @@ async def transfer_credits(from_user_id: str, to_user_id: str, amount: float, de
 
 @router.get("/admin/stats")
 async def get_networking_stats():
-    """Get networking ecosystem stats for admin"""
-    stats = {
+    """Get networking ecosystem stats for admin (materialized snapshot)"""
+    metrics, freshness = await MetricsAdminService.get_section(db, "networking")
+    leads_by_status = metrics["leads"]["by_status"]
+    referrals_by_status = metrics["referrals"]["by_status"]
+    
+    return {
         "posts": {
-            "total": await db.content_posts.count_documents({}),
-            "this_week": await db.content_posts.count_documents({
-                "created_at": {"$gte": (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()}
-            })
+            "total": metrics["posts"]["total"],
+            "this_week": metrics["posts"]["this_week"]
         },
         "leads": {
-            "total": await db.leads.count_documents({}),
-            "new": await db.leads.count_documents({"status": "new"}),
-            "converted": await db.leads.count_documents({"status": "converted"})
+            "total": metrics["leads"]["total"],
+            "new": leads_by_status.get("new", 0),
+            "converted": leads_by_status.get("converted", 0)
         },
         "contacts": {
-            "total": await db.contacts.count_documents({})
+            "total": metrics["contacts"]["total"]
         },
         "groups": {
-            "total": await db.groups.count_documents({}),
-            "active": await db.groups.count_documents({"is_active": True})
+            "total": metrics["groups"]["total"],
+            "active": metrics["groups"]["active"]
         },
         "referrals": {
-            "total": await db.referrals.count_documents({}),
-            "pending": await db.referrals.count_documents({"status": "pending"}),
-            "rewarded": await db.referrals.count_documents({"status": "rewarded"})
+            "total": metrics["referrals"]["total"],
+            "pending": referrals_by_status.get("pending", 0),
+            "rewarded": referrals_by_status.get("rewarded", 0)
         },
         "wallets": {
-            "total": await db.wallets.count_documents({}),
-            "total_credits": 0  # Will calculate below
-        }
+            "total": metrics["wallets"]["total"],
+            "total_credits": metrics["wallets"]["total_credits"]
+        },
+        "freshness": freshness
     }
-    
-    # Calculate total credits in circulation
-    wallets = await db.wallets.find({}, {"balance_credits": 1, "_id": 0}).to_list(10000)
-    stats["wallets"]["total_credits"] = sum(w.get("balance_credits", 0) for w in wallets)
-    
-    return stats
 
 @router.get("/admin/pending-referrals")
 async def get_pending_referrals():
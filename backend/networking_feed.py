@@ -0,0 +1,334 @@
+"""
+Networking Feed
+- Keyset pagination on (created_at, id) for posts and timelines instead
+  of skip/offset + count_documents on every page
+- Fan-out on write: create_post writes one feed_timelines entry per
+  audience (author, allowed groups and their members, linked contacts),
+  so reading a home or group feed is one indexed range scan
+- Likes keyed by a unique (user_id, target_type, target_id) index: liking
+  is a single upsert, and counters only move when a like really changed
+- Posts written before timelines existed are fanned out by a one-time
+  backfill, started in the background by the first timeline read
+
+Timeline entries hold only ids and sort keys; posts are loaded by id when
+a page is served, so edits never need to touch the timelines.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, List, Tuple
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+TIMELINES_COLLECTION = "feed_timelines"
+
+MAX_PAGE_SIZE = 100
+
+# Above this audience size the post is only reachable through /posts
+MAX_FANOUT = 5000
+
+FANOUT_CHUNK = 1000
+
+# Marker document: posts written before fan-out have their timeline entries
+BACKFILL_MARKER = "__backfill__"
+
+BACKFILL_BATCH = 500
+
+_indexes_ready = False
+_indexes_lock = asyncio.Lock()
+
+_backfill_done = False
+_backfill_task: Optional[asyncio.Task] = None
+
+
+async def ensure_feed_indexes(db):
+    """Feed, timeline and like indexes (created once per process)"""
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    async with _indexes_lock:
+        if _indexes_ready:
+            return
+        await db.content_posts.create_index([("created_at", -1), ("id", -1)])
+        await db.content_posts.create_index([("author_id", 1), ("created_at", -1), ("id", -1)])
+        # A post's created_at never changes, so this also makes (feed, post_id) unique
+        await db[TIMELINES_COLLECTION].create_index(
+            [("feed", 1), ("created_at", -1), ("post_id", -1)], unique=True
+        )
+        await db[TIMELINES_COLLECTION].create_index("post_id")
+        await db.contacts.create_index("contact_user_id", sparse=True)
+        try:
+            await db.content_likes.create_index(
+                [("user_id", 1), ("target_type", 1), ("target_id", 1)], unique=True
+            )
+        except OperationFailure as e:
+            # Duplicate likes from before the index: upserts still work, only the race guard is missing
+            logger.warning(f"content_likes unique index not created: {e}")
+        await db.content_likes.create_index([("target_type", 1), ("target_id", 1)])
+        _indexes_ready = True
+
+
+# ============================================
+# CURSORS
+# ============================================
+
+def encode_cursor(created_at: str, doc_id: str) -> str:
+    raw = json.dumps([created_at, doc_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Raises ValueError on a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), str(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_query(query: dict, cursor: Optional[str], id_field: str = "id") -> dict:
+    """Add the "strictly older than the cursor" condition to a query"""
+    if not cursor:
+        return query
+    created_at, doc_id = decode_cursor(cursor)
+    after = {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, id_field: {"$lt": doc_id}}
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+def _clamp(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+async def fetch_posts_page(
+    db, query: dict, limit: int = 20, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of content_posts, newest first. Returns (posts, next_cursor)"""
+    await ensure_feed_indexes(db)
+    limit = _clamp(limit)
+    posts = await db.content_posts.find(
+        keyset_query(query, cursor), {"_id": 0}
+    ).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(posts) > limit:
+        next_cursor = encode_cursor(posts[limit - 1]["created_at"], posts[limit - 1]["id"])
+    return posts[:limit], next_cursor
+
+
+# ============================================
+# TIMELINES (FAN-OUT ON WRITE)
+# ============================================
+
+def user_feed(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def group_feed(group_id: str) -> str:
+    return f"group:{group_id}"
+
+
+async def _audience(db, post: dict) -> List[str]:
+    """Timelines that receive a post, author first"""
+    author_id = post["author_id"]
+    feeds = [user_feed(author_id)]
+    visibility = post.get("visibility", "public")
+
+    if visibility == "groups":
+        group_ids = post.get("allowed_groups") or []
+        groups = await db.groups.find(
+            {"id": {"$in": group_ids}}, {"_id": 0, "id": 1, "member_ids": 1}
+        ).to_list(len(group_ids))
+        for group in groups:
+            feeds.append(group_feed(group["id"]))
+            feeds.extend(user_feed(m) for m in group.get("member_ids", []))
+    elif visibility in ("public", "contacts"):
+        # The author's linked contacts
+        contacts = await db.contacts.find(
+            {"owner_id": author_id, "contact_user_id": {"$ne": None}},
+            {"_id": 0, "contact_user_id": 1}
+        ).to_list(MAX_FANOUT)
+        feeds.extend(user_feed(c["contact_user_id"]) for c in contacts)
+        if visibility == "public":
+            # Users who saved the author as a contact
+            followers = await db.contacts.find(
+                {"contact_user_id": author_id}, {"_id": 0, "owner_id": 1}
+            ).to_list(MAX_FANOUT)
+            feeds.extend(user_feed(c["owner_id"]) for c in followers)
+
+    return list(dict.fromkeys(feeds))
+
+
+async def fan_out_post(db, post: dict) -> int:
+    """Write the post's timeline entries. Returns the number of timelines"""
+    await ensure_feed_indexes(db)
+    feeds = await _audience(db, post)
+    if len(feeds) > MAX_FANOUT:
+        logger.warning(f"Post {post['id']} audience of {len(feeds)} truncated to {MAX_FANOUT}")
+        feeds = feeds[:MAX_FANOUT]
+
+    entries = [
+        {"feed": feed, "post_id": post["id"], "created_at": post["created_at"], "author_id": post["author_id"]}
+        for feed in feeds
+    ]
+    for start in range(0, len(entries), FANOUT_CHUNK):
+        try:
+            await db[TIMELINES_COLLECTION].insert_many(entries[start:start + FANOUT_CHUNK], ordered=False)
+        except BulkWriteError as e:
+            # Replayed fan-out: entries already present are skipped by the unique index
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+    return len(entries)
+
+
+async def remove_post(db, post_id: str):
+    """Drop a deleted post from every timeline"""
+    await db[TIMELINES_COLLECTION].delete_many({"post_id": post_id})
+
+
+async def fetch_timeline(
+    db, feed: str, limit: int = 20, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of a timeline, newest first. Returns (posts, next_cursor)"""
+    await ensure_feed_indexes(db)
+    request_backfill(db)
+    limit = _clamp(limit)
+    entries = await db[TIMELINES_COLLECTION].find(
+        keyset_query({"feed": feed}, cursor, id_field="post_id"), {"_id": 0, "post_id": 1, "created_at": 1}
+    ).sort([("created_at", -1), ("post_id", -1)]).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(entries) > limit:
+        next_cursor = encode_cursor(entries[limit - 1]["created_at"], entries[limit - 1]["post_id"])
+    entries = entries[:limit]
+
+    ids = [e["post_id"] for e in entries]
+    posts = await db.content_posts.find({"id": {"$in": ids}}, {"_id": 0}).to_list(len(ids))
+    by_id = {p["id"]: p for p in posts}
+    return [by_id[i] for i in ids if i in by_id], next_cursor
+
+
+async def backfill_timelines(db, batch_size: int = BACKFILL_BATCH) -> int:
+    """
+    Fan out every post created before the backfill started. Runs once per
+    database; progress is saved after each batch so an interrupted pass
+    resumes where it stopped. Returns the number of posts fanned out.
+    """
+    global _backfill_done
+    await ensure_feed_indexes(db)
+    timelines = db[TIMELINES_COLLECTION]
+    marker = await timelines.find_one({"_id": BACKFILL_MARKER}) or {}
+    if marker.get("done_at"):
+        _backfill_done = True
+        return 0
+
+    # Later posts are fanned out by create_post
+    cutoff = marker.get("cutoff") or datetime.now(timezone.utc).isoformat()
+    after = marker.get("after")
+    fanned_out = 0
+    while True:
+        query = {"created_at": {"$lte": cutoff}, "author_id": {"$type": "string"}}
+        if after:
+            query = {"$and": [query, {"$or": [
+                {"created_at": {"$gt": after[0]}},
+                {"created_at": after[0], "id": {"$gt": after[1]}}
+            ]}]}
+        posts = await db.content_posts.find(
+            query, {"_id": 0, "id": 1, "author_id": 1, "created_at": 1, "visibility": 1, "allowed_groups": 1}
+        ).sort([("created_at", 1), ("id", 1)]).limit(batch_size).to_list(batch_size)
+        if not posts:
+            break
+        for post in posts:
+            await fan_out_post(db, post)
+        fanned_out += len(posts)
+        after = [posts[-1]["created_at"], posts[-1]["id"]]
+        await timelines.update_one(
+            {"_id": BACKFILL_MARKER}, {"$set": {"cutoff": cutoff, "after": after}}, upsert=True
+        )
+
+    await timelines.update_one(
+        {"_id": BACKFILL_MARKER},
+        {"$set": {"cutoff": cutoff, "done_at": datetime.now(timezone.utc).isoformat()}},
+        upsert=True
+    )
+    if fanned_out:
+        logger.info(f"Backfilled timelines for {fanned_out} posts")
+    _backfill_done = True
+    return fanned_out
+
+
+def request_backfill(db):
+    """Start backfill_timelines in the background unless it is done or running"""
+    global _backfill_task
+    if _backfill_done or (_backfill_task is not None and not _backfill_task.done()):
+        return
+
+    async def run():
+        try:
+            await backfill_timelines(db)
+        except Exception as e:
+            # Retried by the next timeline read, from the saved progress
+            logger.error(f"Timeline backfill failed: {e}")
+
+    _backfill_task = asyncio.create_task(run())
+
+
+# ============================================
+# LIKES
+# ============================================
+
+def _like_target_collection(target_type: str) -> str:
+    return "content_posts" if target_type == "post" else "content_comments"
+
+
+async def add_like(db, user_id: str, target_type: str, target_id: str) -> Tuple[bool, Optional[dict]]:
+    """
+    Idempotent like. One upsert on the unique key; the target counter is
+    bumped only when the like was created. Returns (created, target) where
+    target holds author_id/title for the notification.
+    """
+    await ensure_feed_indexes(db)
+    key = {"user_id": user_id, "target_type": target_type, "target_id": target_id}
+    try:
+        result = await db.content_likes.update_one(
+            key,
+            {"$setOnInsert": {
+                "id": str(uuid.uuid4()),
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Concurrent like by the same user won the race
+        return False, None
+    if result.upserted_id is None:
+        return False, None
+
+    target = await db[_like_target_collection(target_type)].find_one_and_update(
+        {"id": target_id},
+        {"$inc": {"likes_count": 1}},
+        projection={"_id": 0, "author_id": 1, "title": 1}
+    )
+    return True, target
+
+
+async def remove_like(db, user_id: str, target_type: str, target_id: str) -> bool:
+    """Idempotent unlike. Returns True if a like was removed"""
+    result = await db.content_likes.delete_one(
+        {"user_id": user_id, "target_type": target_type, "target_id": target_id}
+    )
+    if not result.deleted_count:
+        return False
+    await db[_like_target_collection(target_type)].update_one(
+        {"id": target_id}, {"$inc": {"likes_count": -1}}
+    )
+    return True
@@ -0,0 +1,566 @@
+"""
+Wallet Ledger
+- Debits are one conditional $inc (balance_credits >= amount): concurrent
+  transfers can never spend the same credits twice, and no
+  read-modify-write can lose an update
+- Credits are one upserting $inc; the wallet is created by its first credit
+- Transfers are idempotent under a transfer id (wallet_transfers._id) and
+  both legs are written to wallet_transactions under a unique
+  (transfer_id, leg) key
+- On a replica set the whole transfer runs in one multi-document
+  transaction. On a standalone server every step is individually atomic
+  and marked on the wallet (pending_transfers), so replaying the same
+  transfer id finishes a half-applied transfer without applying a leg twice
+- A transfer or settlement is applied by one attempt at a time: its record
+  is claimed (status "applying" + owner token, re-checked before each
+  step) and wallet markers are only released by the owner that completed
+  it. A claim left by a crashed attempt expires after CLAIM_TTL
+- settle_referrals() pays a batch of referrals: one claim, concurrent
+  per-wallet credits, one insert_many of legs, one status update;
+  resume_stale_settlements() finishes settlements nobody can resume by id
+
+Callers keep their own metrics hooks; results report what changed.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List, Dict, Callable, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+TRANSFERS_COLLECTION = "wallet_transfers"
+
+SETTLEMENTS_COLLECTION = "wallet_settlements"
+
+# Seconds after which another attempt may take over an "applying" record
+CLAIM_TTL = 60
+
+# Concurrent wallet credits during a settlement
+SETTLEMENT_CONCURRENCY = 16
+
+MAX_SETTLEMENT_SIZE = 1000
+
+# Wallet document for a new user (without _id)
+WalletFactory = Callable[[str], dict]
+
+_indexes_ready = False
+_indexes_lock = asyncio.Lock()
+
+# None until the first transaction attempt tells us
+_transactions_supported: Optional[bool] = None
+
+
+class TransferError(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class _InsufficientBalance(Exception):
+    pass
+
+
+class _ClaimLost(Exception):
+    """Another attempt took over (or completed) the record being applied"""
+
+
+async def ensure_wallet_indexes(db):
+    """Wallet and ledger indexes (created once per process)"""
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    async with _indexes_lock:
+        if _indexes_ready:
+            return
+        try:
+            await db.wallets.create_index("user_id", unique=True)
+        except OperationFailure as e:
+            # Without it a replayed credit could create a second wallet
+            logger.error(f"wallets.user_id unique index not created: {e}")
+        await db.wallet_transactions.create_index(
+            [("transfer_id", 1), ("leg", 1)],
+            unique=True,
+            partialFilterExpression={"transfer_id": {"$exists": True}}
+        )
+        await db.wallet_transactions.create_index([("user_id", 1), ("created_at", -1)])
+        await db.wallets.create_index("pending_transfers", sparse=True)
+        _indexes_ready = True
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _on_insert(new_wallet: WalletFactory, user_id: str, updated: Tuple[str, ...] = ()) -> dict:
+    """New-wallet fields, minus the ones the same update already writes"""
+    skip = {"_id", "user_id", *updated}
+    return {k: v for k, v in new_wallet(user_id).items() if k not in skip}
+
+
+def _leg(wallet_id: str, user_id: str, transaction_type: str, amount: float,
+         balance_before: float, reference_type: str, reference_id: str,
+         description: str, transfer_id: str, leg: str, created_at: str) -> dict:
+    """wallet_transactions document (WalletTransaction fields + ledger key)"""
+    return {
+        "id": str(uuid.uuid4()),
+        "wallet_id": wallet_id,
+        "user_id": user_id,
+        "transaction_type": transaction_type,
+        "amount": amount,
+        "currency": "credits",
+        "balance_before": balance_before,
+        "balance_after": balance_before + amount,
+        "reference_type": reference_type,
+        "reference_id": reference_id,
+        "description": description,
+        "status": "completed",
+        "created_at": created_at,
+        "transfer_id": transfer_id,
+        "leg": leg
+    }
+
+
+async def _insert_legs(db, legs: List[dict], session=None):
+    """Insert ledger legs; legs already written by an earlier attempt are skipped"""
+    if not legs:
+        return
+    try:
+        await db.wallet_transactions.insert_many(legs, ordered=False, session=session)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+
+async def _run_atomic(db, operation, attempts: int = 3):
+    """
+    Run operation(session) in a transaction when the deployment supports
+    it, otherwise run operation(None).
+    """
+    global _transactions_supported
+    client = getattr(db, "client", None)
+    if client is not None and _transactions_supported is not False:
+        for attempt in range(attempts):
+            try:
+                async with await client.start_session() as session:
+                    async with session.start_transaction():
+                        result = await operation(session)
+                _transactions_supported = True
+                return result
+            except OperationFailure as e:
+                if e.code == 20 or "Transaction numbers are only allowed" in str(e):
+                    # Standalone server: nothing was written, fall back
+                    _transactions_supported = False
+                    logger.info("MongoDB transactions unavailable, wallet ledger uses marked steps")
+                    break
+                if e.has_error_label("TransientTransactionError") and attempt < attempts - 1:
+                    continue
+                raise
+    return await operation(None)
+
+
+# ============================================
+# WALLET OPERATIONS
+# ============================================
+
+async def ensure_wallet(db, user_id: str, new_wallet: WalletFactory) -> Tuple[dict, bool]:
+    """Get or atomically create a wallet. Returns (wallet, created)"""
+    await ensure_wallet_indexes(db)
+    doc = new_wallet(user_id)
+    try:
+        before = await db.wallets.find_one_and_update(
+            {"user_id": user_id},
+            {"$setOnInsert": _on_insert(lambda _: doc, user_id)},
+            upsert=True,
+            projection={"_id": 0}
+        )
+    except DuplicateKeyError:
+        # Created concurrently
+        before = await db.wallets.find_one({"user_id": user_id}, {"_id": 0})
+    if before is None:
+        doc.pop("_id", None)
+        return doc, True
+    return before, False
+
+
+async def credit(db, user_id: str, amount: float, marker: str, new_wallet: WalletFactory,
+                 session=None) -> Tuple[Optional[dict], bool]:
+    """
+    Credit a wallet once per marker (one upserting $inc).
+    Returns (wallet before the credit, created); the wallet is None when
+    the credit created it or an earlier attempt already applied it.
+    """
+    try:
+        before = await db.wallets.find_one_and_update(
+            {"user_id": user_id, "pending_transfers": {"$ne": marker}},
+            {
+                "$inc": {"balance_credits": amount, "total_earned": amount},
+                "$set": {"updated_at": _now()},
+                "$addToSet": {"pending_transfers": marker},
+                "$setOnInsert": _on_insert(new_wallet, user_id, ("balance_credits", "total_earned", "updated_at"))
+            },
+            upsert=True,
+            projection={"_id": 0},
+            session=session
+        )
+    except DuplicateKeyError:
+        # The wallet exists and already carries the marker
+        return None, False
+    return before, before is None
+
+
+async def debit(db, user_id: str, amount: float, marker: str, session=None) -> Optional[dict]:
+    """
+    Debit a wallet once per marker, only if the balance covers it (one
+    conditional $inc). Returns the wallet before the debit, or None when
+    already applied. Raises _InsufficientBalance otherwise.
+    """
+    before = await db.wallets.find_one_and_update(
+        {"user_id": user_id, "balance_credits": {"$gte": amount}, "pending_transfers": {"$ne": marker}},
+        {
+            "$inc": {"balance_credits": -amount, "total_spent": amount},
+            "$set": {"updated_at": _now()},
+            "$addToSet": {"pending_transfers": marker}
+        },
+        projection={"_id": 0},
+        session=session
+    )
+    if before is not None:
+        return before
+    applied = await db.wallets.find_one(
+        {"user_id": user_id, "pending_transfers": marker}, {"_id": 1}, session=session
+    )
+    if applied is None:
+        raise _InsufficientBalance()
+    return None
+
+
+async def _current(db, user_id: str, session=None) -> dict:
+    return await db.wallets.find_one({"user_id": user_id}, {"_id": 0}, session=session) or {}
+
+
+async def _release(db, marker: str, session=None):
+    await db.wallets.update_many(
+        {"pending_transfers": marker}, {"$pull": {"pending_transfers": marker}}, session=session
+    )
+
+
+# ============================================
+# CLAIMS
+# ============================================
+
+def _claim_fields(owner: str) -> dict:
+    return {"status": "applying", "owner": owner, "claimed_at": _now()}
+
+
+async def _claim(db, collection: str, record_id: str, owner: str) -> Optional[dict]:
+    """
+    Take a pending record, or one whose claim expired (CLAIM_TTL).
+    Returns the claimed record, or None when another attempt holds it or
+    it is finished.
+    """
+    stale = (datetime.now(timezone.utc) - timedelta(seconds=CLAIM_TTL)).isoformat()
+    return await db[collection].find_one_and_update(
+        {"_id": record_id, "$or": [
+            {"status": "pending"},
+            {"status": "applying", "claimed_at": {"$lt": stale}}
+        ]},
+        {"$set": _claim_fields(owner)},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def _check_claim(db, collection: str, record_id: str, owner: str, session=None):
+    """Raise _ClaimLost unless `owner` still holds the record"""
+    held = await db[collection].find_one(
+        {"_id": record_id, "status": "applying", "owner": owner}, {"_id": 1}, session=session
+    )
+    if held is None:
+        raise _ClaimLost()
+
+
+async def _finish_claim(db, collection: str, record_id: str, owner: str, fields: dict, session=None):
+    """Close the record as its owner; raise _ClaimLost if the claim was taken over"""
+    result = await db[collection].update_one(
+        {"_id": record_id, "status": "applying", "owner": owner},
+        {"$set": fields, "$unset": {"owner": ""}},
+        session=session
+    )
+    if not result.matched_count:
+        raise _ClaimLost()
+
+
+async def _unclaim(db, collection: str, record_id: str, owner: str):
+    """Hand an interrupted record back so a retry can resume it at once"""
+    try:
+        await db[collection].update_one(
+            {"_id": record_id, "status": "applying", "owner": owner},
+            {"$set": {"status": "pending"}, "$unset": {"owner": "", "claimed_at": ""}}
+        )
+    except Exception as e:
+        # The claim expires after CLAIM_TTL
+        logger.warning(f"Could not release claim on {collection}/{record_id}: {e}")
+
+
+# ============================================
+# TRANSFERS
+# ============================================
+
+def _transfer_result(record: dict, replayed: bool) -> dict:
+    return {
+        "transfer_id": record["_id"],
+        "from_balance": record.get("from_balance"),
+        "to_balance": record.get("to_balance"),
+        "created_wallet": record.get("created_wallet", False),
+        "replayed": replayed
+    }
+
+
+async def transfer(db, transfer_id: str, from_user_id: str, to_user_id: str, amount: float,
+                   description: str, new_wallet: WalletFactory) -> dict:
+    """
+    Move credits between two wallets, at most once per transfer_id.
+    Raises TransferError (insufficient balance, reused id, self transfer).
+    """
+    if amount <= 0:
+        raise TransferError("Amount must be positive")
+    if from_user_id == to_user_id:
+        raise TransferError("Cannot transfer to yourself")
+    await ensure_wallet_indexes(db)
+
+    owner = str(uuid.uuid4())
+    record = {
+        "_id": transfer_id,
+        "from_user_id": from_user_id,
+        "to_user_id": to_user_id,
+        "amount": amount,
+        "description": description,
+        "created_at": _now(),
+        **_claim_fields(owner)
+    }
+    try:
+        await db[TRANSFERS_COLLECTION].insert_one(dict(record))
+    except DuplicateKeyError:
+        existing = await db[TRANSFERS_COLLECTION].find_one({"_id": transfer_id})
+        if (existing["from_user_id"], existing["to_user_id"], existing["amount"]) != (from_user_id, to_user_id, amount):
+            raise TransferError("Transfer id already used for another transfer", 409)
+        # Interrupted earlier attempt: finish it, unless another attempt is on it
+        record = await _claim(db, TRANSFERS_COLLECTION, transfer_id, owner)
+        if record is None:
+            return await _settled_transfer(db, transfer_id)
+
+    async def apply(session):
+        now = _now()
+        await _check_claim(db, TRANSFERS_COLLECTION, transfer_id, owner, session)
+        sender = await debit(db, from_user_id, amount, transfer_id, session)
+        if sender is None:
+            sender = await _current(db, from_user_id, session)
+            sender["balance_credits"] = sender.get("balance_credits", 0) + amount
+        await _check_claim(db, TRANSFERS_COLLECTION, transfer_id, owner, session)
+        receiver, created = await credit(db, to_user_id, amount, transfer_id, new_wallet, session)
+        if receiver is None:
+            current = await _current(db, to_user_id, session)
+            receiver = dict(current, balance_credits=current.get("balance_credits", 0) - amount)
+
+        from_before = sender.get("balance_credits", 0)
+        to_before = receiver.get("balance_credits", 0)
+        await _check_claim(db, TRANSFERS_COLLECTION, transfer_id, owner, session)
+        await _insert_legs(db, [
+            _leg(sender.get("id"), from_user_id, "transfer_out", -amount, from_before,
+                 "transfer", to_user_id, f"Transfert vers utilisateur: {description}",
+                 transfer_id, "debit", now),
+            _leg(receiver.get("id"), to_user_id, "transfer_in", amount, to_before,
+                 "transfer", from_user_id, f"Transfert reçu: {description}",
+                 transfer_id, "credit", now)
+        ], session)
+
+        done = {
+            "status": "completed",
+            "completed_at": now,
+            "from_balance": from_before - amount,
+            "to_balance": to_before + amount,
+            "created_wallet": created
+        }
+        await _finish_claim(db, TRANSFERS_COLLECTION, transfer_id, owner, done, session)
+        # Only the completing owner drops the markers: a late step of another
+        # attempt still finds them and cannot apply its leg again
+        await _release(db, transfer_id, session)
+        return dict(record, **done)
+
+    try:
+        completed = await _run_atomic(db, apply)
+    except _InsufficientBalance:
+        await db[TRANSFERS_COLLECTION].update_one(
+            {"_id": transfer_id, "status": "applying", "owner": owner},
+            {"$set": {"status": "failed", "error": "Insufficient balance", "completed_at": _now()},
+             "$unset": {"owner": ""}}
+        )
+        raise TransferError("Insufficient balance")
+    except _ClaimLost:
+        return await _settled_transfer(db, transfer_id)
+    except Exception:
+        await _unclaim(db, TRANSFERS_COLLECTION, transfer_id, owner)
+        raise
+    return _transfer_result(completed, replayed=False)
+
+
+async def _settled_transfer(db, transfer_id: str) -> dict:
+    """Outcome of a transfer applied by another attempt"""
+    existing = await db[TRANSFERS_COLLECTION].find_one({"_id": transfer_id})
+    if existing["status"] == "completed":
+        return _transfer_result(existing, replayed=True)
+    if existing["status"] == "failed":
+        raise TransferError(existing.get("error", "Transfer failed"))
+    raise TransferError("Transfer already in progress", 409)
+
+
+# ============================================
+# REFERRAL SETTLEMENT
+# ============================================
+
+def _settlement_summary(settlement_id: str, settled: int = 0, referrals: Optional[List[dict]] = None,
+                        payouts: Optional[Dict[str, list]] = None, created_wallets: int = 0) -> dict:
+    payouts = payouts or {}
+    return {
+        "settlement_id": settlement_id,
+        "settled": settled,
+        "referrals": referrals or [],
+        "total_rewards": sum(amount for items in payouts.values() for _, _, amount, _ in items),
+        "wallets_credited": len(payouts),
+        "created_wallets": created_wallets
+    }
+
+
+async def settle_referrals(
+    db,
+    new_wallet: WalletFactory,
+    referral_ids: Optional[List[str]] = None,
+    settlement_id: Optional[str] = None,
+    limit: int = MAX_SETTLEMENT_SIZE,
+    concurrency: int = SETTLEMENT_CONCURRENCY
+) -> dict:
+    """
+    Pay pending referrals (the given ids, or up to `limit` of them).
+
+    The settlement record (wallet_settlements) is claimed first. Referrals
+    are then claimed with one update_many (settlement_id), each wallet
+    gets one credit for the sum of its rewards, legs go in one insert_many
+    and the referrals flip to "rewarded" with one update_many. Calling
+    again with the same settlement_id resumes an interrupted settlement;
+    while another attempt holds it, nothing is settled.
+    """
+    await ensure_wallet_indexes(db)
+    settlement_id = settlement_id or f"settlement_{uuid.uuid4()}"
+    owner = str(uuid.uuid4())
+
+    try:
+        await db[SETTLEMENTS_COLLECTION].insert_one(
+            {"_id": settlement_id, "created_at": _now(), **_claim_fields(owner)}
+        )
+    except DuplicateKeyError:
+        if await _claim(db, SETTLEMENTS_COLLECTION, settlement_id, owner) is None:
+            return _settlement_summary(settlement_id)
+
+    try:
+        return await _apply_settlement(db, new_wallet, settlement_id, owner, referral_ids, limit, concurrency)
+    except _ClaimLost:
+        return _settlement_summary(settlement_id)
+    except Exception:
+        await _unclaim(db, SETTLEMENTS_COLLECTION, settlement_id, owner)
+        raise
+
+
+async def _apply_settlement(db, new_wallet: WalletFactory, settlement_id: str, owner: str,
+                            referral_ids: Optional[List[str]], limit: int, concurrency: int) -> dict:
+    if referral_ids is None:
+        pending = await db.referrals.find(
+            {"status": "pending", "settlement_id": {"$exists": False}}, {"_id": 0, "id": 1}
+        ).limit(limit).to_list(limit)
+        referral_ids = [r["id"] for r in pending]
+    referral_ids = referral_ids[:limit]
+
+    if referral_ids:
+        await db.referrals.update_many(
+            {"id": {"$in": referral_ids}, "status": "pending", "settlement_id": {"$exists": False}},
+            {"$set": {"settlement_id": settlement_id}}
+        )
+    claimed = await db.referrals.find(
+        {"settlement_id": settlement_id, "status": "pending"}, {"_id": 0}
+    ).to_list(None)
+
+    payouts: Dict[str, List[Tuple[dict, str, float, str]]] = defaultdict(list)
+    for referral in claimed:
+        payouts[referral["referrer_id"]].append(
+            (referral, "referrer", referral.get("referrer_reward_amount", 0), "Bonus de parrainage"))
+        payouts[referral["referee_id"]].append(
+            (referral, "referee", referral.get("referee_reward_amount", 0), "Bonus de bienvenue"))
+
+    slots = asyncio.Semaphore(concurrency)
+    now = _now()
+
+    async def pay(user_id: str, items: list) -> Tuple[List[dict], bool]:
+        total = sum(amount for _, _, amount, _ in items)
+        async with slots:
+            await _check_claim(db, SETTLEMENTS_COLLECTION, settlement_id, owner)
+            before, created = await credit(db, user_id, total, settlement_id, new_wallet)
+            if before is None:
+                current = await _current(db, user_id)
+                before = dict(current, balance_credits=current.get("balance_credits", 0) - total)
+        balance = before.get("balance_credits", 0)
+        legs = []
+        for referral, role, amount, description in items:
+            legs.append(_leg(before.get("id"), user_id, "reward", amount, balance, "referral_bonus",
+                             referral["id"], description, settlement_id, f"{referral['id']}:{role}", now))
+            balance += amount
+        return legs, created
+
+    paid = await asyncio.gather(*(pay(user_id, items) for user_id, items in payouts.items()))
+    await _check_claim(db, SETTLEMENTS_COLLECTION, settlement_id, owner)
+    await _insert_legs(db, [leg for legs, _ in paid for leg in legs])
+
+    result = await db.referrals.update_many(
+        {"settlement_id": settlement_id, "status": "pending"},
+        {"$set": {"status": "rewarded", "verified_at": now, "rewarded_at": now}}
+    )
+    await _finish_claim(db, SETTLEMENTS_COLLECTION, settlement_id, owner, {
+        "status": "completed", "completed_at": now, "settled": result.modified_count
+    })
+    await _release(db, settlement_id)
+
+    return _settlement_summary(
+        settlement_id, result.modified_count, claimed, payouts,
+        sum(1 for _, created in paid if created)
+    )
+
+
+async def resume_stale_settlements(db, new_wallet: WalletFactory) -> List[dict]:
+    """
+    Finish settlements that left referrals claimed but unpaid, typically
+    an interrupted settlement whose generated settlement_id never reached
+    the caller. Settlements still held by a live attempt are skipped;
+    referrals claimed by a completed settlement are handed back to the
+    pending pool. Returns the summaries of the resumed settlements.
+    """
+    orphaned = await db.referrals.distinct(
+        "settlement_id", {"status": "pending", "settlement_id": {"$exists": True}}
+    )
+    summaries = []
+    for settlement_id in orphaned:
+        # No new referral joins a resumed settlement
+        summary = await settle_referrals(db, new_wallet, [], settlement_id=settlement_id)
+        if summary["settled"]:
+            summaries.append(summary)
+            continue
+        record = await db[SETTLEMENTS_COLLECTION].find_one({"_id": settlement_id}, {"status": 1})
+        if record and record.get("status") == "completed":
+            await db.referrals.update_many(
+                {"settlement_id": settlement_id, "status": "pending"},
+                {"$unset": {"settlement_id": ""}}
+            )
+    return summaries
@@ -0,0 +1,304 @@
+"""
+Notification Inbox
+- Per-user counter documents (total / unread / unseen / by type) kept in
+  step with every write done through notifications.py
+- Keyset pagination on (created_at, id) instead of skip/offset
+- Badge reads touch only the counters collection
+
+Counters are created lazily from a one-time recount, so users whose
+notifications predate this module get correct numbers on first read.
+rebuild_counters() resynchronizes a user on demand.
+
+The inbox only covers documents written by notifications.py (`id`,
+is_read / is_seen flags). Other modules (waypoint sharing, group chat,
+hunting groups) write their own notifications with a `read` flag and no
+`id`, and keep their own readers; every inbox query and counter is scoped
+with INBOX_SCOPE so those documents can neither break the cursors nor
+drift the counters. global_stats() still counts them for the admin.
+"""
+
+import asyncio
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Optional, List, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+COUNTERS_COLLECTION = "notification_counters"
+
+# Marker document: counters backfilled for every user with notifications
+BACKFILL_MARKER = "__backfill__"
+
+MAX_PAGE_SIZE = 100
+
+# Documents written through notifications.py (other writers set no id / is_read)
+INBOX_SCOPE = {"id": {"$exists": True}, "is_read": {"$exists": True}}
+
+_indexes_ready = False
+_indexes_lock = asyncio.Lock()
+
+
+async def ensure_inbox_indexes(db):
+    """Inbox keyset index (created once per process)"""
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    async with _indexes_lock:
+        if _indexes_ready:
+            return
+        await db.notifications.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])
+        await db.notifications.create_index([("user_id", 1), ("is_read", 1)])
+        _indexes_ready = True
+
+
+# ============================================
+# CURSORS
+# ============================================
+
+def encode_cursor(notification: dict) -> str:
+    raw = json.dumps([notification["created_at"], notification["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Raises ValueError on a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, notification_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), str(notification_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def inbox_query(user_id: str, **conditions) -> dict:
+    """Filter on one user's inbox documents"""
+    return {"user_id": user_id, **INBOX_SCOPE, **conditions}
+
+
+def keyset_query(user_id: str, cursor: Optional[str] = None, unread_only: bool = False) -> dict:
+    query = inbox_query(user_id)
+    if unread_only:
+        query["is_read"] = False
+    if cursor:
+        created_at, notification_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": notification_id}}
+        ]
+    return query
+
+
+async def fetch_page(
+    db,
+    user_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    unread_only: bool = False
+) -> Tuple[List[dict], Optional[str]]:
+    """One page, newest first. Returns (notifications, next_cursor)"""
+    await ensure_inbox_indexes(db)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    docs = await db.notifications.find(
+        keyset_query(user_id, cursor, unread_only), {"_id": 0}
+    ).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+# ============================================
+# COUNTERS
+# ============================================
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def _bump(db, user_id: str, inc: dict):
+    inc = {k: v for k, v in inc.items() if v}
+    if not inc:
+        return
+    await db[COUNTERS_COLLECTION].update_one(
+        {"_id": user_id},
+        {"$inc": inc, "$set": {"updated_at": _now()}},
+        upsert=True
+    )
+
+
+async def ensure_counters(db, user_id: str):
+    """
+    Recount once if the user has no counter document yet. Call it before
+    the write whose delta is applied next, so the write is not counted twice.
+
+    The recount is only inserted ($setOnInsert), never written over a
+    document another request created meanwhile: that document already
+    predates any write whose delta followed it.
+    """
+    if await db[COUNTERS_COLLECTION].find_one({"_id": user_id}, {"_id": 1}):
+        return
+    counters = await _recount(db, user_id)
+    try:
+        await db[COUNTERS_COLLECTION].update_one({"_id": user_id}, {"$setOnInsert": counters}, upsert=True)
+    except DuplicateKeyError:
+        # Concurrent first write: the other upsert created it
+        pass
+
+
+async def on_created(db, user_id: str, notification_type: str):
+    """Apply the delta of a new notification (ensure_counters ran before the insert)"""
+    await _bump(db, user_id, {"total": 1, "unread": 1, "unseen": 1, f"by_type.{notification_type}": 1})
+
+
+async def on_deleted(db, notification: dict):
+    """Apply the delta of a deleted notification (ensure_counters ran before the delete)"""
+    await _bump(db, notification["user_id"], {
+        "total": -1,
+        "unread": -1 if not notification.get("is_read") else 0,
+        "unseen": -1 if not notification.get("is_seen") else 0,
+        f"by_type.{notification.get('type')}": -1
+    })
+
+
+async def mark_seen(db, user_id: str) -> int:
+    await ensure_counters(db, user_id)
+    result = await db.notifications.update_many(
+        inbox_query(user_id, is_seen=False),
+        {"$set": {"is_seen": True}}
+    )
+    await _bump(db, user_id, {"unseen": -result.modified_count})
+    return result.modified_count
+
+
+async def mark_read(db, user_id: str, notification_ids: Optional[List[str]] = None, also_seen: bool = False) -> int:
+    """
+    Mark notifications read. Only documents actually flipped are counted,
+    so concurrent marks cannot push the counters below the truth.
+    """
+    await ensure_counters(db, user_id)
+    unseen_delta = 0
+    if also_seen:
+        seen_query = inbox_query(user_id, is_seen=False)
+        if notification_ids:
+            seen_query["id"] = {"$in": notification_ids}
+        seen = await db.notifications.update_many(seen_query, {"$set": {"is_seen": True}})
+        unseen_delta = -seen.modified_count
+
+    query = inbox_query(user_id, is_read=False)
+    if notification_ids:
+        query["id"] = {"$in": notification_ids}
+    result = await db.notifications.update_many(query, {"$set": {"is_read": True}})
+    await _bump(db, user_id, {"unread": -result.modified_count, "unseen": unseen_delta})
+    return result.modified_count
+
+
+async def _recount(db, user_id: str) -> dict:
+    """Counter document for one user's inbox (indexed by user_id)"""
+    total, unread, unseen, by_type = await asyncio.gather(
+        db.notifications.count_documents(inbox_query(user_id)),
+        db.notifications.count_documents(inbox_query(user_id, is_read=False)),
+        db.notifications.count_documents(inbox_query(user_id, is_seen=False)),
+        db.notifications.aggregate([
+            {"$match": inbox_query(user_id)},
+            {"$group": {"_id": "$type", "count": {"$sum": 1}}}
+        ]).to_list(100)
+    )
+    return {
+        "user_id": user_id,
+        "total": total,
+        "unread": unread,
+        "unseen": unseen,
+        "by_type": {t["_id"]: t["count"] for t in by_type if t["_id"]},
+        "updated_at": _now(),
+        "rebuilt_at": _now()
+    }
+
+
+async def rebuild_counters(db, user_id: str) -> dict:
+    """Recount one user's inbox and overwrite the stored counters"""
+    counters = await _recount(db, user_id)
+    await db[COUNTERS_COLLECTION].update_one({"_id": user_id}, {"$set": counters}, upsert=True)
+    return counters
+
+
+async def get_counters(db, user_id: str) -> dict:
+    """Badge counters; reads only the counters collection once initialized"""
+    doc = await db[COUNTERS_COLLECTION].find_one({"_id": user_id})
+    if not doc:
+        await ensure_counters(db, user_id)
+        doc = await db[COUNTERS_COLLECTION].find_one({"_id": user_id}) or {}
+    return {
+        "unread_count": max(0, doc.get("unread", 0)),
+        "unseen_count": max(0, doc.get("unseen", 0)),
+        "total": max(0, doc.get("total", 0))
+    }
+
+
+async def backfill_counters(db):
+    """
+    One full pass over notifications creating the missing counter
+    documents ($merge keeps existing ones). Runs once per database.
+    """
+    if await db[COUNTERS_COLLECTION].find_one({"_id": BACKFILL_MARKER}, {"_id": 1}):
+        return
+    unread = {"$cond": [{"$eq": ["$is_read", False]}, 1, 0]}
+    unseen = {"$cond": [{"$eq": ["$is_seen", False]}, 1, 0]}
+    await db.notifications.aggregate([
+        {"$match": {"user_id": {"$type": "string"}, **INBOX_SCOPE}},
+        {"$group": {
+            "_id": {"u": "$user_id", "t": {"$ifNull": ["$type", "unknown"]}},
+            "n": {"$sum": 1}, "unread": {"$sum": unread}, "unseen": {"$sum": unseen}
+        }},
+        {"$group": {
+            "_id": "$_id.u",
+            "total": {"$sum": "$n"}, "unread": {"$sum": "$unread"}, "unseen": {"$sum": "$unseen"},
+            "types": {"$push": {"k": "$_id.t", "v": "$n"}}
+        }},
+        {"$project": {"user_id": "$_id", "total": 1, "unread": 1, "unseen": 1,
+                      "by_type": {"$arrayToObject": "$types"}, "rebuilt_at": _now()}},
+        {"$merge": {"into": COUNTERS_COLLECTION, "on": "_id",
+                    "whenMatched": "keepExisting", "whenNotMatched": "insert"}}
+    ]).to_list(None)
+    await db[COUNTERS_COLLECTION].update_one(
+        {"_id": BACKFILL_MARKER}, {"$set": {"done_at": _now()}}, upsert=True
+    )
+
+
+async def _other_writers_stats(db) -> List[dict]:
+    """Per-type totals of notifications written outside notifications.py"""
+    return await db.notifications.aggregate([
+        {"$match": {"$nor": [INBOX_SCOPE]}},
+        {"$group": {
+            "_id": "$type",
+            "count": {"$sum": 1},
+            "unread": {"$sum": {"$cond": [{"$eq": ["$read", False]}, 1, 0]}}
+        }}
+    ]).to_list(100)
+
+
+async def global_stats(db) -> dict:
+    """
+    Admin totals: inbox documents summed over counter documents (one per
+    user), plus the notifications other modules write outside the inbox
+    """
+    await backfill_counters(db)
+    totals = await db[COUNTERS_COLLECTION].aggregate([
+        {"$group": {"_id": None, "total": {"$sum": "$total"}, "unread": {"$sum": "$unread"}}}
+    ]).to_list(1)
+    by_type = await db[COUNTERS_COLLECTION].aggregate([
+        {"$project": {"types": {"$objectToArray": {"$ifNull": ["$by_type", {}]}}}},
+        {"$unwind": "$types"},
+        {"$group": {"_id": "$types.k", "count": {"$sum": "$types.v"}}}
+    ]).to_list(100)
+    row = totals[0] if totals else {}
+    stats = {
+        "total_notifications": row.get("total", 0),
+        "unread_notifications": row.get("unread", 0),
+        "by_type": {t["_id"]: t["count"] for t in by_type if t["count"]}
+    }
+    for t in await _other_writers_stats(db):
+        stats["total_notifications"] += t["count"]
+        stats["unread_notifications"] += t["unread"]
+        if t["_id"]:
+            stats["by_type"][t["_id"]] = stats["by_type"].get(t["_id"], 0) + t["count"]
+    return stats
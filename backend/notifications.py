@@ -2,6 +2,7 @@
 Notifications Module
 - Real-time notification system for user engagement
 - Notifications for: likes, comments, group joins, referrals, wallet transactions
+- Inbox counters and keyset paging in notification_inbox.py
 """
 
 from fastapi import APIRouter, HTTPException, Query
@@ -12,6 +13,8 @@ import uuid
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 
+import notification_inbox as inbox
+
 # Router
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -132,8 +135,10 @@ async def create_notification(
     doc = notification.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     
+    await inbox.ensure_counters(db, user_id)
     await db.notifications.insert_one(doc)
     doc.pop('_id', None)
+    await inbox.on_created(db, user_id, notification_type)
     
     return doc
 
@@ -294,64 +299,61 @@ async def get_notifications(
     user_id: str,
     unread_only: bool = False,
     limit: int = 50,
+    cursor: Optional[str] = None,
     offset: int = 0
 ):
-    """Get notifications for a user"""
-    query = {"user_id": user_id}
-    if unread_only:
-        query["is_read"] = False
-    
-    notifications = await db.notifications.find(query, {"_id": 0}).sort("created_at", -1).skip(offset).limit(limit).to_list(limit)
+    """
+    Get notifications for a user, newest first.
+    Pass next_cursor back as `cursor` for the following page; `offset`
+    is kept for older clients only. `limit` is clamped to MAX_PAGE_SIZE.
+    """
+    limit = max(1, min(limit, inbox.MAX_PAGE_SIZE))
+    if offset and not cursor:
+        query = inbox.inbox_query(user_id)
+        if unread_only:
+            query["is_read"] = False
+        notifications = await db.notifications.find(query, {"_id": 0}).sort("created_at", -1).skip(offset).limit(limit).to_list(limit)
+        next_cursor = None
+    else:
+        try:
+            notifications, next_cursor = await inbox.fetch_page(db, user_id, limit, cursor, unread_only)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    # Count unread
-    unread_count = await db.notifications.count_documents({"user_id": user_id, "is_read": False})
-    unseen_count = await db.notifications.count_documents({"user_id": user_id, "is_seen": False})
+    counters = await inbox.get_counters(db, user_id)
     
     return {
         "notifications": notifications,
-        "unread_count": unread_count,
-        "unseen_count": unseen_count,
-        "total": await db.notifications.count_documents({"user_id": user_id})
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        **counters
     }
 
 
+@router.get("/{user_id}/badge")
+async def get_notification_badge(user_id: str):
+    """Unread/unseen counters for the bell icon (counters only)"""
+    return await inbox.get_counters(db, user_id)
+
+
 @router.post("/{user_id}/mark-seen")
 async def mark_notifications_seen(user_id: str):
     """Mark all notifications as seen (for badge)"""
-    await db.notifications.update_many(
-        {"user_id": user_id, "is_seen": False},
-        {"$set": {"is_seen": True}}
-    )
+    await inbox.mark_seen(db, user_id)
     return {"success": True}
 
 
 @router.post("/{user_id}/mark-read")
 async def mark_notifications_read(user_id: str, notification_ids: List[str] = None):
     """Mark notifications as read"""
-    query = {"user_id": user_id}
-    if notification_ids:
-        query["id"] = {"$in": notification_ids}
-    
-    await db.notifications.update_many(query, {"$set": {"is_read": True}})
+    await inbox.mark_read(db, user_id, notification_ids)
     return {"success": True}
 
 
 @router.post("/{user_id}/mark-all-read")
 async def mark_all_notifications_read(user_id: str):
     """Mark all notifications as read"""
-    await db.notifications.update_many(
-        {"user_id": user_id},
-        {"$set": {"is_read": True, "is_seen": True}}
-    )
-    return {"success": True}
-
-
-@router.delete("/{user_id}/{notification_id}")
-async def delete_notification(user_id: str, notification_id: str):
-    """Delete a notification"""
-    result = await db.notifications.delete_one({"id": notification_id, "user_id": user_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    await inbox.mark_read(db, user_id, also_seen=True)
     return {"success": True}
 
 
@@ -359,6 +361,21 @@ async def delete_notification(user_id: str, notification_id: str):
 async def clear_all_notifications(user_id: str):
     """Clear all notifications for a user"""
     await db.notifications.delete_many({"user_id": user_id})
+    await inbox.rebuild_counters(db, user_id)
+    return {"success": True}
+
+
+@router.delete("/{user_id}/{notification_id}")
+async def delete_notification(user_id: str, notification_id: str):
+    """Delete a notification"""
+    await inbox.ensure_counters(db, user_id)
+    deleted = await db.notifications.find_one_and_delete(
+        inbox.inbox_query(user_id, id=notification_id),
+        projection={"_id": 0, "user_id": 1, "type": 1, "is_read": 1, "is_seen": 1}
+    )
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    await inbox.on_deleted(db, deleted)
     return {"success": True}
 
 
@@ -473,18 +490,12 @@ async def send_system_notification(
 
 @router.get("/admin/stats")
 async def get_notification_stats():
-    """Get notification statistics for admin"""
-    total = await db.notifications.count_documents({})
-    unread = await db.notifications.count_documents({"is_read": False})
-    
-    # Count by type
-    pipeline = [
-        {"$group": {"_id": "$type", "count": {"$sum": 1}}}
-    ]
-    type_counts = await db.notifications.aggregate(pipeline).to_list(100)
-    
-    return {
-        "total_notifications": total,
-        "unread_notifications": unread,
-        "by_type": {t["_id"]: t["count"] for t in type_counts}
-    }
+    """Get notification statistics for admin (summed from per-user counters)"""
+    return await inbox.global_stats(db)
+
+
+@router.post("/admin/rebuild-counters/{user_id}")
+async def rebuild_notification_counters(user_id: str):
+    """Resynchronize a user's inbox counters with the notifications collection"""
+    counters = await inbox.rebuild_counters(db, user_id)
+    return {"success": True, "counters": counters}
@@ -18,6 +18,8 @@ from pydantic import BaseModel, EmailStr, Field
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from bson import ObjectId
 
+from utils.principal_cache import principal_cache
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -772,6 +774,10 @@ async def convert_to_partner(request_id: str, background_tasks: BackgroundTasks)
                 {"email": request_doc.get('email')},
                 {"$set": {"role": "partner", "partner_id": str(result.inserted_id)}}
             )
+            # Cached sessions must pick up the new role
+            principal_cache.invalidate_user(
+                user_id=existing_user.get("user_id"), email=request_doc.get('email')
+            )
         else:
             await db.users.insert_one(user_doc)
         
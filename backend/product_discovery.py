@@ -1,16 +1,17 @@
 # product_discovery.py - Système intelligent de détection et ingestion automatique de produits
-import os
 import re
 import uuid
 import json
-import asyncio
 import hashlib
+import logging
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, Literal
 from pydantic import BaseModel, Field
 import httpx
 from bs4 import BeautifulSoup
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from modules.llm_gateway import get_llm_gateway
+
+logger = logging.getLogger(__name__)
 
 # ============================================
 # CONFIGURATION
@@ -159,6 +160,10 @@ class AdminNotification(BaseModel):
 # SERVICE DE DÉCOUVERTE
 # ============================================
 
+class ProductAnalysisError(Exception):
+    """L'analyse d'une page a échoué (HTML, LLM ou réponse invalide)"""
+
+
 class ProductDiscoveryService:
     def __init__(self, api_key: str, db):
         self.api_key = api_key
@@ -166,15 +171,23 @@ class ProductDiscoveryService:
         self.http_client = httpx.AsyncClient(timeout=30.0, follow_redirects=True)
         
         # LLM pour analyse et traduction
-        self.llm = LlmChat(
-            api_key=api_key,
-            session_id=f"discovery_{uuid.uuid4().hex[:8]}",
-            system_message="""Tu es un expert en produits de chasse, spécialisé dans les attractants et leurres.
+        self.llm = get_llm_gateway()
+        self.system_message = """Tu es un expert en produits de chasse, spécialisé dans les attractants et leurres.
             Tu analyses les pages web et extraits les informations produits de manière structurée.
             Tu traduis entre français et anglais avec précision.
             Tu génères des scores basés sur des critères objectifs.
             Réponds toujours en JSON valide."""
-        ).with_model("openai", "gpt-4.1")
+    
+    async def _ask_llm(self, prompt: str) -> str:
+        """Requête LLM via le gateway partagé (cache + limites)"""
+        return await self.llm.complete(
+            prompt,
+            system_message=self.system_message,
+            feature="product_discovery",
+            provider="openai",
+            model="gpt-4.1",
+            api_key=self.api_key
+        )
     
     def _generate_content_hash(self, name: str, brand: str, source: str) -> str:
         """Génère un hash unique pour identifier les doublons"""
@@ -219,11 +232,16 @@ class ProductDiscoveryService:
             if response.status_code == 200:
                 return response.text
         except Exception as e:
-            print(f"Error fetching {url}: {e}")
+            logger.warning(f"Error fetching {url}: {e}")
         return None
     
     async def _analyze_product_page(self, html: str, source_url: str, source_name: str) -> Optional[DiscoveredProduct]:
-        """Analyse une page produit avec l'IA"""
+        """
+        Analyse une page produit avec l'IA.
+        
+        Retourne None si la page ne contient pas de produit retenu; lève
+        ProductAnalysisError si l'analyse elle-même a échoué.
+        """
         try:
             # Nettoyer le HTML
             soup = BeautifulSoup(html, 'lxml')
@@ -267,7 +285,7 @@ Réponds UNIQUEMENT avec ce JSON (sans texte autour):
     "is_excluded": true/false si c'est une arme/munition
 }}"""
 
-            response = await self.llm.send_message(UserMessage(text=prompt))
+            response = await self._ask_llm(prompt)
             
             # Parser la réponse JSON
             json_str = response
@@ -310,8 +328,8 @@ Réponds UNIQUEMENT avec ce JSON (sans texte autour):
             return product
             
         except Exception as e:
-            print(f"Error analyzing product: {e}")
-            return None
+            logger.warning(f"Error analyzing product page {source_url}: {e}")
+            raise ProductAnalysisError(str(e)) from e
     
     async def translate_product(self, product: DiscoveredProduct) -> DiscoveredProduct:
         """Traduit les champs FR vers EN"""
@@ -332,7 +350,7 @@ Réponds UNIQUEMENT avec ce JSON:
     "tags_en": ["tag1", "tag2", "tag3"]
 }}"""
 
-            response = await self.llm.send_message(UserMessage(text=prompt))
+            response = await self._ask_llm(prompt)
             
             json_str = response
             if "```json" in json_str:
@@ -358,7 +376,7 @@ Réponds UNIQUEMENT avec ce JSON:
             product.tags_fr = [t for t in product.tags_fr if t]
             
         except Exception as e:
-            print(f"Translation error: {e}")
+            logger.warning(f"Translation error: {e}")
         
         return product
     
@@ -460,16 +478,19 @@ Réponds UNIQUEMENT avec ce JSON:
         })
         return existing is not None
     
-    async def save_product(self, product: DiscoveredProduct) -> str:
-        """Sauvegarde un produit découvert"""
+    def product_document(self, product: DiscoveredProduct) -> Dict[str, Any]:
+        """Document MongoDB d'un produit (dates en ISO)"""
         doc = product.model_dump()
         doc['discovered_at'] = doc['discovered_at'].isoformat()
         if doc.get('approved_at'):
             doc['approved_at'] = doc['approved_at'].isoformat()
         if doc.get('rejected_at'):
             doc['rejected_at'] = doc['rejected_at'].isoformat()
-        
-        await self.db.discovered_products.insert_one(doc)
+        return doc
+    
+    async def save_product(self, product: DiscoveredProduct) -> str:
+        """Sauvegarde un produit découvert"""
+        await self.db.discovered_products.insert_one(self.product_document(product))
         return product.id
     
     async def create_notification(self, product: DiscoveredProduct) -> str:
@@ -495,29 +516,40 @@ Réponds UNIQUEMENT avec ce JSON:
         if not html:
             return products
         
-        # Analyser la page
-        product = await self._analyze_product_page(html, url, source_name)
-        
+        config = await self.get_config()
+        try:
+            product = await self.prepare_product(html, url, source_name, config.min_score_threshold)
+        except ProductAnalysisError:
+            return products
         if product:
-            # Vérifier les doublons
-            if await self.check_duplicate(product):
-                return products
-            
-            # Traduire
-            product = await self.translate_product(product)
-            
-            # Calculer le score
-            product = self.calculate_score(product)
-            
-            # Sauvegarder si score suffisant
-            config = await self.get_config()
-            if product.score_total >= config.min_score_threshold:
-                await self.save_product(product)
-                await self.create_notification(product)
-                products.append(product)
+            await self.save_product(product)
+            await self.create_notification(product)
+            products.append(product)
         
         return products
     
+    async def prepare_product(self, html: str, url: str, source_name: str,
+                              min_score: float) -> Optional[DiscoveredProduct]:
+        """
+        Analyse, dédoublonnage, traduction et scoring d'une page.
+        Retourne None si la page ne donne pas de nouveau produit retenu;
+        ProductAnalysisError est propagée si l'analyse a échoué.
+        """
+        product = await self._analyze_product_page(html, url, source_name)
+        if not product:
+            return None
+        
+        # Vérifier les doublons avant les appels LLM de traduction
+        if await self.check_duplicate(product):
+            return None
+        
+        product = await self.translate_product(product)
+        product = self.calculate_score(product)
+        
+        if product.score_total < min_score:
+            return None
+        return product
+    
     async def get_config(self) -> ScannerConfig:
         """Récupère la configuration du scanner"""
         config = await self.db.scanner_config.find_one({"id": "scanner_config"}, {"_id": 0})
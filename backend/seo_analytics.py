@@ -337,7 +337,7 @@ async def generate_content_text(request: ContentGenRequest):
         raise HTTPException(status_code=500, detail="LLM API key not configured")
     
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        from modules.llm_gateway import get_llm_gateway
         
         # Build prompt based on content type
         prompts = {
@@ -388,13 +388,14 @@ Réponds avec une liste JSON de CTAs courts et percutants."""
         
         prompt = prompts.get(request.content_type, prompts["ad"])
         
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"content-gen-{uuid.uuid4()}",
-            system_message="Tu es un expert en marketing digital et copywriting spécialisé dans l'industrie de la chasse et du plein air au Québec. Tu génères du contenu engageant, authentique et optimisé pour la conversion."
-        ).with_model("openai", "gpt-5.2")
-        
-        response = await chat.send_message(UserMessage(text=prompt))
+        response = await get_llm_gateway().complete(
+            prompt,
+            system_message="Tu es un expert en marketing digital et copywriting spécialisé dans l'industrie de la chasse et du plein air au Québec. Tu génères du contenu engageant, authentique et optimisé pour la conversion.",
+            feature="seo_analytics",
+            provider="openai",
+            model="gpt-5.2",
+            api_key=EMERGENT_LLM_KEY
+        )
         
         return {
             "success": True,
@@ -546,7 +547,7 @@ async def optimize_content(item_id: str, field: str = "all"):
         raise HTTPException(status_code=500, detail="LLM API key not configured")
     
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        from modules.llm_gateway import get_llm_gateway
         
         prompt = f"""Optimise ce contenu marketing pour maximiser l'engagement:
 
@@ -563,13 +564,14 @@ Génère une version améliorée en JSON avec:
 - cta: appel à l'action percutant
 - improvements: liste des améliorations apportées"""
 
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"optimize-{item_id}",
-            system_message="Tu es un expert en optimisation de contenu marketing pour l'industrie de la chasse au Québec."
-        ).with_model("openai", "gpt-5.2")
-        
-        response = await chat.send_message(UserMessage(text=prompt))
+        response = await get_llm_gateway().complete(
+            prompt,
+            system_message="Tu es un expert en optimisation de contenu marketing pour l'industrie de la chasse au Québec.",
+            feature="seo_analytics",
+            provider="openai",
+            model="gpt-5.2",
+            api_key=EMERGENT_LLM_KEY
+        )
         
         # Update item
         new_version = {
@@ -616,7 +618,7 @@ async def suggest_modifications(item_id: str):
         raise HTTPException(status_code=500, detail="LLM API key not configured")
     
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        from modules.llm_gateway import get_llm_gateway
         
         prompt = f"""Analyse ce contenu marketing et génère des suggestions d'amélioration:
 
@@ -633,13 +635,14 @@ Génère une liste JSON de 5-7 suggestions concrètes et actionnables pour amél
 
 Format: [{{"suggestion": "...", "category": "...", "priority": "high/medium/low"}}]"""
 
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"suggest-{item_id}",
-            system_message="Tu es un consultant en marketing digital spécialisé dans l'industrie de la chasse."
-        ).with_model("openai", "gpt-5.2")
-        
-        response = await chat.send_message(UserMessage(text=prompt))
+        response = await get_llm_gateway().complete(
+            prompt,
+            system_message="Tu es un consultant en marketing digital spécialisé dans l'industrie de la chasse.",
+            feature="seo_analytics",
+            provider="openai",
+            model="gpt-5.2",
+            api_key=EMERGENT_LLM_KEY
+        )
         
         suggestion = {
             "id": str(uuid.uuid4()),
@@ -778,7 +781,7 @@ async def analyze_seo(url: str = Body(..., embed=True)):
         raise HTTPException(status_code=500, detail="LLM API key not configured")
     
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        from modules.llm_gateway import get_llm_gateway
         
         prompt = f"""Analyse cette URL et génère des recommandations SEO: {url}
 
@@ -791,13 +794,14 @@ Génère une analyse JSON avec:
 - quick_wins: améliorations rapides à implémenter
 - technical_issues: problèmes techniques potentiels"""
 
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"seo-analyze-{uuid.uuid4()}",
-            system_message="Tu es un expert SEO spécialisé dans les sites e-commerce et les applications web."
-        ).with_model("openai", "gpt-5.2")
-        
-        response = await chat.send_message(UserMessage(text=prompt))
+        response = await get_llm_gateway().complete(
+            prompt,
+            system_message="Tu es un expert SEO spécialisé dans les sites e-commerce et les applications web.",
+            feature="seo_analytics",
+            provider="openai",
+            model="gpt-5.2",
+            api_key=EMERGENT_LLM_KEY
+        )
         
         return {
             "success": True,
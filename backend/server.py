@@ -76,6 +76,17 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Territory sync startup failed: {e}")
     
+    # Flag snapshots (feature controls, site/maintenance mode, master switch)
+    try:
+        from flag_snapshot import flag_snapshot, switch_snapshot
+        from feature_controls import get_db as get_flags_db
+        from modules.global_master_switch.router import get_db as get_switch_db
+        await flag_snapshot.start(await get_flags_db())
+        await switch_snapshot.start(get_switch_db())
+        logger.info("✓ Flag snapshots loaded")
+    except Exception as e:
+        logger.warning(f"Flag snapshot startup failed: {e}")
+    
     logger.info("=" * 60)
     logger.info("✓ All modules loaded successfully")
     logger.info("=" * 60)
@@ -84,12 +95,43 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Server shutting down...")
+    try:
+        from modules.ad_spaces_engine.serving_cache import shutdown_ad_counters
+        await shutdown_ad_counters()
+    except Exception as e:
+        logger.warning(f"Ad counters flush on shutdown failed: {e}")
+
+    try:
+        from modules.products_engine.v1.service import shutdown_product_counters
+        await shutdown_product_counters()
+    except Exception as e:
+        logger.warning(f"Product counters flush on shutdown failed: {e}")
+
     try:
         from territory_sync import shutdown_sync
         await shutdown_sync()
     except Exception:
         pass
 
+    try:
+        from modules.weather_engine.v1.external_service import get_openweathermap_service
+        await get_openweathermap_service().close()
+    except Exception:
+        pass
+
+    try:
+        from flag_snapshot import flag_snapshot, switch_snapshot
+        await flag_snapshot.stop()
+        await switch_snapshot.stop()
+    except Exception:
+        pass
+
+    try:
+        from utils.password_hashing import password_hasher
+        password_hasher.shutdown()
+    except Exception:
+        pass
+
 
 # ==============================================
 # FASTAPI APPLICATION
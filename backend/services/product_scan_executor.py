@@ -0,0 +1,300 @@
+# Product Scan Executor - Scan concurrent des sources de produits
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from urllib.parse import urlparse
+
+import httpx
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+# Pages en cours (téléchargement ou analyse) pour tout le scan
+SCAN_MAX_CONCURRENCY = int(os.environ.get("SCAN_MAX_CONCURRENCY", 8))
+
+# Téléchargements simultanés vers un même hôte
+SCAN_PER_HOST_CONCURRENCY = int(os.environ.get("SCAN_PER_HOST_CONCURRENCY", 2))
+
+# Durée maximale d'une source (secondes)
+SCAN_SOURCE_TIMEOUT = float(os.environ.get("SCAN_SOURCE_TIMEOUT", 300))
+
+# Écritures (produits + checkpoints) regroupées par lot
+SCAN_WRITE_BATCH = int(os.environ.get("SCAN_WRITE_BATCH", 50))
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# Statut d'une page -> compteur du résultat de la source
+PAGE_COUNTERS = {"done": "scanned", "unchanged": "unchanged", "resumed": "resumed", "error": "failed"}
+
+# (html, url, source_name) -> document produit prêt à écrire, ou None si la
+# page n'en contient pas; une exception signale un échec d'analyse
+PageAnalyzer = Callable[[str, str, str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class ProductScanExecutor:
+    """
+    Exécute un scan de découverte sur plusieurs sources en parallèle.
+
+    - plafond global (SCAN_MAX_CONCURRENCY) et par hôte (SCAN_PER_HOST_CONCURRENCY)
+    - délai maximal par source; les pages déjà traitées restent acquises
+    - requêtes conditionnelles (ETag / Last-Modified) et empreinte du
+      contenu: une page inchangée n'est pas réanalysée
+    - checkpoint par page (collection scan_checkpoints): un scan interrompu
+      reprend avec le même run_id sans refaire les pages terminées
+    - produits et checkpoints écrits par bulk_write non ordonnés; les
+      produits d'un lot sont toujours écrits avant ses checkpoints
+    """
+
+    def __init__(
+        self,
+        db,
+        analyzer: PageAnalyzer,
+        max_concurrency: int = SCAN_MAX_CONCURRENCY,
+        per_host: int = SCAN_PER_HOST_CONCURRENCY,
+        source_timeout: float = SCAN_SOURCE_TIMEOUT,
+        batch_size: int = SCAN_WRITE_BATCH,
+        client: Optional[httpx.AsyncClient] = None
+    ):
+        self.db = db
+        self.analyzer = analyzer
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.source_timeout = source_timeout
+        self.batch_size = batch_size
+        self._client = client
+        self._owns_client = client is None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._checkpoints: Dict[str, Dict] = {}
+        self._pending_products: List[Dict] = []
+        self._pending_checkpoints: List[Dict] = []
+        self._flush_lock = asyncio.Lock()
+        self.new_products = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_connections=self.max_concurrency)
+            )
+        return self._client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    # ============================================
+    # EXÉCUTION
+    # ============================================
+
+    async def run(self, sources: List[Dict], run_id: str) -> List[Dict]:
+        """Scanne toutes les sources; un résultat par source, dans l'ordre"""
+        urls = [url for source in sources for url in self._source_urls(source)]
+        if urls:
+            cursor = self.db.scan_checkpoints.find({"url": {"$in": urls}}, {"_id": 0})
+            self._checkpoints = {cp["url"]: cp for cp in await cursor.to_list(len(urls))}
+
+        try:
+            return list(await asyncio.gather(
+                *(self._run_source(source, run_id) for source in sources)
+            ))
+        finally:
+            await self._flush()
+            if self._owns_client and self._client is not None:
+                await self._client.aclose()
+                self._client = None
+
+    @staticmethod
+    def _source_urls(source: Dict) -> List[str]:
+        return list(source.get("urls") or ([source["url"]] if source.get("url") else []))
+
+    async def _run_source(self, source: Dict, run_id: str) -> Dict:
+        name = source.get("name") or source.get("url")
+        result = {
+            "source": name,
+            "url": source.get("url"),
+            "pages": 0,
+            "scanned": 0,
+            "unchanged": 0,
+            "resumed": 0,
+            "failed": 0,
+            "products_found": 0,
+            "errors": []
+        }
+        started = time.monotonic()
+        try:
+            pages = await asyncio.wait_for(
+                asyncio.gather(*(self._scan_page(url, name, run_id) for url in self._source_urls(source))),
+                timeout=self.source_timeout
+            )
+            for page in pages:
+                result["pages"] += 1
+                result[PAGE_COUNTERS[page["status"]]] += 1
+                result["products_found"] += page["products_found"]
+                if page.get("error"):
+                    result["errors"].append(f"{page['url']}: {page['error']}")
+        except asyncio.TimeoutError:
+            # Les pages terminées avant le délai ont déjà leur checkpoint
+            logger.warning(f"Scan of {name} exceeded {self.source_timeout}s")
+            result["error"] = f"timeout after {self.source_timeout}s"
+        except Exception as e:
+            logger.error(f"Error scanning {name}: {e}")
+            result["error"] = str(e)
+        finally:
+            await self._flush()
+
+        result["duration_seconds"] = round(time.monotonic() - started, 3)
+        return result
+
+    async def _scan_page(self, url: str, source_name: str, run_id: str) -> Dict:
+        previous = self._checkpoints.get(url) or {}
+        if previous.get("run_id") == run_id and previous.get("status") in ("done", "unchanged"):
+            return {"url": url, "status": "resumed", "products_found": 0}
+
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+        checkpoint = {"url": url, "source": source_name, "run_id": run_id, "status": "done"}
+        product = None
+        try:
+            async with self._host_slot(url):
+                async with self._slots:
+                    response = await self._get_client().get(url, headers=headers)
+
+            if response.status_code == 304:
+                checkpoint["status"] = "unchanged"
+            elif response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code}")
+            else:
+                checkpoint.update(
+                    etag=response.headers.get("etag"),
+                    last_modified=response.headers.get("last-modified"),
+                    content_hash=hashlib.sha256(response.content).hexdigest()
+                )
+                if previous.get("content_hash") == checkpoint["content_hash"]:
+                    # Serveur sans validateurs: contenu identique au dernier scan
+                    checkpoint["status"] = "unchanged"
+                else:
+                    async with self._slots:
+                        product = await self.analyzer(response.text, url, source_name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Téléchargement ou analyse en échec: les validateurs précédents
+            # restent en place et la page n'est pas terminée, elle sera retentée
+            checkpoint.update(status="error", error=str(e))
+
+        if product:
+            self._pending_products.append(product)
+        return await self._checkpoint(checkpoint, int(bool(product)))
+
+    async def _checkpoint(self, checkpoint: Dict, products_found: int) -> Dict:
+        checkpoint["scanned_at"] = datetime.now(timezone.utc).isoformat()
+        checkpoint["products_found"] = products_found
+        self._pending_checkpoints.append(checkpoint)
+        if len(self._pending_products) + len(self._pending_checkpoints) >= self.batch_size:
+            await self._flush()
+        return {"url": checkpoint["url"], "status": checkpoint["status"],
+                "products_found": products_found, "error": checkpoint.get("error")}
+
+    # ============================================
+    # ÉCRITURES PAR LOT
+    # ============================================
+
+    async def _flush(self):
+        """
+        Écrit les produits puis les checkpoints en attente.
+
+        Une écriture en échec ne perd rien: les opérations refusées
+        (toutes, si l'erreur n'est pas un BulkWriteError) reviennent en
+        attente pour le prochain flush. Si des produits échouent, aucun
+        checkpoint du lot n'est écrit: une page n'est jamais marquée
+        terminée avant que son produit soit en base.
+        """
+        async with self._flush_lock:
+            products, self._pending_products = self._pending_products, []
+            checkpoints, self._pending_checkpoints = self._pending_checkpoints, []
+
+            if products:
+                # Doublon (même content_hash): le produit existant est conservé
+                upserted, failed = await self._bulk_upsert(self.db.discovered_products, [
+                    UpdateOne({"content_hash": doc["content_hash"]}, {"$setOnInsert": doc}, upsert=True)
+                    for doc in products
+                ])
+                created = [products[i] for i in upserted]
+                self.new_products += len(created)
+                if created:
+                    await self.db.admin_notifications.insert_many([
+                        self._notification(doc) for doc in created
+                    ])
+                if failed:
+                    self._pending_products[:0] = [products[i] for i in failed]
+                    self._pending_checkpoints[:0] = checkpoints
+                    return
+
+            if checkpoints:
+                _, failed = await self._bulk_upsert(self.db.scan_checkpoints, [
+                    UpdateOne({"url": cp["url"]}, self._checkpoint_update(cp), upsert=True)
+                    for cp in checkpoints
+                ])
+                if failed:
+                    self._pending_checkpoints[:0] = [checkpoints[i] for i in failed]
+                    failed = set(failed)
+                    checkpoints = [cp for i, cp in enumerate(checkpoints) if i not in failed]
+
+            for cp in checkpoints:
+                merged = dict(self._checkpoints.get(cp["url"]) or {})
+                merged.update(self._checkpoint_update(cp)["$set"])
+                self._checkpoints[cp["url"]] = merged
+
+    @staticmethod
+    async def _bulk_upsert(collection, operations: List[UpdateOne]):
+        """bulk_write non ordonné -> (index upsertés, index en échec)"""
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            return sorted(result.upserted_ids), []
+        except BulkWriteError as e:
+            failed = sorted({err["index"] for err in e.details.get("writeErrors", [])})
+            upserted = sorted(u["index"] for u in e.details.get("upserted", []))
+            logger.error(f"Scan write to {collection.name}: {len(failed)} operation(s) failed, requeued")
+            return upserted, failed
+        except Exception as e:
+            logger.error(f"Scan write to {collection.name} failed, {len(operations)} operation(s) requeued: {e}")
+            return [], list(range(len(operations)))
+
+    @staticmethod
+    def _checkpoint_update(checkpoint: Dict) -> Dict:
+        if checkpoint["status"] == "error":
+            fields = {k: checkpoint[k] for k in ("source", "run_id", "status", "error", "scanned_at")}
+            return {"$set": fields}
+        fields = {k: v for k, v in checkpoint.items() if v is not None and k != "error"}
+        return {"$set": fields, "$unset": {"error": ""}}
+
+    @staticmethod
+    def _notification(doc: Dict) -> Dict:
+        return {
+            "id": str(uuid.uuid4()),
+            "type": "new_product",
+            "title": f"Nouveau produit détecté: {doc.get('name_fr')}",
+            "message": f"Score: {doc.get('score_total')}/100 | Catégorie: {doc.get('category')} | Prix: ${doc.get('price_regular')}",
+            "product_id": doc.get("id"),
+            "is_read": False,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
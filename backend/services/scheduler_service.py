@@ -1,4 +1,5 @@
 # Scheduler Service - Automated Background Tasks
+import os
 import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
@@ -161,22 +162,40 @@ class SchedulerService:
         return False
     
     async def _run_product_scan(self, sources: list = None):
-        """Exécute le scan de découverte de produits"""
+        """
+        Exécute le scan de découverte de produits.
+        
+        Les sources sont scannées en parallèle par ProductScanExecutor
+        (plafonds global et par hôte, délai par source, requêtes
+        conditionnelles, écritures par lot). Un scan interrompu est
+        repris au prochain lancement avec le même identifiant.
+        """
         from product_discovery import ProductDiscoveryService
+        from services.product_scan_executor import ProductScanExecutor
         
         logger.info("🔍 Starting automatic product discovery scan...")
         scan_start = datetime.now(timezone.utc)
+        run_id = f"scan_{scan_start.strftime('%Y%m%d_%H%M%S')}"
+        discovery_service = None
         
         try:
-            # Initialize discovery service
-            discovery_service = ProductDiscoveryService(self.db)
-            
             # Get scanner config
             config = await self.db.scanner_config.find_one({"id": "main_scanner"})
             if not config:
                 config = {}
             
-            # Run scan for each source
+            # Reprendre un scan interrompu (checkpoints par page)
+            current = config.get("current_scan") or {}
+            if current.get("run_id"):
+                run_id = current["run_id"]
+                logger.info(f"Resuming interrupted scan {run_id}")
+            else:
+                await self.db.scanner_config.update_one(
+                    {"id": "main_scanner"},
+                    {"$set": {"current_scan": {"run_id": run_id, "started_at": scan_start.isoformat()}}},
+                    upsert=True
+                )
+            
             scan_sources = sources or config.get("sources", [])
             if not scan_sources:
                 scan_sources = [
@@ -184,34 +203,25 @@ class SchedulerService:
                     {"url": "https://www.cabelas.ca/fr", "name": "Cabela's Canada"}
                 ]
             
-            total_discovered = 0
-            results = []
+            discovery_service = ProductDiscoveryService(os.environ.get("EMERGENT_LLM_KEY", ""), self.db)
+            discovery_config = await discovery_service.get_config()
+            
+            async def analyze(html: str, url: str, source_name: str):
+                product = await discovery_service.prepare_product(
+                    html, url, source_name, discovery_config.min_score_threshold
+                )
+                return discovery_service.product_document(product) if product else None
             
-            for source in scan_sources:
-                try:
-                    # Simulate scan (in production, this would actually scrape)
-                    source_result = await discovery_service.scan_source(
-                        source_url=source.get("url"),
-                        source_name=source.get("name")
-                    )
-                    
-                    total_discovered += source_result.get("products_found", 0)
-                    results.append(source_result)
-                    
-                except Exception as e:
-                    logger.error(f"Error scanning {source.get('name')}: {e}")
-                    results.append({
-                        "source": source.get("name"),
-                        "error": str(e),
-                        "products_found": 0
-                    })
+            executor = ProductScanExecutor(self.db, analyze)
+            results = await executor.run(scan_sources, run_id)
+            total_discovered = executor.new_products
             
             scan_end = datetime.now(timezone.utc)
             duration = (scan_end - scan_start).total_seconds()
             
             # Save scan result
             scan_log = {
-                "id": f"scan_{scan_start.strftime('%Y%m%d_%H%M%S')}",
+                "id": run_id,
                 "started_at": scan_start.isoformat(),
                 "completed_at": scan_end.isoformat(),
                 "duration_seconds": duration,
@@ -221,7 +231,7 @@ class SchedulerService:
                 "status": "completed"
             }
             
-            await self.db.scan_logs.insert_one(scan_log)
+            await self.db.scan_logs.insert_one(dict(scan_log))
             
             # Update last scan time
             await self.db.scanner_config.update_one(
@@ -231,7 +241,8 @@ class SchedulerService:
                         "last_scan": scan_end.isoformat(),
                         "last_scan_duration": duration,
                         "last_scan_products": total_discovered
-                    }
+                    },
+                    "$unset": {"current_scan": ""}
                 }
             )
             
@@ -255,7 +266,7 @@ class SchedulerService:
             
             # Save failed scan log
             await self.db.scan_logs.insert_one({
-                "id": f"scan_{scan_start.strftime('%Y%m%d_%H%M%S')}",
+                "id": run_id,
                 "started_at": scan_start.isoformat(),
                 "completed_at": datetime.now(timezone.utc).isoformat(),
                 "status": "failed",
@@ -263,6 +274,9 @@ class SchedulerService:
             })
             
             raise
+        finally:
+            if discovery_service is not None:
+                await discovery_service.close()
     
     async def run_scan_now(self, sources: list = None):
         """Force un scan immédiat"""
@@ -18,6 +18,7 @@ from dotenv import load_dotenv
 # Import role-based authentication
 from modules.roles_engine.v1.dependencies import require_admin, get_optional_user_with_role
 from modules.roles_engine.v1.models import UserWithRole
+from flag_snapshot import flag_snapshot
 
 load_dotenv()
 
@@ -152,6 +153,8 @@ async def disable_all_features(admin_email: str = "system"):
         "reason": "Mode maintenance activé - Désactivation automatique"
     })
     
+    flag_snapshot.apply_features({feature_id: False for feature_id in FEATURE_IDS})
+    
     logger.info(f"Disabled {disabled_count} features for maintenance mode")
     return disabled_count
 
@@ -199,6 +202,8 @@ async def restore_feature_states(admin_email: str = "system"):
         "reason": "Sortie du mode maintenance - Restauration automatique"
     })
     
+    flag_snapshot.apply_features(dict(backup["states"]), replace=True)
+    
     logger.info(f"Restored {restored_count} feature states from maintenance backup")
     return restored_count
 
@@ -209,10 +214,11 @@ async def restore_feature_states(admin_email: str = "system"):
 
 @access_router.get("/status")
 async def get_site_status():
-    """Get current site status (public endpoint)"""
+    """Get current site status (public endpoint) - served from the flag snapshot"""
     database = await get_db()
     
-    config = await database.site_config.find_one({"_id": "main"})
+    await flag_snapshot.ensure_loaded(database)
+    config = flag_snapshot.document("site_config")
     
     if not config:
         # Initialize with default config (development mode)
@@ -220,8 +226,7 @@ async def get_site_status():
         config["_id"] = "main"
         await database.site_config.insert_one(config)
         del config["_id"]
-    else:
-        del config["_id"]
+        flag_snapshot.apply_document("site_config", config)
     
     return {
         "mode": config.get("mode", "live"),
@@ -266,7 +271,8 @@ async def update_site_mode(
     database = await get_db()
     
     # Get current mode to detect mode changes
-    current_config = await database.site_config.find_one({"_id": "main"})
+    await flag_snapshot.ensure_loaded(database)
+    current_config = flag_snapshot.document("site_config")
     current_mode = current_config.get("mode", "live") if current_config else "live"
     
     update_data = {
@@ -308,6 +314,7 @@ async def update_site_mode(
         {"$set": update_data},
         upsert=True
     )
+    flag_snapshot.apply_document("site_config", {**(current_config or {}), **update_data})
     
     mode_labels = {
         "live": "🟢 En ligne",
@@ -347,6 +354,7 @@ async def add_allowed_ip(
         {"$addToSet": {"allowed_ips": ip}},
         upsert=True
     )
+    await flag_snapshot.refresh(database)
     
     logger.info(f"IP {ip} whitelisted by {admin.email}")
     return {"success": True, "message": f"IP {ip} ajoutée à la liste blanche"}
@@ -363,6 +371,7 @@ async def remove_allowed_ip(
         {"_id": "main"},
         {"$pull": {"allowed_ips": ip}}
     )
+    await flag_snapshot.refresh(database)
     
     logger.info(f"IP {ip} removed from whitelist by {admin.email}")
     return {"success": True, "message": f"IP {ip} retirée de la liste blanche"}
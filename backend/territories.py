@@ -16,6 +16,7 @@ import logging
 import re
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from territory_tiles import territory_written, mark_all_stale
 from bson import ObjectId
 
 # Setup logging
@@ -390,6 +391,7 @@ async def create_territory(territory: TerritoryCreate):
         }
         
         result = await db.territories.insert_one(doc)
+        await territory_written(db, {"_id": result.inserted_id})
         territory_id = str(result.inserted_id)
         doc['id'] = territory_id
         if '_id' in doc:
@@ -593,6 +595,7 @@ async def update_territory(territory_id: str, update: TerritoryUpdate):
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Territoire non trouvé")
+        await territory_written(db, query)
         
         # Get updated document
         territory = await db.territories.find_one(query)
@@ -632,6 +635,7 @@ async def delete_territory(territory_id: str):
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Territoire non trouvé")
+        await territory_written(db, query)
         
         return {
             "success": True,
@@ -676,6 +680,7 @@ async def calculate_territory_score(territory_id: str):
                 "scoring.last_calculated": datetime.now(timezone.utc).isoformat()
             }}
         )
+        await territory_written(db, query)
         
         return {
             "success": True,
@@ -716,6 +721,7 @@ async def update_territory_scoring(territory_id: str, scoring: TerritoryScoring)
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Territoire non trouvé")
+        await territory_written(db, query)
         
         return {
             "success": True,
@@ -895,6 +901,9 @@ async def batch_import_territories(territories: List[TerritoryCreate]):
             except Exception as e:
                 errors.append({"name": territory.name, "error": str(e)})
         
+        if created:
+            mark_all_stale()
+        
         return {
             "success": True,
             "message": f"Import terminé: {created} créés, {skipped} ignorés",
@@ -1294,6 +1303,7 @@ async def seed_sample_territories():
             }
     
     await db.territories.insert_many(sample_territories)
+    mark_all_stale()
     logger.info(f"Seeded {len(sample_territories)} sample territories")
     
     return len(sample_territories)
@@ -1440,6 +1450,7 @@ async def sync_partnership_to_territory(partner_request_id: str):
         )
         
         if result.modified_count > 0:
+            await territory_written(db, {"_id": ObjectId(territory_id)})
             logger.info(f"Synced partnership {partner_request_id} back to territory {territory_id}")
             return {"success": True, "synced": territory_id}
         else:
@@ -22,6 +22,12 @@ from PIL import Image
 import exifread
 from io import BytesIO
 from motor.motor_asyncio import AsyncIOMotorClient
+from territory_routes import optimize_waypoints, optimize_waypoint_batch, matrix_cache_stats
+from territory_tracks import (
+    ensure_track_indexes, new_track_fields, append_point, read_points,
+    delete_track_points, track_summary, points_count, duration_minutes
+)
+from territory_heatmap import ensure_heatmap_indexes, activity_heatmap, DEFAULT_ZOOM as DEFAULT_HEATMAP_ZOOM
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -58,6 +64,8 @@ async def get_db():
         await db.territory_events.create_index([("latitude", 1), ("longitude", 1)])
         await db.territory_cameras.create_index("user_id")
         await db.territory_photos.create_index("user_id")
+        await ensure_track_indexes(db)
+        await ensure_heatmap_indexes(db)
     return db
 
 async def close_db():
@@ -882,49 +890,37 @@ async def get_photo_image(photo_id: str):
 # ===========================================
 
 @territory_router.get("/layers/heatmap_activite")
-async def get_heatmap_activite(user_id: str, species: Optional[str] = None, hours: int = 72):
-    """Get activity heatmap data (P2 NORMALIZED - reads from geo_entities)"""
+async def get_heatmap_activite(
+    user_id: str,
+    species: Optional[str] = None,
+    hours: int = 72,
+    zoom: int = DEFAULT_HEATMAP_ZOOM,
+    north: Optional[float] = None,
+    south: Optional[float] = None,
+    east: Optional[float] = None,
+    west: Optional[float] = None
+):
+    """Get activity heatmap data (P2 NORMALIZED - aggregated from geo_entities)"""
     database = await get_db()
     
-    cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-    
-    # Query geo_entities with entity_type: observation
-    query = {
-        "user_id": user_id,
-        "entity_type": "observation",
-        "created_at": {"$gte": cutoff_time}
-    }
-    
-    if species:
-        query["metadata.species"] = species
-    
-    events = await database.geo_entities.find(query).to_list(1000)
+    bounds = {"north": north, "south": south, "east": east, "west": west}
+    viewport = None
+    if any(v is not None for v in bounds.values()):
+        if any(v is None for v in bounds.values()):
+            raise HTTPException(status_code=400, detail="Viewport requires north, south, east and west")
+        if south >= north or west >= east:
+            raise HTTPException(status_code=400, detail="Invalid viewport bounds")
+        viewport = bounds
     
-    # Group by approximate grid cell (0.001 degree ~ 100m)
-    grid_data = {}
-    for event in events:
-        location = event.get('location', {})
-        coords = location.get('coordinates', [0, 0])
-        lng, lat = coords[0], coords[1]
-        
-        lat_rounded = round(lat, 3)
-        lon_rounded = round(lng, 3)
-        key = f"{lat_rounded},{lon_rounded}"
-        
-        if key not in grid_data:
-            grid_data[key] = {
-                "lat": lat_rounded,
-                "lon": lon_rounded,
-                "intensity": 0,
-                "species": event.get('metadata', {}).get('species')
-            }
-        grid_data[key]["intensity"] += 1
+    cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+    heatmap = await activity_heatmap(database, user_id, cutoff_time, zoom, species, viewport)
     
     return {
         "type": "heatmap",
         "time_window_hours": hours,
         "species_filter": species,
-        "points": list(grid_data.values())
+        "viewport": viewport,
+        **heatmap
     }
 
 @territory_router.get("/stats")
@@ -1419,12 +1415,11 @@ async def create_track(user_id: str, track: TrackCreate):
         "user_id": user_id,
         "name": track.name,
         "description": track.description,
-        "points": [],
         "started_at": now,
         "ended_at": None,
         "is_active": True,
-        "distance_km": 0,
-        "created_at": now
+        "created_at": now,
+        **new_track_fields()
     }
     
     await database.territory_tracks.insert_one(track_doc)
@@ -1466,22 +1461,13 @@ async def add_track_point(track_id: str, user_id: str, point: TrackPointCreate):
         "timestamp": now
     }
     
-    # Calculate distance from last point
-    additional_distance = 0
-    if track['points']:
-        last_point = track['points'][-1]
-        additional_distance = haversine_distance(
-            last_point['lat'], last_point['lon'],
-            point.latitude, point.longitude
-        )
-    
-    await database.territory_tracks.update_one(
-        {"_id": track_id},
-        {
-            "$push": {"points": point_data},
-            "$inc": {"distance_km": additional_distance}
-        }
-    )
+    # Append into the current bucket; summary stats updated on the track
+    try:
+        additional_distance = await append_point(database, track, point_data)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Track is not active")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
     return {
         "status": "added",
@@ -1511,8 +1497,9 @@ async def stop_track(track_id: str, user_id: str):
         "status": "stopped",
         "track_id": track_id,
         "ended_at": now,
-        "total_points": len(track.get('points', [])),
-        "total_distance_km": round(track.get('distance_km', 0), 2)
+        "total_points": points_count(track),
+        "total_distance_km": round(track.get('distance_km', 0), 2),
+        "bounds": track.get('bounds')
     }
 
 @territory_router.get("/tracks")
@@ -1524,22 +1511,18 @@ async def list_tracks(user_id: str, active_only: bool = False):
     if active_only:
         query["is_active"] = True
     
-    tracks = await database.territory_tracks.find(query).sort("created_at", -1).to_list(100)
+    # Summary fields only; points live in territory_track_buckets
+    tracks = await database.territory_tracks.find(query, {"last_point": 0}).sort("created_at", -1).to_list(100)
     
     results = []
     for track in tracks:
-        duration = 0
-        if track.get('started_at'):
-            end_time = track.get('ended_at') or datetime.now(timezone.utc)
-            duration = (end_time - track['started_at']).total_seconds() / 60
-        
         results.append(TrackResponse(
             id=str(track['_id']),
             name=track['name'],
             description=track.get('description'),
-            points_count=len(track.get('points', [])),
+            points_count=points_count(track),
             distance_km=round(track.get('distance_km', 0), 2),
-            duration_minutes=round(duration, 1),
+            duration_minutes=round(duration_minutes(track), 1),
             started_at=track['started_at'],
             ended_at=track.get('ended_at'),
             is_active=track.get('is_active', False)
@@ -1548,8 +1531,8 @@ async def list_tracks(user_id: str, active_only: bool = False):
     return results
 
 @territory_router.get("/tracks/{track_id}")
-async def get_track(track_id: str, user_id: str):
-    """Get track details including all points"""
+async def get_track(track_id: str, user_id: str, start: int = 0, limit: int = 5000):
+    """Get track details with its points (first `limit` points from `start`)"""
     database = await get_db()
     
     track = await database.territory_tracks.find_one({"_id": track_id, "user_id": user_id})
@@ -1557,24 +1540,52 @@ async def get_track(track_id: str, user_id: str):
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    duration = 0
-    if track.get('started_at'):
-        end_time = track.get('ended_at') or datetime.now(timezone.utc)
-        duration = (end_time - track['started_at']).total_seconds() / 60
+    summary = track_summary(track)
+    points = await read_points(database, track, start=max(start, 0), limit=limit)
     
     return {
         "id": str(track['_id']),
         "name": track['name'],
         "description": track.get('description'),
-        "points": track.get('points', []),
-        "points_count": len(track.get('points', [])),
-        "distance_km": round(track.get('distance_km', 0), 2),
-        "duration_minutes": round(duration, 1),
+        "points": points,
+        **summary,
+        "has_more": max(start, 0) + len(points) < summary["points_count"],
         "started_at": track['started_at'],
         "ended_at": track.get('ended_at'),
         "is_active": track.get('is_active', False)
     }
 
+@territory_router.get("/tracks/{track_id}/points")
+async def get_track_points(
+    track_id: str,
+    user_id: str,
+    start: int = 0,
+    limit: int = 1000,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Ranged read of track points, by index offset or time window"""
+    database = await get_db()
+    
+    track = await database.territory_tracks.find_one(
+        {"_id": track_id, "user_id": user_id}, {"last_point": 0}
+    )
+    
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
+    
+    points = await read_points(
+        database, track, start=max(start, 0), limit=max(limit, 0), since=since, until=until
+    )
+    
+    return {
+        "track_id": track_id,
+        "start": max(start, 0),
+        "points": points,
+        "count": len(points),
+        "points_count": points_count(track)
+    }
+
 @territory_router.delete("/tracks/{track_id}")
 async def delete_track(track_id: str, user_id: str):
     """Delete a track"""
@@ -1585,6 +1596,8 @@ async def delete_track(track_id: str, user_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Track not found")
     
+    await delete_track_points(database, track_id)
+    
     return {"status": "deleted", "id": track_id}
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -1612,6 +1625,7 @@ class GuidedRouteRequest(BaseModel):
     start_from_current_position: bool = False
     current_lat: Optional[float] = None
     current_lng: Optional[float] = None
+    return_to_start: bool = False
 
 class RouteSegment(BaseModel):
     from_waypoint: dict
@@ -1707,57 +1721,6 @@ def calculate_point_probability(lat: float, lng: float, species: str) -> dict:
         "factors": factors
     }
 
-def optimize_waypoint_order(waypoints: list, start_point: dict = None, optimization: str = 'balanced') -> list:
-    """
-    Optimize waypoint order using a nearest-neighbor algorithm with probability weighting.
-    Returns waypoints in optimized order.
-    """
-    if len(waypoints) <= 1:
-        return waypoints
-    
-    remaining = waypoints.copy()
-    ordered = []
-    
-    # Start from the provided point or the first waypoint
-    if start_point:
-        current = start_point
-    else:
-        current = remaining.pop(0)
-        ordered.append(current)
-    
-    while remaining:
-        best_next = None
-        best_score = float('inf')
-        
-        for wp in remaining:
-            distance = haversine_distance(
-                current['latitude'], current['longitude'],
-                wp['latitude'], wp['longitude']
-            )
-            
-            prob_score = wp.get('probability', {}).get('score', 50)
-            
-            if optimization == 'probability':
-                # Prioritize high probability zones
-                score = distance - (prob_score * 0.05)  # Bonus for high probability
-            elif optimization == 'distance':
-                # Pure shortest distance
-                score = distance
-            else:  # balanced
-                # Balance between distance and probability
-                score = distance - (prob_score * 0.02)
-            
-            if score < best_score:
-                best_score = score
-                best_next = wp
-        
-        if best_next:
-            remaining.remove(best_next)
-            ordered.append(best_next)
-            current = best_next
-    
-    return ordered
-
 @territory_router.post("/analysis/guided-route", response_model=GuidedRouteResponse)
 async def generate_guided_route(request: GuidedRouteRequest, user_id: str):
     """
@@ -1806,16 +1769,15 @@ async def generate_guided_route(request: GuidedRouteRequest, user_id: str):
             "probability": calculate_point_probability(request.current_lat, request.current_lng, request.species)
         }
     
-    # Optimize waypoint order
-    optimized_waypoints = optimize_waypoint_order(
-        waypoints_with_prob, 
-        start_point,
-        request.optimize_for
+    # Optimize waypoint order (start point included, CPU work off the event loop)
+    route = await asyncio.to_thread(
+        optimize_waypoints,
+        waypoints_with_prob,
+        start_point=start_point,
+        return_to_start=request.return_to_start,
+        optimization=request.optimize_for
     )
-    
-    # If we have a start point, prepend it
-    if start_point and start_point not in optimized_waypoints:
-        optimized_waypoints.insert(0, start_point)
+    optimized_waypoints = route["waypoints"]
     
     # Build route segments
     segments = []
@@ -1916,6 +1878,59 @@ async def generate_guided_route(request: GuidedRouteRequest, user_id: str):
         summary=summary
     )
 
+class RoutePoint(BaseModel):
+    id: Optional[str] = None
+    latitude: float
+    longitude: float
+    probability_score: Optional[float] = None
+
+class RouteOptimizationRequest(BaseModel):
+    waypoints: List[RoutePoint] = Field(..., min_length=1, max_length=300)
+    start: Optional[RoutePoint] = None
+    end: Optional[RoutePoint] = None
+    return_to_start: bool = False
+    optimize_for: Literal['probability', 'distance', 'balanced'] = 'distance'
+
+class RouteBatchRequest(BaseModel):
+    routes: List[RouteOptimizationRequest] = Field(..., min_length=1, max_length=20)
+    time_budget_seconds: float = Field(default=2.0, gt=0, le=5)
+
+def _route_point(point: RoutePoint) -> dict:
+    data = point.model_dump()
+    if point.probability_score is not None:
+        data["probability"] = {"score": point.probability_score}
+    return data
+
+@territory_router.post("/analysis/route-optimize/batch")
+async def optimize_route_batch(request: RouteBatchRequest):
+    """
+    Optimize the visiting order of several waypoint sets at once.
+    
+    Each set is solved with 2-opt / Or-opt local search; the time budget
+    is shared between sets according to their size.
+    """
+    problems = [{
+        "waypoints": [_route_point(wp) for wp in route.waypoints],
+        "start_point": _route_point(route.start) if route.start else None,
+        "end_point": _route_point(route.end) if route.end else None,
+        "return_to_start": route.return_to_start,
+        "optimization": route.optimize_for
+    } for route in request.routes]
+    
+    results = await asyncio.to_thread(optimize_waypoint_batch, problems, request.time_budget_seconds)
+    
+    return {
+        "routes": [{
+            "order": [{"id": wp.get("id"), "lat": wp["latitude"], "lng": wp["longitude"]} for wp in r["waypoints"]],
+            "distance_km": r["distance_km"],
+            "initial_distance_km": r["initial_distance_km"],
+            "improvement_pct": r["improvement_pct"],
+            "timed_out": r["timed_out"],
+            "elapsed_ms": r["elapsed_ms"]
+        } for r in results],
+        "matrix_cache": matrix_cache_stats()
+    }
+
 # ===========================================
 # CLIMATE & COOLING ZONES
 # ===========================================
@@ -2003,72 +2018,16 @@ async def get_cooling_zones(
 # GPX IMPORT/EXPORT
 # ===========================================
 
-GPX_HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
-<gpx version="1.1" creator="BIONIC Territory Analysis"
-  xmlns="http://www.topografix.com/GPX/1/1"
-  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
-  xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd">
-  <metadata>
-    <name>{name}</name>
-    <desc>{description}</desc>
-    <time>{time}</time>
-  </metadata>
-'''
-
-GPX_FOOTER = '</gpx>'
-
 @territory_router.get("/export/gpx")
 async def export_gpx(user_id: str, include_waypoints: bool = True, include_tracks: bool = True):
-    """Export all waypoints and tracks as GPX file"""
-    from fastapi.responses import Response
+    """Export all waypoints and tracks as GPX file (streamed in chunks)"""
+    from fastapi.responses import StreamingResponse
+    from territory_gpx import stream_gpx_export
     
     database = await get_db()
     
-    now = datetime.now(timezone.utc).isoformat()
-    gpx_content = GPX_HEADER.format(
-        name="BIONIC Territory Export",
-        description=f"Export des données de territoire - {now}",
-        time=now
-    )
-    
-    # Export waypoints
-    if include_waypoints:
-        waypoints = await database.territory_waypoints.find({"user_id": user_id}).to_list(1000)
-        for wp in waypoints:
-            gpx_content += f'''  <wpt lat="{wp['latitude']}" lon="{wp['longitude']}">
-    <name>{wp['name']}</name>
-    <desc>{wp.get('description', '')}</desc>
-    <type>{wp['waypoint_type']}</type>
-    <time>{wp['created_at'].isoformat() if wp.get('created_at') else now}</time>
-  </wpt>
-'''
-    
-    # Export tracks
-    if include_tracks:
-        tracks = await database.territory_tracks.find({"user_id": user_id, "is_active": False}).to_list(100)
-        for track in tracks:
-            if track.get('points') and len(track['points']) > 0:
-                gpx_content += f'''  <trk>
-    <name>{track['name']}</name>
-    <desc>{track.get('description', '')}</desc>
-    <trkseg>
-'''
-                for point in track['points']:
-                    alt_str = f'<ele>{point["alt"]}</ele>' if point.get('alt') else ''
-                    time_str = f'<time>{point["timestamp"].isoformat()}</time>' if point.get('timestamp') else ''
-                    gpx_content += f'''      <trkpt lat="{point['lat']}" lon="{point['lon']}">
-        {alt_str}
-        {time_str}
-      </trkpt>
-'''
-                gpx_content += '''    </trkseg>
-  </trk>
-'''
-    
-    gpx_content += GPX_FOOTER
-    
-    return Response(
-        content=gpx_content,
+    return StreamingResponse(
+        stream_gpx_export(database, user_id, include_waypoints, include_tracks),
         media_type="application/gpx+xml",
         headers={
             "Content-Disposition": f"attachment; filename=bionic_territory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.gpx"
@@ -2076,127 +2035,53 @@ async def export_gpx(user_id: str, include_waypoints: bool = True, include_track
     )
 
 @territory_router.post("/import/gpx")
-async def import_gpx(user_id: str = Form(...), file: UploadFile = File(...)):
-    """Import waypoints and tracks from GPX file"""
-    import xml.etree.ElementTree as ET
+async def import_gpx(
+    user_id: str = Form(...),
+    file: UploadFile = File(...),
+    import_id: Optional[str] = Form(None)
+):
+    """
+    Import waypoints and tracks from GPX file.
     
-    database = await get_db()
+    The upload is parsed incrementally and written in batches; pass an
+    import_id to follow progress on /import/gpx/{import_id}.
+    """
+    from territory_gpx import import_gpx_stream, ImportExistsError
     
-    content = await file.read()
+    database = await get_db()
     
     try:
-        root = ET.fromstring(content)
-    except ET.ParseError as e:
-        raise HTTPException(status_code=400, detail=f"Invalid GPX file: {e}")
+        result = await import_gpx_stream(database, user_id, file, import_id=import_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportExistsError as e:
+        # Re-sent upload: the client polls /import/gpx/{import_id} instead
+        raise HTTPException(status_code=409, detail=str(e))
     
-    # GPX namespace
-    ns = {'gpx': 'http://www.topografix.com/GPX/1/1'}
-    
-    imported_waypoints = 0
-    imported_tracks = 0
-    
-    # Import waypoints
-    for wpt in root.findall('.//gpx:wpt', ns) + root.findall('.//wpt'):
-        try:
-            lat = float(wpt.get('lat'))
-            lon = float(wpt.get('lon'))
-            
-            name_elem = wpt.find('gpx:name', ns) or wpt.find('name')
-            name = name_elem.text if name_elem is not None else f"Waypoint importé"
-            
-            desc_elem = wpt.find('gpx:desc', ns) or wpt.find('desc')
-            desc = desc_elem.text if desc_elem is not None else None
-            
-            type_elem = wpt.find('gpx:type', ns) or wpt.find('type')
-            wp_type = type_elem.text if type_elem is not None and type_elem.text in ['observation', 'camera', 'cache', 'stand', 'water', 'trail_start', 'custom'] else 'custom'
-            
-            waypoint_id = str(uuid.uuid4())
-            waypoint_doc = {
-                "_id": waypoint_id,
-                "user_id": user_id,
-                "latitude": lat,
-                "longitude": lon,
-                "name": name,
-                "description": desc,
-                "waypoint_type": wp_type,
-                "icon": None,
-                "created_at": datetime.now(timezone.utc),
-                "imported": True
-            }
-            
-            await database.territory_waypoints.insert_one(waypoint_doc)
-            imported_waypoints += 1
-            
-        except (ValueError, AttributeError) as e:
-            logger.warning(f"Failed to import waypoint: {e}")
-            continue
-    
-    # Import tracks
-    for trk in root.findall('.//gpx:trk', ns) + root.findall('.//trk'):
-        try:
-            name_elem = trk.find('gpx:name', ns) or trk.find('name')
-            name = name_elem.text if name_elem is not None else f"Tracé importé {datetime.now().strftime('%Y-%m-%d')}"
-            
-            desc_elem = trk.find('gpx:desc', ns) or trk.find('desc')
-            desc = desc_elem.text if desc_elem is not None else None
-            
-            points = []
-            total_distance = 0
-            
-            for trkseg in trk.findall('.//gpx:trkseg', ns) + trk.findall('.//trkseg'):
-                for trkpt in trkseg.findall('gpx:trkpt', ns) + trkseg.findall('trkpt'):
-                    lat = float(trkpt.get('lat'))
-                    lon = float(trkpt.get('lon'))
-                    
-                    ele_elem = trkpt.find('gpx:ele', ns) or trkpt.find('ele')
-                    alt = float(ele_elem.text) if ele_elem is not None else None
-                    
-                    time_elem = trkpt.find('gpx:time', ns) or trkpt.find('time')
-                    timestamp = datetime.fromisoformat(time_elem.text.replace('Z', '+00:00')) if time_elem is not None else datetime.now(timezone.utc)
-                    
-                    if points:
-                        total_distance += haversine_distance(
-                            points[-1]['lat'], points[-1]['lon'],
-                            lat, lon
-                        )
-                    
-                    points.append({
-                        "lat": lat,
-                        "lon": lon,
-                        "alt": alt,
-                        "timestamp": timestamp
-                    })
-            
-            if points:
-                track_id = str(uuid.uuid4())
-                track_doc = {
-                    "_id": track_id,
-                    "user_id": user_id,
-                    "name": name,
-                    "description": desc,
-                    "points": points,
-                    "started_at": points[0]['timestamp'] if points else datetime.now(timezone.utc),
-                    "ended_at": points[-1]['timestamp'] if points else datetime.now(timezone.utc),
-                    "is_active": False,
-                    "distance_km": total_distance,
-                    "created_at": datetime.now(timezone.utc),
-                    "imported": True
-                }
-                
-                await database.territory_tracks.insert_one(track_doc)
-                imported_tracks += 1
-                
-        except (ValueError, AttributeError) as e:
-            logger.warning(f"Failed to import track: {e}")
-            continue
+    imported_waypoints = result["imported_waypoints"]
+    imported_tracks = result["imported_tracks"]
     
     return {
         "status": "success",
+        "import_id": result["import_id"],
         "imported_waypoints": imported_waypoints,
         "imported_tracks": imported_tracks,
+        "imported_points": result["imported_points"],
+        "skipped": result["skipped"],
         "message": f"Importé {imported_waypoints} waypoints et {imported_tracks} tracés"
     }
 
+@territory_router.get("/import/gpx/{import_id}")
+async def get_gpx_import_progress(import_id: str, user_id: str):
+    """Progress of a GPX import"""
+    from territory_gpx import get_import_progress
+    
+    database = await get_db()
+    progress = await get_import_progress(database, import_id, user_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
+
 # ===========================================
 # NUTRITION ANALYSIS & BIONIC PRODUCTS
 # ===========================================
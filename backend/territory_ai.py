@@ -2,10 +2,11 @@
 BIONIC™ Territory AI Recommendations & Cartography Module
 - AI-powered recommendations by species/season
 - GeoJSON integration for heatmaps
+- z/x/y GeoJSON tiles with ETags (map panning)
 - Partnership module integration
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
@@ -13,7 +14,11 @@ import os
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
-import random
+
+from territory_tiles import (
+    build_territory_query, territory_position, territory_feature, heatmap_value,
+    get_tile, etag_matches, tile_cache, territory_written, HEATMAP_METRICS
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -443,74 +448,18 @@ async def get_territories_geojson(
 ):
     """Get territories as GeoJSON for map integration"""
     try:
-        query = {"status": "active"}
-        
-        if province:
-            query["province"] = province
-        if establishment_type:
-            query["establishment_type"] = establishment_type
-        if species:
-            query["species"] = {"$in": [species]}
-        if min_score:
-            query["scoring.global_score"] = {"$gte": min_score}
+        query = build_territory_query(province, establishment_type, species, min_score)
         
         territories = await db.territories.find(query).to_list(500)
-        
-        # Province default coordinates
-        province_coords = {
-            "QC": {"lat": 46.8, "lon": -71.2, "spread": 4},
-            "ON": {"lat": 43.7, "lon": -79.4, "spread": 3},
-            "NB": {"lat": 46.1, "lon": -66.1, "spread": 1.5},
-            "NS": {"lat": 44.6, "lon": -63.6, "spread": 1},
-            "NL": {"lat": 53.1, "lon": -57.5, "spread": 3},
-            "MB": {"lat": 49.9, "lon": -98.8, "spread": 3},
-            "SK": {"lat": 52.1, "lon": -106.7, "spread": 3},
-            "AB": {"lat": 53.5, "lon": -114.1, "spread": 3},
-            "BC": {"lat": 49.3, "lon": -123.1, "spread": 4},
-            "YT": {"lat": 64.0, "lon": -135.0, "spread": 3},
-            "NT": {"lat": 64.0, "lon": -125.0, "spread": 4}
-        }
+        total = len(territories)
+        if total == 500:
+            total = await db.territories.count_documents(query)
         
         features = []
-        for idx, territory in enumerate(territories):
-            coords = territory.get("coordinates", {}) or {}
-            prov = territory.get("province", "QC")
-            prov_default = province_coords.get(prov, province_coords["QC"])
-            
-            # Get or generate coordinates
-            lat = coords.get("latitude")
-            lon = coords.get("longitude")
-            
-            if not lat or not lon:
-                # Generate coordinates based on province with offset for visual separation
-                spread = prov_default["spread"]
-                # Use index for deterministic but spread placement
-                offset_lat = ((idx * 17) % 100) / 100 * spread - spread/2
-                offset_lon = ((idx * 23) % 100) / 100 * spread - spread/2
-                lat = prov_default["lat"] + offset_lat
-                lon = prov_default["lon"] + offset_lon
-            
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [lon, lat]
-                },
-                "properties": {
-                    "id": str(territory.get("_id")),
-                    "internal_id": territory.get("internal_id"),
-                    "name": territory.get("name"),
-                    "establishment_type": territory.get("establishment_type"),
-                    "province": prov,
-                    "region": territory.get("region"),
-                    "global_score": territory.get("scoring", {}).get("global_score", 0),
-                    "success_rate": territory.get("success_rate"),
-                    "species": territory.get("species", []),
-                    "is_verified": territory.get("is_verified", False),
-                    "is_partner": territory.get("is_partner", False)
-                }
-            }
-            features.append(feature)
+        for territory in territories:
+            lon, lat, estimated = territory_position(territory)
+            territory["location_estimated"] = estimated
+            features.append(territory_feature(territory, lon, lat))
         
         geojson = {
             "type": "FeatureCollection",
@@ -518,6 +467,9 @@ async def get_territories_geojson(
             "metadata": {
                 "generated_at": datetime.now(timezone.utc).isoformat(),
                 "total_features": len(features),
+                "total_matching": total,
+                "truncated": total > len(features),
+                "tiles": "/api/territories/ai/tiles/{z}/{x}/{y}",
                 "filters": {
                     "province": province,
                     "establishment_type": establishment_type,
@@ -541,55 +493,24 @@ async def get_heatmap_data(
 ):
     """Get heatmap data for territories"""
     try:
-        valid_metrics = ["score", "success", "pressure", "density"]
-        if metric not in valid_metrics:
-            raise HTTPException(status_code=400, detail=f"Métrique invalide. Valides: {valid_metrics}")
+        if metric not in HEATMAP_METRICS:
+            raise HTTPException(status_code=400, detail=f"Métrique invalide. Valides: {HEATMAP_METRICS}")
         
-        query = {"status": "active"}
-        if province:
-            query["province"] = province
+        query = build_territory_query(province)
         
         territories = await db.territories.find(query).to_list(500)
+        total = len(territories)
+        if total == 500:
+            total = await db.territories.count_documents(query)
         
         heatmap_points = []
         
         for territory in territories:
-            coords = territory.get("coordinates") or {}
-            
-            # Get value based on metric
-            if metric == "score":
-                value = territory.get("scoring", {}).get("global_score", 0)
-            elif metric == "success":
-                value = territory.get("success_rate", 0) or 0
-            elif metric == "pressure":
-                value = 100 - territory.get("scoring", {}).get("pressure_index", 50)  # Invert for heatmap
-            elif metric == "density":
-                value = territory.get("scoring", {}).get("habitat_index", 50)
-            else:
-                value = 50
-            
-            # Get or generate coordinates
-            lat = coords.get("latitude")
-            lon = coords.get("longitude")
-            
-            if not lat or not lon:
-                province_coords = {
-                    "QC": [-71.2, 46.8],
-                    "ON": [-79.4, 43.7],
-                    "NB": [-66.1, 46.1],
-                    "NL": [-57.5, 53.1],
-                    "AB": [-114.1, 53.5],
-                    "BC": [-123.1, 49.3],
-                    "SK": [-106.7, 52.1]
-                }
-                default = province_coords.get(territory.get("province", "QC"), [-71.2, 46.8])
-                lon = default[0] + random.uniform(-3, 3)
-                lat = default[1] + random.uniform(-3, 3)
-            
+            lon, lat, _ = territory_position(territory)
             heatmap_points.append({
                 "lat": lat,
                 "lon": lon,
-                "value": value,
+                "value": heatmap_value(territory, metric),
                 "name": territory.get("name"),
                 "id": str(territory.get("_id"))
             })
@@ -599,6 +520,8 @@ async def get_heatmap_data(
             "metric": metric,
             "points": heatmap_points,
             "count": len(heatmap_points),
+            "total_matching": total,
+            "truncated": total > len(heatmap_points),
             "legend": {
                 "score": "Score BIONIC™ (0-100)",
                 "success": "Taux de succès (%)",
@@ -614,6 +537,52 @@ async def get_heatmap_data(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/tiles/stats")
+async def get_tile_cache_stats():
+    """Tile cache statistics"""
+    return {"success": True, "cache": tile_cache.stats()}
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_territory_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    metric: Optional[str] = None,
+    province: Optional[str] = None,
+    establishment_type: Optional[str] = None,
+    species: Optional[str] = None,
+    min_score: Optional[float] = None
+):
+    """
+    Territories of one z/x/y map tile as GeoJSON (or heatmap points with `metric`).
+    
+    Supports If-None-Match: unchanged tiles return 304.
+    """
+    try:
+        etag, body = await get_tile(
+            db, z, x, y,
+            filters={
+                "province": province,
+                "establishment_type": establishment_type,
+                "species": species,
+                "min_score": min_score
+            },
+            metric=metric
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating tile {z}/{x}/{y}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/geo+json", headers=headers)
+
+
 # ============================================
 # API ENDPOINTS - PARTNERSHIP INTEGRATION
 # ============================================
@@ -693,6 +662,7 @@ async def convert_to_partner(territory_id: str):
                 "updated_at": datetime.now(timezone.utc)
             }}
         )
+        await territory_written(db, query)
         
         # Create partnership request
         partnership_request = {
@@ -0,0 +1,519 @@
+"""
+Chasse Bionic™ / BIONIC™ - Territory GPX Streaming
+Streaming GPX import/export for territory waypoints and tracks
+
+- Export: async generator fed by Mongo cursors, emitted in ~64 KB chunks
+- Import: incremental pull parser fed by the upload stream, elements are
+  detached from the tree as soon as they are consumed
+- Track points leave the parser one bucket at a time, so a long <trk> is
+  never held whole in memory
+- Writes batched with insert_many; a progress record per import
+- Track points are stored in bucket documents (see territory_tracks)
+"""
+
+import uuid
+import logging
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, AsyncIterator
+from xml.sax.saxutils import escape, quoteattr
+
+from pymongo.errors import DuplicateKeyError
+
+from territory_tracks import (
+    BUCKETS_COLLECTION, BUCKET_SIZE, haversine_km, iter_points, build_buckets, merge_bounds
+)
+
+logger = logging.getLogger(__name__)
+
+GPX_HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="BIONIC Territory Analysis"
+  xmlns="http://www.topografix.com/GPX/1/1"
+  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+  xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd">
+  <metadata>
+    <name>{name}</name>
+    <desc>{description}</desc>
+    <time>{time}</time>
+  </metadata>
+'''
+
+GPX_FOOTER = '</gpx>\n'
+
+WAYPOINT_TYPES = ['observation', 'camera', 'cache', 'stand', 'water', 'trail_start', 'custom']
+
+# Streaming parameters
+EXPORT_CHUNK_SIZE = 64 * 1024
+IMPORT_READ_SIZE = 64 * 1024
+WAYPOINT_BATCH_SIZE = 500
+TRACK_BATCH_POINTS = 20000
+
+IMPORTS_COLLECTION = "territory_gpx_imports"
+
+
+class ImportExistsError(Exception):
+    """An import with this import_id was already started"""
+
+    def __init__(self, progress: Dict[str, Any]):
+        super().__init__(f"Import {progress.get('import_id')} already exists ({progress.get('status')})")
+        self.progress = progress
+
+
+def _iso(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+# ===========================================
+# EXPORT
+# ===========================================
+
+def waypoint_to_gpx(wp: Dict[str, Any], default_time: str) -> str:
+    return (
+        f'  <wpt lat={quoteattr(str(wp["latitude"]))} lon={quoteattr(str(wp["longitude"]))}>\n'
+        f'    <name>{escape(str(wp.get("name") or ""))}</name>\n'
+        f'    <desc>{escape(str(wp.get("description") or ""))}</desc>\n'
+        f'    <type>{escape(str(wp.get("waypoint_type") or "custom"))}</type>\n'
+        f'    <time>{_iso(wp.get("created_at")) or default_time}</time>\n'
+        f'  </wpt>\n'
+    )
+
+
+def trackpoint_to_gpx(point: Dict[str, Any]) -> str:
+    parts = [f'      <trkpt lat={quoteattr(str(point["lat"]))} lon={quoteattr(str(point["lon"]))}>']
+    if point.get("alt") is not None:
+        parts.append(f'<ele>{point["alt"]}</ele>')
+    if point.get("timestamp"):
+        parts.append(f'<time>{_iso(point["timestamp"])}</time>')
+    parts.append('</trkpt>\n')
+    return "".join(parts)
+
+
+async def stream_gpx_export(
+    database,
+    user_id: str,
+    include_waypoints: bool = True,
+    include_tracks: bool = True,
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Generate a GPX document chunk by chunk.
+
+    Waypoints and tracks are read through cursors, so memory is bounded by
+    one track document plus one output chunk.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    buffer: List[str] = [GPX_HEADER.format(
+        name="BIONIC Territory Export",
+        description=f"Export des données de territoire - {now}",
+        time=now
+    )]
+    size = len(buffer[0])
+
+    def drain() -> bytes:
+        nonlocal buffer, size
+        data = "".join(buffer).encode("utf-8")
+        buffer, size = [], 0
+        return data
+
+    if include_waypoints:
+        cursor = database.territory_waypoints.find({"user_id": user_id}).sort("created_at", 1)
+        async for wp in cursor:
+            text = waypoint_to_gpx(wp, now)
+            buffer.append(text)
+            size += len(text)
+            if size >= chunk_size:
+                yield drain()
+
+    if include_tracks:
+        cursor = database.territory_tracks.find(
+            {"user_id": user_id, "is_active": False}
+        ).sort("created_at", 1)
+        async for track in cursor:
+            header_written = False
+            async for point in iter_points(database, track):
+                if not header_written:
+                    text = (
+                        f'  <trk>\n'
+                        f'    <name>{escape(str(track.get("name") or ""))}</name>\n'
+                        f'    <desc>{escape(str(track.get("description") or ""))}</desc>\n'
+                        f'    <trkseg>\n'
+                    )
+                    buffer.append(text)
+                    size += len(text)
+                    header_written = True
+                text = trackpoint_to_gpx(point)
+                buffer.append(text)
+                size += len(text)
+                if size >= chunk_size:
+                    yield drain()
+            if header_written:
+                text = '    </trkseg>\n  </trk>\n'
+                buffer.append(text)
+                size += len(text)
+
+    buffer.append(GPX_FOOTER)
+    yield drain()
+
+
+# ===========================================
+# IMPORT
+# ===========================================
+
+def _local(tag: str) -> str:
+    """Tag name without its XML namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child_text(elem: ET.Element, name: str) -> Optional[str]:
+    for child in elem:
+        if _local(child.tag) == name:
+            return child.text
+    return None
+
+
+def _parse_time(text: Optional[str]) -> datetime:
+    if not text:
+        return datetime.now(timezone.utc)
+    return datetime.fromisoformat(text.strip().replace('Z', '+00:00'))
+
+
+class GpxStreamParser:
+    """
+    Incremental GPX parser.
+
+    feed() accepts raw bytes as they arrive and returns the items completed
+    by that chunk: waypoints, and for each track a "track_start", its points
+    in "track_points" batches of at most BUCKET_SIZE, then a "track_end"
+    with the name and distance. Consumed elements are cleared and detached
+    from their parent so the tree never grows.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._stack: List[ET.Element] = []
+        self._track: Optional[Dict[str, Any]] = None
+        self.skipped = 0
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._parser.close()
+        return self._drain()
+
+    def _detach(self, elem: ET.Element):
+        elem.clear()
+        if self._stack:
+            self._stack[-1].remove(elem)
+
+    def _points_batch(self) -> Dict[str, Any]:
+        points, self._track["points"] = self._track["points"], []
+        return {"kind": "track_points", "points": points}
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        items = []
+        for event, elem in self._parser.read_events():
+            tag = _local(elem.tag)
+            if event == "start":
+                self._stack.append(elem)
+                if tag == "trk":
+                    self._track = {"points": [], "last": None, "distance_km": 0.0}
+                    items.append({"kind": "track_start"})
+                continue
+
+            self._stack.pop()
+            if tag == "wpt":
+                item = self._waypoint(elem)
+                if item:
+                    items.append(item)
+                self._detach(elem)
+            elif tag == "trkpt" and self._track is not None:
+                self._trackpoint(elem)
+                self._detach(elem)
+                if len(self._track["points"]) >= BUCKET_SIZE:
+                    items.append(self._points_batch())
+            elif tag == "trk" and self._track is not None:
+                if self._track["points"]:
+                    items.append(self._points_batch())
+                track, self._track = self._track, None
+                items.append({
+                    "kind": "track_end",
+                    "name": _child_text(elem, "name"),
+                    "description": _child_text(elem, "desc"),
+                    "distance_km": track["distance_km"]
+                })
+                self._detach(elem)
+            elif tag == "rte":
+                # Routes are not imported; drop them early as well
+                self._detach(elem)
+        return items
+
+    def _waypoint(self, elem: ET.Element) -> Optional[Dict[str, Any]]:
+        try:
+            lat = float(elem.get('lat'))
+            lon = float(elem.get('lon'))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Failed to import waypoint: {e}")
+            self.skipped += 1
+            return None
+        wp_type = _child_text(elem, "type")
+        return {
+            "kind": "waypoint",
+            "latitude": lat,
+            "longitude": lon,
+            "name": _child_text(elem, "name") or "Waypoint importé",
+            "description": _child_text(elem, "desc"),
+            "waypoint_type": wp_type if wp_type in WAYPOINT_TYPES else 'custom'
+        }
+
+    def _trackpoint(self, elem: ET.Element):
+        try:
+            lat = float(elem.get('lat'))
+            lon = float(elem.get('lon'))
+            ele = _child_text(elem, "ele")
+            point = {
+                "lat": lat,
+                "lon": lon,
+                "alt": float(ele) if ele else None,
+                "timestamp": _parse_time(_child_text(elem, "time"))
+            }
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Failed to import track point: {e}")
+            self.skipped += 1
+            return
+        last = self._track["last"]
+        if last:
+            self._track["distance_km"] += haversine_km(last["lat"], last["lon"], lat, lon)
+        self._track["last"] = point
+        self._track["points"].append(point)
+
+
+class GpxImportWriter:
+    """
+    Writes parsed items with insert_many, updating the progress record.
+
+    Track points are turned into buckets as they arrive and written every
+    TRACK_BATCH_POINTS points; the track document itself is inserted once
+    its </trk> is reached, after all of its buckets.
+    """
+
+    def __init__(self, database, user_id: str, import_id: str):
+        self.database = database
+        self.user_id = user_id
+        self.import_id = import_id
+        self._waypoints: List[Dict[str, Any]] = []
+        self._tracks: List[Dict[str, Any]] = []
+        self._buckets: List[Dict[str, Any]] = []
+        self._bucket_points = 0
+        self._track: Optional[Dict[str, Any]] = None
+        self.counts = {"waypoints": 0, "tracks": 0, "points": 0}
+
+    def _base(self) -> Dict[str, Any]:
+        return {
+            "_id": str(uuid.uuid4()),
+            "user_id": self.user_id,
+            "created_at": datetime.now(timezone.utc),
+            "imported": True,
+            "import_id": self.import_id
+        }
+
+    async def add(self, item: Dict[str, Any]) -> bool:
+        """Buffer an item; returns True if a batch was written"""
+        kind = item["kind"]
+        if kind == "waypoint":
+            self._waypoints.append({
+                **self._base(),
+                "latitude": item["latitude"],
+                "longitude": item["longitude"],
+                "name": item["name"],
+                "description": item["description"],
+                "waypoint_type": item["waypoint_type"],
+                "icon": None
+            })
+            if len(self._waypoints) >= WAYPOINT_BATCH_SIZE:
+                return await self.flush_waypoints()
+            return False
+        if kind == "track_start":
+            self._track = {**self._base(), "points_count": 0, "bounds": None, "first": None, "last": None}
+            return False
+        if kind == "track_points":
+            return await self._add_points(item["points"])
+        return await self._end_track(item)
+
+    async def _add_points(self, points: List[Dict[str, Any]]) -> bool:
+        track = self._track
+        self._buckets.extend(build_buckets(
+            track["_id"], points, {"user_id": self.user_id, "import_id": self.import_id},
+            start=track["points_count"]
+        ))
+        track["points_count"] += len(points)
+        track["bounds"] = merge_bounds(track["bounds"], points)
+        track["first"] = track["first"] or points[0]
+        track["last"] = points[-1]
+        self._bucket_points += len(points)
+        if self._bucket_points >= TRACK_BATCH_POINTS:
+            return await self.flush_buckets()
+        return False
+
+    async def _end_track(self, item: Dict[str, Any]) -> bool:
+        track, self._track = self._track, None
+        if not track or not track["points_count"]:
+            return False
+        first, last = track.pop("first"), track.pop("last")
+        self._tracks.append({
+            **track,
+            "name": item["name"] or f"Tracé importé {datetime.now().strftime('%Y-%m-%d')}",
+            "description": item["description"],
+            "started_at": first["timestamp"],
+            "ended_at": last["timestamp"],
+            "is_active": False,
+            "distance_km": item["distance_km"],
+            "first_point_at": first["timestamp"],
+            "last_point_at": last["timestamp"],
+            "last_point": last
+        })
+        if len(self._tracks) >= WAYPOINT_BATCH_SIZE:
+            return await self.flush_tracks()
+        return False
+
+    async def flush_waypoints(self) -> bool:
+        if not self._waypoints:
+            return False
+        batch, self._waypoints = self._waypoints, []
+        await self.database.territory_waypoints.insert_many(batch, ordered=False)
+        self.counts["waypoints"] += len(batch)
+        return True
+
+    async def flush_buckets(self) -> bool:
+        if not self._buckets:
+            return False
+        buckets, self._buckets = self._buckets, []
+        await self.database[BUCKETS_COLLECTION].insert_many(buckets, ordered=False)
+        self.counts["points"] += self._bucket_points
+        self._bucket_points = 0
+        return True
+
+    async def flush_tracks(self) -> bool:
+        # Buckets first: a track document never points at missing data
+        wrote = await self.flush_buckets()
+        if not self._tracks:
+            return wrote
+        batch, self._tracks = self._tracks, []
+        await self.database.territory_tracks.insert_many(batch, ordered=False)
+        self.counts["tracks"] += len(batch)
+        return True
+
+    async def flush(self):
+        await self.flush_waypoints()
+        await self.flush_tracks()
+
+    async def rollback(self):
+        """Remove everything written by this import"""
+        await self.database.territory_waypoints.delete_many({"import_id": self.import_id})
+        await self.database.territory_tracks.delete_many({"import_id": self.import_id})
+        await self.database[BUCKETS_COLLECTION].delete_many({"import_id": self.import_id})
+
+
+async def _update_progress(database, import_id: str, fields: Dict[str, Any]):
+    fields["updated_at"] = datetime.now(timezone.utc)
+    await database[IMPORTS_COLLECTION].update_one({"_id": import_id}, {"$set": fields})
+
+
+async def import_gpx_stream(
+    database,
+    user_id: str,
+    upload,
+    import_id: Optional[str] = None,
+    read_size: int = IMPORT_READ_SIZE
+) -> Dict[str, Any]:
+    """
+    Import a GPX upload incrementally.
+
+    Args:
+        upload: object with an async read(size) method (FastAPI UploadFile)
+        import_id: optional client-chosen id, to poll progress during upload
+
+    Raises:
+        ValueError: invalid GPX (nothing from this import is kept)
+        ImportExistsError: import_id was already used (re-sent upload)
+    """
+    import_id = import_id or str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    try:
+        await database[IMPORTS_COLLECTION].insert_one({
+            "_id": import_id,
+            "user_id": user_id,
+            "filename": getattr(upload, "filename", None),
+            "bytes_total": getattr(upload, "size", None),
+            "bytes_read": 0,
+            "status": "running",
+            "waypoints": 0,
+            "tracks": 0,
+            "points": 0,
+            "started_at": now,
+            "updated_at": now
+        })
+    except DuplicateKeyError:
+        existing = await get_import_progress(database, import_id, user_id)
+        raise ImportExistsError(existing or {"import_id": import_id, "status": "unknown"})
+
+    parser = GpxStreamParser()
+    writer = GpxImportWriter(database, user_id, import_id)
+    bytes_read = 0
+
+    async def progress():
+        await _update_progress(database, import_id, {"bytes_read": bytes_read, **writer.counts})
+
+    try:
+        while True:
+            chunk = await upload.read(read_size)
+            if not chunk:
+                items = parser.close()
+            else:
+                bytes_read += len(chunk)
+                items = parser.feed(chunk)
+            wrote = False
+            for item in items:
+                wrote = await writer.add(item) or wrote
+            if wrote:
+                await progress()
+            if not chunk:
+                break
+        await writer.flush()
+    except ET.ParseError as e:
+        await writer.rollback()
+        await _update_progress(database, import_id, {
+            "status": "failed", "error": f"Invalid GPX file: {e}", "finished_at": datetime.now(timezone.utc)
+        })
+        raise ValueError(f"Invalid GPX file: {e}")
+    except Exception as e:
+        await _update_progress(database, import_id, {
+            "status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc)
+        })
+        raise
+
+    await _update_progress(database, import_id, {
+        "status": "completed",
+        "bytes_read": bytes_read,
+        "skipped": parser.skipped,
+        "finished_at": datetime.now(timezone.utc),
+        **writer.counts
+    })
+
+    return {
+        "import_id": import_id,
+        "imported_waypoints": writer.counts["waypoints"],
+        "imported_tracks": writer.counts["tracks"],
+        "imported_points": writer.counts["points"],
+        "skipped": parser.skipped
+    }
+
+
+async def get_import_progress(database, import_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    doc = await database[IMPORTS_COLLECTION].find_one({"_id": import_id, "user_id": user_id})
+    if doc:
+        doc["import_id"] = doc.pop("_id")
+    return doc
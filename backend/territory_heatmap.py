@@ -0,0 +1,147 @@
+"""
+Chasse Bionic™ / BIONIC™ - Territory Activity Heatmap
+Server-side aggregation of observations into heatmap cells
+
+- Observations (geo_entities, entity_type "observation") are binned by a
+  $group on quantized coordinates inside MongoDB: every observation in the
+  time window counts, there is no document cap
+- Cells form a pyramid: the cell size halves at each zoom level and
+  cells are aligned on floor(coordinate / size), so a cell at zoom z is
+  exactly four cells at zoom z + 1
+- A viewport (north/south/east/west) restricts the match to the visible
+  area; only its cells are returned
+- Counts are computed at read time from geo_entities, so observations
+  written by imports, migrations or the geo engine are always included
+"""
+
+import logging
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+from territory_tiles import bbox_polygon
+
+logger = logging.getLogger(__name__)
+
+# Zoom 16 keeps the historical 0.001° (~100 m) cells
+DEFAULT_ZOOM = 16
+BASE_CELL_DEG = 0.001
+MIN_ZOOM = 4
+MAX_ZOOM = 18
+
+# Most intense cells returned per request
+MAX_CELLS = 5000
+
+# Wider viewports cannot be one 2dsphere polygon; the exact rectangle
+# filter after the projection is then the only spatial filter
+MAX_GEO_VIEWPORT_DEGREES = 180
+
+
+async def ensure_heatmap_indexes(database):
+    # The 2dsphere index on location is created by the geo engine
+    await database.geo_entities.create_index([("user_id", 1), ("entity_type", 1), ("created_at", -1)])
+
+
+def cell_size(zoom: int) -> float:
+    """Cell edge in degrees at a zoom level"""
+    zoom = max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+    return BASE_CELL_DEG * 2 ** (DEFAULT_ZOOM - zoom)
+
+
+def _viewport_polygon(north: float, south: float, east: float, west: float) -> Dict[str, Any]:
+    """
+    $geoWithin polygon covering the viewport. Its edges are geodesics, which
+    bow towards the pole between two corners: the box is padded and its
+    latitude edges densified (as for map tiles) so no point near the south
+    edge falls outside; the exact rectangle is applied after the projection.
+    """
+    return bbox_polygon(west, south, east, north)
+
+
+def heatmap_pipeline(
+    user_id: str,
+    since: datetime,
+    zoom: int = DEFAULT_ZOOM,
+    species: Optional[str] = None,
+    viewport: Optional[Dict[str, float]] = None,
+    max_cells: int = MAX_CELLS
+) -> List[Dict[str, Any]]:
+    """
+    Aggregation pipeline returning one document
+    {"cells": [{"_id": {"x", "y"}, "intensity", "species"}], "totals": [...]}
+    """
+    size = cell_size(zoom)
+    match: Dict[str, Any] = {
+        "user_id": user_id,
+        "entity_type": "observation",
+        "created_at": {"$gte": since}
+    }
+    if species:
+        match["metadata.species"] = species
+
+    pipeline: List[Dict[str, Any]] = []
+    if viewport and viewport["east"] - viewport["west"] < MAX_GEO_VIEWPORT_DEGREES:
+        # $geoWithin can use the 2dsphere index
+        match["location"] = {"$geoWithin": {"$geometry": _viewport_polygon(**viewport)}}
+    pipeline.append({"$match": match})
+    pipeline.append({"$project": {
+        "_id": 0,
+        "lng": {"$arrayElemAt": ["$location.coordinates", 0]},
+        "lat": {"$arrayElemAt": ["$location.coordinates", 1]},
+        "species": "$metadata.species"
+    }})
+    if viewport:
+        pipeline.append({"$match": {
+            "lat": {"$gte": viewport["south"], "$lte": viewport["north"]},
+            "lng": {"$gte": viewport["west"], "$lte": viewport["east"]}
+        }})
+
+    pipeline.extend([
+        {"$group": {
+            "_id": {
+                "x": {"$floor": {"$divide": ["$lng", size]}},
+                "y": {"$floor": {"$divide": ["$lat", size]}}
+            },
+            "intensity": {"$sum": 1},
+            "species": {"$first": "$species"}
+        }},
+        {"$facet": {
+            "cells": [{"$sort": {"intensity": -1, "_id.y": 1, "_id.x": 1}}, {"$limit": max_cells}],
+            "totals": [{"$group": {"_id": None, "cells": {"$sum": 1}, "observations": {"$sum": "$intensity"}}}]
+        }}
+    ])
+    return pipeline
+
+
+async def activity_heatmap(
+    database,
+    user_id: str,
+    since: datetime,
+    zoom: int = DEFAULT_ZOOM,
+    species: Optional[str] = None,
+    viewport: Optional[Dict[str, float]] = None,
+    max_cells: int = MAX_CELLS
+) -> Dict[str, Any]:
+    """Heatmap cells (center lat/lon, intensity, species) for a user's observations"""
+    size = cell_size(zoom)
+    pipeline = heatmap_pipeline(user_id, since, zoom, species, viewport, max_cells)
+    result = await database.geo_entities.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {"cells": [], "totals": []}
+    totals = facets["totals"][0] if facets["totals"] else {"cells": 0, "observations": 0}
+
+    points = [
+        {
+            "lat": round((cell["_id"]["y"] + 0.5) * size, 6),
+            "lon": round((cell["_id"]["x"] + 0.5) * size, 6),
+            "intensity": cell["intensity"],
+            "species": cell.get("species")
+        }
+        for cell in facets["cells"]
+    ]
+    return {
+        "zoom": max(MIN_ZOOM, min(MAX_ZOOM, zoom)),
+        "cell_size_deg": size,
+        "total_cells": totals["cells"],
+        "total_observations": totals["observations"],
+        "truncated": totals["cells"] > len(points),
+        "points": points
+    }
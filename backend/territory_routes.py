@@ -0,0 +1,291 @@
+"""
+Chasse Bionic™ / BIONIC™ - Territory Route Optimization
+Waypoint ordering for guided routes
+
+- Pairwise haversine distance matrix computed with NumPy and cached per
+  coordinate set
+- Nearest-neighbour construction (optionally probability weighted),
+  improved by 2-opt and Or-opt local search under a time budget
+- Optional fixed start, fixed end or return to start
+- Batch API for several waypoint sets
+"""
+
+import time
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+
+from utils.performance import LRUCache
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+# Default local search budget per route (seconds)
+DEFAULT_TIME_BUDGET = 0.25
+
+# Longest segment moved by Or-opt
+OR_OPT_MAX_SEGMENT = 3
+
+# Probability bonus (km per score point) used by the greedy construction
+PROBABILITY_WEIGHTS = {"distance": 0.0, "balanced": 0.02, "probability": 0.05}
+
+_matrix_cache = LRUCache(maxsize=256, ttl=3600)
+
+
+# ===========================================
+# DISTANCE MATRIX
+# ===========================================
+
+def distance_matrix(lats, lngs) -> np.ndarray:
+    """Pairwise great-circle distances (km), shape (n, n)"""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lng = np.radians(np.asarray(lngs, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cached_distance_matrix(lats, lngs) -> np.ndarray:
+    """distance_matrix() memoized on the (rounded) coordinate set"""
+    coords = np.round(np.column_stack([lats, lngs]).astype(float), 6)
+    key = hashlib.sha1(coords.tobytes()).hexdigest()
+    matrix = _matrix_cache.get(key)
+    if matrix is None:
+        matrix = distance_matrix(coords[:, 0], coords[:, 1])
+        matrix.setflags(write=False)
+        _matrix_cache.set(key, matrix)
+    return matrix
+
+
+def matrix_cache_stats() -> Dict[str, Any]:
+    return _matrix_cache.stats()
+
+
+# ===========================================
+# LOCAL SEARCH
+# ===========================================
+
+@dataclass
+class RouteResult:
+    order: List[int]
+    distance_km: float
+    initial_distance_km: float
+    iterations: int = 0
+    timed_out: bool = False
+    elapsed_ms: float = 0.0
+    moves: Dict[str, int] = field(default_factory=lambda: {"two_opt": 0, "or_opt": 0})
+
+
+def _path_length(dist: np.ndarray, path: List[int]) -> float:
+    idx = np.asarray(path)
+    return float(dist[idx[:-1], idx[1:]].sum())
+
+
+def _nearest_neighbour(dist: np.ndarray, head: int, nodes: List[int], bonus: np.ndarray) -> List[int]:
+    remaining = np.asarray(nodes)
+    order = []
+    current = head
+    while remaining.size:
+        scores = dist[current, remaining] - bonus[remaining]
+        k = int(np.argmin(scores))
+        current = int(remaining[k])
+        order.append(current)
+        remaining = np.delete(remaining, k)
+    return order
+
+
+def _two_opt_pass(dist: np.ndarray, path: List[int], deadline: float) -> int:
+    """One first-improvement sweep of segment reversals; returns moves applied"""
+    moves = 0
+    n = len(path)
+    for i in range(1, n - 2):
+        if time.perf_counter() > deadline:
+            break
+        p = np.asarray(path)
+        a, b = p[i - 1], p[i]
+        js = np.arange(i + 1, n - 1)
+        c, d = p[js], p[js + 1]
+        delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+        k = int(np.argmin(delta))
+        if delta[k] < -1e-9:
+            j = int(js[k])
+            path[i:j + 1] = path[i:j + 1][::-1]
+            moves += 1
+    return moves
+
+
+def _or_opt_pass(dist: np.ndarray, path: List[int], deadline: float) -> int:
+    """Relocate segments of 1..OR_OPT_MAX_SEGMENT nodes (either direction)"""
+    moves = 0
+    for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+        i = 1
+        while i + length < len(path):
+            if time.perf_counter() > deadline:
+                return moves
+            seg = path[i:i + length]
+            prev, nxt = path[i - 1], path[i + length]
+            removal_gain = dist[prev, seg[0]] + dist[seg[-1], nxt] - dist[prev, nxt]
+
+            rest = path[:i] + path[i + length:]
+            r = np.asarray(rest)
+            u, v = r[:-1], r[1:]
+            forward = dist[u, seg[0]] + dist[seg[-1], v] - dist[u, v]
+            backward = dist[u, seg[-1]] + dist[seg[0], v] - dist[u, v]
+            best_f, best_b = int(np.argmin(forward)), int(np.argmin(backward))
+            if forward[best_f] <= backward[best_b]:
+                pos, cost, insert = best_f, forward[best_f], seg
+            else:
+                pos, cost, insert = best_b, backward[best_b], seg[::-1]
+
+            if cost - removal_gain < -1e-9:
+                path[:] = rest[:pos + 1] + insert + rest[pos + 1:]
+                moves += 1
+            else:
+                i += 1
+    return moves
+
+
+def solve_route(
+    dist: np.ndarray,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    return_to_start: bool = False,
+    bonus: Optional[np.ndarray] = None,
+    time_budget: float = DEFAULT_TIME_BUDGET
+) -> RouteResult:
+    """
+    Order all nodes of `dist` into a short path.
+
+    Free endpoints are modelled with a ghost node at zero distance from
+    every node, so 2-opt and Or-opt always work on a path with fixed ends.
+
+    Args:
+        start: index of a fixed first node
+        end: index of a fixed last node (ignored with return_to_start)
+        return_to_start: close the loop back to `start` (or the first node)
+        bonus: per-node score subtracted during greedy construction
+        time_budget: seconds allowed for local search
+    """
+    began = time.perf_counter()
+    n = dist.shape[0]
+    if n <= 1:
+        return RouteResult(order=list(range(n)), distance_km=0.0, initial_distance_km=0.0)
+
+    ghost = n
+    ext = np.zeros((n + 1, n + 1))
+    ext[:n, :n] = dist
+    bonus = np.zeros(n + 1) if bonus is None else np.append(np.asarray(bonus, dtype=float), 0.0)
+
+    if return_to_start and start is None:
+        start = 0
+    head = start if start is not None else ghost
+    tail = start if return_to_start else (end if end is not None and end != start else ghost)
+    interior = [i for i in range(n) if i not in (head, tail)]
+
+    path = [head] + _nearest_neighbour(ext, head, interior, bonus) + [tail]
+    initial = _path_length(ext, path)
+
+    deadline = began + time_budget
+    result = RouteResult(order=[], distance_km=initial, initial_distance_km=initial)
+    while time.perf_counter() < deadline:
+        result.iterations += 1
+        two = _two_opt_pass(ext, path, deadline)
+        orr = _or_opt_pass(ext, path, deadline)
+        result.moves["two_opt"] += two
+        result.moves["or_opt"] += orr
+        if not two and not orr:
+            break
+    else:
+        result.timed_out = True
+
+    order = [node for node in path if node != ghost]
+    if return_to_start:
+        order = order[:-1]
+    result.order = order
+    result.distance_km = _path_length(ext, path)
+    result.elapsed_ms = (time.perf_counter() - began) * 1000
+    return result
+
+
+# ===========================================
+# WAYPOINT API
+# ===========================================
+
+def optimize_waypoints(
+    waypoints: List[Dict[str, Any]],
+    start_point: Optional[Dict[str, Any]] = None,
+    end_point: Optional[Dict[str, Any]] = None,
+    return_to_start: bool = False,
+    optimization: str = "balanced",
+    time_budget: float = DEFAULT_TIME_BUDGET
+) -> Dict[str, Any]:
+    """
+    Order waypoints ({latitude, longitude, probability?}) into a short route.
+
+    The start/end points, when given, are included in the returned order.
+    In 'probability' mode without a start point, the route starts at the
+    highest-probability waypoint. Returns {"waypoints", "distance_km", ...}.
+    """
+    nodes = list(waypoints)
+    start_idx = end_idx = None
+    if start_point is not None:
+        nodes.insert(0, start_point)
+        start_idx = 0
+    if end_point is not None and not return_to_start:
+        nodes.append(end_point)
+        end_idx = len(nodes) - 1
+
+    scores = np.array([wp.get("probability", {}).get("score", 50) for wp in nodes], dtype=float)
+    if start_idx is None and optimization == "probability" and nodes:
+        start_idx = int(np.argmax(scores))
+
+    dist = cached_distance_matrix(
+        [wp["latitude"] for wp in nodes],
+        [wp["longitude"] for wp in nodes]
+    )
+    result = solve_route(
+        dist,
+        start=start_idx,
+        end=end_idx,
+        return_to_start=return_to_start,
+        bonus=scores * PROBABILITY_WEIGHTS.get(optimization, PROBABILITY_WEIGHTS["balanced"]),
+        time_budget=time_budget
+    )
+    ordered = [nodes[i] for i in result.order]
+    return {
+        "waypoints": ordered + ([ordered[0]] if return_to_start and ordered else []),
+        "order": result.order,
+        "distance_km": round(result.distance_km, 3),
+        "initial_distance_km": round(result.initial_distance_km, 3),
+        "improvement_pct": round(
+            100 * (1 - result.distance_km / result.initial_distance_km), 1
+        ) if result.initial_distance_km else 0.0,
+        "iterations": result.iterations,
+        "moves": result.moves,
+        "timed_out": result.timed_out,
+        "elapsed_ms": round(result.elapsed_ms, 1)
+    }
+
+
+def optimize_waypoint_batch(
+    problems: List[Dict[str, Any]],
+    total_budget: float = 2.0
+) -> List[Dict[str, Any]]:
+    """
+    Optimize several waypoint sets; the time budget is shared, weighted by
+    each set's size. Each problem takes the keyword arguments of
+    optimize_waypoints().
+    """
+    weights = [max(len(p.get("waypoints", [])), 1) ** 2 for p in problems]
+    total = sum(weights) or 1
+    results = []
+    for problem, weight in zip(problems, weights):
+        kwargs = dict(problem)
+        kwargs.setdefault("time_budget", total_budget * weight / total)
+        results.append(optimize_waypoints(**kwargs))
+    return results
@@ -20,6 +20,7 @@ import csv
 import io
 import re
 from motor.motor_asyncio import AsyncIOMotorClient
+from territory_tiles import territory_written
 from bson import ObjectId
 
 # Setup logging
@@ -848,6 +849,7 @@ async def import_territory_data(data: Dict) -> Dict:
                     **{k: v for k, v in data.items() if v is not None}
                 }}
             )
+            await territory_written(db, {"_id": existing["_id"]})
             return {"status": "updated", "id": str(existing["_id"]), "name": data["name"]}
         
         # Create new
@@ -897,6 +899,7 @@ async def import_territory_data(data: Dict) -> Dict:
         doc["scoring"]["last_calculated"] = datetime.now(timezone.utc).isoformat()
         
         result = await db.territories.insert_one(doc)
+        await territory_written(db, {"_id": result.inserted_id})
         return {"status": "created", "id": str(result.inserted_id), "name": data["name"]}
         
     except Exception as e:
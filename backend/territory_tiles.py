@@ -0,0 +1,445 @@
+"""
+BIONIC™ Territory Map Tiles
+- z/x/y GeoJSON tiles for the territories map and heatmaps
+- Bbox queries served by a 2dsphere index on `location`
+- Per-tile ETags and an in-process tile cache invalidated on write
+"""
+
+from typing import Optional, List, Dict, Any, Tuple
+from collections import OrderedDict
+from pymongo import UpdateOne
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+
+MAX_ZOOM = 18
+
+# Below this zoom, tiles span too much longitude for a single
+# 2dsphere polygon; the tile is filtered in Python only
+GEO_QUERY_MIN_ZOOM = 2
+
+# Features per tile (best scores first when a tile overflows)
+MAX_FEATURES_PER_TILE = 2000
+
+# Edge densification step for the query polygon (degrees of longitude)
+EDGE_STEP_DEGREES = 1.0
+
+MAX_MERCATOR_LAT = 85.05112878
+
+# Default placement for territories without coordinates
+PROVINCE_CENTERS = {
+    "QC": {"lat": 46.8, "lon": -71.2, "spread": 4},
+    "ON": {"lat": 43.7, "lon": -79.4, "spread": 3},
+    "NB": {"lat": 46.1, "lon": -66.1, "spread": 1.5},
+    "NS": {"lat": 44.6, "lon": -63.6, "spread": 1},
+    "NL": {"lat": 53.1, "lon": -57.5, "spread": 3},
+    "MB": {"lat": 49.9, "lon": -98.8, "spread": 3},
+    "SK": {"lat": 52.1, "lon": -106.7, "spread": 3},
+    "AB": {"lat": 53.5, "lon": -114.1, "spread": 3},
+    "BC": {"lat": 49.3, "lon": -123.1, "spread": 4},
+    "YT": {"lat": 64.0, "lon": -135.0, "spread": 3},
+    "NT": {"lat": 64.0, "lon": -125.0, "spread": 4}
+}
+
+HEATMAP_METRICS = ["score", "success", "pressure", "density"]
+
+TILE_PROJECTION = {
+    "_id": 1, "internal_id": 1, "name": 1, "establishment_type": 1, "province": 1,
+    "region": 1, "scoring": 1, "success_rate": 1, "species": 1, "is_verified": 1,
+    "is_partner": 1, "location": 1, "location_estimated": 1
+}
+
+
+# ============================================
+# TILE MATH
+# ============================================
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) of a Web Mercator tile, in degrees"""
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def point_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    n = 2 ** z
+    lat = max(min(lat, MAX_MERCATOR_LAT), -MAX_MERCATOR_LAT)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def validate_tile(z: int, x: int, y: int):
+    if not 0 <= z <= MAX_ZOOM:
+        raise ValueError(f"Zoom must be between 0 and {MAX_ZOOM}")
+    n = 2 ** z
+    if not (0 <= x < n and 0 <= y < n):
+        raise ValueError("Tile coordinates out of range")
+
+
+def tile_polygon(z: int, x: int, y: int) -> Dict[str, Any]:
+    """
+    GeoJSON polygon of a tile for $geoWithin.
+
+    2dsphere edges are geodesics, so the latitude edges are densified and
+    the box is padded slightly; the exact tile test is done in Python.
+    """
+    return bbox_polygon(*tile_bounds(z, x, y))
+
+
+def bbox_polygon(west: float, south: float, east: float, north: float) -> Dict[str, Any]:
+    """
+    Padded GeoJSON polygon of a lon/lat box, latitude edges densified.
+
+    Between two edge points dlon apart, a geodesic strays at most
+    dlon² / 16 radians from the parallel; the latitude padding covers that
+    even for a thin, wide box.
+    """
+    pad_x = (east - west) * 0.01
+    west, east = max(west - pad_x, -180.0), min(east + pad_x, 180.0)
+    steps = max(1, int(math.ceil((east - west) / EDGE_STEP_DEGREES)))
+    sag = math.degrees(math.radians((east - west) / steps) ** 2 / 16)
+    pad_y = max((north - south) * 0.01, 2 * sag)
+    south, north = max(south - pad_y, -90.0), min(north + pad_y, 90.0)
+
+    lons = [west + (east - west) * i / steps for i in range(steps + 1)]
+    ring = [[lon, south] for lon in lons] + [[lon, north] for lon in reversed(lons)]
+    ring.append(ring[0])
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+# ============================================
+# TERRITORY GEOMETRY
+# ============================================
+
+def territory_position(territory: Dict[str, Any]) -> Tuple[float, float, bool]:
+    """
+    (lon, lat, estimated) for a territory.
+
+    Territories without coordinates are placed deterministically inside
+    their province (hash of the id), so they stay in the same tile.
+    """
+    coords = territory.get("coordinates") or {}
+    lat = coords.get("latitude")
+    lon = coords.get("longitude")
+    if lat and lon:
+        return float(lon), float(lat), False
+
+    center = PROVINCE_CENTERS.get(territory.get("province") or "QC", PROVINCE_CENTERS["QC"])
+    digest = hashlib.md5(str(territory.get("_id")).encode()).digest()
+    spread = center["spread"]
+    offset_lat = digest[0] / 255 * spread - spread / 2
+    offset_lon = digest[1] / 255 * spread - spread / 2
+    return center["lon"] + offset_lon, center["lat"] + offset_lat, True
+
+
+def location_fields(territory: Dict[str, Any]) -> Dict[str, Any]:
+    lon, lat, estimated = territory_position(territory)
+    return {
+        "location": {"type": "Point", "coordinates": [lon, lat]},
+        "location_estimated": estimated
+    }
+
+
+def build_territory_query(
+    province: Optional[str] = None,
+    establishment_type: Optional[str] = None,
+    species: Optional[str] = None,
+    min_score: Optional[float] = None
+) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"status": "active"}
+    if province:
+        query["province"] = province
+    if establishment_type:
+        query["establishment_type"] = establishment_type
+    if species:
+        query["species"] = {"$in": [species]}
+    if min_score:
+        query["scoring.global_score"] = {"$gte": min_score}
+    return query
+
+
+def territory_feature(territory: Dict[str, Any], lon: float, lat: float) -> Dict[str, Any]:
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [lon, lat]
+        },
+        "properties": {
+            "id": str(territory.get("_id")),
+            "internal_id": territory.get("internal_id"),
+            "name": territory.get("name"),
+            "establishment_type": territory.get("establishment_type"),
+            "province": territory.get("province", "QC"),
+            "region": territory.get("region"),
+            "global_score": territory.get("scoring", {}).get("global_score", 0),
+            "success_rate": territory.get("success_rate"),
+            "species": territory.get("species", []),
+            "is_verified": territory.get("is_verified", False),
+            "is_partner": territory.get("is_partner", False),
+            "location_estimated": territory.get("location_estimated", False)
+        }
+    }
+
+
+def heatmap_value(territory: Dict[str, Any], metric: str) -> float:
+    scoring = territory.get("scoring", {}) or {}
+    if metric == "score":
+        return scoring.get("global_score", 0)
+    if metric == "success":
+        return territory.get("success_rate", 0) or 0
+    if metric == "pressure":
+        return 100 - scoring.get("pressure_index", 50)  # Invert for heatmap
+    if metric == "density":
+        return scoring.get("habitat_index", 50)
+    return 50
+
+
+# ============================================
+# LOCATION INDEX
+# ============================================
+
+_locations_ready = False
+_locations_lock = asyncio.Lock()
+
+
+async def ensure_territory_locations(database, batch_size: int = 1000) -> int:
+    """
+    Create the 2dsphere index and backfill `location` once per process
+    (and again after mark_all_stale()). Returns the number of documents updated.
+    """
+    global _locations_ready
+    if _locations_ready:
+        return 0
+    async with _locations_lock:
+        if _locations_ready:
+            return 0
+        await database.territories.create_index([("location", "2dsphere")])
+
+        updated = 0
+        ops: List[UpdateOne] = []
+        cursor = database.territories.find(
+            {"location": {"$exists": False}},
+            {"_id": 1, "coordinates": 1, "province": 1}
+        )
+        async for territory in cursor:
+            ops.append(UpdateOne({"_id": territory["_id"]}, {"$set": location_fields(territory)}))
+            if len(ops) >= batch_size:
+                await database.territories.bulk_write(ops, ordered=False)
+                updated += len(ops)
+                ops = []
+        if ops:
+            await database.territories.bulk_write(ops, ordered=False)
+            updated += len(ops)
+
+        if updated:
+            logger.info(f"Backfilled location for {updated} territories")
+        _locations_ready = True
+        return updated
+
+
+async def territory_written(database, query: Dict[str, Any]):
+    """
+    Write hook: refresh the document's location and drop the cached
+    tiles at its previous and new position.
+    """
+    territory = await database.territories.find_one(
+        query, {"_id": 1, "coordinates": 1, "province": 1, "location": 1}
+    )
+    if not territory:
+        return
+    old = (territory.get("location") or {}).get("coordinates")
+    fields = location_fields(territory)
+    new = fields["location"]["coordinates"]
+    if old != new:
+        await database.territories.update_one({"_id": territory["_id"]}, {"$set": fields})
+    if old:
+        tile_cache.invalidate_point(old[0], old[1])
+    tile_cache.invalidate_point(new[0], new[1])
+
+
+def mark_all_stale():
+    """Bulk writes: drop every tile and re-run the location backfill"""
+    global _locations_ready
+    _locations_ready = False
+    tile_cache.clear()
+
+
+# ============================================
+# TILE CACHE
+# ============================================
+
+class TileCache:
+    """
+    LRU of rendered tiles (ETag + body), with an index by z/x/y so a
+    write only drops the tiles that contain the written point.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: int = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, Tuple[str, bytes, float]]" = OrderedDict()
+        self._by_tile: Dict[Tuple[int, int, int], set] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Optional[Tuple[str, bytes]]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[2] > self.ttl:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def set(self, key: tuple, etag: str, body: bytes):
+        if key not in self._entries and len(self._entries) >= self.maxsize:
+            self._drop(next(iter(self._entries)))
+        self._entries[key] = (etag, body, time.monotonic())
+        self._entries.move_to_end(key)
+        self._by_tile.setdefault(key[:3], set()).add(key)
+
+    def _drop(self, key: tuple):
+        self._entries.pop(key, None)
+        keys = self._by_tile.get(key[:3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_tile[key[:3]]
+
+    def invalidate_point(self, lon: float, lat: float):
+        """Drop the tiles containing (lon, lat) at every zoom level"""
+        for z in range(MAX_ZOOM + 1):
+            x, y = point_to_tile(lon, lat, z)
+            for key in list(self._by_tile.get((z, x, y), ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._by_tile.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+tile_cache = TileCache()
+
+
+# ============================================
+# TILE RENDERING
+# ============================================
+
+async def query_tile(
+    database,
+    z: int,
+    x: int,
+    y: int,
+    filters: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Territories whose position falls in the tile; returns (docs, truncated)"""
+    query = build_territory_query(**filters)
+    if z >= GEO_QUERY_MIN_ZOOM:
+        query["location"] = {"$geoWithin": {"$geometry": tile_polygon(z, x, y)}}
+
+    cursor = database.territories.find(query, TILE_PROJECTION).sort("scoring.global_score", -1)
+    docs = []
+    truncated = False
+    async for territory in cursor:
+        coords = (territory.get("location") or {}).get("coordinates")
+        if not coords or point_to_tile(coords[0], coords[1], z) != (x, y):
+            continue
+        if len(docs) >= MAX_FEATURES_PER_TILE:
+            truncated = True
+            break
+        docs.append(territory)
+    return docs, truncated
+
+
+def _render(z: int, x: int, y: int, docs: List[Dict[str, Any]], truncated: bool, metric: Optional[str]) -> Dict[str, Any]:
+    tile = {"z": z, "x": x, "y": y, "bounds": list(tile_bounds(z, x, y)), "truncated": truncated}
+    if metric:
+        points = []
+        for territory in docs:
+            lon, lat = territory["location"]["coordinates"]
+            points.append({
+                "lat": lat,
+                "lon": lon,
+                "value": heatmap_value(territory, metric),
+                "name": territory.get("name"),
+                "id": str(territory.get("_id"))
+            })
+        return {"metric": metric, "points": points, "count": len(points), "tile": tile}
+
+    features = [
+        territory_feature(t, *t["location"]["coordinates"])
+        for t in docs
+    ]
+    return {"type": "FeatureCollection", "features": features, "tile": tile}
+
+
+async def get_tile(
+    database,
+    z: int,
+    x: int,
+    y: int,
+    filters: Optional[Dict[str, Any]] = None,
+    metric: Optional[str] = None
+) -> Tuple[str, bytes]:
+    """
+    Rendered tile as (etag, JSON body), from cache when possible.
+
+    Raises:
+        ValueError: invalid tile coordinates or metric
+    """
+    validate_tile(z, x, y)
+    if metric is not None and metric not in HEATMAP_METRICS:
+        raise ValueError(f"Métrique invalide. Valides: {HEATMAP_METRICS}")
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+
+    key = (z, x, y, metric or "territories", tuple(sorted(filters.items())))
+    cached = tile_cache.get(key)
+    if cached is not None:
+        return cached
+
+    await ensure_territory_locations(database)
+    docs, truncated = await query_tile(database, z, x, y, filters)
+    payload = _render(z, x, y, docs, truncated, metric)
+    body = json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    tile_cache.set(key, etag, body)
+    return etag, body
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,362 @@
+"""
+Chasse Bionic™ / BIONIC™ - Territory Track Storage
+Segmented storage for GPS track points
+
+- Points are appended into fixed-size bucket documents
+  (territory_track_buckets, unique on track_id + seq) instead of an
+  ever-growing array on the track document
+- The parent track keeps incrementally updated summary stats:
+  points_count, distance_km, bounds, first/last point timestamps
+- Ranged reads by point offset or time window only touch the buckets
+  that overlap the range
+- Legacy tracks with inline `points` are still readable
+"""
+
+import math
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List, Dict, Any, AsyncIterator
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_COLLECTION = "territory_track_buckets"
+
+# Points per bucket document
+BUCKET_SIZE = 500
+
+# Optimistic append retries when two fixes race on the same track
+APPEND_RETRIES = 5
+
+# Hard cap for a single ranged read
+MAX_RANGE_POINTS = 5000
+
+# Seconds after which an unfinished legacy migration can be claimed again
+MIGRATION_CLAIM_TTL = 60
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance between two points (km)"""
+    R = 6371
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+async def ensure_track_indexes(database):
+    await database[BUCKETS_COLLECTION].create_index([("track_id", 1), ("seq", 1)], unique=True)
+    await database[BUCKETS_COLLECTION].create_index("import_id", sparse=True)
+
+
+def _is_legacy(track: Dict[str, Any]) -> bool:
+    """Track written before bucketing (points stored inline)"""
+    return "points_count" not in track and bool(track.get("points"))
+
+
+def points_count(track: Dict[str, Any]) -> int:
+    if _is_legacy(track):
+        return len(track["points"])
+    return track.get("points_count", 0)
+
+
+def duration_minutes(track: Dict[str, Any], now: Optional[datetime] = None) -> float:
+    if not track.get("started_at"):
+        return 0
+    end_time = track.get("ended_at") or now or datetime.now(timezone.utc)
+    return (end_time - track["started_at"]).total_seconds() / 60
+
+
+def track_summary(track: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary stats read from the parent document only"""
+    return {
+        "points_count": points_count(track),
+        "distance_km": round(track.get("distance_km", 0), 2),
+        "duration_minutes": round(duration_minutes(track), 1),
+        "bounds": track.get("bounds"),
+        "first_point_at": track.get("first_point_at"),
+        "last_point_at": track.get("last_point_at")
+    }
+
+
+def _bounds_update(lat: float, lon: float, prefix: str = "bounds.") -> Dict[str, Dict[str, float]]:
+    return {
+        "$min": {f"{prefix}min_lat": lat, f"{prefix}min_lon": lon},
+        "$max": {f"{prefix}max_lat": lat, f"{prefix}max_lon": lon}
+    }
+
+
+def _compute_bounds(points: List[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    if not points:
+        return None
+    lats = [p["lat"] for p in points]
+    lons = [p["lon"] for p in points]
+    return {"min_lat": min(lats), "max_lat": max(lats), "min_lon": min(lons), "max_lon": max(lons)}
+
+
+def merge_bounds(bounds: Optional[Dict[str, float]], points: List[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """Bounds extended with a batch of points (streamed imports)"""
+    extra = _compute_bounds(points)
+    if bounds is None or extra is None:
+        return bounds or extra
+    return {
+        "min_lat": min(bounds["min_lat"], extra["min_lat"]),
+        "max_lat": max(bounds["max_lat"], extra["max_lat"]),
+        "min_lon": min(bounds["min_lon"], extra["min_lon"]),
+        "max_lon": max(bounds["max_lon"], extra["max_lon"])
+    }
+
+
+# ===========================================
+# WRITE PATH
+# ===========================================
+
+def new_track_fields() -> Dict[str, Any]:
+    """Summary fields for a freshly created (bucketed) track"""
+    return {
+        "points_count": 0,
+        "distance_km": 0,
+        "bounds": None,
+        "first_point_at": None,
+        "last_point_at": None,
+        "last_point": None
+    }
+
+
+async def append_point(database, track: Dict[str, Any], point: Dict[str, Any]) -> float:
+    """
+    Append a fix to an active track; returns the added distance (km).
+
+    The point index is reserved with a compare-and-set on the parent's
+    points_count, so concurrent fixes never share a slot. The point is then
+    pushed into bucket index // BUCKET_SIZE (upserted on first use).
+    """
+    if "points_count" not in track:
+        await migrate_legacy_track(database, track)
+        track = await database.territory_tracks.find_one({"_id": track["_id"]})
+        if track and "points_count" not in track:
+            # Another request holds the migration claim
+            raise RuntimeError("Track migration in progress, retry later")
+
+    for _ in range(APPEND_RETRIES):
+        index = track.get("points_count", 0)
+        last = track.get("last_point")
+        distance = haversine_km(last["lat"], last["lon"], point["lat"], point["lon"]) if last else 0
+
+        bounds = _bounds_update(point["lat"], point["lon"])
+        update = {
+            "$inc": {"points_count": 1, "distance_km": distance},
+            "$set": {"last_point": point, "last_point_at": point["timestamp"]},
+            "$min": {**bounds["$min"], "first_point_at": point["timestamp"]},
+            "$max": bounds["$max"]
+        }
+        if track.get("bounds") is None:
+            # $min/$max cannot descend into a null field
+            update["$set"]["bounds"] = _compute_bounds([point])
+            del update["$min"]
+            del update["$max"]
+            update["$set"]["first_point_at"] = point["timestamp"]
+
+        result = await database.territory_tracks.update_one(
+            {"_id": track["_id"], "is_active": True, "points_count": index},
+            update
+        )
+        if result.modified_count:
+            break
+
+        track = await database.territory_tracks.find_one({"_id": track["_id"]})
+        if not track or not track.get("is_active"):
+            raise ValueError("Track is not active")
+    else:
+        raise RuntimeError("Track append contention, retry later")
+
+    bucket_update = {
+        "$push": {"points": {**point, "n": index}},
+        "$inc": {"count": 1},
+        "$min": {"first_ts": point["timestamp"], "first_n": index},
+        "$max": {"last_ts": point["timestamp"], "last_n": index},
+        "$setOnInsert": {"user_id": track.get("user_id")}
+    }
+    bucket_filter = {"track_id": track["_id"], "seq": index // BUCKET_SIZE}
+    try:
+        await database[BUCKETS_COLLECTION].update_one(bucket_filter, bucket_update, upsert=True)
+    except DuplicateKeyError:
+        # Two first pushes into a new bucket both tried to insert it;
+        # the loser's point goes into the bucket the winner created
+        await database[BUCKETS_COLLECTION].update_one(bucket_filter, bucket_update)
+    return distance
+
+
+def build_buckets(
+    track_id: str,
+    points: List[Dict[str, Any]],
+    extra: Optional[Dict[str, Any]] = None,
+    start: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Bucket documents for a batch of points (bulk import).
+
+    `start` is the index of the first point in the track; it must be a
+    multiple of BUCKET_SIZE when a track is written in several batches.
+    """
+    buckets = []
+    for offset in range(0, len(points), BUCKET_SIZE):
+        chunk = points[offset:offset + BUCKET_SIZE]
+        first_n = start + offset
+        buckets.append({
+            **(extra or {}),
+            "track_id": track_id,
+            "seq": first_n // BUCKET_SIZE,
+            "count": len(chunk),
+            "points": [{**p, "n": first_n + i} for i, p in enumerate(chunk)],
+            "first_ts": chunk[0].get("timestamp"),
+            "last_ts": chunk[-1].get("timestamp"),
+            "first_n": first_n,
+            "last_n": first_n + len(chunk) - 1
+        })
+    return buckets
+
+
+def summary_fields(points: List[Dict[str, Any]], distance_km: Optional[float] = None) -> Dict[str, Any]:
+    """Parent summary for a complete list of points"""
+    if distance_km is None:
+        distance_km = sum(
+            haversine_km(a["lat"], a["lon"], b["lat"], b["lon"])
+            for a, b in zip(points, points[1:])
+        )
+    return {
+        "points_count": len(points),
+        "distance_km": distance_km,
+        "bounds": _compute_bounds(points),
+        "first_point_at": points[0].get("timestamp") if points else None,
+        "last_point_at": points[-1].get("timestamp") if points else None,
+        "last_point": points[-1] if points else None
+    }
+
+
+async def migrate_legacy_track(database, track: Dict[str, Any]) -> bool:
+    """
+    Move inline points into buckets and set the summary fields.
+
+    The migration is claimed first with a conditional update, so of two
+    concurrent callers only one inserts the buckets. A claim left by a
+    crashed worker can be taken again after MIGRATION_CLAIM_TTL. Returns
+    True if this call migrated the track.
+    """
+    now = datetime.now(timezone.utc)
+    claim = await database.territory_tracks.update_one(
+        {
+            "_id": track["_id"],
+            "points": {"$exists": True},
+            "points_count": {"$exists": False},
+            "$or": [
+                {"migration_claimed_at": {"$exists": False}},
+                {"migration_claimed_at": {"$lt": now - timedelta(seconds=MIGRATION_CLAIM_TTL)}}
+            ]
+        },
+        {"$set": {"migration_claimed_at": now}}
+    )
+    if not claim.modified_count:
+        return False
+
+    points = track.get("points") or []
+    buckets = build_buckets(track["_id"], points, {"user_id": track.get("user_id")})
+    if buckets:
+        try:
+            await database[BUCKETS_COLLECTION].insert_many(buckets, ordered=False)
+        except BulkWriteError as e:
+            # Buckets left by an expired claim hold the same points
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+    await database.territory_tracks.update_one(
+        {"_id": track["_id"], "migration_claimed_at": now},
+        {
+            "$set": summary_fields(points, track.get("distance_km")),
+            "$unset": {"points": "", "migration_claimed_at": ""}
+        }
+    )
+    return True
+
+
+async def delete_track_points(database, track_id: str):
+    await database[BUCKETS_COLLECTION].delete_many({"track_id": track_id})
+
+
+# ===========================================
+# READ PATH
+# ===========================================
+
+def _strip(point: Dict[str, Any]) -> Dict[str, Any]:
+    point = dict(point)
+    point.pop("n", None)
+    return point
+
+
+async def read_points(
+    database,
+    track: Dict[str, Any],
+    start: int = 0,
+    limit: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Points of a track within an index range and/or a time window.
+
+    Only the buckets overlapping [start, start + limit) and [since, until]
+    are fetched.
+    """
+    limit = MAX_RANGE_POINTS if limit is None else min(limit, MAX_RANGE_POINTS)
+    if limit <= 0:
+        return []
+
+    def in_window(p: Dict[str, Any]) -> bool:
+        ts = p.get("timestamp")
+        if since and (ts is None or ts < since):
+            return False
+        if until and (ts is None or ts > until):
+            return False
+        return True
+
+    if _is_legacy(track):
+        points = [p for p in track["points"] if in_window(p)]
+        return points[start:start + limit]
+
+    query: Dict[str, Any] = {"track_id": track["_id"]}
+    if since is None and until is None:
+        query["seq"] = {"$gte": start // BUCKET_SIZE, "$lte": (start + limit - 1) // BUCKET_SIZE}
+    else:
+        if since is not None:
+            query["last_ts"] = {"$gte": since}
+        if until is not None:
+            query["first_ts"] = {"$lte": until}
+
+    results: List[Dict[str, Any]] = []
+    skip = start if (since or until) else start - (start // BUCKET_SIZE) * BUCKET_SIZE
+    cursor = database[BUCKETS_COLLECTION].find(query, {"points": 1, "seq": 1}).sort("seq", 1)
+    async for bucket in cursor:
+        for point in sorted(bucket.get("points", []), key=lambda p: p.get("n", 0)):
+            if not in_window(point):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            results.append(_strip(point))
+            if len(results) >= limit:
+                return results
+    return results
+
+
+async def iter_points(database, track: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """All points of a track in order, one bucket in memory at a time"""
+    if _is_legacy(track):
+        for point in track["points"]:
+            yield point
+        return
+    if not track.get("points_count"):
+        return
+    cursor = database[BUCKETS_COLLECTION].find({"track_id": track["_id"]}).sort("seq", 1)
+    async for bucket in cursor:
+        for point in sorted(bucket.get("points", []), key=lambda p: p.get("n", 0)):
+            yield _strip(point)
@@ -0,0 +1,744 @@
+"""
+Fixtures partagées - Motor simulé en mémoire
+============================================
+Sous-ensemble de l'API motor utilisé par les modules testés: requêtes
+(opérateurs de comparaison, $and/$or, tableaux, $regex, $text sur un
+index texte), mises à jour ($set, $inc, $push, $pull, ...), upserts,
+bulk_write, index uniques (DuplicateKeyError / BulkWriteError) et
+pipelines d'agrégation simples.
+
+Chaque opération est atomique, comme côté Mongo; un ``await`` rend la
+main avant l'opération pour exercer les accès concurrents.
+
+Version: 1.0.0
+"""
+
+import asyncio
+import copy
+import math
+import re
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+
+# ==============================================
+# REQUÊTES
+# ==============================================
+
+def get_path(doc, path):
+    for part in path.split("."):
+        if isinstance(doc, list) and part.isdigit():
+            doc = doc[int(part)] if int(part) < len(doc) else None
+        elif isinstance(doc, dict):
+            doc = doc.get(part)
+        else:
+            return None
+    return doc
+
+
+def set_path(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def unset_path(doc, path):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _compare(value, arg, op):
+    if value is None or arg is None:
+        return False
+    try:
+        return op(value, arg)
+    except TypeError:
+        return False
+
+
+def _in_polygon(point, polygon):
+    """Ray casting planaire sur l'anneau extérieur"""
+    x, y = point
+    ring = polygon["coordinates"][0]
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+
+def _operator(value, op, arg):
+    if op == "$eq":
+        return _equals(value, arg)
+    if op == "$ne":
+        return not _equals(value, arg)
+    if op == "$gt":
+        return _compare(value, arg, lambda a, b: a > b)
+    if op == "$gte":
+        return _compare(value, arg, lambda a, b: a >= b)
+    if op == "$lt":
+        return _compare(value, arg, lambda a, b: a < b)
+    if op == "$lte":
+        return _compare(value, arg, lambda a, b: a <= b)
+    if op == "$in":
+        return any(_equals(value, a) for a in arg)
+    if op == "$nin":
+        return not any(_equals(value, a) for a in arg)
+    if op == "$exists":
+        return (value is not None) == bool(arg)
+    if op == "$type":
+        return isinstance(value, {"string": str, "date": datetime, "number": (int, float)}[arg])
+    if op == "$geoWithin":
+        return value is not None and _in_polygon(value["coordinates"], arg["$geometry"])
+    raise AssertionError(f"opérateur de requête non supporté: {op}")
+
+
+def _equals(value, cond):
+    if isinstance(value, list) and not isinstance(cond, list):
+        return cond in value
+    return value == cond
+
+
+def _regex(value, pattern, options=""):
+    flags = re.IGNORECASE if "i" in options else 0
+    values = value if isinstance(value, list) else [value]
+    return any(isinstance(v, str) and re.search(pattern, v, flags) for v in values)
+
+
+def match_value(value, cond):
+    if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+        if "$regex" in cond and not _regex(value, cond["$regex"], cond.get("$options", "")):
+            return False
+        return all(_operator(value, op, arg) for op, arg in cond.items() if op not in ("$regex", "$options"))
+    return _equals(value, cond)
+
+
+def _text_match(doc, search):
+    """$text simplifié: un des mots dans une valeur texte du document"""
+    words = search["$search"].lower().split()
+    texts = [v.lower() for v in doc.values() if isinstance(v, str)]
+    return any(word in text for word in words for text in texts)
+
+
+def text_search(query):
+    """Critère $text d'une requête (None sans recherche plein texte)"""
+    for key, cond in query.items():
+        if key == "$text":
+            return cond
+        if key in ("$and", "$or", "$nor"):
+            for sub in cond:
+                found = text_search(sub)
+                if found is not None:
+                    return found
+    return None
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, q) for q in cond):
+                return False
+        elif key == "$text":
+            if not _text_match(doc, cond):
+                return False
+        elif not match_value(get_path(doc, key), cond):
+            return False
+    return True
+
+
+def project(doc, projection):
+    if doc is None:
+        return None
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    included = [k for k, v in projection.items() if v and k != "_id"]
+    if included:
+        out = {}
+        for field in included:
+            value = get_path(doc, field)
+            if value is not None:
+                set_path(out, field, value)
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    for field, keep in projection.items():
+        if not keep:
+            unset_path(doc, field)
+    return doc
+
+
+# ==============================================
+# MISES À JOUR
+# ==============================================
+
+def apply_update(doc, update, inserting=False):
+    for path, value in update.get("$set", {}).items():
+        set_path(doc, path, copy.deepcopy(value))
+    if inserting:
+        for path, value in update.get("$setOnInsert", {}).items():
+            set_path(doc, path, copy.deepcopy(value))
+    for path in update.get("$unset", {}):
+        unset_path(doc, path)
+    for path, amount in update.get("$inc", {}).items():
+        set_path(doc, path, (get_path(doc, path) or 0) + amount)
+    for path, value in update.get("$min", {}).items():
+        current = get_path(doc, path)
+        set_path(doc, path, value if current is None else min(current, value))
+    for path, value in update.get("$max", {}).items():
+        current = get_path(doc, path)
+        set_path(doc, path, value if current is None else max(current, value))
+    for path, value in update.get("$push", {}).items():
+        items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+        array = get_path(doc, path)
+        if array is None:
+            array = []
+            set_path(doc, path, array)
+        array.extend(copy.deepcopy(items))
+    for path, value in update.get("$addToSet", {}).items():
+        items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+        array = get_path(doc, path)
+        if array is None:
+            array = []
+            set_path(doc, path, array)
+        array.extend(v for v in items if v not in array)
+    for path, cond in update.get("$pull", {}).items():
+        array = get_path(doc, path) or []
+        set_path(doc, path, [v for v in array if not match_value(v, cond)])
+
+
+def _upsert_seed(query):
+    seed = {}
+    for key, cond in query.items():
+        if key == "$and":
+            for sub in cond:
+                seed.update(_upsert_seed(sub))
+        elif not key.startswith("$") and not (isinstance(cond, dict) and any(k.startswith("$") for k in cond)):
+            set_path(seed, key, copy.deepcopy(cond))
+        elif isinstance(cond, dict) and "$eq" in cond:
+            set_path(seed, key, copy.deepcopy(cond["$eq"]))
+    return seed
+
+
+# ==============================================
+# AGRÉGATION
+# ==============================================
+
+def evaluate(expr, doc):
+    if isinstance(expr, str) and expr.startswith("$"):
+        return get_path(doc, expr[1:])
+    if isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)).startswith("$"):
+        (op, args), = expr.items()
+        if op == "$arrayElemAt":
+            array = evaluate(args[0], doc)
+            return array[args[1]] if array is not None else None
+        if op == "$floor":
+            return math.floor(evaluate(args, doc))
+        if op == "$divide":
+            return evaluate(args[0], doc) / evaluate(args[1], doc)
+        if op == "$multiply":
+            return math.prod(evaluate(a, doc) for a in args)
+        if op == "$add":
+            return sum(evaluate(a, doc) for a in args)
+        if op == "$arrayToObject":
+            return {item["k"]: item["v"] for item in evaluate(args, doc) or []}
+        if op == "$objectToArray":
+            return [{"k": k, "v": v} for k, v in (evaluate(args, doc) or {}).items()]
+        if op == "$ifNull":
+            value = evaluate(args[0], doc)
+            return evaluate(args[1], doc) if value is None else value
+        if op == "$cond":
+            test, then, other = args if isinstance(args, list) else (args["if"], args["then"], args["else"])
+            return evaluate(then if evaluate(test, doc) else other, doc)
+        if op == "$eq":
+            return evaluate(args[0], doc) == evaluate(args[1], doc)
+        if op == "$in":
+            return evaluate(args[0], doc) in evaluate(args[1], doc)
+        if op == "$setUnion":
+            union = []
+            for arg in args:
+                union += [v for v in evaluate(arg, doc) or [] if v not in union]
+            return union
+        raise AssertionError(f"opérateur d'agrégation non supporté: {op}")
+    if isinstance(expr, dict):
+        return {k: evaluate(v, doc) for k, v in expr.items()}
+    if isinstance(expr, list):
+        return [evaluate(v, doc) for v in expr]
+    return expr
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = evaluate(spec["_id"], doc)
+        hashable = tuple(sorted(key.items())) if isinstance(key, dict) else key
+        out = groups.setdefault(hashable, {"_id": key})
+        for field, acc in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = acc.items()
+            value = evaluate(arg, doc)
+            if op == "$sum":
+                out[field] = out.get(field, 0) + (value or 0)
+            elif op == "$first":
+                out.setdefault(field, value)
+            elif op == "$last":
+                out[field] = value
+            elif op == "$max":
+                out[field] = value if out.get(field) is None else max(out[field], value)
+            elif op == "$min":
+                out[field] = value if out.get(field) is None else min(out[field], value)
+            elif op == "$push":
+                out.setdefault(field, []).append(value)
+            else:
+                raise AssertionError(f"accumulateur non supporté: {op}")
+    return list(groups.values())
+
+
+def _sort_key(value):
+    return (value is not None, value)
+
+
+def sort_docs(docs, keys):
+    docs = list(docs)
+    for field, direction in reversed(list(keys)):
+        docs.sort(key=lambda d: _sort_key(get_path(d, field)), reverse=direction < 0)
+    return docs
+
+
+def run_pipeline(docs, pipeline):
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = [d for d in docs if matches(d, spec)]
+        elif op == "$project":
+            if all(v in (0, 1, True, False) for v in spec.values()):
+                docs = [project(d, spec) for d in docs]
+            else:
+                keep_id = spec.get("_id", 1) in (1, True)
+                docs = [
+                    dict(
+                        {"_id": d["_id"]} if keep_id and "_id" in d else {},
+                        **{k: (get_path(d, k) if v in (1, True) else evaluate(v, d)) for k, v in spec.items() if k != "_id"}
+                    )
+                    for d in docs
+                ]
+        elif op == "$unwind":
+            path = spec if isinstance(spec, str) else spec["path"]
+            field = path[1:]
+            docs = [dict(d, **{field: item}) for d in docs for item in (get_path(d, field) or [])]
+        elif op == "$group":
+            docs = _group(docs, spec)
+        elif op == "$sort":
+            docs = sort_docs(docs, spec.items())
+        elif op == "$skip":
+            docs = docs[spec:]
+        elif op == "$limit":
+            docs = docs[:spec]
+        elif op == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        elif op == "$facet":
+            docs = [{name: run_pipeline(list(docs), sub) for name, sub in spec.items()}]
+        else:
+            raise AssertionError(f"stage non supporté: {op}")
+    return docs
+
+
+# ==============================================
+# COLLECTIONS
+# ==============================================
+
+class FakeCursor:
+    def __init__(self, collection, docs, projection=None, error=None):
+        self.collection = collection
+        self.docs = docs
+        self.projection = projection
+        # Comme motor: l'erreur serveur n'apparaît qu'à l'itération
+        self.error = error
+
+    def sort(self, keys, direction=1):
+        self.collection.ops.append("sort")
+        if isinstance(keys, str):
+            keys = [(keys, direction)]
+        self.docs = sort_docs(self.docs, keys)
+        return self
+
+    def skip(self, n):
+        self.collection.ops.append("skip")
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    def _results(self):
+        if self.error:
+            raise self.error
+        return [project(d, self.projection) for d in self.docs]
+
+    async def to_list(self, length=None):
+        docs = self._results()
+        return docs[:length] if length else docs
+
+    def __iter__(self):
+        # Modules sur le driver synchrone (pymongo)
+        return iter(self._results())
+
+    def __aiter__(self):
+        self._it = iter(self._results())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """Collection en mémoire; ``unique`` liste les index uniques (tuples de champs)"""
+
+    def __init__(self, name="", unique=(), db=None):
+        self.name = name
+        self.db = db
+        self.docs = []
+        self.unique = [tuple(keys) for keys in unique]
+        self.indexes = []
+        self.text_index = False
+        self.queries = []
+        self.ops = []
+        self.reads = 0
+        self.writes = 0
+
+    @property
+    def calls(self):
+        return self.reads + self.writes
+
+    async def _op(self, name, write=False):
+        self.ops.append(name)
+        if write:
+            self.writes += 1
+        else:
+            self.reads += 1
+        await asyncio.sleep(0)
+
+    def _check_unique(self, doc, ignore=None):
+        keys = [("_id",)] + self.unique
+        for fields in keys:
+            if not all(get_path(doc, f) is not None for f in fields):
+                continue
+            value = tuple(get_path(doc, f) for f in fields)
+            for other in self.docs:
+                if other is not ignore and tuple(get_path(other, f) for f in fields) == value:
+                    raise DuplicateKeyError(f"E11000 duplicate key {fields}", 11000)
+
+    def _check_text(self, query):
+        if text_search(query) is not None and not self.text_index:
+            raise OperationFailure("text index required for $text query", 27)
+
+    def _first(self, query, sort=None):
+        docs = [d for d in self.docs if matches(d, query)]
+        if sort:
+            docs = sort_docs(docs, sort)
+        return docs[0] if docs else None
+
+    # --- index -----------------------------------------------------------
+
+    async def create_index(self, keys, unique=False, **kwargs):
+        fields = (keys,) if isinstance(keys, str) else tuple(k for k, _ in keys)
+        self.indexes.append(fields)
+        if not isinstance(keys, str) and any(kind == "text" for _, kind in keys):
+            self.text_index = True
+        if unique and fields not in self.unique and fields != ("_id",):
+            self.unique.append(fields)
+        return kwargs.get("name") or "_".join(fields)
+
+    async def create_indexes(self, models, **kwargs):
+        return [await self.create_index(m.document["key"].items(), **{
+            k: v for k, v in m.document.items() if k != "key"
+        }) for m in models]
+
+    # --- lecture ---------------------------------------------------------
+
+    def find(self, query=None, projection=None, sort=None, skip=0, limit=0, **kwargs):
+        self.ops.append("find")
+        self.queries.append(query)
+        self.reads += 1
+        try:
+            self._check_text(query or {})
+        except OperationFailure as e:
+            return FakeCursor(self, [], projection, error=e)
+        cursor = FakeCursor(self, [d for d in self.docs if matches(d, query or {})], projection)
+        if sort:
+            cursor.sort(sort)
+        if skip:
+            cursor.skip(skip)
+        return cursor.limit(limit)
+
+    async def find_one(self, query=None, projection=None, sort=None, session=None, **kwargs):
+        await self._op("find_one")
+        return project(self._first(query or {}, sort), projection)
+
+    async def count_documents(self, query, session=None, **kwargs):
+        await self._op("count_documents")
+        self._check_text(query)
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def distinct(self, field, query=None, session=None):
+        await self._op("distinct")
+        values = []
+        for d in self.docs:
+            if matches(d, query or {}):
+                value = get_path(d, field)
+                for v in value if isinstance(value, list) else [value]:
+                    if v is not None and v not in values:
+                        values.append(v)
+        return values
+
+    def aggregate(self, pipeline, session=None, **kwargs):
+        self.ops.append("aggregate")
+        self.reads += 1
+        self.pipelines = getattr(self, "pipelines", []) + [pipeline]
+        merge = pipeline[-1].get("$merge") if pipeline else None
+        docs = run_pipeline(copy.deepcopy(self.docs), pipeline[:-1] if merge else pipeline)
+        if merge:
+            self._merge(docs, merge)
+            docs = []
+        return FakeCursor(self, docs)
+
+    def _merge(self, docs, spec):
+        target = self.db[spec["into"]]
+        on = spec.get("on", "_id")
+        for doc in docs:
+            existing = next((d for d in target.docs if d.get(on) == doc.get(on)), None)
+            if existing is None:
+                if spec.get("whenNotMatched", "insert") == "insert":
+                    target.docs.append(doc)
+            elif spec.get("whenMatched", "merge") == "merge":
+                existing.update(doc)
+            elif spec["whenMatched"] == "replace":
+                existing.clear()
+                existing.update(doc)
+
+    # --- écriture --------------------------------------------------------
+
+    async def insert_one(self, doc, session=None, **kwargs):
+        await self._op("insert_one", write=True)
+        self._check_unique(doc)
+        self.docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_id=doc.get("_id"), acknowledged=True)
+
+    async def insert_many(self, docs, ordered=True, session=None, **kwargs):
+        await self._op("insert_many", write=True)
+        errors, inserted = [], []
+        for i, doc in enumerate(docs):
+            try:
+                self._check_unique(doc)
+            except DuplicateKeyError:
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key"})
+                if ordered:
+                    break
+                continue
+            self.docs.append(copy.deepcopy(doc))
+            inserted.append(doc.get("_id"))
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return SimpleNamespace(inserted_ids=inserted, acknowledged=True)
+
+    def _update(self, target, update):
+        """Applique une mise à jour à un document existant (rejet si l'index unique casse)"""
+        updated = copy.deepcopy(target)
+        apply_update(updated, update)
+        self._check_unique(updated, ignore=target)
+        target.clear()
+        target.update(updated)
+
+    def _upsert(self, query, update):
+        doc = _upsert_seed(query)
+        apply_update(doc, update, inserting=True)
+        self._check_unique(doc)
+        self.docs.append(doc)
+        return doc
+
+    async def update_one(self, query, update, upsert=False, session=None, **kwargs):
+        await self._op("update_one", write=True)
+        target = self._first(query)
+        if target is None:
+            if not upsert:
+                return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+            doc = self._upsert(query, update)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc.get("_id", True))
+        self._update(target, update)
+        return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+
+    async def update_many(self, query, update, upsert=False, session=None, **kwargs):
+        await self._op("update_many", write=True)
+        targets = [d for d in self.docs if matches(d, query)]
+        for target in targets:
+            self._update(target, update)
+        if not targets and upsert:
+            doc = self._upsert(query, update)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc.get("_id", True))
+        return SimpleNamespace(matched_count=len(targets), modified_count=len(targets), upserted_id=None)
+
+    async def replace_one(self, query, replacement, upsert=False, session=None, **kwargs):
+        await self._op("replace_one", write=True)
+        target = self._first(query)
+        if target is None:
+            if upsert:
+                doc = dict(_upsert_seed(query), **copy.deepcopy(replacement))
+                self._check_unique(doc)
+                self.docs.append(doc)
+            return SimpleNamespace(matched_count=0, modified_count=0)
+        doc = dict(copy.deepcopy(replacement), **({"_id": target["_id"]} if "_id" in target else {}))
+        self._check_unique(doc, ignore=target)
+        target.clear()
+        target.update(doc)
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, session=None, **kwargs):
+        await self._op("find_one_and_update", write=True)
+        target = self._first(query, sort)
+        if target is None:
+            if not upsert:
+                return None
+            doc = self._upsert(query, update)
+            return project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        before = copy.deepcopy(target)
+        self._update(target, update)
+        return project(target if return_document == ReturnDocument.AFTER else before, projection)
+
+    async def find_one_and_delete(self, query, projection=None, sort=None, session=None, **kwargs):
+        await self._op("find_one_and_delete", write=True)
+        target = self._first(query, sort)
+        if target is not None:
+            self.docs.remove(target)
+        return project(target, projection)
+
+    async def delete_one(self, query, session=None, **kwargs):
+        await self._op("delete_one", write=True)
+        target = self._first(query)
+        if target is not None:
+            self.docs.remove(target)
+        return SimpleNamespace(deleted_count=int(target is not None))
+
+    async def delete_many(self, query, session=None, **kwargs):
+        await self._op("delete_many", write=True)
+        kept = [d for d in self.docs if not matches(d, query)]
+        deleted = len(self.docs) - len(kept)
+        self.docs = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    def _bulk_op(self, op, counts):
+        """Une opération de bulk_write (InsertOne, UpdateOne, ...), sans await;
+        renvoie l'_id du document upserté, sinon None"""
+        kind = type(op).__name__
+        if kind == "InsertOne":
+            self._check_unique(op._doc)
+            self.docs.append(copy.deepcopy(op._doc))
+            counts["nInserted"] += 1
+        elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+            targets = [d for d in self.docs if matches(d, op._filter)]
+            targets = targets if kind == "UpdateMany" else targets[:1]
+            if not targets and op._upsert:
+                if kind == "ReplaceOne":
+                    doc = dict(_upsert_seed(op._filter), **copy.deepcopy(op._doc))
+                    self._check_unique(doc)
+                    self.docs.append(doc)
+                else:
+                    doc = self._upsert(op._filter, op._doc)
+                counts["nUpserted"] += 1
+                return doc.get("_id", True)
+            for target in targets:
+                if kind == "ReplaceOne":
+                    doc = dict(copy.deepcopy(op._doc), **({"_id": target["_id"]} if "_id" in target else {}))
+                    self._check_unique(doc, ignore=target)
+                    target.clear()
+                    target.update(doc)
+                else:
+                    self._update(target, op._doc)
+            counts["nMatched"] += len(targets)
+            counts["nModified"] += len(targets)
+        elif kind in ("DeleteOne", "DeleteMany"):
+            targets = [d for d in self.docs if matches(d, op._filter)]
+            targets = targets if kind == "DeleteMany" else targets[:1]
+            for target in targets:
+                self.docs.remove(target)
+            counts["nRemoved"] += len(targets)
+        else:
+            raise AssertionError(f"opération bulk non supportée: {kind}")
+
+    async def bulk_write(self, requests, ordered=True, session=None, **kwargs):
+        """Comme Mongo: non ordonné, les opérations valides sont appliquées
+        malgré les erreurs (index unique, $inc sur une valeur non numérique)"""
+        await self._op("bulk_write", write=True)
+        self.bulk_calls = getattr(self, "bulk_calls", []) + [(list(requests), ordered)]
+        counts = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0}
+        errors, upserted = [], []
+        for i, op in enumerate(requests):
+            try:
+                upserted_id = self._bulk_op(op, counts)
+                if upserted_id is not None:
+                    upserted.append({"index": i, "_id": upserted_id})
+            except (DuplicateKeyError, TypeError) as e:
+                code = 11000 if isinstance(e, DuplicateKeyError) else 14
+                errors.append({"index": i, "code": code, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError(dict(counts, writeErrors=errors, writeConcernErrors=[], upserted=upserted))
+        return SimpleNamespace(
+            acknowledged=True,
+            inserted_count=counts["nInserted"],
+            upserted_count=counts["nUpserted"],
+            matched_count=counts["nMatched"],
+            modified_count=counts["nModified"],
+            deleted_count=counts["nRemoved"],
+            upserted_ids={u["index"]: u["_id"] for u in upserted},
+            bulk_api_result=dict(counts, writeErrors=[], upserted=upserted)
+        )
+
+
+class FakeDB:
+    """Base simulée: ``db.nom`` et ``db["nom"]`` créent la collection à la demande.
+    Pas d'attribut ``client``: les modules voient un serveur standalone."""
+
+    def __init__(self, unique=None):
+        self.collections = {}
+        for name, indexes in (unique or {}).items():
+            self.collections[name] = FakeCollection(name, unique=indexes, db=self)
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name, db=self)
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name == "client":
+            raise AttributeError(name)
+        return self[name]
+
+
+@pytest.fixture
+def fake_db():
+    return FakeDB()
@@ -0,0 +1,192 @@
+"""
+Tests Unitaires - Ad Serving Cache
+==================================
+Tests du cache de décision publicitaire et des compteurs tamponnés.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.ad_spaces_engine.serving_cache import (
+    AdServingCache, AdCounterBuffer, compute_ctr
+)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = docs or []
+        self.find_calls = 0
+        self.bulk_calls = []
+
+    async def find_one(self, query, projection=None):
+        self.find_calls += 1
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                return dict(doc)
+        return None
+
+    def find(self, query=None, projection=None):
+        self.find_calls += 1
+        return FakeCursor(self.docs)
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_calls.append((ops, ordered))
+
+    async def update_one(self, query, update, upsert=False):
+        pass
+
+    async def update_many(self, query, update):
+        pass
+
+    async def insert_one(self, doc):
+        pass
+
+
+class FakeDB:
+    def __init__(self, **collections):
+        self.collections = collections
+
+    def __getattr__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture
+def db():
+    return FakeDB(
+        ad_master_switch=FakeCollection([{"switch_id": "global", "is_active": True}]),
+        ad_slot_reservations=FakeCollection([{
+            "reservation_id": "r1",
+            "space_id": "sidebar_mid",
+            "opportunity_id": "o1",
+            "status": "active",
+            "start_date": "2020-01-01T00:00:00+00:00",
+            "end_date": "2099-01-01T00:00:00+00:00"
+        }]),
+        deployed_ads=FakeCollection([{"ad_id": "a1", "opportunity_id": "o1", "is_active": True}])
+    )
+
+
+class TestAdServingCache:
+    """Tests pour AdServingCache"""
+
+    def test_refresh_then_hit(self, db):
+        """Le second accès ne touche pas MongoDB"""
+        cache = AdServingCache(ttl=60)
+
+        async def run():
+            await cache.ensure_fresh(db)
+            calls = db.ad_slot_reservations.find_calls
+            await cache.ensure_fresh(db)
+            return calls
+
+        calls = asyncio.run(run())
+        assert db.ad_slot_reservations.find_calls == calls
+        assert cache.master_switch_active() is True
+        assert cache.refreshes == 1
+        assert cache.hits == 1
+
+    def test_active_reservations_and_ads(self, db):
+        cache = AdServingCache(ttl=60)
+        asyncio.run(cache.ensure_fresh(db))
+
+        reservations = cache.active_reservations("sidebar_mid", 3)
+        assert [r["reservation_id"] for r in reservations] == ["r1"]
+        assert cache.get_deployed_ad("o1")["ad_id"] == "a1"
+        assert cache.get_deployed_ad_by_id("a1")["opportunity_id"] == "o1"
+        assert cache.active_reservations("header_banner_main", 3) == []
+
+    def test_reservation_outside_window_excluded(self, db):
+        cache = AdServingCache(ttl=60)
+        asyncio.run(cache.ensure_fresh(db))
+        assert cache.active_reservations("sidebar_mid", 3, now="2100-01-01T00:00:00+00:00") == []
+
+    def test_invalidate_forces_refresh(self, db):
+        cache = AdServingCache(ttl=60)
+        asyncio.run(cache.ensure_fresh(db))
+        cache.invalidate()
+        assert cache.is_fresh() is False
+        asyncio.run(cache.ensure_fresh(db))
+        assert cache.refreshes == 2
+
+
+class TestGlobalSwitchInvalidation:
+    """Tests de l'invalidation du cache par le Global Master Switch"""
+
+    def test_switch_writes_invalidate_serving_cache(self, db, monkeypatch):
+        from modules.global_master_switch import router as switch_router
+        from modules.ad_spaces_engine.serving_cache import serving_cache
+
+        async def refresh(database):
+            pass
+
+        async def current_switch(database):
+            return {"status": "ON"}
+
+        monkeypatch.setattr(switch_router, "get_db", lambda: db)
+        monkeypatch.setattr(switch_router, "_current_switch", current_switch)
+        monkeypatch.setattr(switch_router.switch_snapshot, "refresh", refresh)
+
+        async def run():
+            await serving_cache.ensure_fresh(db)
+            await switch_router.toggle_global_switch(new_status="OFF", reason="test", admin_user="admin")
+            after_toggle = serving_cache.is_fresh()
+            await serving_cache.ensure_fresh(db)
+            await switch_router.toggle_engine(engine_id="affiliate_ad_automation_engine", is_active=False, admin_user="admin")
+            return after_toggle, serving_cache.is_fresh()
+
+        assert asyncio.run(run()) == (False, False)
+
+
+class TestAdCounterBuffer:
+    """Tests pour AdCounterBuffer"""
+
+    def test_increments_coalesce_into_one_op(self, db):
+        buffer = AdCounterBuffer()
+        for _ in range(5):
+            buffer.increment("deployed_ads", "ad_id", "a1", "impressions")
+        buffer.increment("deployed_ads", "ad_id", "a1", "clicks")
+
+        ops = asyncio.run(buffer.flush(db))
+
+        assert ops == 1
+        (bulk_ops, ordered), = db.deployed_ads.bulk_calls
+        assert ordered is False
+        assert bulk_ops[0]._doc == {"$inc": {"impressions": 5, "clicks": 1}}
+        assert buffer.stats()["pending_documents"] == 0
+
+    def test_merge_pending_into_read(self):
+        buffer = AdCounterBuffer()
+        buffer.increment("ad_opportunities", "opportunity_id", "o1", "clicks", 2)
+        doc = buffer.merge_pending({"opportunity_id": "o1", "clicks": 3}, "ad_opportunities", "opportunity_id")
+        assert doc["clicks"] == 5
+
+    def test_flush_without_db_is_noop(self):
+        buffer = AdCounterBuffer()
+        buffer.increment("deployed_ads", "ad_id", "a1", "impressions")
+        assert asyncio.run(buffer.flush()) == 0
+        assert buffer.pending("deployed_ads", "ad_id", "a1") == {"impressions": 1}
+
+    def test_compute_ctr(self):
+        assert compute_ctr(5, 200) == 2.5
+        assert compute_ctr(1, 0) == 100.0
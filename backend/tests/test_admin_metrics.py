@@ -0,0 +1,255 @@
+"""
+Tests Unitaires - Admin Metrics Snapshot
+========================================
+Tests du service de métriques matérialisées (réconciliation $facet,
+hooks d'écriture, fraîcheur) avec une base Mongo simulée en mémoire.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.admin_engine.services.metrics_admin import (
+    MetricsAdminService, METRIC_DEFINITIONS, SNAPSHOT_COLLECTION,
+    build_collection_facets, parse_facet_result, nest_metrics, transition
+)
+from modules.admin_engine.services.networking_admin import NetworkingAdminService
+from modules.admin_engine.services.hotspots_admin import HotspotsAdminService
+
+
+# ==============================================
+# FAKE MONGO
+# ==============================================
+
+def _matches(doc, match):
+    for key, cond in match.items():
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            if value is None or value < cond["$gte"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _eval(expr, doc):
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict) and "$ifNull" in expr:
+        value = _eval(expr["$ifNull"][0], doc)
+        return expr["$ifNull"][1] if value is None else value
+    if isinstance(expr, dict) and "$add" in expr:
+        return sum(_eval(e, doc) for e in expr["$add"])
+    return expr
+
+
+def _run_pipeline(docs, pipeline):
+    for stage in pipeline:
+        if "$match" in stage:
+            docs = [d for d in docs if _matches(d, stage["$match"])]
+        elif "$count" in stage:
+            docs = [{stage["$count"]: len(docs)}] if docs else []
+        elif "$group" in stage:
+            spec = stage["$group"]
+            groups = {}
+            for d in docs:
+                key = _eval(spec["_id"], d)
+                expr = spec["value"]["$sum"]
+                groups[key] = groups.get(key, 0) + _eval(expr, d)
+            docs = [{"_id": k, "value": v} for k, v in groups.items()]
+    return docs
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = docs or []
+        self.aggregate_calls = 0
+
+    def aggregate(self, pipeline):
+        self.aggregate_calls += 1
+        facets = pipeline[0]["$facet"]
+        return FakeCursor([{name: _run_pipeline(self.docs, p) for name, p in facets.items()}])
+
+    async def find_one(self, query, projection=None):
+        for d in self.docs:
+            if all(d.get(k) == v for k, v in query.items()):
+                return d
+        return None
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs = [d for d in self.docs if d.get("_id") != query["_id"]] + [dict(doc)]
+
+    async def update_one(self, query, update):
+        doc = await self.find_one(query)
+        if doc is None:
+            return
+        for path, amount in update.get("$inc", {}).items():
+            node = doc
+            parts = path.split(".")
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = node.get(parts[-1], 0) + amount
+        doc.update(update.get("$set", {}))
+
+    async def find_one_and_update(self, query, update, projection=None):
+        doc = await self.find_one(query)
+        if doc is None:
+            return None
+        before = dict(doc)
+        doc.update(update["$set"])
+        return before
+
+
+class FakeDB:
+    def __init__(self, **collections):
+        self.collections = {name: FakeCollection(docs) for name, docs in collections.items()}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+@pytest.fixture(autouse=True)
+def reset_cache():
+    MetricsAdminService._cache = None
+    MetricsAdminService._cache_at = 0.0
+    MetricsAdminService._lock = None
+    MetricsAdminService._reconcile_task = None
+    yield
+
+
+def _sample_db():
+    now = datetime.now(timezone.utc)
+    return FakeDB(
+        content_posts=[
+            {"id": "p1", "created_at": now.isoformat()},
+            {"id": "p2", "created_at": (now - timedelta(days=30)).isoformat()}
+        ],
+        leads=[{"status": "new"}, {"status": "new"}, {"status": "converted"}],
+        groups=[
+            {"id": "g1", "is_active": True, "group_type": "family"},
+            {"id": "g2", "is_active": False, "group_type": "hunting_club"}
+        ],
+        referrals=[
+            {"status": "rewarded", "referrer_reward_amount": 10, "referee_reward_amount": 5},
+            {"status": "pending", "referrer_reward_amount": 10}
+        ],
+        wallets=[{"balance_credits": 12.5, "total_earned": 20}, {"balance_credits": 7.25}],
+        land_listings=[
+            {"id": "l1", "status": "active", "is_featured": False},
+            {"id": "l2", "status": "pending", "is_featured": True}
+        ],
+        lands_purchases=[{"status": "completed", "amount": 9.99}, {"status": "failed", "amount": 50}]
+    )
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestPipelineHelpers:
+    """Tests des helpers de construction/lecture $facet"""
+
+    def test_one_facet_stage_per_collection(self):
+        facets = build_collection_facets(datetime.now(timezone.utc))
+        collections = {spec["collection"] for spec in METRIC_DEFINITIONS.values()}
+        assert set(facets) == collections
+        assert sum(len(paths) for paths, _ in facets.values()) == len(METRIC_DEFINITIONS)
+
+    def test_parse_skips_null_group_keys(self):
+        values = parse_facet_result(
+            ["networking.leads.by_status"],
+            {"m0": [{"_id": "new", "value": 2}, {"_id": None, "value": 1}]}
+        )
+        assert values == {"networking.leads.by_status": {"new": 2}}
+
+    def test_nest_and_transition(self):
+        assert nest_metrics({"a.b.c": 1, "a.d": 2}) == {"a": {"b": {"c": 1}, "d": 2}}
+        assert transition("x.by_status", "pending", "rewarded") == {
+            "x.by_status.pending": -1, "x.by_status.rewarded": 1
+        }
+        assert transition("x.by_status", "same", "same") == {}
+
+
+class TestReconcile:
+    """Tests de la réconciliation complète"""
+
+    def test_reconcile_computes_dashboard(self):
+        db = _sample_db()
+        result = asyncio.run(NetworkingAdminService.get_dashboard_stats(db))
+        stats = result["stats"]
+        assert stats["posts"] == {"total": 2, "this_week": 1}
+        assert stats["leads"] == {"total": 3, "new": 2, "converted": 1}
+        assert stats["groups"] == {"total": 2, "active": 1}
+        assert stats["referrals"]["pending"] == 1
+        assert stats["wallets"] == {"total": 2, "total_credits": 19.75}
+        assert result["freshness"]["stale"] is False
+        assert db.content_posts.aggregate_calls == 1
+
+    def test_sums_with_filter(self):
+        db = _sample_db()
+        stats = asyncio.run(HotspotsAdminService.get_dashboard_stats(db))["stats"]
+        assert stats["revenue"] == {"total": 9.99, "transactions": 1}
+        assert stats["listings"]["featured"] == 1
+        assert stats["listings"]["active"] == 1
+
+    def test_empty_collections_default_to_zero(self):
+        metrics, freshness = asyncio.run(MetricsAdminService.get_section(FakeDB(), "marketing"))
+        assert metrics["campaigns"]["total"] == 0
+        assert metrics["posts"]["by_platform"] == {}
+        assert freshness["version"] == 1
+
+
+class TestWriteHooks:
+    """Tests des hooks d'écriture ($inc sur le snapshot)"""
+
+    def test_status_transition_updates_snapshot(self):
+        db = _sample_db()
+
+        async def run():
+            await MetricsAdminService.reconcile(db)
+            await HotspotsAdminService.update_listing_status(db, "l2", "active")
+            return await HotspotsAdminService.get_dashboard_stats(db)
+
+        stats = asyncio.run(run())["stats"]
+        assert stats["listings"]["active"] == 2
+        assert stats["listings"]["pending"] == 0
+        assert db.land_listings.aggregate_calls == 1
+
+    def test_unknown_metric_is_ignored(self):
+        db = _sample_db()
+        asyncio.run(MetricsAdminService.reconcile(db))
+        assert asyncio.run(MetricsAdminService.record(db, {"networking.unknown": 1})) is False
+
+    def test_stale_snapshot_triggers_background_reconcile(self):
+        db = _sample_db()
+
+        async def run():
+            snapshot = await MetricsAdminService.reconcile(db)
+            old = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+            db[SNAPSHOT_COLLECTION].docs[0]["reconciled_at"] = old
+            MetricsAdminService._cache = None
+            _, freshness = await MetricsAdminService.get_section(db, "networking")
+            await MetricsAdminService._reconcile_task
+            return snapshot["version"], freshness
+
+        version, freshness = asyncio.run(run())
+        assert freshness["stale"] is True
+        assert db[SNAPSHOT_COLLECTION].docs[0]["version"] == version + 1
@@ -0,0 +1,140 @@
+"""
+Tests Unitaires - Legal Time Ephemeris
+======================================
+Tests de l'éphéméride solaire vectorisée (comparaison avec Astral,
+cas polaires, cache par cellule) et de la table de saison.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import importlib
+import sys
+import os
+import threading
+from datetime import date, timedelta
+from zoneinfo import ZoneInfo
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from astral import LocationInfo
+from astral.sun import sun
+
+from modules.legal_time_engine.v1.ephemeris import SolarEphemeris, quantize
+from modules.legal_time_engine.v1.service import LegalTimeService
+from modules.legal_time_engine.v1.models import LocationInput
+
+
+LOCATIONS = [
+    (46.8139, -71.2080, "America/Toronto"),    # Québec
+    (58.1, -68.4, "America/Toronto"),          # Kuujjuaq
+    (-33.9, 151.2, "Australia/Sydney"),
+    (69.6, 18.9, "Europe/Oslo"),               # Tromsø (nuit/jour polaire)
+]
+
+
+def _astral(lat, lng, tz, day):
+    observer = LocationInfo("x", "x", tz, lat, lng).observer
+    return sun(observer, date=day, tzinfo=ZoneInfo(tz))
+
+
+class TestSolarEphemeris:
+    """Tests pour SolarEphemeris"""
+
+    def test_matches_astral_over_a_year(self):
+        eph = SolarEphemeris(cell_degrees=1e-6)
+        table = eph.get_range(LOCATIONS, date(2026, 1, 1), date(2026, 12, 31))
+
+        checked = 0
+        for (lat, lng, tz), days in zip(LOCATIONS, table):
+            assert len(days) == 365
+            for solar_day in days[::7]:
+                try:
+                    expected = _astral(lat, lng, tz, solar_day.date)
+                except ValueError:
+                    with pytest.raises(ValueError):
+                        solar_day.require()
+                    continue
+                for event in ("dawn", "sunrise", "sunset", "dusk"):
+                    delta = abs((getattr(solar_day, event) - expected[event]).total_seconds())
+                    assert delta < 1
+                checked += 1
+        assert checked > 150
+
+    def test_dst_transition_day(self):
+        eph = SolarEphemeris(cell_degrees=1e-6)
+        day = date(2026, 3, 8)
+        solar_day = eph.get_day(46.8139, -71.2080, "America/Toronto", day)
+        expected = _astral(46.8139, -71.2080, "America/Toronto", day)
+        assert solar_day.sunrise == pytest.approx(expected["sunrise"], abs=timedelta(seconds=1))
+        assert solar_day.sunrise.utcoffset() == timedelta(hours=-4)
+
+    def test_polar_night_raises(self):
+        eph = SolarEphemeris()
+        solar_day = eph.get_day(78.2, 15.6, "Europe/Oslo", date(2026, 12, 21))
+        assert solar_day.sunrise is None
+        with pytest.raises(ValueError, match="always below"):
+            solar_day.require()
+
+    def test_cache_hits_per_cell(self):
+        eph = SolarEphemeris(cell_degrees=0.01)
+        eph.get_range([(46.8139, -71.2080, "America/Toronto")], date(2026, 9, 1), date(2026, 9, 30))
+        # Même cellule de 0.01°: servi depuis le cache, aucun nouveau lot
+        eph.get_range([(46.8141, -71.2079, "America/Toronto")], date(2026, 9, 10), date(2026, 9, 20))
+        stats = eph.stats()
+        assert stats["batches"] == 1
+        assert stats["hits"] == 11
+        assert stats["computed_days"] == 30
+        assert quantize(46.8139, -71.2080) == quantize(46.8141, -71.2079)
+
+    def test_misses_of_many_locations_share_one_batch(self):
+        eph = SolarEphemeris()
+        eph.get_range(LOCATIONS[:2], date(2026, 10, 1), date(2026, 10, 15))
+        assert eph.stats()["batches"] == 1
+        assert eph.stats()["size"] == 30
+
+
+class TestSeasonTable:
+    """Tests de la table de saison du service"""
+
+    def test_rows_per_location(self):
+        service = LegalTimeService()
+        locations = [LocationInput(), LocationInput(latitude=45.5017, longitude=-73.5673)]
+        table = service.get_season_table(locations, date(2026, 9, 1), date(2026, 11, 30))
+
+        assert len(table) == 2
+        rows = table[0]["days"]
+        assert len(rows) == 91
+        first = rows[0]
+        assert first["legal_start"] < first["sunrise"] < first["sunset"] < first["legal_end"]
+        assert first["polar"] is None
+
+        # Cohérent avec le calcul jour par jour
+        sun_times = service.get_sun_times(date(2026, 9, 1))
+        assert first["sunrise"] == sun_times.sunrise.strftime("%H:%M")
+
+    def test_polar_days_do_not_fail_table(self):
+        service = LegalTimeService()
+        location = LocationInput(latitude=78.2, longitude=15.6, timezone="Europe/Oslo")
+        rows = service.get_season_table([location], date(2026, 12, 20), date(2026, 12, 22))[0]["days"]
+        assert all(row["sunrise"] is None for row in rows)
+        assert rows[0]["polar"]["sunrise"] == "below"
+
+    def test_endpoint_runs_off_the_event_loop(self, monkeypatch):
+        legal_router = importlib.import_module("modules.legal_time_engine.v1.router")
+        from modules.legal_time_engine.v1.models import SeasonTableRequest
+        threads = []
+        compute = legal_router._service.get_season_table
+
+        def recording(*args):
+            threads.append(threading.get_ident())
+            return compute(*args)
+
+        monkeypatch.setattr(legal_router._service, "get_season_table", recording)
+        request = SeasonTableRequest(locations=[LocationInput()], start_date=date(2026, 9, 1), end_date=date(2026, 9, 7))
+        result = asyncio.run(legal_router.get_season_table(request))
+
+        assert result["days"] == 7 and len(result["locations"][0]["days"]) == 7
+        assert threads and threads[0] != threading.get_ident()
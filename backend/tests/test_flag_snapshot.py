@@ -0,0 +1,265 @@
+"""
+Tests Unitaires - Flag Snapshot
+===============================
+Tests du snapshot en mémoire des feature flags et des interrupteurs
+(lecture sans I/O, mise à jour locale au toggle, rechargement par
+change stream ou par polling, numéros de version).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('JWT_SECRET_KEY', 'test_secret_key_for_testing')
+
+from pymongo.errors import AutoReconnect, OperationFailure
+
+import feature_controls
+import maintenance_controller
+import site_access
+from flag_snapshot import FlagSnapshotService
+from feature_controls import FeatureToggleRequest, BulkToggleRequest
+
+
+# ==============================================
+# FAKE MOTOR
+# ==============================================
+
+def _matches(doc, query):
+    return all(doc.get(k) == v for k, v in query.items())
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, n):
+        return [{k: v for k, v in d.items() if k != "_id"} for d in self.docs]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.reads = 0
+
+    def find(self, query, projection=None):
+        self.reads += 1
+        return FakeCursor([d for d in self.docs if _matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        self.reads += 1
+        return next((dict(d) for d in self.docs if _matches(d, query)), None)
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def update_one(self, query, update, upsert=False):
+        target = next((d for d in self.docs if _matches(d, query)), None)
+        if target is None and upsert:
+            target = dict(query)
+            self.docs.append(target)
+        if target is not None:
+            target.update(update.get("$set", {}))
+        return SimpleNamespace(matched_count=int(target is not None))
+
+    async def delete_many(self, query):
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+
+
+class FakeDB:
+    def __init__(self):
+        self.collections = {}
+        self.watch_error = None
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def watch(self, pipeline):
+        raise self.watch_error
+
+
+def _reads(db):
+    return sum(c.reads for c in db.collections.values())
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    service = FlagSnapshotService(
+        singletons={"site_config": {"_id": "main"}, "maintenance_mode": {"_id": "config"}},
+        features=True
+    )
+
+    async def get_db():
+        return fake
+
+    for module in (feature_controls, maintenance_controller, site_access):
+        monkeypatch.setattr(module, "get_db", get_db)
+        monkeypatch.setattr(module, "flag_snapshot", service)
+    fake.service = service
+    return fake
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestFeatureFlags:
+    """Tests des feature flags servis depuis le snapshot"""
+
+    def test_checks_do_no_io_after_first_load(self, db):
+        db.feature_controls.docs = [{"feature_id": "marketplace", "enabled": False}]
+
+        async def run():
+            first = await feature_controls.is_feature_enabled("marketplace")
+            reads = _reads(db)
+            checks = [await feature_controls.is_feature_enabled("marketplace") for _ in range(50)]
+            checks.append(await feature_controls.is_feature_enabled("social_posts"))
+            return first, checks, _reads(db) - reads
+
+        first, checks, extra_reads = asyncio.run(run())
+        assert first is False
+        assert checks[:-1] == [False] * 50 and checks[-1] is True
+        assert extra_reads == 0
+        assert feature_controls.feature_enabled_now("inconnu") is False
+
+    def test_toggle_and_bulk_update_snapshot_immediately(self, db):
+        async def run():
+            await feature_controls.get_all_feature_status()
+            v0 = db.service.snapshot.version
+            await feature_controls.toggle_feature(FeatureToggleRequest(feature_id="payments", enabled=False), "a@b.ca")
+            after_toggle = feature_controls.feature_enabled_now("payments")
+            await feature_controls.toggle_features_bulk(
+                BulkToggleRequest(features={"likes": False, "groups": False, "inconnu": True}), "a@b.ca"
+            )
+            v2 = db.service.snapshot.version
+            status = await feature_controls.get_all_feature_status()
+            await feature_controls.reset_to_defaults("a@b.ca")
+            return v0, after_toggle, v2, status
+
+        v0, after_toggle, v2, status = asyncio.run(run())
+        assert after_toggle is False
+        assert v2 == v0 + 2
+        assert status["summary"]["disabled"] == sum(
+            1 for f in feature_controls.FEATURE_DEFINITIONS.values() if not f["default"]
+        ) + 3
+        assert status["snapshot_version"] == v2
+        assert feature_controls.feature_enabled_now("payments") is True
+
+
+class TestRefresh:
+    """Tests du rechargement et des versions"""
+
+    def test_refresh_swaps_only_on_change(self, db):
+        service = db.service
+
+        async def run():
+            await service.refresh(db)
+            v1 = service.snapshot.version
+            unchanged = await service.refresh(db)
+            db.feature_controls.docs.append({"feature_id": "comments", "enabled": False})
+            changed = await service.refresh(db)
+            return v1, unchanged, changed
+
+        v1, unchanged, changed = asyncio.run(run())
+        assert unchanged is False and changed is True
+        assert service.snapshot.version == v1 + 1
+        assert service.is_enabled("comments", True) is False
+
+    def test_stale_reload_does_not_undo_local_change(self, db):
+        service = db.service
+        real_load = service._load
+        loads = []
+
+        async def racing_load(database):
+            result = await real_load(database)
+            if service.local_updates == 0:
+                # Toggle arrive pendant la lecture d'un rechargement
+                db.feature_controls.docs.append({"feature_id": "likes", "enabled": False})
+                service.apply_features({"likes": False})
+                loads.append(service.snapshot.version)
+            return result
+
+        async def run():
+            await service.ensure_loaded(db)
+            service._load = racing_load
+            await service.refresh(db)
+
+        asyncio.run(run())
+        assert service.is_enabled("likes", True) is False
+        # La lecture périmée est écartée, la relecture ne change rien
+        assert service.snapshot.version == loads[0]
+
+    def test_polling_fallback_without_change_streams(self, db):
+        service = db.service
+        service.poll_interval = 0.01
+        db.watch_error = OperationFailure("$changeStream is only supported on replica sets", code=40573)
+
+        async def run():
+            await service.start(db)
+            db.site_config.docs.append({"_id": "main", "mode": "maintenance"})
+            await asyncio.sleep(0.1)
+            mode = service.mode
+            await service.stop()
+            return mode
+
+        assert asyncio.run(run()) == "polling"
+        assert service.document("site_config")["mode"] == "maintenance"
+
+    def test_refresh_loop_starts_when_initial_load_fails(self, db):
+        service = db.service
+        service.poll_interval = 0.01
+        db.watch_error = OperationFailure("$changeStream is only supported on replica sets", code=40573)
+        db.site_config.docs.append({"_id": "main", "mode": "maintenance"})
+        load = service._load
+        failures = []
+
+        async def flaky_load(database):
+            if not failures:
+                failures.append(1)
+                raise AutoReconnect("connection refused")
+            return await load(database)
+
+        service._load = flaky_load
+
+        async def run():
+            await service.start(db)
+            loaded_at_start = service.loaded
+            await asyncio.sleep(0.1)
+            await service.stop()
+            return loaded_at_start
+
+        # Premier chargement en échec: la boucle de rafraîchissement rattrape
+        assert asyncio.run(run()) is False
+        assert service.loaded
+        assert service.document("site_config")["mode"] == "maintenance"
+
+
+class TestSwitches:
+    """Tests du mode site et du mode maintenance"""
+
+    def test_site_and_maintenance_status_from_snapshot(self, db):
+        db.site_config.docs = [{"_id": "main", "mode": "live", "message": "ok"}]
+
+        async def run():
+            site = await site_access.get_site_status()
+            maintenance = await maintenance_controller.get_maintenance_status()
+            reads = _reads(db)
+            await site_access.get_site_status()
+            await maintenance_controller.verify_bypass_token("x")
+            return site, maintenance, _reads(db) - reads
+
+        site, maintenance, extra_reads = asyncio.run(run())
+        assert site["is_accessible"] is True
+        assert maintenance["is_active"] is False
+        assert len(db.maintenance_mode.docs) == 1
+        assert extra_reads == 0
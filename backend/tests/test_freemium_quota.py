@@ -0,0 +1,157 @@
+"""
+Tests Unitaires - Freemium Quotas
+=================================
+Tests du cache de niveaux, des seaux de jetons locaux et du
+check-and-consume atomique (base Mongo simulée en mémoire).
+
+Version: 1.0.0
+"""
+
+import asyncio
+import sys
+import os
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.freemium_engine import quota
+from modules.freemium_engine.quota import QuotaManager, QuotaBuckets, utc_day
+from modules.freemium_engine.router import TIER_LIMITS
+
+from conftest import FakeDB as BaseFakeDB
+
+
+class FakeDB(BaseFakeDB):
+    def __init__(self, subscriptions=None):
+        super().__init__()
+        self.subscriptions.docs.extend(subscriptions or [])
+
+
+def _usage(db, user_id, feature):
+    return next(d for d in db.quota_usage.docs if d["user_id"] == user_id and d["feature"] == feature)
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestTierCache:
+    """Tests du cache des niveaux d'abonnement"""
+
+    def test_tier_is_cached(self):
+        manager = QuotaManager(TIER_LIMITS)
+        db = FakeDB([{"user_id": "u1", "tier": "premium"}])
+
+        async def run():
+            return [await manager.tiers.get_tier(db, "u1") for _ in range(5)]
+
+        tiers = asyncio.run(run())
+        assert tiers[-1] == ("premium", False)
+        assert db.subscriptions.reads == 1
+
+    def test_expired_falls_back_to_free(self):
+        manager = QuotaManager(TIER_LIMITS)
+        expired = (datetime.now(timezone.utc) - timedelta(days=1)).replace(tzinfo=None)
+        db = FakeDB([{"user_id": "u1", "tier": "pro", "expires_at": expired}])
+        assert asyncio.run(manager.tiers.get_tier(db, "u1")) == ("free", True)
+
+    def test_invalidate_on_upgrade(self):
+        manager = QuotaManager(TIER_LIMITS)
+        db = FakeDB([{"user_id": "u1", "tier": "free"}])
+        asyncio.run(manager.tiers.get_tier(db, "u1"))
+        db.subscriptions.docs[0]["tier"] = "pro"
+        manager.invalidate("u1")
+        assert asyncio.run(manager.tiers.get_tier(db, "u1")) == ("pro", False)
+
+
+class TestQuotaBuckets:
+    """Tests des seaux de jetons locaux"""
+
+    def test_bucket_rejects_after_capacity(self):
+        buckets = QuotaBuckets()
+        day = utc_day()
+        assert all(buckets.try_take("u1", "f", day, 3) for _ in range(3))
+        assert buckets.try_take("u1", "f", day, 3) is False
+        assert buckets.stats()["local_rejections"] == 1
+
+    def test_new_day_refills(self):
+        buckets = QuotaBuckets()
+        day = utc_day()
+        buckets.sync("u1", "f", day, 3, 3)
+        assert buckets.try_take("u1", "f", day + timedelta(days=1), 3) is True
+
+
+class TestConsume:
+    """Tests du check-and-consume atomique"""
+
+    def test_concurrent_consume_never_overshoots(self):
+        manager = QuotaManager(TIER_LIMITS)
+        db = FakeDB()
+        limit = TIER_LIMITS["free"]["daily_strategy_generations"]
+
+        async def run():
+            return await asyncio.gather(*[
+                manager.consume(db, "u1", "daily_strategy_generations") for _ in range(20)
+            ])
+
+        results = asyncio.run(run())
+        assert sum(r["allowed"] for r in results) == limit
+        assert _usage(db, "u1", "daily_strategy_generations")["count"] == limit
+        # Les rafales au-delà de la limite sont rejetées localement
+        assert db.quota_usage.writes == limit
+        assert {r["source"] for r in results if not r["allowed"]} == {"local"}
+
+    def test_db_rejects_when_other_worker_consumed(self):
+        manager = QuotaManager(TIER_LIMITS)
+        db = FakeDB()
+        db.quota_usage.docs.append({"user_id": "u1", "feature": "daily_weather_checks", "date": utc_day(), "count": 10})
+
+        result = asyncio.run(manager.consume(db, "u1", "daily_weather_checks"))
+        assert result["allowed"] is False
+        assert result["source"] == "db"
+        assert result["remaining"] == 0
+
+    def test_unlimited_and_boolean_features(self):
+        manager = QuotaManager(TIER_LIMITS)
+        db = FakeDB([{"user_id": "pro_user", "tier": "pro"}])
+
+        unlimited = asyncio.run(manager.consume(db, "pro_user", "daily_strategy_generations"))
+        assert unlimited["allowed"] is True and unlimited["remaining"] == -1
+
+        locked = asyncio.run(manager.consume(db, "free_user", "export_reports"))
+        assert locked["allowed"] is False and locked["source"] == "tier"
+
+    def test_usage_reflects_consumption(self):
+        manager = QuotaManager(TIER_LIMITS)
+        db = FakeDB()
+
+        async def run():
+            await manager.consume(db, "u1", "ai_recommendations", amount=2)
+            return await manager.get_usage(db, "u1", "ai_recommendations")
+
+        usage = asyncio.run(run())
+        assert usage["used"] == 2
+        assert usage["remaining"] == TIER_LIMITS["free"]["ai_recommendations"] - 2
+
+    def test_index_creation_is_retried_after_failure(self, monkeypatch):
+        manager = QuotaManager(TIER_LIMITS)
+        db = FakeDB()
+        attempts = []
+
+        async def failing_create_index(*args, **kwargs):
+            attempts.append(args)
+            raise RuntimeError("not primary")
+
+        monkeypatch.setattr(db.quota_usage, "create_index", failing_create_index)
+        asyncio.run(manager.ensure_indexes(db))
+        asyncio.run(manager.ensure_indexes(db))
+        assert manager._indexes_ready is False
+        assert len(attempts) == 1
+
+        # Après le délai, la création est retentée puis mémorisée
+        monkeypatch.setattr(quota.time, "monotonic", lambda: manager._index_retry_at + 1)
+        monkeypatch.delattr(db.quota_usage, "create_index")
+        asyncio.run(manager.ensure_indexes(db))
+        assert manager._indexes_ready is True
+        assert ("user_id", "feature", "date") in db.quota_usage.unique
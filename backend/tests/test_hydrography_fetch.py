@@ -0,0 +1,218 @@
+"""
+Tests Unitaires - Hydrography Fetch
+===================================
+Tests de l'acquisition hydrographique multi-source (sources en
+parallèle, délais par source, annulation au premier résultat suffisant)
+et du stockage persistant des tuiles z/x/y.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import hydrography_service as hydro
+from hydrography_service import HydroSource, HydrographyCache
+from hydrography_tiles import HydroTileStore, tiles_for_bbox, bbox_around, split_into_tiles
+
+# Québec: sources MRNF, CanVec et OSM
+LAT, LNG = 46.8, -71.2
+
+
+def _lake(name, lat=LAT, lng=LNG, size=0.004):
+    return {"id": name, "type": "lake", "name": name, "source": "test",
+            "polygon": [[lat, lng], [lat + size, lng], [lat + size, lng + size], [lat, lng + size]]}
+
+
+class FakeSource:
+    """Source simulée: délai, surfaces renvoyées, suivi des annulations"""
+
+    def __init__(self, name, features=(), delay=0.0, success=True):
+        self.name = name
+        self.features = list(features)
+        self.delay = delay
+        self.success = success
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self, lat, lng, radius_meters):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {"features": list(self.features), "source": self.name, "success": self.success}
+
+
+@pytest.fixture
+def sources(monkeypatch, tmp_path):
+    fakes = {
+        HydroSource.QUEBEC_MRNF: FakeSource("quebec_mrnf"),
+        HydroSource.CANADA_CANVEC: FakeSource("canada_canvec"),
+        HydroSource.USA_NHD: FakeSource("usa_nhd"),
+        HydroSource.OSM_FALLBACK: FakeSource("osm_fallback"),
+    }
+    monkeypatch.setattr(hydro, "SOURCE_FETCHERS", fakes)
+    monkeypatch.setattr(hydro, "_hydro_cache", HydrographyCache())
+    monkeypatch.setattr(hydro, "_tile_store", HydroTileStore(str(tmp_path / "tiles.sqlite")))
+    monkeypatch.setattr(hydro, "HYDRO_MERGE_GRACE", 0.05)
+    return fakes
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestConcurrentSources:
+    """Tests de l'interrogation parallèle"""
+
+    def test_sources_run_in_parallel_and_merge(self, sources):
+        shared = _lake("shared")
+        sources[HydroSource.QUEBEC_MRNF].features = [shared, _lake("a", lat=LAT + 0.01)]
+        sources[HydroSource.QUEBEC_MRNF].delay = 0.2
+        sources[HydroSource.CANADA_CANVEC].features = [dict(shared, id="dup")]
+        sources[HydroSource.CANADA_CANVEC].delay = 0.2
+        sources[HydroSource.OSM_FALLBACK].delay = 5
+
+        started = time.monotonic()
+        result = asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.35
+        assert result["feature_count"] == 2
+        assert result["sources_used"] == ["quebec_mrnf", "canada_canvec"]
+        assert sources[HydroSource.USA_NHD].calls == 0
+        assert sources[HydroSource.OSM_FALLBACK].cancelled
+
+    def test_deadline_and_grace_cancel_slow_sources(self, sources, monkeypatch):
+        monkeypatch.setattr(hydro, "HYDRO_MERGE_GRACE", 1)
+        monkeypatch.setitem(hydro.SOURCE_DEADLINES, HydroSource.QUEBEC_MRNF, 0.05)
+        sources[HydroSource.QUEBEC_MRNF].delay = 5
+        sources[HydroSource.CANADA_CANVEC].features = [_lake("c")]
+
+        result = asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+        assert result["sources_used"] == ["canada_canvec"]
+        assert any("deadline exceeded" in e for e in result["errors"])
+        assert sources[HydroSource.QUEBEC_MRNF].cancelled
+
+        # Délai de fusion: la source lente est annulée après le premier résultat
+        monkeypatch.setattr(hydro, "HYDRO_MERGE_GRACE", 0.05)
+        sources[HydroSource.QUEBEC_MRNF].features = [_lake("q")]
+        sources[HydroSource.QUEBEC_MRNF].delay = 0
+        sources[HydroSource.CANADA_CANVEC].delay = 5
+        started = time.monotonic()
+        merged = asyncio.run(hydro.fetch_sources_concurrently(LAT, LNG, 2000, hydro.detect_region(LAT, LNG)))
+        assert time.monotonic() - started < 1
+        assert merged["sources_used"] == ["quebec_mrnf"]
+        assert sources[HydroSource.CANADA_CANVEC].cancelled
+
+    def test_osm_used_only_without_official_data(self, sources):
+        sources[HydroSource.OSM_FALLBACK].features = [_lake("osm")]
+        sources[HydroSource.CANADA_CANVEC].success = False
+
+        result = asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+        assert result["sources_used"] == ["osm_fallback"]
+        assert [f["id"] for f in result["features"]] == ["osm"]
+
+
+class TestTileStore:
+    """Tests du stockage persistant par tuile"""
+
+    def test_tiles_survive_restart(self, sources, tmp_path, monkeypatch):
+        sources[HydroSource.QUEBEC_MRNF].features = [_lake("a"), _lake("loin", lat=LAT + 0.5)]
+        first = asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+
+        # Nouveau processus: cache mémoire vide, même fichier SQLite
+        monkeypatch.setattr(hydro, "_hydro_cache", HydrographyCache())
+        monkeypatch.setattr(hydro, "_tile_store", HydroTileStore(str(tmp_path / "tiles.sqlite")))
+        second = asyncio.run(hydro.fetch_water_features_multi_source(LAT + 0.001, LNG, 1500))
+
+        assert [f["id"] for f in first["features"]] == ["a"]
+        assert [f["id"] for f in second["features"]] == ["a"]
+        assert sources[HydroSource.QUEBEC_MRNF].calls == 1
+        assert second["tiles"]["from_store"] == second["tiles"]["total"] > 0
+
+    def test_failures_are_not_persisted(self, sources):
+        for fake in sources.values():
+            fake.success = False
+        asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+        assert hydro._tile_store.stats()["tiles"] == 0
+
+    def test_partial_results_are_not_persisted(self, sources, monkeypatch):
+        # CanVec en échec: MRNF seul ne suffit pas à figer les tuiles 30 jours
+        sources[HydroSource.QUEBEC_MRNF].features = [_lake("a")]
+        sources[HydroSource.CANADA_CANVEC].success = False
+        result = asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+        assert [f["id"] for f in result["features"]] == ["a"]
+        assert hydro._tile_store.stats()["tiles"] == 0
+
+        # Cache mémoire court: la requête suivante réinterroge les sources
+        monkeypatch.setattr(hydro, "HYDRO_PARTIAL_CACHE_DURATION", 0)
+        hydro._hydro_cache.clear()
+        asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+        sources[HydroSource.CANADA_CANVEC].success = True
+        asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+        assert sources[HydroSource.QUEBEC_MRNF].calls == 3
+        assert hydro._tile_store.stats()["tiles"] > 0
+
+    def test_late_source_completes_tiles_in_background(self, sources, monkeypatch):
+        sources[HydroSource.QUEBEC_MRNF].features = [_lake("q")]
+        sources[HydroSource.CANADA_CANVEC].features = [_lake("c", lat=LAT + 0.01)]
+        sources[HydroSource.CANADA_CANVEC].delay = 0.2
+
+        async def run():
+            result = await hydro.fetch_water_features_multi_source(LAT, LNG, 2000)
+            stored_at_response = hydro._tile_store.stats()["tiles"]
+            await asyncio.gather(*hydro._late_persists)
+            return result, stored_at_response
+
+        # La réponse n'attend pas CanVec; les tuiles sont écrites quand il répond
+        result, stored_at_response = asyncio.run(run())
+        assert [f["id"] for f in result["features"]] == ["q"]
+        assert any("not awaited" in e for e in result["errors"])
+        assert stored_at_response == 0
+        assert not sources[HydroSource.CANADA_CANVEC].cancelled
+
+        monkeypatch.setattr(hydro, "_hydro_cache", HydrographyCache())
+        second = asyncio.run(hydro.fetch_water_features_multi_source(LAT, LNG, 2000))
+        assert second["tiles"]["from_store"] == second["tiles"]["total"]
+        assert {f["id"] for f in second["features"]} == {"q", "c"}
+        assert second["sources_used"] == ["quebec_mrnf", "canada_canvec"]
+        assert sources[HydroSource.CANADA_CANVEC].calls == 1
+
+    def test_failed_late_source_keeps_tiles_out_of_store(self, sources, monkeypatch):
+        monkeypatch.setitem(hydro.SOURCE_DEADLINES, HydroSource.CANADA_CANVEC, 0.1)
+        sources[HydroSource.QUEBEC_MRNF].features = [_lake("q")]
+        sources[HydroSource.CANADA_CANVEC].delay = 5
+
+        async def run():
+            result = await hydro.fetch_water_features_multi_source(LAT, LNG, 2000)
+            await asyncio.gather(*hydro._late_persists)
+            return result
+
+        result = asyncio.run(run())
+        assert any("not awaited" in e for e in result["errors"])
+        assert sources[HydroSource.CANADA_CANVEC].cancelled
+        assert hydro._tile_store.stats()["tiles"] == 0
+
+    def test_split_keeps_empty_tiles(self):
+        tiles = tiles_for_bbox(bbox_around(LAT, LNG, 2000))
+        entries = split_into_tiles([_lake("a", size=0.0005)], tiles)
+        assert set(entries) == set(tiles)
+        assert sum(1 for features in entries.values() if features) >= 1
+        assert any(not features for features in entries.values())
+
+    def test_memory_cache_is_bounded(self):
+        cache = HydrographyCache(max_entries=3)
+        for i in range(5):
+            cache.set(LAT + i, LNG, 1000, {"i": i})
+        assert len(cache._cache) == 3
+        assert cache.get(LAT, LNG, 1000) is None
+        assert cache.get(LAT + 4, LNG, 1000) == {"i": 4}
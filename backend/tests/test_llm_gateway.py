@@ -0,0 +1,181 @@
+"""
+Tests Unitaires - LLM Gateway
+=============================
+Tests du gateway LLM partagé avec le backend stub déterministe
+(aucun appel réseau).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.llm_gateway.gateway import (
+    LLMGateway, LLMBudgetExceeded, LLMTimeout, canonicalize_prompt, make_cache_key
+)
+from modules.llm_gateway.backends import StubLlmBackend
+
+
+class SlowStubBackend(StubLlmBackend):
+    """Stub qui simule un appel lent"""
+
+    def __init__(self, delay: float = 0.05):
+        super().__init__()
+        self.delay = delay
+        self.max_parallel = 0
+        self._parallel = 0
+
+    async def send(self, **kwargs) -> str:
+        self._parallel += 1
+        self.max_parallel = max(self.max_parallel, self._parallel)
+        try:
+            await asyncio.sleep(self.delay)
+            return await super().send(**kwargs)
+        finally:
+            self._parallel -= 1
+
+
+class FakeStore:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ttl, feature, model):
+        self.data[key] = value
+
+
+class TestCanonicalization:
+    """Tests de canonicalisation des prompts"""
+
+    def test_whitespace_insensitive(self):
+        assert canonicalize_prompt("  Bonjour   le\r\nmonde  ") == "Bonjour le\nmonde"
+
+    def test_key_depends_on_model_and_system(self):
+        base = make_cache_key("openai", "gpt-5.2", "sys", "prompt")
+        assert base == make_cache_key("openai", "gpt-5.2", "sys ", " prompt")
+        assert base != make_cache_key("openai", "gpt-4o", "sys", "prompt")
+        assert base != make_cache_key("openai", "gpt-5.2", "other", "prompt")
+
+
+class TestLLMGateway:
+    """Tests pour LLMGateway"""
+
+    def test_stub_is_deterministic(self):
+        gateway = LLMGateway(backend=StubLlmBackend())
+        first = asyncio.run(gateway.complete("prompt", use_cache=False))
+        second = asyncio.run(gateway.complete("prompt", use_cache=False))
+        assert first == second
+
+    def test_memory_cache_hit(self):
+        backend = StubLlmBackend()
+        gateway = LLMGateway(backend=backend)
+
+        async def run():
+            await gateway.complete("analyse", feature="product_analysis")
+            await gateway.complete("analyse", feature="product_analysis")
+
+        asyncio.run(run())
+        assert backend.calls == 1
+        assert gateway.metrics["product_analysis"].memory_hits == 1
+
+    def test_persistent_store_hit(self):
+        store = FakeStore()
+        first = LLMGateway(backend=StubLlmBackend(), store=store)
+        asyncio.run(first.complete("analyse"))
+
+        backend = StubLlmBackend()
+        second = LLMGateway(backend=backend, store=store)
+        asyncio.run(second.complete("analyse"))
+        assert backend.calls == 0
+        assert second.metrics["default"].store_hits == 1
+
+    def test_identical_in_flight_prompts_coalesce(self):
+        backend = SlowStubBackend()
+        gateway = LLMGateway(backend=backend)
+
+        async def run():
+            return await asyncio.gather(*[gateway.complete("même prompt") for _ in range(10)])
+
+        results = asyncio.run(run())
+        assert len(set(results)) == 1
+        assert backend.calls == 1
+        assert gateway.metrics["default"].coalesced == 9
+
+    def test_feature_concurrency_limit(self):
+        backend = SlowStubBackend()
+        gateway = LLMGateway(backend=backend, policies={"seo": {"concurrency": 2}})
+
+        async def run():
+            await asyncio.gather(*[gateway.complete(f"page {i}", feature="seo") for i in range(8)])
+
+        asyncio.run(run())
+        assert backend.calls == 8
+        assert backend.max_parallel == 2
+
+    def test_token_budget(self):
+        gateway = LLMGateway(backend=StubLlmBackend(), policies={"tiny": {"tokens_per_hour": 50, "completion_reserve": 0}})
+
+        async def run():
+            await gateway.complete("x" * 100, feature="tiny", use_cache=False)
+            await gateway.complete("y" * 100, feature="tiny", use_cache=False)
+
+        with pytest.raises(LLMBudgetExceeded):
+            asyncio.run(run())
+        assert gateway.metrics["tiny"].budget_rejections == 1
+
+    def test_concurrent_calls_cannot_overspend(self):
+        """Vérification et réservation en une étape: un seul appel passe"""
+        backend = SlowStubBackend()
+        gateway = LLMGateway(backend=backend, policies={"tiny": {"tokens_per_hour": 1100}})
+
+        async def run():
+            return await asyncio.gather(
+                *[gateway.complete(f"prompt {i}", feature="tiny") for i in range(5)],
+                return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        assert sum(isinstance(r, LLMBudgetExceeded) for r in results) == 4
+        assert backend.calls == 1
+        # Réservation réglée au montant réel
+        assert gateway._budget("tiny").used() < 1000
+
+    def test_owner_cancellation_does_not_cancel_followers(self):
+        backend = SlowStubBackend(delay=0.05)
+        gateway = LLMGateway(backend=backend)
+
+        async def run():
+            owner = asyncio.ensure_future(gateway.complete("partagé"))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(gateway.complete("partagé")) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            owner.cancel()
+            return owner, await asyncio.gather(*followers)
+
+        owner, results = asyncio.run(run())
+        assert owner.cancelled()
+        assert len(set(results)) == 1
+        assert backend.calls == 1
+
+    def test_timeout(self):
+        gateway = LLMGateway(backend=SlowStubBackend(delay=0.5))
+        with pytest.raises(LLMTimeout):
+            asyncio.run(gateway.complete("lent", timeout=0.01))
+        assert gateway.metrics["default"].timeouts == 1
+
+    def test_stats_shape(self):
+        gateway = LLMGateway(backend=StubLlmBackend())
+        asyncio.run(gateway.complete("prompt", feature="seo_content"))
+        stats = gateway.stats()
+        assert stats["backend"] == "stub"
+        feature = stats["features"]["seo_content"]
+        assert feature["backend_calls"] == 1
+        assert feature["prompt_tokens"] > 0
+        assert feature["latency_ms"]["p50"] is not None
@@ -0,0 +1,171 @@
+"""
+Tests Unitaires - Messaging Bulk Send
+=====================================
+Tests du pipeline d'envoi massif (templates compilés, insertion par
+lots, job d'envoi repris après échec partiel ou interruption).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pymongo.errors import BulkWriteError
+
+from modules.messaging_engine import router as messaging
+from modules.messaging_engine.router import (
+    BILINGUAL_TEMPLATES, compile_template, render_compiled, personalize_template,
+    recipient_variables, message_id_for, SEND_JOBS_COLLECTION
+)
+
+
+from conftest import FakeDB
+
+
+# ==============================================
+# FIXTURES
+# ==============================================
+
+def _with_insert_failures(collection):
+    """
+    insert_many de la collection partagée, plus un rejet de validation
+    pour les preview_id de ``fail_ids`` et une coupure réseau après
+    ``crash_after`` appels
+    """
+    collection.fail_ids = set()
+    collection.crash_after = None
+    insert_many = collection.insert_many
+
+    async def failing_insert_many(docs, ordered=True, **kwargs):
+        if collection.crash_after is not None:
+            if collection.crash_after == 0:
+                raise ConnectionError("connexion perdue")
+            collection.crash_after -= 1
+        kept = [i for i, d in enumerate(docs) if d.get("preview_id") not in collection.fail_ids]
+        errors = [{"index": i, "code": 121, "errmsg": "validation"} for i in range(len(docs)) if i not in kept]
+        try:
+            await insert_many([docs[i] for i in kept], ordered=ordered, **kwargs)
+        except BulkWriteError as e:
+            errors += [dict(err, index=kept[err["index"]]) for err in e.details["writeErrors"]]
+        if errors:
+            raise BulkWriteError({"writeErrors": sorted(errors, key=lambda err: err["index"])})
+
+    collection.insert_many = failing_insert_many
+    return collection
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    _with_insert_failures(fake.bilingual_messages)
+    monkeypatch.setattr(messaging, "get_db", lambda: fake)
+    monkeypatch.setattr(messaging, "SEND_CHUNK_SIZE", 10)
+    return fake
+
+
+def _recipients(n):
+    return [{"affiliate_id": f"a{i}", "company_name": f"Pourvoirie {i}", "category": "chasse",
+             "country": "CA", "email": f"p{i}@ex.ca"} for i in range(n)]
+
+
+async def _prepare(n):
+    result = await messaging.generate_message_preview({
+        "template": "affiliate_prelaunch", "send_mode": "TOUS", "recipients": _recipients(n)
+    })
+    await messaging.validate_all_previews(result["batch_id"], "admin")
+    return result
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestTemplateCompilation:
+    """Tests des templates compilés"""
+
+    def test_compiled_matches_personalize(self):
+        for name, template in BILINGUAL_TEMPLATES.items():
+            variables = recipient_variables({"company_name": "Zec Batiscan", "country": "CA"})
+            assert render_compiled(compile_template(name), variables) == personalize_template(template, variables)
+
+    def test_unknown_variables_are_kept(self):
+        compiled = {"fr": {"body": ("Bonjour ", "contact_name", " de ", "inconnu", "")}}
+        assert render_compiled(compiled, {"contact_name": None}) == {"fr": {"body": "Bonjour  de {{inconnu}}"}}
+
+
+class TestBulkPipeline:
+    """Tests du pipeline d'envoi par lots"""
+
+    def test_previews_inserted_in_bulk(self, db):
+        result = asyncio.run(_prepare(25))
+        assert result["previews_generated"] == 25
+        assert len(result["previews"]) == 1
+        assert db.message_previews.ops.count("insert_one") == 0
+        assert db.message_previews.ops.count("insert_many") == 1
+
+    def test_small_batch_sends_inline_with_chunked_writes(self, db):
+        async def run():
+            prepared = await _prepare(25)
+            return await messaging.send_all_messages({"batch_id": prepared["batch_id"], "wait": True})
+
+        result = asyncio.run(run())
+        assert result["sent_count"] == 25 and result["status"] == "completed"
+        assert len(result["sent_messages"]) == 25
+        assert db.bilingual_messages.ops.count("insert_many") == 3
+        assert db.message_previews.ops.count("bulk_write") == 3
+        assert db.message_previews.ops.count("update_one") == 0
+        assert all(p["sent"] for p in db.message_previews.docs)
+
+    def test_partial_failure_then_retry(self, db):
+        async def run():
+            prepared = await _prepare(12)
+            failing = sorted(p["preview_id"] for p in db.message_previews.docs)[3]
+            db.bilingual_messages.fail_ids = {failing}
+            first = await messaging.send_all_messages({"batch_id": prepared["batch_id"], "wait": True})
+            db.bilingual_messages.fail_ids = set()
+            await messaging.resume_send_job(first["job_id"], retry_failed=True)
+            await asyncio.gather(*messaging._send_tasks.values())
+            job = await messaging.get_send_job(first["job_id"])
+            return first, job["job"]
+
+        first, job = asyncio.run(run())
+        assert first["status"] == "partial"
+        assert first["sent_count"] == 11 and first["failed_count"] == 1
+        assert job["status"] == "completed" and job["sent"] == 12
+        assert len(db.bilingual_messages.docs) == 12
+
+    def test_interrupted_job_resumes_without_duplicates(self, db):
+        async def run():
+            prepared = await _prepare(30)
+            db.bilingual_messages.crash_after = 1
+            first = await messaging.send_all_messages({"batch_id": prepared["batch_id"], "wait": True})
+            db.bilingual_messages.crash_after = None
+            resumed = await messaging.run_send_job(db, first["job_id"])
+            return first, resumed
+
+        first, resumed = asyncio.run(run())
+        assert first["status"] == "interrupted" and first["sent_count"] == 10
+        assert resumed["status"] == "completed" and resumed["sent"] == 30
+        ids = [m["message_id"] for m in db.bilingual_messages.docs]
+        assert len(ids) == len(set(ids)) == 30
+        preview = db.message_previews.docs[0]
+        assert preview["message_id"] == message_id_for(preview["preview_id"])
+
+    def test_large_batch_runs_in_background(self, db):
+        async def run():
+            prepared = await _prepare(25)
+            started = await messaging.send_all_messages({"batch_id": prepared["batch_id"]})
+            await asyncio.gather(*messaging._send_tasks.values())
+            again = await messaging.run_send_job(db, started["job_id"])
+            return started, again
+
+        started, again = asyncio.run(run())
+        assert started["status"] == "running" and started["total"] == 25
+        # Un job terminé n'est pas repris
+        assert again["status"] == "completed" and again["sent"] == 25
+        assert db[SEND_JOBS_COLLECTION].docs[0]["chunks_done"] == 3
@@ -0,0 +1,204 @@
+"""
+Tests Unitaires - Networking Feed
+=================================
+Tests du fil social: pagination par curseur (created_at, id), timelines
+écrites à la publication (fan-out on write) et likes par upsert sur
+clé unique.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import networking
+import networking_feed as feed
+from conftest import FakeDB
+
+
+def _post(i, author="alice", visibility="public", groups=(), created_at=None):
+    return {"id": f"p{i:03d}", "author_id": author, "visibility": visibility, "allowed_groups": list(groups),
+            "created_at": created_at or f"2026-10-{1 + i // 24:02d}T{i % 24:02d}:00:00+00:00", "likes_count": 0}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(feed, "_backfill_done", False)
+    monkeypatch.setattr(feed, "_backfill_task", None)
+    # ensure_feed_indexes ne tourne qu'une fois par processus
+    return FakeDB(unique={feed.TIMELINES_COLLECTION: [("feed", "created_at", "post_id")]})
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestKeysetPaging:
+    """Tests de la pagination par curseur"""
+
+    def test_pages_cover_every_post_once(self, db):
+        # Horodatages en double: l'id départage
+        db.content_posts.docs = [_post(i, created_at="2026-10-01T00:00:00+00:00" if i < 6 else None) for i in range(25)]
+
+        async def run():
+            seen, cursor = [], None
+            while True:
+                page, cursor = await feed.fetch_posts_page(db, {}, 7, cursor)
+                seen.extend(p["id"] for p in page)
+                if not cursor:
+                    return seen
+
+        seen = asyncio.run(run())
+        expected = sorted(db.content_posts.docs, key=lambda d: (d["created_at"], d["id"]), reverse=True)
+        assert seen == [d["id"] for d in expected]
+        assert "skip" not in db.content_posts.ops
+        assert "count_documents" not in db.content_posts.ops
+
+    def test_invalid_cursor_rejected(self, db):
+        with pytest.raises(ValueError):
+            asyncio.run(feed.fetch_posts_page(db, {}, 10, "pas-un-curseur"))
+
+
+class TestFanOut:
+    """Tests des timelines écrites à la publication"""
+
+    def test_audiences_by_visibility(self, db):
+        db.groups.docs = [{"id": "club", "member_ids": ["alice", "bob", "carol"]}]
+        db.contacts.docs = [
+            {"owner_id": "alice", "contact_user_id": "dave"},
+            {"owner_id": "alice", "contact_user_id": None},
+            {"owner_id": "erin", "contact_user_id": "alice"},
+        ]
+
+        async def run():
+            await feed.fan_out_post(db, _post(1, visibility="groups", groups=["club"]))
+            await feed.fan_out_post(db, _post(2, visibility="contacts"))
+            await feed.fan_out_post(db, _post(3, visibility="public"))
+            await feed.fan_out_post(db, _post(4, visibility="private"))
+            # Rejouer une publication ne crée pas de doublon
+            await feed.fan_out_post(db, _post(3, visibility="public"))
+
+        asyncio.run(run())
+        feeds = {}
+        for entry in db[feed.TIMELINES_COLLECTION].docs:
+            feeds.setdefault(entry["post_id"], set()).add(entry["feed"])
+        assert feeds["p001"] == {"user:alice", "group:club", "user:bob", "user:carol"}
+        assert feeds["p002"] == {"user:alice", "user:dave"}
+        assert feeds["p003"] == {"user:alice", "user:dave", "user:erin"}
+        assert feeds["p004"] == {"user:alice"}
+
+    def test_timeline_pages_and_deleted_posts(self, db):
+        db.groups.docs = [{"id": "club", "member_ids": ["bob"]}]
+
+        async def run():
+            for i in range(5):
+                post = _post(i, visibility="groups", groups=["club"])
+                db.content_posts.docs.append(post)
+                await feed.fan_out_post(db, post)
+            db.content_posts.docs = [p for p in db.content_posts.docs if p["id"] != "p003"]
+            await feed.remove_post(db, "p003")
+            first, cursor = await feed.fetch_timeline(db, feed.user_feed("bob"), 2)
+            second, end = await feed.fetch_timeline(db, feed.user_feed("bob"), 2, cursor)
+            return first, second, end
+
+        first, second, end = asyncio.run(run())
+        assert [p["id"] for p in first] == ["p004", "p002"]
+        assert [p["id"] for p in second] == ["p001", "p000"]
+        assert end is None
+
+    def test_backfill_fans_out_older_posts_once(self, db):
+        db.groups.docs = [{"id": "club", "member_ids": ["bob"]}]
+        db.content_posts.docs = [_post(i, visibility="groups", groups=["club"]) for i in range(5)]
+        db.content_posts.docs.append({"id": "orphan", "created_at": "2026-10-02T00:00:00+00:00"})
+
+        async def run():
+            # Lot interrompu: la reprise repart de la progression enregistrée
+            original = feed.fan_out_post
+            calls = []
+
+            async def flaky(database, post):
+                calls.append(post["id"])
+                if len(calls) == 4:
+                    raise RuntimeError("connexion perdue")
+                return await original(database, post)
+
+            feed.fan_out_post = flaky
+            try:
+                with pytest.raises(RuntimeError):
+                    await feed.backfill_timelines(db, batch_size=2)
+                first = await feed.backfill_timelines(db, batch_size=2)
+            finally:
+                feed.fan_out_post = original
+            again = await feed.backfill_timelines(db)
+            page, _ = await feed.fetch_timeline(db, feed.user_feed("bob"), 10)
+            return calls, first, again, page
+
+        calls, first, again, page = asyncio.run(run())
+        assert calls == ["p000", "p001", "p002", "p003", "p002", "p003", "p004"]
+        assert first == 3 and again == 0
+        assert [p["id"] for p in page] == ["p004", "p003", "p002", "p001", "p000"]
+
+    def test_first_timeline_read_starts_backfill(self, db):
+        db.content_posts.docs = [_post(1)]
+
+        async def run():
+            page, _ = await feed.fetch_timeline(db, feed.user_feed("alice"), 10)
+            await feed._backfill_task
+            again, _ = await feed.fetch_timeline(db, feed.user_feed("alice"), 10)
+            return page, again
+
+        page, again = asyncio.run(run())
+        assert page == []
+        assert [p["id"] for p in again] == ["p001"]
+        assert feed._backfill_done is True
+
+
+class TestLikes:
+    """Tests des likes par upsert"""
+
+    def test_like_is_idempotent(self, db):
+        db.content_posts.docs = [_post(1)]
+
+        async def run():
+            first = await feed.add_like(db, "bob", "post", "p001")
+            again = await feed.add_like(db, "bob", "post", "p001")
+            removed = await feed.remove_like(db, "bob", "post", "p001")
+            removed_again = await feed.remove_like(db, "bob", "post", "p001")
+            return first, again, removed, removed_again
+
+        (created, target), (created_again, _), removed, removed_again = asyncio.run(run())
+        assert created is True and target["author_id"] == "alice"
+        assert created_again is False
+        assert removed is True and removed_again is False
+        assert db.content_posts.docs[0]["likes_count"] == 0
+        assert db.content_likes.docs == []
+
+    def test_toggle_endpoint_round_trips(self, db, monkeypatch):
+        db.content_posts.docs = [_post(1)]
+        notified = []
+
+        async def notify(*args):
+            notified.append(args)
+
+        monkeypatch.setattr(networking, "db", db)
+        monkeypatch.setattr(networking, "NOTIFICATIONS_ENABLED", True)
+        monkeypatch.setattr(networking, "notify_post_liked", notify, raising=False)
+
+        async def run():
+            await feed.ensure_feed_indexes(db)
+            before = db.content_likes.calls + db.content_posts.calls
+            liked = await networking.toggle_like("bob", "Bob", "post", "p001")
+            like_calls = db.content_likes.calls + db.content_posts.calls - before
+            unliked = await networking.toggle_like("bob", "Bob", "post", "p001")
+            return liked, like_calls, unliked
+
+        liked, like_calls, unliked = asyncio.run(run())
+        assert liked["action"] == "liked" and unliked["action"] == "unliked"
+        assert like_calls == 2
+        assert len(notified) == 1 and notified[0][0] == "alice"
+        assert db.content_posts.docs[0]["likes_count"] == 0
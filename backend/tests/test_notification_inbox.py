@@ -0,0 +1,194 @@
+"""
+Tests Unitaires - Notification Inbox
+====================================
+Tests des compteurs par utilisateur (création, lecture, suppression),
+de la pagination par curseur (created_at, id) et du badge.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import notifications
+import notification_inbox as inbox
+from notification_inbox import encode_cursor, decode_cursor, COUNTERS_COLLECTION
+
+
+from conftest import FakeDB
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(notifications, "db", fake)
+    monkeypatch.setattr(inbox, "_indexes_ready", False)
+    return fake
+
+
+async def _notify(n, user_id="u1", notification_type="system"):
+    for i in range(n):
+        await notifications.create_notification(user_id, notification_type, f"Titre {i}", "Message")
+
+
+def _counters(db, user_id="u1"):
+    return next(d for d in db[COUNTERS_COLLECTION].docs if d["_id"] == user_id)
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestCounters:
+    """Tests des compteurs maintenus à l'écriture"""
+
+    def test_create_mark_and_badge(self, db):
+        async def run():
+            await _notify(3)
+            await _notify(2, notification_type="wallet_credit")
+            await notifications.mark_notifications_seen("u1")
+            ids = [d["id"] for d in db.notifications.docs[:2]]
+            await notifications.mark_notifications_read("u1", ids)
+            # Deuxième marquage: aucun document ne change, compteur intact
+            await notifications.mark_notifications_read("u1", ids)
+            reads = db.notifications.reads
+            badge = await notifications.get_notification_badge("u1")
+            return badge, reads
+
+        badge, reads = asyncio.run(run())
+        assert badge == {"unread_count": 3, "unseen_count": 0, "total": 5}
+        assert db.notifications.reads == reads
+        assert _counters(db)["by_type"] == {"system": 3, "wallet_credit": 2}
+
+    def test_delete_and_clear(self, db):
+        async def run():
+            await _notify(3)
+            first = db.notifications.docs[0]["id"]
+            await notifications.mark_notifications_read("u1", [first])
+            await notifications.delete_notification("u1", first)
+            after_delete = await inbox.get_counters(db, "u1")
+            await notifications.clear_all_notifications("u1")
+            return after_delete, await inbox.get_counters(db, "u1")
+
+        after_delete, after_clear = asyncio.run(run())
+        assert after_delete == {"unread_count": 2, "unseen_count": 2, "total": 2}
+        assert after_clear == {"unread_count": 0, "unseen_count": 0, "total": 0}
+
+    def test_existing_history_counted_once(self, db):
+        # Notifications antérieures au module: pas de document compteur
+        db.notifications.docs = [
+            {"id": f"old{i}", "user_id": "u1", "type": "system", "is_read": i == 0,
+             "is_seen": i == 0, "created_at": f"2025-01-0{i + 1}T00:00:00+00:00"}
+            for i in range(3)
+        ]
+
+        async def run():
+            await _notify(1)
+            return await inbox.get_counters(db, "u1")
+
+        assert asyncio.run(run()) == {"unread_count": 3, "unseen_count": 3, "total": 4}
+
+    def test_first_write_race_keeps_existing_counters(self, db, monkeypatch):
+        recount = inbox._recount
+        raced = []
+
+        async def racing_recount(database, user_id):
+            counters = await recount(database, user_id)
+            if not raced:
+                raced.append(True)
+                # Une autre requête crée les compteurs puis sa notification
+                await _notify(1)
+            return counters
+
+        monkeypatch.setattr(inbox, "_recount", racing_recount)
+
+        async def run():
+            await inbox.ensure_counters(db, "u1")
+            return await inbox.get_counters(db, "u1")
+
+        # Le recomptage périmé (0) n'écrase pas les compteurs de l'autre requête
+        assert asyncio.run(run()) == {"unread_count": 1, "unseen_count": 1, "total": 1}
+
+    def test_other_writers_are_outside_the_inbox(self, db):
+        # Forme écrite par waypoint_sharing / group_chat / hunting_groups:
+        # created_at ISO, drapeau `read`, ni id ni is_read / is_seen
+        db.notifications.docs = [
+            {"user_id": "u1", "type": "group_message", "title": "t", "message": "m", "data": {},
+             "read": False, "created_at": f"2026-05-0{i + 1}T00:00:00+00:00"}
+            for i in range(3)
+        ]
+
+        async def run():
+            await _notify(3)
+            await notifications.mark_notifications_read("u1", [db.notifications.docs[3]["id"]])
+            seen, cursor = [], None
+            while True:
+                page = await notifications.get_notifications("u1", limit=2, cursor=cursor)
+                seen += [n["id"] for n in page["notifications"]]
+                cursor = page["next_cursor"]
+                if not page["has_more"]:
+                    return seen, page, await inbox.global_stats(db)
+
+        seen, page, stats = asyncio.run(run())
+        assert seen == [d["id"] for d in reversed(db.notifications.docs[3:])]
+        assert page["total"] == 3 and page["unread_count"] == 2
+        assert all(d["read"] is False and "is_read" not in d for d in db.notifications.docs[:3])
+        # Les statistiques admin comptent aussi les notifications des autres modules
+        assert stats["total_notifications"] == 6
+        assert stats["unread_notifications"] == 5
+        assert stats["by_type"] == {"system": 3, "group_message": 3}
+
+
+class TestKeysetPaging:
+    """Tests de la pagination par curseur"""
+
+    def test_pages_cover_all_without_overlap(self, db):
+        db.notifications.docs = [
+            {"id": f"n{i:02d}", "user_id": "u1", "type": "system", "is_read": i % 2 == 0,
+             "is_seen": False, "created_at": f"2025-03-{(i // 3) + 1:02d}T00:00:00+00:00"}
+            for i in range(10)
+        ]
+
+        async def run():
+            seen, cursor, pages = [], None, 0
+            while True:
+                page = await notifications.get_notifications("u1", limit=4, cursor=cursor)
+                seen += [n["id"] for n in page["notifications"]]
+                pages += 1
+                cursor = page["next_cursor"]
+                if not page["has_more"]:
+                    return seen, pages, page
+
+        seen, pages, last = asyncio.run(run())
+        assert len(seen) == len(set(seen)) == 10
+        assert pages == 3
+        assert seen[0] == "n09" and seen[-1] == "n00"
+        assert last["total"] == 10
+
+    def test_unread_filter_and_bad_cursor(self, db):
+        from fastapi import HTTPException
+        db.notifications.docs = [
+            {"id": f"n{i}", "user_id": "u1", "type": "system", "is_read": i % 2 == 0,
+             "is_seen": False, "created_at": f"2025-03-0{i + 1}T00:00:00+00:00"}
+            for i in range(6)
+        ]
+        page = asyncio.run(notifications.get_notifications("u1", unread_only=True, limit=10))
+        assert [n["id"] for n in page["notifications"]] == ["n5", "n3", "n1"]
+        assert decode_cursor(encode_cursor({"created_at": "t", "id": "x"})) == ("t", "x")
+        with pytest.raises(HTTPException):
+            asyncio.run(notifications.get_notifications("u1", cursor="pas-un-curseur", limit=10))
+
+    def test_large_limit_is_clamped(self, db):
+        db.notifications.docs = [
+            {"id": f"n{i:03d}", "user_id": "u1", "type": "system", "is_read": False,
+             "is_seen": False, "created_at": f"2025-03-01T00:{i // 60:02d}:{i % 60:02d}+00:00"}
+            for i in range(inbox.MAX_PAGE_SIZE + 5)
+        ]
+        page = asyncio.run(notifications.get_notifications("u1", limit=500))
+        assert len(page["notifications"]) == inbox.MAX_PAGE_SIZE
+        assert page["has_more"]
@@ -0,0 +1,146 @@
+"""
+Tests Unitaires - Password Hashing
+==================================
+Tests du hachage bcrypt hors boucle d'événements (pool borné,
+contre-pression, limite de connexions par IP, rehachage au login).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import threading
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.password_hashing import (
+    PasswordHasher, LoginConcurrencyLimiter, HashingOverloaded, TooManyLoginAttempts,
+    build_context as _context
+)
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = docs
+        self.updates = []
+
+    async def find_one(self, query, projection=None):
+        for d in self.docs:
+            if all(d.get(k) == v for k, v in query.items()):
+                return dict(d)
+        return None
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+        for d in self.docs:
+            if all(d.get(k) == v for k, v in query.items()):
+                d.update(update["$set"])
+
+
+class FakeDB:
+    def __init__(self, users):
+        self.collections = {"users": FakeUsers(users)}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeUsers([]))
+
+
+class TestPasswordHasher:
+    """Tests du pool bcrypt"""
+
+    def test_hash_and_verify_off_loop(self):
+        hasher = PasswordHasher(context=_context(4), workers=2)
+        threads = []
+
+        def spy(password):
+            threads.append(threading.current_thread().name)
+            return hasher.context.hash(password)
+
+        async def run():
+            hashed = await hasher._run(spy, "secret123")
+            return hashed, await hasher.verify("secret123", hashed), await hasher.verify("bad", hashed)
+
+        hashed, ok, bad = asyncio.run(run())
+        hasher.shutdown()
+        assert ok and not bad
+        assert threads[0].startswith("bcrypt")
+        assert hasher.stats()["completed"] == 3
+
+    def test_queue_depth_backpressure(self):
+        hasher = PasswordHasher(context=_context(4), workers=1, max_pending=2)
+        gate = threading.Event()
+
+        async def run():
+            loop_jobs = [asyncio.ensure_future(hasher._run(gate.wait)) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(HashingOverloaded):
+                await hasher.hash("x")
+            gate.set()
+            await asyncio.gather(*loop_jobs)
+            # File vidée: de nouveau accepté
+            return await hasher.hash("x")
+
+        assert asyncio.run(run())
+        hasher.shutdown()
+        assert hasher.stats()["rejected"] == 1
+        assert hasher.stats()["pending"] == 0
+
+    def test_outdated_cost_is_rehashed(self):
+        old_hash = _context(4).hash("secret123")
+        hasher = PasswordHasher(context=_context(5))
+        valid, new_hash = asyncio.run(hasher.verify_and_update("secret123", old_hash))
+        assert valid and new_hash and "$05$" in new_hash
+        valid, new_hash = asyncio.run(hasher.verify_and_update("wrong", old_hash))
+        assert not valid and new_hash is None
+        hasher.shutdown()
+
+
+class TestLoginLimiter:
+    """Tests de la limite de connexions simultanées par IP"""
+
+    def test_slots_per_ip(self):
+        limiter = LoginConcurrencyLimiter(max_per_ip=1)
+
+        async def run():
+            async with limiter.slot("1.2.3.4"):
+                async with limiter.slot("5.6.7.8"):
+                    pass
+                with pytest.raises(TooManyLoginAttempts):
+                    async with limiter.slot("1.2.3.4"):
+                        pass
+            async with limiter.slot("1.2.3.4"):
+                pass
+
+        asyncio.run(run())
+        assert limiter.stats() == {"max_per_ip": 1, "active_ips": 0, "rejected": 1}
+
+
+class TestLoginRehash:
+    """Tests du rehachage transparent dans AuthService.login"""
+
+    def test_login_upgrades_stored_hash(self, monkeypatch):
+        pytest.importorskip("email_validator")
+        from modules.auth_engine.v1 import service as service_module
+        hasher = PasswordHasher(context=_context(5))
+        monkeypatch.setattr(service_module, "password_hasher", hasher)
+        old_hash = _context(4).hash("secret123")
+        db = FakeDB([{"user_id": "user_1", "name": "Chasseur", "email": "c@huntiq.ca",
+                      "password_hash": old_hash, "is_active": True}])
+        service = service_module.AuthService(db)
+
+        async def no_session(*args, **kwargs):
+            return None
+
+        monkeypatch.setattr(service, "_store_session", no_session)
+        login = SimpleNamespace(email="c@huntiq.ca", password="secret123", remember_device=False)
+        success, _, error = asyncio.run(service.login(login))
+        hasher.shutdown()
+
+        assert success, error
+        stored = db["users"].docs[0]["password_hash"]
+        assert stored != old_hash and "$05$" in stored
+        assert hasher.stats()["rehashed"] == 1
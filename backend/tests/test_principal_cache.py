@@ -0,0 +1,203 @@
+"""
+Tests Unitaires - Principal Cache
+=================================
+Tests du cache jeton → utilisateur partagé par les dépendances
+d'authentification (succès/absences, invalidation par utilisateur,
+cache négatif des jetons révoqués).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+
+# Set environment variables for testing
+os.environ.setdefault('JWT_SECRET_KEY', 'test_secret_key_for_testing')
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import jwt
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.requests import Request
+
+import utils.principal_cache as pc
+from utils.principal_cache import PrincipalCache, TokenRevoked, revoke_token
+from modules.roles_engine.v1 import dependencies
+from modules.roles_engine.v1.models import UserRole
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = docs or []
+        self.find_one_calls = 0
+
+    async def find_one(self, query, projection=None):
+        self.find_one_calls += 1
+        for d in self.docs:
+            if all(d.get(k) == v for k, v in query.items()):
+                return dict(d)
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.append({**query, **update["$set"]})
+
+
+class SyncCollection:
+    """Collection pymongo (synchrone) du user_engine"""
+
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, query, update):
+        self.updates.append((query, update))
+
+    def update_many(self, query, update):
+        self.updates.append((query, update))
+
+
+class FakeDB:
+    def __init__(self, users):
+        self.collections = {"users": FakeCollection(users), "revoked_tokens": FakeCollection()}
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+def _token(user_id="user_1", minutes=30):
+    payload = {"sub": user_id, "exp": datetime.now(timezone.utc) + timedelta(minutes=minutes)}
+    return jwt.encode(payload, os.environ['JWT_SECRET_KEY'], algorithm="HS256")
+
+
+def _request():
+    return Request({"type": "http", "headers": [], "query_string": b""})
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB([{"user_id": "user_1", "name": "Chasseur", "email": "c@huntiq.ca",
+                    "role": "hunter", "password_hash": "x", "is_active": True}])
+    monkeypatch.setattr(pc, "principal_cache", PrincipalCache())
+    monkeypatch.setattr(dependencies, "principal_cache", pc.principal_cache)
+    monkeypatch.setattr(dependencies, "get_db", lambda: fake)
+    return fake
+
+
+def _resolve(token):
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(dependencies.get_current_user_with_role(_request(), creds))
+
+
+class TestPrincipalCache:
+    """Tests du cache en mémoire"""
+
+    def test_entry_expires_with_token(self):
+        cache = PrincipalCache(ttl=3600)
+        cache.put("t", {"user_id": "u"}, token_exp=time.time() - 1)
+        assert cache.lookup("t") is None
+
+    def test_snapshot_has_no_secrets(self):
+        cache = PrincipalCache()
+        cache.put("t", {"user_id": "u", "password_hash": "h", "_id": 1})
+        assert cache.lookup("t") == {"user_id": "u"}
+
+    def test_invalidate_by_user_and_email(self):
+        cache = PrincipalCache()
+        cache.put("a", {"user_id": "u1", "email": "A@x.ca"})
+        cache.put("b", {"user_id": "u1", "email": "a@x.ca"})
+        cache.put("c", {"user_id": "u2", "email": "b@x.ca"})
+        assert cache.invalidate_user("u1") == 2
+        assert cache.invalidate_user(email="B@X.CA") == 1
+        assert cache.stats()["size"] == 0
+
+    def test_lru_bound(self):
+        cache = PrincipalCache(maxsize=2)
+        for t in "abc":
+            cache.put(t, {"user_id": t})
+        assert cache.lookup("a") is None
+        assert cache.stats()["size"] == 2
+
+
+class TestRoleDependency:
+    """Tests de get_current_user_with_role avec cache"""
+
+    def test_second_request_skips_database(self, db):
+        token = _token()
+        first = _resolve(token)
+        second = _resolve(token)
+        assert first.role == second.role == UserRole.HUNTER
+        assert db["users"].find_one_calls == 1
+        stats = pc.principal_cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+
+    def test_role_change_is_visible_after_invalidation(self, db):
+        token = _token()
+        _resolve(token)
+        db["users"].docs[0]["role"] = "guide"
+        assert _resolve(token).role == UserRole.HUNTER
+        pc.principal_cache.invalidate_user("user_1")
+        assert _resolve(token).role == UserRole.GUIDE
+
+    def test_deactivated_user_rejected_after_invalidation(self, db):
+        token = _token()
+        _resolve(token)
+        db["users"].docs[0]["is_active"] = False
+        pc.principal_cache.invalidate_user("user_1")
+        with pytest.raises(HTTPException) as exc:
+            _resolve(token)
+        assert exc.value.status_code == 403
+
+    def test_revoked_token_uses_negative_cache(self, db):
+        token = _token()
+        _resolve(token)
+        asyncio.run(revoke_token(db, token))
+        with pytest.raises(HTTPException) as exc:
+            _resolve(token)
+        assert exc.value.status_code == 401
+        assert pc.principal_cache.stats()["revoked_hits"] == 1
+
+    def test_revocation_from_other_worker(self, db):
+        token = _token()
+        asyncio.run(revoke_token(db, token))
+        # Nouveau worker: cache vide, la révocation vient de la base
+        pc.principal_cache.clear()
+        with pytest.raises(HTTPException):
+            _resolve(token)
+        with pytest.raises(TokenRevoked):
+            pc.principal_cache.lookup(token)
+
+    def test_user_engine_role_and_status_writes_invalidate(self, db, monkeypatch):
+        from modules.user_engine.v1 import service as user_service
+        from modules.user_engine.v1.models import UserRole as EngineRole
+        monkeypatch.setattr(user_service, "principal_cache", pc.principal_cache)
+        service = user_service.UserService()
+        service._db = SimpleNamespace(users=SyncCollection(), user_sessions=SyncCollection())
+
+        async def noop(*args, **kwargs):
+            return None
+
+        monkeypatch.setattr(service, "log_activity", noop)
+        monkeypatch.setattr(service, "get_user", noop)
+
+        for write in (lambda: service.update_role("user_1", EngineRole.PARTNER),
+                      lambda: service.suspend_user("user_1"),
+                      lambda: service.reactivate_user("user_1")):
+            _resolve(_token())
+            assert pc.principal_cache.stats()["size"] == 1
+            asyncio.run(write())
+            assert pc.principal_cache.stats()["size"] == 0
+
+    def test_bulk_role_migration_drops_every_snapshot(self, db):
+        token, revoked = _token(), _token("user_2")
+        _resolve(token)
+        asyncio.run(revoke_token(db, revoked))
+        assert pc.principal_cache.invalidate_all() == 1
+        assert pc.principal_cache.lookup(token) is None
+        with pytest.raises(TokenRevoked):
+            pc.principal_cache.lookup(revoked)
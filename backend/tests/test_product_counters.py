@@ -0,0 +1,213 @@
+"""
+Tests Unitaires - Product Engagement Counters
+=============================================
+Tests des compteurs tamponnés (CounterBuffer) et de leur usage par
+ProductsService: vues, clics, comparaisons, vidage bulk_write.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Set environment variables for testing
+os.environ.setdefault('JWT_SECRET_KEY', 'test_secret_key_for_testing')
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pymongo.errors import BulkWriteError
+
+from utils.counter_buffer import CounterBuffer
+from modules.products_engine.v1.service import ProductsService
+
+from conftest import FakeDB
+
+
+def _db(docs):
+    db = FakeDB()
+    db.products.docs = docs
+    return db
+
+
+def _doc(db, product_id):
+    return next(d for d in db.products.docs if d["id"] == product_id)
+
+
+def _bulk_sizes(collection):
+    return [(len(ops), ordered) for ops, ordered in getattr(collection, "bulk_calls", [])]
+
+
+def _group_runs(collection):
+    return sum(1 for p in getattr(collection, "pipelines", []) if "$group" in p[0])
+
+
+def _service():
+    service = ProductsService()
+    service._db = _db([
+        {"id": "p1", "name": "Gel", "brand": "Buck", "price": 10, "score": 80, "rank": 1,
+         "image_url": "x.png", "views": 5, "clicks": 1},
+        {"id": "p2", "name": "Bloc", "brand": "Doe", "price": 20, "score": 70, "rank": 2,
+         "image_url": "y.png"}
+    ])
+    return service
+
+
+class TestCounterBuffer:
+    """Tests pour CounterBuffer"""
+
+    def test_pending_totals(self):
+        buffer = CounterBuffer()
+        buffer.increment("products", "id", "p1", "views", 3)
+        buffer.increment("products", "id", "p2", "views")
+        buffer.increment("other", "id", "x", "views")
+        assert buffer.pending_totals("products", ["views", "clicks"]) == {"views": 4, "clicks": 0}
+
+    def test_failed_flush_keeps_deltas(self):
+        db = _db([{"id": "p1"}])
+
+        async def broken(ops, ordered=True):
+            raise RuntimeError("primary stepped down")
+
+        db.products.bulk_write = broken
+        buffer = CounterBuffer()
+        buffer.increment("products", "id", "p1", "views", 2)
+        with pytest.raises(RuntimeError):
+            asyncio.run(buffer.flush(db))
+        assert buffer.pending("products", "id", "p1") == {"views": 2}
+
+    def test_failed_collection_does_not_drop_the_others(self):
+        db = FakeDB()
+        db.products.docs = [{"id": "p1", "views": 0}]
+        db.ads.docs = [{"id": "a1", "views": 0}]
+
+        async def broken(ops, ordered=True):
+            raise RuntimeError("primary stepped down")
+
+        db.products.bulk_write = broken
+        buffer = CounterBuffer()
+        buffer.increment("products", "id", "p1", "views", 2)
+        buffer.increment("ads", "id", "a1", "views", 3)
+        with pytest.raises(RuntimeError):
+            asyncio.run(buffer.flush(db))
+        # Les deltas de l'autre collection sont persistés, ceux en échec gardés
+        assert db.ads.docs[0]["views"] == 3
+        assert buffer.pending("ads", "id", "a1") == {}
+        assert buffer.pending("products", "id", "p1") == {"views": 2}
+
+    def test_partial_bulk_error_requeues_only_failed_ops(self):
+        db = FakeDB()
+        # $inc sur une valeur non numérique: erreur d'écriture pour p2 seulement
+        db.products.docs = [{"id": "p1", "views": 1}, {"id": "p2", "views": "n/a"}, {"id": "p3"}]
+        buffer = CounterBuffer()
+        for product_id in ("p1", "p2", "p3"):
+            buffer.increment("products", "id", product_id, "views", 2)
+        with pytest.raises(BulkWriteError):
+            asyncio.run(buffer.flush(db))
+        assert buffer.pending("products", "id", "p1") == {}
+        assert buffer.pending("products", "id", "p2") == {"views": 2}
+
+        db.products.docs[1]["views"] = 0
+        assert asyncio.run(buffer.flush(db)) == 1
+        # Aucun incrément appliqué deux fois
+        assert [d["views"] for d in db.products.docs] == [3, 2, 2]
+        assert buffer.flushed_totals("products", ["views"]) == {"views": 6}
+
+    def test_max_pending_triggers_early_flush(self):
+        db = _db([{"id": f"p{i}"} for i in range(3)])
+        buffer = CounterBuffer(flush_interval=3600, max_pending=3)
+
+        async def run():
+            buffer.start(db)
+            for i in range(3):
+                buffer.increment("products", "id", f"p{i}", "views")
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            await buffer.stop()
+
+        asyncio.run(run())
+        assert _bulk_sizes(db.products) == [(3, False)]
+
+
+class TestProductCounters:
+    """Tests des compteurs d'engagement produits"""
+
+    def test_reads_do_not_write(self):
+        service = _service()
+        db = service.db
+
+        async def run():
+            for _ in range(10):
+                await service.get_by_id("p1")
+            await service.track_click("p1")
+            await service.track_compare("p2")
+            return await service.flush_counters()
+
+        ops = asyncio.run(run())
+        assert "update_one" not in db.products.ops
+        # Un seul bulk_write non ordonné, une opération par produit
+        assert ops == 2
+        assert _bulk_sizes(db.products) == [(2, False)]
+        assert _doc(db, "p1")["views"] == 15
+        assert _doc(db, "p1")["clicks"] == 2
+        assert _doc(db, "p2")["comparisons"] == 1
+
+    def test_read_includes_pending_views(self):
+        service = _service()
+
+        async def run():
+            await service.get_by_id("p1")
+            await service.get_by_id("p1")
+            return await service.get_by_id("p1")
+
+        product = asyncio.run(run())
+        assert product.views == 7
+
+    def test_unknown_product_is_not_tracked(self):
+        service = _service()
+        assert asyncio.run(service.track_click("missing")) is False
+        assert service.counters.stats()["pending_documents"] == 0
+
+    def test_known_ids_skip_existence_read(self):
+        service = _service()
+        db = service.db
+
+        async def run():
+            await service.track_click("p2")
+            await service.track_click("p2")
+
+        asyncio.run(run())
+        assert db.products.reads == 1
+
+    def test_stats_merge_pending_deltas(self):
+        service = _service()
+
+        async def run():
+            await service.get_by_id("p2")
+            await service.track_click("p2")
+            return await service.get_stats()
+
+        stats = asyncio.run(run())
+        assert stats["engagement"] == {"views": 6, "clicks": 2, "comparisons": 0}
+        assert stats["counters"]["pending_documents"] == 1
+
+    def test_stats_use_engagement_snapshot(self):
+        service = _service()
+        db = service.db
+
+        async def run():
+            first = await service.get_stats()
+            await service.track_click("p1")
+            await service.flush_counters()
+            await service.track_click("p2")
+            second = await service.get_stats()
+            return first, second
+
+        first, second = asyncio.run(run())
+        # Un seul $group: les vidages et deltas suivants s'ajoutent au snapshot
+        assert _group_runs(db.products) == 1
+        assert first["engagement"]["clicks"] == 1
+        assert second["engagement"]["clicks"] == 3
+        assert service.counters.flushed_totals("products", ["clicks"]) == {"clicks": 1}
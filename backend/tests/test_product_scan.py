@@ -0,0 +1,257 @@
+"""
+Tests Unitaires - Product Scan Executor
+=======================================
+Tests du scan concurrent des sources de produits (plafonds global et
+par hôte, délai par source, requêtes conditionnelles, checkpoints et
+écritures par lot).
+
+Version: 1.0.0
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+
+from conftest import FakeDB
+from services.product_scan_executor import ProductScanExecutor
+
+
+# ==============================================
+# FIXTURES
+# ==============================================
+
+def _by(collection, key):
+    return {doc[key]: doc for doc in collection.docs}
+
+
+def _failing_first_write(collection):
+    """Premier bulk_write en échec (perte de connexion), les suivants passent"""
+    write = collection.bulk_write
+    calls = []
+
+    async def bulk_write(requests, ordered=True):
+        calls.append(len(requests))
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        return await write(requests, ordered=ordered)
+
+    collection.bulk_write = bulk_write
+    return calls
+
+
+class FakeSite:
+    """Transport HTTP simulé: délais, ETag, suivi de la concurrence"""
+
+    def __init__(self, delay=0.0, etag=True):
+        self.delay = delay
+        self.etag = etag
+        self.slow_hosts = {}
+        self.requests = []
+        self.active = {}
+        self.max_active = {}
+        self.max_total = 0
+
+    async def handler(self, request):
+        host = request.url.host
+        self.requests.append(request)
+        self.active[host] = self.active.get(host, 0) + 1
+        self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        self.max_total = max(self.max_total, sum(self.active.values()))
+        try:
+            await asyncio.sleep(self.slow_hosts.get(host, self.delay))
+        finally:
+            self.active[host] -= 1
+        tag = f'"{request.url.path}"'
+        if self.etag and request.headers.get("if-none-match") == tag:
+            return httpx.Response(304)
+        headers = {"ETag": tag} if self.etag else {}
+        return httpx.Response(200, text=f"<html>{request.url}</html>", headers=headers)
+
+    def client(self):
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+class FakeAnalyzer:
+    def __init__(self, product_key=lambda url: url):
+        self.product_key = product_key
+        self.calls = []
+
+    async def __call__(self, html, url, source_name):
+        self.calls.append(url)
+        return {"id": url, "name_fr": url, "content_hash": self.product_key(url), "score_total": 60}
+
+
+def _sources(hosts, pages=1):
+    return [
+        {"name": host, "url": f"https://{host}/", "urls": [f"https://{host}/p{i}" for i in range(pages)]}
+        for host in hosts
+    ]
+
+
+def _run(db, site, sources, run_id="scan_1", analyzer=None, **kwargs):
+    executor = ProductScanExecutor(db, analyzer or FakeAnalyzer(), client=site.client(), **kwargs)
+    return executor, asyncio.run(executor.run(sources, run_id))
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestConcurrency:
+    """Tests des plafonds de concurrence et des délais"""
+
+    def test_duration_bounded_by_slowest_source(self):
+        site = FakeSite(delay=0.2)
+        started = time.monotonic()
+        _, results = _run(FakeDB(), site, _sources(["a.ca", "b.ca", "c.ca", "d.ca", "e.ca"]))
+        assert time.monotonic() - started < 0.6
+        assert [r["source"] for r in results] == ["a.ca", "b.ca", "c.ca", "d.ca", "e.ca"]
+        assert all(r["scanned"] == 1 and r["products_found"] == 1 for r in results)
+
+    def test_global_and_per_host_caps(self):
+        site = FakeSite(delay=0.02)
+        _run(FakeDB(), site, _sources(["a.ca", "b.ca", "c.ca"], pages=6), max_concurrency=4, per_host=2)
+        assert max(site.max_active.values()) == 2
+        assert site.max_total <= 4
+        assert len(site.requests) == 18
+
+    def test_slow_source_times_out_alone(self):
+        site = FakeSite()
+        site.slow_hosts["lent.ca"] = 5
+        db = FakeDB()
+        started = time.monotonic()
+        _, results = _run(db, site, _sources(["lent.ca", "ok.ca"]), source_timeout=0.1)
+        assert time.monotonic() - started < 1
+        assert "timeout" in results[0]["error"]
+        assert results[1]["products_found"] == 1
+        assert list(_by(db.scan_checkpoints, "url")) == ["https://ok.ca/p0"]
+
+
+class TestIncremental:
+    """Tests des requêtes conditionnelles et des checkpoints"""
+
+    def test_unchanged_pages_are_not_reanalyzed(self):
+        db = FakeDB()
+        analyzer = FakeAnalyzer()
+        _run(db, FakeSite(), _sources(["a.ca"], pages=3), analyzer=analyzer)
+        site = FakeSite()
+        _, results = _run(db, site, _sources(["a.ca"], pages=3), run_id="scan_2", analyzer=analyzer)
+
+        assert len(analyzer.calls) == 3
+        assert results[0]["unchanged"] == 3
+        assert all(r.headers["if-none-match"] for r in site.requests)
+
+        # Serveur sans ETag: l'empreinte du contenu suffit
+        db = FakeDB()
+        _run(db, FakeSite(etag=False), _sources(["b.ca"]), analyzer=analyzer)
+        _, results = _run(db, FakeSite(etag=False), _sources(["b.ca"]), run_id="scan_2", analyzer=analyzer)
+        assert results[0]["unchanged"] == 1
+        assert len(analyzer.calls) == 4
+
+    def test_interrupted_run_resumes_without_refetch(self):
+        db = FakeDB()
+        site = FakeSite()
+        site.slow_hosts["lent.ca"] = 5
+        _run(db, site, _sources(["lent.ca", "ok.ca"], pages=2), source_timeout=0.1)
+
+        site = FakeSite()
+        _, results = _run(db, site, _sources(["lent.ca", "ok.ca"], pages=2))
+        assert results[1]["resumed"] == 2
+        assert results[0]["scanned"] == 2
+        assert {r.url.host for r in site.requests} == {"lent.ca"}
+
+    def test_failed_page_keeps_previous_validators(self):
+        db = FakeDB()
+        _run(db, FakeSite(), _sources(["a.ca"]))
+
+        async def broken(request):
+            return httpx.Response(503)
+
+        site = FakeSite()
+        site.handler = broken
+        _, results = _run(db, site, _sources(["a.ca"]), run_id="scan_2")
+        checkpoint = _by(db.scan_checkpoints, "url")["https://a.ca/p0"]
+        assert results[0]["failed"] == 1 and "HTTP 503" in results[0]["errors"][0]
+        assert checkpoint["status"] == "error" and checkpoint["etag"] == '"/p0"'
+
+    def test_failed_analysis_is_retried(self):
+        db = FakeDB()
+        _run(db, FakeSite(), _sources(["a.ca"]))
+
+        async def changed(request):
+            return httpx.Response(200, text="<html>nouveau</html>", headers={"ETag": '"v2"'})
+
+        async def failing(html, url, source_name):
+            raise RuntimeError("LLM unavailable")
+
+        # Page modifiée mais analyse en échec: ni nouveaux validateurs ni page terminée
+        site = FakeSite()
+        site.handler = changed
+        _, results = _run(db, site, _sources(["a.ca"]), run_id="scan_2", analyzer=failing)
+        checkpoint = _by(db.scan_checkpoints, "url")["https://a.ca/p0"]
+        assert results[0]["failed"] == 1 and "LLM unavailable" in results[0]["errors"][0]
+        assert checkpoint["status"] == "error" and checkpoint["etag"] == '"/p0"'
+
+        # Même run: la page est réanalysée au lieu d'être reprise
+        analyzer = FakeAnalyzer()
+        _, results = _run(db, site, _sources(["a.ca"]), run_id="scan_2", analyzer=analyzer)
+        assert results[0]["scanned"] == 1 and results[0]["resumed"] == 0
+        assert analyzer.calls == ["https://a.ca/p0"]
+        assert _by(db.scan_checkpoints, "url")["https://a.ca/p0"]["etag"] == '"v2"'
+
+
+class TestBatchedWrites:
+    """Tests des upserts par lot"""
+
+    def test_duplicates_upserted_once_with_few_round_trips(self):
+        db = FakeDB()
+        analyzer = FakeAnalyzer(product_key=lambda url: url.rsplit("/", 1)[1])
+        executor, results = _run(db, FakeSite(), _sources(["a.ca", "b.ca"], pages=5),
+                                 analyzer=analyzer, batch_size=50)
+
+        assert sum(r["products_found"] for r in results) == 10
+        assert executor.new_products == 5
+        assert len(db.discovered_products.docs) == 5
+        assert len(db.admin_notifications.docs) == 5
+        assert len(db.scan_checkpoints.docs) == 10
+        assert len(db.discovered_products.bulk_calls) <= 2
+        assert len(db.scan_checkpoints.bulk_calls) <= 2
+
+    def test_failed_write_is_requeued(self):
+        db = FakeDB()
+        product_writes = _failing_first_write(db.discovered_products)
+        executor, results = _run(db, FakeSite(), _sources(["a.ca"], pages=3), batch_size=2)
+
+        assert len(product_writes) >= 2
+        assert executor.new_products == 3
+        assert len(db.discovered_products.docs) == 3
+        assert len(db.admin_notifications.docs) == 3
+        assert {cp["status"] for cp in db.scan_checkpoints.docs} == {"done"}
+        assert len(db.scan_checkpoints.docs) == 3
+
+        # Checkpoints en échec: remis en attente, réécrits au flush suivant
+        db = FakeDB()
+        checkpoint_writes = _failing_first_write(db.scan_checkpoints)
+        _run(db, FakeSite(), _sources(["a.ca"], pages=3), batch_size=2)
+        assert len(checkpoint_writes) >= 2
+        assert len(db.scan_checkpoints.docs) == 3
+
+    def test_rejected_product_holds_back_checkpoints(self):
+        db = FakeDB(unique={"discovered_products": [("id",)]})
+
+        async def same_id(html, url, source_name):
+            return {"id": "dup", "name_fr": url, "content_hash": url, "score_total": 60}
+
+        executor, _ = _run(db, FakeSite(), _sources(["a.ca"], pages=2), analyzer=same_id)
+
+        # Le produit refusé reste en attente; aucune page n'est marquée terminée
+        assert executor.new_products == 1
+        assert len(db.discovered_products.docs) == 1
+        assert [doc["content_hash"] for doc in executor._pending_products] == ["https://a.ca/p1"]
+        assert db.scan_checkpoints.docs == []
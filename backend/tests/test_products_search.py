@@ -0,0 +1,257 @@
+"""
+Tests Unitaires - Products Search
+=================================
+Tests de la recherche produits indexée (filtres, pagination par
+curseur, snapshot des facettes) avec la collection Mongo simulée partagée.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+from datetime import datetime, timezone
+
+# Set environment variables for testing
+os.environ.setdefault('JWT_SECRET_KEY', 'test_secret_key_for_testing')
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pymongo.errors import OperationFailure
+
+from modules.products_engine.v1.models import ProductSearchRequest
+from modules.products_engine.v1.search import (
+    FacetSnapshot, build_filter, encode_cursor, decode_cursor, parse_facets
+)
+from modules.products_engine.v1.service import ProductsService
+
+from conftest import FakeDB
+
+
+# ==============================================
+# FIXTURES
+# ==============================================
+
+def _products(n=12):
+    return [
+        {
+            "id": f"p{i:02d}", "name": f"Attractant {i}", "brand": "Buck" if i % 2 else "Doe",
+            "price": 10.0 + i, "score": 50 + i, "rank": i // 2, "image_url": "x.png",
+            "category": "attractant", "animal_type": "cerf" if i % 3 else "orignal",
+            "target_animals": ["ours"] if i == 4 else [], "rainproof": i % 4 == 0
+        }
+        for i in range(n)
+    ]
+
+
+def _service(docs, text_index=True):
+    service = ProductsService()
+    service._db = FakeDB()
+    service._db.products.docs = docs
+    if not text_index:
+        create_index = service._db.products.create_index
+
+        async def no_text_index(keys, **kwargs):
+            if not isinstance(keys, str) and any(kind == "text" for _, kind in keys):
+                raise OperationFailure("text index unavailable")
+            return await create_index(keys, **kwargs)
+
+        service._db.products.create_index = no_text_index
+    return service
+
+
+def _facet_runs(collection):
+    return sum(1 for p in getattr(collection, "pipelines", []) if "$facet" in p[0])
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestQueryBuilding:
+    """Tests de construction des filtres"""
+
+    def test_filters_are_anded(self):
+        request = ProductSearchRequest(query="gel", animals=["cerf"], features=["rainproof", "unknown"])
+        query = build_filter(request)
+        assert query["$and"][0] == {"$text": {"$search": "gel"}}
+        # Le filtre animaux ne se mélange plus avec la recherche texte
+        assert {"$or": [{"animal_type": {"$in": ["cerf"]}}, {"target_animals": {"$in": ["cerf"]}}]} in query["$and"]
+        assert {"rainproof": True} in query["$and"]
+        assert len(query["$and"]) == 3
+
+    def test_regex_fallback_is_escaped(self):
+        query = build_filter(ProductSearchRequest(query="a.b*"), text_mode="regex")
+        assert query["$or"][0]["name"]["$regex"] == r"a\.b\*"
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor("price", 12.5, "p01")
+        assert decode_cursor(cursor) == {"field": "price", "value": 12.5, "id": "p01", "mode": None}
+        assert decode_cursor(encode_cursor("price", 12.5, "p01", "regex"))["mode"] == "regex"
+        with pytest.raises(ValueError):
+            decode_cursor("pas-un-curseur")
+
+        created = datetime(2026, 10, 1, 12, 30, tzinfo=timezone.utc)
+        assert decode_cursor(encode_cursor("created_at", created, "p02"))["value"] == created
+        assert decode_cursor(encode_cursor("score", None, "p03"))["value"] is None
+
+
+class TestKeysetSearch:
+    """Tests de la pagination par curseur"""
+
+    def test_pages_cover_all_results_without_duplicates(self):
+        service = _service(_products())
+
+        async def run():
+            seen, cursor, pages = [], None, 0
+            while True:
+                page = await service.search(ProductSearchRequest(limit=5, cursor=cursor))
+                seen += [p.id for p in page["products"]]
+                pages += 1
+                cursor = page["next_cursor"]
+                if not page["has_more"]:
+                    return seen, pages, page
+
+        seen, pages, last = asyncio.run(run())
+        assert pages == 3
+        assert len(seen) == len(set(seen)) == 12
+        # Tri par rang puis id (ex-aequo départagés)
+        assert seen[:4] == ["p00", "p01", "p02", "p03"]
+        assert last["total"] is None and last["next_cursor"] is None
+
+    def test_descending_price_with_filter(self):
+        service = _service(_products())
+        request = ProductSearchRequest(brands=["Buck"], sort_by="price", sort_order="desc", limit=4)
+        page = asyncio.run(service.search(request))
+        assert page["total"] == 6
+        assert [p.price for p in page["products"]] == [21.0, 19.0, 17.0, 15.0]
+
+        nxt = asyncio.run(service.search(request.model_copy(update={"cursor": page["next_cursor"]})))
+        assert [p.price for p in nxt["products"]] == [13.0, 11.0]
+
+    def test_null_and_missing_sort_values_are_paged(self):
+        docs = _products()
+        for i, doc in enumerate(docs):
+            if i % 3 == 0 or (i % 3 == 1 and i < 6):
+                doc.pop("cost_benefit_score", None)
+            elif i % 3 == 1:
+                doc["cost_benefit_score"] = i
+            else:
+                doc["cost_benefit_score"] = 5
+        service = _service(docs)
+
+        async def run(order):
+            seen, cursor = [], None
+            while True:
+                request = ProductSearchRequest(sort_by="cost_benefit_score", sort_order=order, limit=3, cursor=cursor)
+                page = await service.search(request)
+                seen += [p.id for p in page["products"]]
+                cursor = page["next_cursor"]
+                if not page["has_more"]:
+                    return seen
+
+        ascending = asyncio.run(run("asc"))
+        assert len(ascending) == len(set(ascending)) == 12
+        # Valeurs absentes d'abord, départagées par id
+        assert ascending[:6] == ["p00", "p01", "p03", "p04", "p06", "p09"]
+        assert asyncio.run(run("desc")) == ascending[::-1]
+
+    def test_text_falls_back_to_regex(self):
+        service = _service(_products(), text_index=False)
+        page = asyncio.run(service.search(ProductSearchRequest(query="attractant 1")))
+        assert page["search_mode"] == "regex"
+        assert {p.id for p in page["products"]} == {"p01", "p10", "p11"}
+
+    def test_regex_pages_keep_their_mode(self):
+        service = _service(_products(), text_index=False)
+
+        async def run():
+            seen, cursor, modes = [], None, []
+            while True:
+                page = await service.search(ProductSearchRequest(query="attractant 1", limit=2, cursor=cursor))
+                seen += [p.id for p in page["products"]]
+                modes.append(page["search_mode"])
+                cursor = page["next_cursor"]
+                if not page["has_more"]:
+                    return seen, modes
+
+        seen, modes = asyncio.run(run())
+        # La page 2 ne repasse pas par $text (index absent ou sans résultat)
+        assert seen == ["p01", "p10", "p11"]
+        assert modes == ["regex", "regex"]
+
+    def test_failed_index_creation_is_not_retried_every_request(self):
+        service = _service(_products(), text_index=False)
+        create_index = service.collection.create_index
+        attempts = []
+
+        async def counting(keys, **kwargs):
+            attempts.append(kwargs.get("name"))
+            return await create_index(keys, **kwargs)
+
+        service.collection.create_index = counting
+
+        async def run():
+            for _ in range(3):
+                await service.search(ProductSearchRequest(query="attractant"))
+            before_retry = len(attempts)
+            # Délai écoulé: nouvelle tentative
+            service._indexes_retry_at = 0.0
+            await service.search(ProductSearchRequest(query="attractant"))
+            return before_retry
+
+        assert asyncio.run(run()) == 1
+        assert len(attempts) == 2
+        assert service._indexes_ready is False
+
+    def test_cursor_for_other_sort_is_rejected(self):
+        service = _service(_products())
+        cursor = encode_cursor("price", 10.0, "p00")
+        with pytest.raises(ValueError):
+            asyncio.run(service.search(ProductSearchRequest(cursor=cursor)))
+
+
+class TestFacetSnapshot:
+    """Tests du snapshot des facettes"""
+
+    def test_parse_facets_defaults(self):
+        facets = parse_facets({})
+        assert facets["total"] == 0
+        assert facets["price_range"] == {"min": 0, "max": 0}
+        assert facets["features"]["rainproof"] == 0
+
+    def test_snapshot_reused_until_write(self):
+        service = _service(_products(4))
+        collection = service.collection
+
+        async def run():
+            await service.get_filter_options()
+            await service.get_filter_options()
+            stats = await service.get_stats()
+            assert _facet_runs(collection) == 1
+            assert stats["total_products"] == 4
+
+            from modules.products_engine.v1.models import ProductCreate
+            await service.create(ProductCreate(name="Nouveau", brand="Elk", price=5, score=60, rank=9, image_url="y.png"))
+            return await service.get_filter_options()
+
+        options = asyncio.run(run())
+        assert _facet_runs(collection) == 2
+        assert "Elk" in options["brands"]
+        assert options["counts"]["total"] == 5
+
+    def test_write_during_rebuild_is_not_cached(self):
+        snapshot = FacetSnapshot()
+        collection = FakeDB().products
+        collection.docs = _products(2)
+        original = collection.aggregate
+
+        def aggregate(pipeline):
+            snapshot.invalidate()
+            return original(pipeline)
+
+        collection.aggregate = aggregate
+        asyncio.run(snapshot.get(collection))
+        assert snapshot.stats()["cached"] is False
@@ -0,0 +1,202 @@
+"""
+Tests Unitaires - Raster Engine
+===============================
+Tests du moteur raster NumPy (densité par noyau, indice de qualité
+d'habitat sur grille, encodage PNG / octets quantifiés) et de son
+utilisation par les couches advanced_geospatial et ecoforestry.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import math
+import time
+import threading
+import zlib
+import base64
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from modules.data_layers import raster
+from modules.data_layers.raster import RasterGrid
+from modules.data_layers.advanced_geospatial_layers.data_layer import AdvancedGeospatialDataLayer
+from modules.data_layers.ecoforestry_layers.data_layer import EcoforestryDataLayer
+
+from conftest import FakeDB
+
+
+BOUNDS = dict(north=46.85, south=46.80, east=-71.20, west=-71.27)
+
+
+def _layer(zones=()):
+    layer = AdvancedGeospatialDataLayer()
+    layer._db = FakeDB()
+    layer._db.concentration_zones.docs = list(zones)
+    return layer
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestGrid:
+    """Tests de la grille"""
+
+    def test_resolution_and_bounds(self):
+        grid = RasterGrid.from_resolution(**BOUNDS, resolution_m=20, max_dim=256)
+        assert grid.shape == (256, 256)
+        grid = RasterGrid.from_resolution(**BOUNDS, resolution_m=100)
+        assert grid.shape == (min(100, int(0.05 * 111000 / 100)), 53)
+        grid = RasterGrid.from_resolution(**BOUNDS, resolution_m=10000, max_dim=5000)
+        assert grid.shape == (raster.MIN_DIM, raster.MIN_DIM)
+
+        lats, lngs = grid.centers()
+        assert lats.shape == (10, 1) and lngs.shape == (1, 10)
+        assert lats[0, 0] == pytest.approx(46.80 + grid.lat_step / 2)
+
+    def test_inverted_bounds_are_rejected(self):
+        with pytest.raises(ValueError):
+            RasterGrid.from_resolution(north=46.80, south=46.85, east=-71.20, west=-71.27, resolution_m=100)
+        with pytest.raises(ValueError):
+            RasterGrid.from_resolution(north=46.85, south=46.80, east=-71.27, west=-71.27, resolution_m=100)
+
+
+class TestFormulas:
+    """Tests des formules vectorisées"""
+
+    def test_kernel_density_matches_per_cell_loop(self):
+        grid = RasterGrid(46.81, 46.80, -71.20, -71.21, 12, 9)
+        rng = np.random.default_rng(7)
+        lats = rng.uniform(46.80, 46.81, 15)
+        lngs = rng.uniform(-71.21, -71.20, 15)
+        weights = rng.uniform(1, 5, 15)
+
+        density = raster.kernel_density(grid, lats, lngs, weights, bandwidth_m=200)
+
+        m_lng = 111000 * math.cos(math.radians(46.805))
+        for i in range(grid.rows):
+            for j in range(grid.cols):
+                cell_lat = grid.south + (i + 0.5) * grid.lat_step
+                cell_lng = grid.west + (j + 0.5) * grid.lng_step
+                expected = sum(
+                    w * math.exp(-(((cell_lat - a) * 111000) ** 2 + ((cell_lng - b) * m_lng) ** 2) / (2 * 200 ** 2))
+                    for a, b, w in zip(lats, lngs, weights)
+                )
+                assert density[i, j] == pytest.approx(expected)
+
+    def test_hsi_grid_matches_point_model(self):
+        layer = EcoforestryDataLayer()
+        grid, hsi = asyncio.run(layer.compute_hsi_grid("moose", **BOUNDS, resolution_m=500))
+        lats, lngs = grid.centers()
+        for i, j in [(0, 0), (3, 5), (grid.rows - 1, grid.cols - 1)]:
+            point = asyncio.run(layer.compute_hsi("moose", float(lats[i, 0]), float(lngs[0, j])))
+            assert round(float(hsi["overall"][i, j]), 3) == point.hsi_overall
+            assert round(float(hsi["water"][i, j]), 3) == point.hsi_water
+
+        cells = layer._generate_placeholder_hsi("moose", 46.8, -71.2, 2.0)
+        assert len(cells) == 16
+        point = asyncio.run(layer.compute_hsi("moose", cells[5].coordinates["lat"], cells[5].coordinates["lng"]))
+        assert cells[5].hsi_overall == point.hsi_overall
+
+
+class TestEncoding:
+    """Tests des tuiles compactes"""
+
+    def test_png_is_north_up_grayscale(self):
+        values = np.array([[0.0, 0.5], [1.0, 0.25], [0.1, 0.2]])
+        png = raster.encode_png(values)
+        assert png.startswith(b"\x89PNG\r\n\x1a\n")
+        width, height = int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big")
+        assert (width, height) == (2, 3)
+
+        idat_len = int.from_bytes(png[33:37], "big")
+        raw = zlib.decompress(png[41:41 + idat_len])
+        scanlines = [raw[k * 3 + 1:k * 3 + 3] for k in range(3)]
+        # Première ligne de l'image = ligne nord (dernière ligne du tableau)
+        assert list(scanlines[0]) == [26, 51]
+        assert list(scanlines[2]) == [0, 128]
+
+    def test_u8_round_trip_and_size(self):
+        grid = RasterGrid(**BOUNDS, rows=256, cols=256)
+        values = np.random.default_rng(1).random(grid.shape)
+        tile = raster.encode_tile(grid, values, "u8")
+        assert len(base64.b64decode(tile["data"])) == 256 * 256
+        assert np.abs(raster.decode_u8(tile) - values).max() <= 0.5 / 255 + 1e-9
+
+        with pytest.raises(ValueError):
+            raster.encode_tile(grid, values, "gif")
+
+
+class TestHeatmapLayer:
+    """Tests de la carte de chaleur"""
+
+    def test_density_from_observed_zones(self):
+        zones = [
+            {"species": "deer", "center": {"lat": 46.84, "lng": -71.26}, "observation_count": 40},
+            {"species": "deer", "center": {"lat": 46.81, "lng": -71.21}, "observation_count": 4},
+            {"species": "moose", "center": {"lat": 46.82, "lng": -71.22}, "observation_count": 9},
+        ]
+        layer = _layer(zones)
+        heatmap = asyncio.run(layer.generate_heatmap(**BOUNDS, species="Deer", resolution_m=50, max_dim=256))
+
+        assert layer.db.concentration_zones.queries[0]["species"] == "deer"
+        assert heatmap.total_observations == 44
+        assert heatmap.max_intensity == 1.0
+        hotspots = asyncio.run(layer.get_hotspots(heatmap))
+        assert hotspots[0]["intensity"] == 1.0
+        assert hotspots[0]["lat"] == pytest.approx(46.84, abs=0.001)
+        assert hotspots[0]["lng"] == pytest.approx(-71.26, abs=0.001)
+        assert len(hotspots) == 20
+
+    def test_large_placeholder_grid_is_fast(self):
+        layer = _layer()
+        started = time.monotonic()
+        grid, values, total = asyncio.run(
+            layer.compute_heatmap_raster(**BOUNDS, resolution_m=5, max_dim=512)
+        )
+        assert time.monotonic() - started < 1
+        assert grid.shape == (512, 512) and total == 0
+        assert values.min() >= 0.1 and values.max() <= 1.0
+
+    def test_query_and_density_run_off_the_event_loop(self):
+        layer = _layer([{"center": {"lat": 46.84, "lng": -71.26}, "observation_count": 3}])
+        collection = layer.db.concentration_zones
+        find = collection.find
+        threads = []
+
+        def recording_find(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return find(*args, **kwargs)
+
+        collection.find = recording_find
+
+        async def run():
+            loop_thread = threading.current_thread()
+            _, _, total = await layer.compute_heatmap_raster(**BOUNDS, max_dim=64)
+            return loop_thread, total
+
+        loop_thread, total = asyncio.run(run())
+        assert total == 3
+        assert threads and threads[0] is not loop_thread
+
+    def test_endpoints_reject_inverted_bounds(self):
+        from fastapi import HTTPException
+        from modules.data_layers.advanced_geospatial_layers.v1.router import generate_heatmap, extract_hotspots
+        from modules.data_layers.ecoforestry_layers.v1.router import get_hsi_raster
+
+        inverted = dict(north=46.80, south=46.85, east=-71.20, west=-71.27)
+        calls = [
+            generate_heatmap(**inverted, species=None, resolution_m=100, max_dim=100, encoding=None),
+            extract_hotspots(**inverted, species=None, threshold=0.7),
+            get_hsi_raster("deer", **inverted, resolution_m=100, max_dim=100, component="overall", encoding="png"),
+        ]
+        for call in calls:
+            with pytest.raises(HTTPException) as exc:
+                asyncio.run(call)
+            assert exc.value.status_code == 400
@@ -0,0 +1,137 @@
+"""
+Tests Unitaires - Rules Engine Compiler
+=======================================
+Tests du compilateur de règles partagé (rules_engine, trigger_engine,
+bionic_knowledge_engine).
+
+Version: 1.0.0
+"""
+
+import pytest
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.rules_engine.compiler import (
+    compile_condition, compile_conditions, compile_trigger_condition,
+    compile_weighted_conditions, CompiledRuleSet, RuleSetCache
+)
+
+
+class TestCompileCondition:
+    """Tests pour compile_condition"""
+
+    @pytest.mark.parametrize("operator,value,ctx_value,expected", [
+        ("eq", "falling", "falling", True),
+        ("ne", "falling", "rising", True),
+        ("gt", 30, 35, True),
+        ("gte", 80, 80, True),
+        ("lt", 15, 20, False),
+        ("lte", 2, 2, True),
+        ("in", ["deer", "moose"], "moose", True),
+        ("not_in", ["deer", "moose"], "bear", True),
+        ("between", ["06:00", "09:00"], "07:30", True),
+        ("between", [-5, 5], 10, False),
+    ])
+    def test_operators(self, operator, value, ctx_value, expected):
+        predicate = compile_condition({"field": "f", "operator": operator, "value": value})
+        assert predicate({"f": ctx_value}) is expected
+
+    def test_missing_field_is_false(self):
+        predicate = compile_condition({"field": "wind_speed", "operator": "lt", "value": 15})
+        assert predicate({}) is False
+
+    def test_incomparable_types_are_false(self):
+        predicate = compile_condition({"field": "wind_speed", "operator": "lt", "value": 15})
+        assert predicate({"wind_speed": "calm"}) is False
+
+    def test_unknown_operator_is_false(self):
+        predicate = compile_condition({"field": "f", "operator": "regex", "value": ".*"})
+        assert predicate({"f": "x"}) is False
+
+    def test_conjunction_and_fields(self):
+        predicate, fields = compile_conditions([
+            {"field": "time_of_day", "operator": "between", "value": ["06:00", "09:00"]},
+            {"field": "species", "operator": "in", "value": ["deer", "moose"]}
+        ])
+        assert fields == {"time_of_day", "species"}
+        assert predicate({"time_of_day": "07:00", "species": "deer"}) is True
+        assert predicate({"time_of_day": "07:00", "species": "bear"}) is False
+
+
+class TestTriggerCondition:
+    """Tests pour compile_trigger_condition"""
+
+    def test_bounds_and_equality(self):
+        predicate, fields = compile_trigger_condition({"cart_value": {"$gte": 50}, "action": "share"})
+        assert fields == {"cart_value"}
+        assert predicate({"cart_value": 60, "action": "share"}) is True
+        assert predicate({"cart_value": 40, "action": "share"}) is False
+        assert predicate({"action": "share"}) is False
+
+    def test_empty_condition_always_matches(self):
+        predicate, fields = compile_trigger_condition({})
+        assert predicate({}) is True
+        assert fields == frozenset()
+
+
+class TestWeightedConditions:
+    """Tests pour compile_weighted_conditions"""
+
+    def test_matches_reference_scoring(self):
+        score = compile_weighted_conditions({
+            "temperature": {"min": 14, "trigger": "above"},
+            "time_of_day": ["midday", "afternoon"]
+        })
+        assert score({"temperature": 20, "time_of_day": "midday"}) == 1.0
+        assert score({"temperature": 7, "time_of_day": "dawn"}) == 0.25
+        assert score({}) == 0.0
+
+    def test_empty_requirements(self):
+        assert compile_weighted_conditions({})({"anything": 1}) == 1.0
+
+
+class TestCompiledRuleSet:
+    """Tests pour CompiledRuleSet et RuleSetCache"""
+
+    @pytest.fixture
+    def ruleset(self):
+        from modules.rules_engine.router import DEFAULT_RULES
+        return CompiledRuleSet.from_rules(DEFAULT_RULES)
+
+    def test_field_index(self, ruleset):
+        names = {r.name for r in ruleset.rules_for_field("wind_speed")}
+        assert names == {"low_wind", "high_wind_warning"}
+
+    def test_evaluate(self, ruleset):
+        names = [r.name for r in ruleset.evaluate({"wind_speed": 40, "pressure_trend": "falling"})]
+        assert names == ["high_wind_warning", "barometric_drop"]
+
+    def test_batch_matches_single(self, ruleset):
+        contexts = [{"wind_speed": w, "global_score": g} for w in range(0, 50, 5) for g in range(0, 100, 10)]
+        batch = ruleset.evaluate_batch(contexts)
+        assert len(batch) == len(contexts)
+        for context, matches in zip(contexts, batch):
+            assert [r.name for r in matches] == [r.name for r in ruleset.evaluate(context)]
+
+    def test_cache_invalidation(self, ruleset):
+        cache = RuleSetCache(ttl=60)
+        cache.set(("weather",), ruleset)
+        assert cache.get(("weather",)) is ruleset
+        cache.invalidate()
+        assert cache.get(("weather",)) is None
+        assert cache.stats()["hits"] == 1
+
+
+class TestKnowledgeRulesBatch:
+    """Tests pour KnowledgeRulesManager.apply_rules_batch"""
+
+    def test_batch_equals_single(self):
+        from modules.bionic_knowledge_engine.knowledge_rules import KnowledgeRulesManager
+
+        conditions_list = [{"temperature": t, "time_of_day": "midday"} for t in range(-10, 30, 5)]
+        batch = KnowledgeRulesManager.apply_rules_batch(conditions_list, "moose", "fall")
+        single = [KnowledgeRulesManager.apply_rules(c, "moose", "fall") for c in conditions_list]
+        assert batch == single
@@ -0,0 +1,146 @@
+"""
+Tests Unitaires - SEO Similarity
+================================
+Tests de l'index MinHash/LSH des quasi-doublons (empreintes,
+requêtes par bandes, rapport global, maintenance à l'écriture).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.seo_engine import seo_similarity
+from modules.seo_engine.seo_similarity import (
+    SEOSimilarityIndex, fingerprint, estimate_similarity, FINGERPRINTS_COLLECTION
+)
+from modules.seo_engine.seo_pages import SEOPagesManager
+from modules.seo_engine.seo_rules_engine import SEORulesEngine
+
+
+from conftest import FakeDB, matches
+
+
+# ==============================================
+# FIXTURES
+# ==============================================
+
+def _scanned(collection, since=0):
+    """Documents renvoyés par les find() depuis la requête n° since"""
+    return sum(sum(1 for d in collection.docs if matches(d, q or {})) for q in collection.queries[since:])
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes(monkeypatch):
+    monkeypatch.setattr(seo_similarity, "_indexes_ready", False)
+
+
+_TEMPLATE = (
+    "La chasse à l'{species} dans la région de {region} commence à l'automne. "
+    "Les chasseurs doivent détenir un permis valide et respecter les limites de prise. "
+    "Les meilleurs secteurs se trouvent près des cours d'eau et des coupes forestières récentes. "
+    "Prévoyez un équipement adapté au froid, des appeaux et une carte topographique détaillée. "
+    "Consultez la réglementation provinciale avant chaque saison pour connaître les dates exactes."
+)
+
+
+def _page(page_id, species="orignal", region="Abitibi", extra=""):
+    return {"id": page_id, "title_fr": f"Chasse {species} {region}", "slug": page_id,
+            "content_markdown": _TEMPLATE.format(species=species, region=region) + extra}
+
+
+_UNRELATED = ("Recette de tarte aux bleuets du Lac-Saint-Jean: mélanger la farine, le beurre "
+              "froid et une pincée de sel, puis abaisser la pâte et cuire quarante minutes au four.")
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestFingerprint:
+    """Tests des empreintes MinHash"""
+
+    def test_templated_pages_are_similar(self):
+        a = fingerprint(_page("a"))
+        b = fingerprint(_page("b", region="Mauricie"))
+        c = fingerprint({"id": "c", "content_markdown": _UNRELATED})
+        assert estimate_similarity(a["signature"], b["signature"]) >= 0.7
+        assert estimate_similarity(a["signature"], c["signature"]) < 0.1
+
+    def test_html_and_empty_pages(self):
+        html = fingerprint({"content_html": "<p>" + _TEMPLATE.format(species="ours", region="Gaspésie") + "</p>"})
+        md = fingerprint({"content_markdown": _TEMPLATE.format(species="ours", region="Gaspésie")})
+        assert html["signature"] == md["signature"]
+        assert fingerprint({"title_fr": "Sans corps"}) is None
+
+
+class TestSimilarityIndex:
+    """Tests de l'index LSH dans MongoDB"""
+
+    def test_pages_indexed_on_write(self):
+        db = FakeDB()
+
+        async def run():
+            await SEOPagesManager.create_page(db, _page("a"))
+            await SEOPagesManager.create_page(db, _page("b", extra=" Bonne chasse."))
+            await SEOPagesManager.create_page(db, {"id": "c", "content_markdown": _UNRELATED})
+            found = await SEOSimilarityIndex.similar_to_page(db, "a", threshold=0.8)
+            await SEOPagesManager.update_page(db, "b", {"content_markdown": _UNRELATED + " Variante."})
+            after_update = await SEOSimilarityIndex.similar_to_page(db, "a", threshold=0.8)
+            await SEOPagesManager.delete_page(db, "c")
+            return found, after_update
+
+        found, after_update = asyncio.run(run())
+        assert [m["page_id"] for m in found["similar"]] == ["b"]
+        assert found["similar"][0]["title_fr"] == "Chasse orignal Abitibi"
+        assert after_update["similar"] == []
+        assert {d["page_id"] for d in db[FINGERPRINTS_COLLECTION].docs} == {"a", "b"}
+
+    def test_query_reads_only_candidate_buckets(self):
+        db = FakeDB()
+
+        async def run():
+            for i in range(30):
+                await SEOSimilarityIndex.index_page(db, {"id": f"u{i}", "content_markdown": f"{_UNRELATED} Variante {i} " * (i + 1)})
+            await SEOSimilarityIndex.index_page(db, _page("a"))
+            since = len(db[FINGERPRINTS_COLLECTION].queries)
+            return since, await SEOSimilarityIndex.find_similar(db, _page("new", extra=" Bonne chasse."))
+
+        since, found = asyncio.run(run())
+        assert [m["page_id"] for m in found] == ["a"]
+        assert _scanned(db[FINGERPRINTS_COLLECTION], since) < 5
+
+    def test_report_groups_and_reindex(self):
+        db = FakeDB()
+        pages = [_page("a"), _page("b", extra=" Bonne chasse."), _page("c", extra=" À bientôt."),
+                 {"id": "x", "content_markdown": _UNRELATED}]
+
+        async def run():
+            db.seo_pages.docs = [dict(p) for p in pages]
+            first = await SEOSimilarityIndex.reindex_all(db)
+            second = await SEOSimilarityIndex.reindex_all(db)
+            report = await SEOSimilarityIndex.duplicate_report(db, threshold=0.8)
+            return first, second, report
+
+        first, second, report = asyncio.run(run())
+        assert first["indexed"] == 4 and second["indexed"] == 0
+        assert report["total_groups"] == 1
+        assert report["groups"][0]["pages"] == ["a", "b", "c"]
+        assert report["duplicate_pairs"] == 3
+
+    def test_check_duplicates_reports_content(self):
+        db = FakeDB()
+
+        async def run():
+            await SEOPagesManager.create_page(db, _page("a"))
+            return await SEORulesEngine.check_duplicates(db, _page("draft", extra=" Bonne chasse."))
+
+        result = asyncio.run(run())
+        content = [d for d in result["duplicates"] if d["type"] == "content"]
+        assert content and content[0]["existing_id"] == "a"
+        assert content[0]["action"] == "WARN"
@@ -0,0 +1,229 @@
+"""
+Tests Unitaires - Territory GPX Streaming
+=========================================
+Tests de l'export GPX par morceaux et de l'import incrémental
+(insert_many par lots, suivi de progression, rollback sur GPX invalide).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import territory_gpx
+from territory_gpx import (
+    GpxStreamParser, stream_gpx_export, import_gpx_stream, get_import_progress,
+    IMPORTS_COLLECTION, ImportExistsError
+)
+
+
+from conftest import FakeDB
+from territory_tracks import BUCKETS_COLLECTION, BUCKET_SIZE
+
+
+# ==============================================
+# FIXTURES
+# ==============================================
+
+class FakeUpload:
+    def __init__(self, data: bytes, filename="trace.gpx"):
+        self.data = data
+        self.filename = filename
+        self.size = len(data)
+        self.pos = 0
+        self.reads = 0
+
+    async def read(self, size=-1):
+        self.reads += 1
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += len(chunk)
+        return chunk
+
+
+def _sample_db():
+    db = FakeDB()
+    start = datetime(2025, 11, 2, 6, 0, tzinfo=timezone.utc)
+    db.territory_waypoints.docs = [
+        {"_id": "w1", "user_id": "u1", "latitude": 46.8, "longitude": -71.2, "name": "Mirador & salin",
+         "description": "Près du <ruisseau>", "waypoint_type": "stand", "created_at": start},
+        {"_id": "w2", "user_id": "u2", "latitude": 45.0, "longitude": -72.0, "name": "Autre",
+         "waypoint_type": "custom", "created_at": start},
+    ]
+    db.territory_tracks.docs = [
+        {"_id": "t1", "user_id": "u1", "name": "Sentier nord", "is_active": False, "created_at": start,
+         "points": [
+             {"lat": 46.8 + i * 0.001, "lon": -71.2, "alt": 120.0 + i, "timestamp": start + timedelta(minutes=i)}
+             for i in range(300)
+         ]},
+        {"_id": "t2", "user_id": "u1", "name": "En cours", "is_active": True, "created_at": start,
+         "points": [{"lat": 1, "lon": 1}]},
+    ]
+    return db
+
+
+async def _collect(gen):
+    return [chunk async for chunk in gen]
+
+
+def _record_batches(collection):
+    """Tailles des insert_many successifs d'une collection"""
+    sizes = []
+    insert_many = collection.insert_many
+
+    async def recording(docs, **kwargs):
+        sizes.append(len(docs))
+        return await insert_many(docs, **kwargs)
+
+    collection.insert_many = recording
+    return sizes
+
+
+def _gpx_track(n_points):
+    points = b"".join(
+        b'<trkpt lat="%.4f" lon="-71.2"><time>2025-11-02T06:00:00Z</time></trkpt>' % (46.8 + i * 0.0001)
+        for i in range(n_points)
+    )
+    return b'<gpx><trk><name>Long</name><trkseg>' + points + b'</trkseg></trk></gpx>'
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestGpxExport:
+    """Tests de l'export en flux"""
+
+    def test_export_is_chunked_and_valid(self):
+        db = _sample_db()
+        chunks = asyncio.run(_collect(stream_gpx_export(db, "u1", chunk_size=4096)))
+        assert len(chunks) > 2
+
+        root = ET.fromstring(b"".join(chunks))
+        ns = {"g": "http://www.topografix.com/GPX/1/1"}
+        assert [w.find("g:name", ns).text for w in root.findall("g:wpt", ns)] == ["Mirador & salin"]
+        tracks = root.findall("g:trk", ns)
+        # Le tracé actif n'est pas exporté
+        assert len(tracks) == 1
+        assert len(tracks[0].findall(".//g:trkpt", ns)) == 300
+
+    def test_export_without_tracks(self):
+        db = _sample_db()
+        data = b"".join(asyncio.run(_collect(stream_gpx_export(db, "u1", include_tracks=False))))
+        assert b"<trk>" not in data and b"<wpt" in data
+
+
+class TestGpxStreamParser:
+    """Tests du parseur incrémental"""
+
+    def test_items_emitted_as_they_complete(self):
+        parser = GpxStreamParser()
+        items = parser.feed(b'<gpx><wpt lat="1" lon="2"><name>A</name></wpt><trk><name>T</name><trkseg>')
+        assert [i["kind"] for i in items] == ["waypoint", "track_start"]
+        assert parser.feed(b'<trkpt lat="1" lon="1"/><trkpt lat="1.01" lon="1"><ele>5</ele></trkpt>') == []
+        items = parser.feed(b'</trkseg></trk></gpx>')
+        assert [i["kind"] for i in items] == ["track_points", "track_end"]
+        assert len(items[0]["points"]) == 2
+        assert items[1]["name"] == "T"
+        assert items[1]["distance_km"] == pytest.approx(1.11, abs=0.01)
+        parser.close()
+
+    def test_track_points_leave_in_bucket_batches(self):
+        parser = GpxStreamParser()
+        data = _gpx_track(BUCKET_SIZE * 2 + 10)
+        # Un lot de points sort dès qu'un bucket est plein, avant </trk>
+        items = parser.feed(data[:len(data) // 2])
+        assert [len(i["points"]) for i in items if i["kind"] == "track_points"] == [BUCKET_SIZE]
+        assert len(parser._track["points"]) < BUCKET_SIZE
+        items = parser.feed(data[len(data) // 2:])
+        assert [len(i.get("points", [])) for i in items] == [BUCKET_SIZE, 10, 0]
+
+    def test_consumed_elements_are_detached(self):
+        parser = GpxStreamParser()
+        parser.feed(b'<gpx><trk><trkseg>' + b'<trkpt lat="1" lon="1"/>' * 1000)
+        trkseg = parser._stack[-1]
+        assert len(trkseg) == 0
+
+    def test_bad_points_are_skipped(self):
+        parser = GpxStreamParser()
+        items = parser.feed(b'<gpx><wpt lat="x" lon="2"/><wpt lat="1" lon="2"><type>bogus</type></wpt></gpx>')
+        parser.close()
+        assert parser.skipped == 1
+        assert items[0]["waypoint_type"] == "custom"
+
+
+class TestGpxImport:
+    """Tests de l'import par lots"""
+
+    def test_round_trip_with_batches_and_progress(self, monkeypatch):
+        monkeypatch.setattr(territory_gpx, "WAYPOINT_BATCH_SIZE", 2)
+        monkeypatch.setattr(territory_gpx, "TRACK_BATCH_POINTS", 100)
+        source = _sample_db()
+        source.territory_waypoints.docs += [
+            {"_id": f"x{i}", "user_id": "u1", "latitude": 46, "longitude": -71, "name": f"P{i}",
+             "waypoint_type": "camera"} for i in range(4)
+        ]
+        data = b"".join(asyncio.run(_collect(stream_gpx_export(source, "u1"))))
+
+        target = FakeDB()
+        waypoint_batches = _record_batches(target.territory_waypoints)
+        upload = FakeUpload(data)
+        result = asyncio.run(import_gpx_stream(target, "u9", upload, import_id="imp-1", read_size=1024))
+
+        assert result["imported_waypoints"] == 5
+        assert result["imported_tracks"] == 1
+        assert result["imported_points"] == 300
+        assert upload.reads > 10
+        assert waypoint_batches == [2, 2, 1]
+        track = target.territory_tracks.docs[0]
+        assert track["distance_km"] == pytest.approx(33.2, abs=0.2)
+        assert track["started_at"] == datetime(2025, 11, 2, 6, 0, tzinfo=timezone.utc)
+        assert track["points_count"] == 300
+        assert track["bounds"]["max_lat"] == pytest.approx(46.8 + 299 * 0.001)
+
+        progress = asyncio.run(get_import_progress(target, "imp-1", "u9"))
+        assert progress["status"] == "completed"
+        assert progress["bytes_read"] == len(data)
+        assert progress["waypoints"] == 5
+
+    def test_long_track_buckets_written_before_track_end(self, monkeypatch):
+        monkeypatch.setattr(territory_gpx, "TRACK_BATCH_POINTS", BUCKET_SIZE)
+        db = FakeDB()
+        bucket_batches = _record_batches(db[BUCKETS_COLLECTION])
+        data = _gpx_track(BUCKET_SIZE * 3 + 1)
+        result = asyncio.run(import_gpx_stream(db, "u1", FakeUpload(data), import_id="long", read_size=4096))
+
+        assert result["imported_points"] == BUCKET_SIZE * 3 + 1
+        # Un insert par bucket plein, le reste avec le document du tracé
+        assert bucket_batches == [1, 1, 1, 1]
+        buckets = sorted(db[BUCKETS_COLLECTION].docs, key=lambda b: b["seq"])
+        assert [b["first_n"] for b in buckets] == [0, BUCKET_SIZE, BUCKET_SIZE * 2, BUCKET_SIZE * 3]
+        assert db.territory_tracks.docs[0]["points_count"] == BUCKET_SIZE * 3 + 1
+
+    def test_resent_import_id_is_a_conflict(self):
+        db = FakeDB()
+        asyncio.run(import_gpx_stream(db, "u1", FakeUpload(b'<gpx><wpt lat="1" lon="2"/></gpx>'), import_id="dup"))
+        with pytest.raises(ImportExistsError) as exc:
+            asyncio.run(import_gpx_stream(db, "u1", FakeUpload(b'<gpx><wpt lat="1" lon="2"/></gpx>'), import_id="dup"))
+        assert exc.value.progress["status"] == "completed"
+        assert len(db.territory_waypoints.docs) == 1
+
+    def test_invalid_gpx_rolls_back(self, monkeypatch):
+        monkeypatch.setattr(territory_gpx, "WAYPOINT_BATCH_SIZE", 1)
+        db = FakeDB()
+        data = b'<gpx><wpt lat="1" lon="2"/><wpt lat="1" lon="3"/><wpt lat="1"'
+        with pytest.raises(ValueError, match="Invalid GPX"):
+            asyncio.run(import_gpx_stream(db, "u1", FakeUpload(data), import_id="bad"))
+        assert db.territory_waypoints.docs == []
+        assert db[IMPORTS_COLLECTION].docs[0]["status"] == "failed"
+
+    def test_progress_is_scoped_to_user(self):
+        db = FakeDB()
+        asyncio.run(import_gpx_stream(db, "u1", FakeUpload(b"<gpx></gpx>"), import_id="i1"))
+        assert asyncio.run(get_import_progress(db, "i1", "intrus")) is None
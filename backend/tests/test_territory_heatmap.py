@@ -0,0 +1,133 @@
+"""
+Tests Unitaires - Territory Activity Heatmap
+============================================
+Tests de l'agrégation serveur de la carte de chaleur d'activité ($group
+sur coordonnées quantifiées, pyramide de zooms, fenêtre d'affichage).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import math
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import territory_heatmap
+from territory_heatmap import activity_heatmap, heatmap_pipeline, cell_size
+from conftest import FakeDB
+
+
+NOW = datetime.now(timezone.utc)
+
+
+def _obs(lat, lng, user_id="u1", species="orignal", age_hours=1, entity_type="observation"):
+    return {
+        "user_id": user_id,
+        "entity_type": entity_type,
+        "location": {"type": "Point", "coordinates": [lng, lat]},
+        "metadata": {"species": species},
+        "created_at": NOW - timedelta(hours=age_hours)
+    }
+
+
+@pytest.fixture
+def db():
+    return FakeDB()
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestAggregation:
+    """Tests de l'agrégation par cellules"""
+
+    def test_no_cap_and_filters(self, db):
+        # 1500 observations dans une même cellule: plus de limite à 1000
+        db.geo_entities.docs = [_obs(46.80005, -71.20005) for _ in range(1500)]
+        db.geo_entities.docs += [
+            _obs(46.9005, -71.3005, species="ours"),
+            _obs(46.80005, -71.20005, user_id="u2"),
+            _obs(46.80005, -71.20005, age_hours=100),
+            _obs(46.80005, -71.20005, entity_type="waypoint"),
+        ]
+        since = NOW - timedelta(hours=72)
+
+        result = asyncio.run(activity_heatmap(db, "u1", since))
+        assert result["total_observations"] == 1501
+        assert result["truncated"] is False
+        top = result["points"][0]
+        assert top["intensity"] == 1500
+        assert top["lat"] == pytest.approx(46.8005) and top["lon"] == pytest.approx(-71.2005)
+
+        result = asyncio.run(activity_heatmap(db, "u1", since, species="ours"))
+        assert [p["intensity"] for p in result["points"]] == [1]
+        assert result["points"][0]["species"] == "ours"
+
+    def test_zoom_pyramid_cells_nest(self, db):
+        db.geo_entities.docs = [
+            _obs(46.8 + 0.0007 * i, -71.2 + 0.0011 * (i % 7)) for i in range(200)
+        ]
+        since = NOW - timedelta(hours=72)
+        fine = asyncio.run(activity_heatmap(db, "u1", since, zoom=16))
+        coarse = asyncio.run(activity_heatmap(db, "u1", since, zoom=15))
+
+        assert cell_size(15) == pytest.approx(2 * cell_size(16))
+        assert fine["total_observations"] == coarse["total_observations"] == 200
+        assert coarse["total_cells"] < fine["total_cells"]
+
+        # Chaque cellule grossière = somme de ses quatre sous-cellules
+        size = cell_size(15)
+        rolled = {}
+        for p in fine["points"]:
+            key = (math.floor(p["lat"] / size), math.floor(p["lon"] / size))
+            rolled[key] = rolled.get(key, 0) + p["intensity"]
+        assert rolled == {
+            (math.floor(p["lat"] / size), math.floor(p["lon"] / size)): p["intensity"] for p in coarse["points"]
+        }
+
+    def test_viewport_and_cell_limit(self, db):
+        db.geo_entities.docs = [_obs(46.80 + 0.01 * i, -71.20) for i in range(10)]
+        viewport = {"north": 46.835, "south": 46.815, "east": -71.19, "west": -71.21}
+        result = asyncio.run(activity_heatmap(db, "u1", NOW - timedelta(hours=72), viewport=viewport))
+
+        assert sorted(round(p["lat"], 2) for p in result["points"]) == [46.82, 46.83]
+        assert all(viewport["south"] <= p["lat"] <= viewport["north"] for p in result["points"])
+
+        result = asyncio.run(activity_heatmap(db, "u1", NOW - timedelta(hours=72), max_cells=3))
+        assert len(result["points"]) == 3
+        assert result["total_cells"] == 10 and result["truncated"] is True
+        assert db.geo_entities.ops == ["aggregate", "aggregate"]
+
+    def test_viewport_polygon_is_padded_and_densified(self):
+        # Arêtes géodésiques: le bord sud d'un rectangle large remonte vers le pôle
+        polygon = territory_heatmap._viewport_polygon(north=46.82, south=46.80, east=-66.0, west=-76.0)
+        ring = polygon["coordinates"][0]
+        south_edge = [p for p in ring if p[1] < 46.80]
+        assert len(south_edge) >= 11
+        # Écart max d'une géodésique entre deux points à 1° de longitude
+        assert min(p[1] for p in ring) <= 46.80 - 0.0011
+        assert max(p[1] for p in ring) >= 46.82 + 0.0011
+        assert ring[0] == ring[-1]
+
+    def test_point_near_south_edge_is_kept(self, db):
+        db.geo_entities.docs = [_obs(46.8001, -71.0), _obs(46.7999, -71.0)]
+        viewport = {"north": 46.82, "south": 46.80, "east": -66.0, "west": -76.0}
+        result = asyncio.run(activity_heatmap(db, "u1", NOW - timedelta(hours=72), viewport=viewport))
+        assert result["total_observations"] == 1
+
+    def test_wide_viewport_skips_geo_match(self):
+        viewport = {"north": 60.0, "south": 40.0, "east": 170.0, "west": -170.0}
+        pipeline = heatmap_pipeline("u1", NOW, viewport=viewport)
+        assert "location" not in pipeline[0]["$match"]
+        assert pipeline[2]["$match"]["lng"] == {"$gte": -170.0, "$lte": 170.0}
+
+    def test_pipeline_is_single_round_trip(self, db):
+        pipeline = heatmap_pipeline("u1", NOW, zoom=30)
+        assert [next(iter(stage)) for stage in pipeline] == ["$match", "$project", "$group", "$facet"]
+        assert pipeline[2]["$group"]["_id"]["x"]["$floor"]["$divide"][1] == cell_size(territory_heatmap.MAX_ZOOM)
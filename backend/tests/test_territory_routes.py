@@ -0,0 +1,124 @@
+"""
+Tests Unitaires - Territory Route Optimization
+==============================================
+Tests de la matrice de distances NumPy et de la recherche locale
+2-opt / Or-opt (départ/arrivée fixes, retour au départ, lots).
+
+Version: 1.0.0
+"""
+
+import pytest
+import sys
+import os
+import itertools
+import math
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from territory_routes import (
+    distance_matrix, cached_distance_matrix, solve_route, optimize_waypoints,
+    optimize_waypoint_batch
+)
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _random_waypoints(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return [{"id": f"w{i}", "latitude": 46.5 + rng.random() * 0.2, "longitude": -71.5 + rng.random() * 0.3}
+            for i in range(n)]
+
+
+def _length(dist, order, closed=False):
+    path = list(order) + ([order[0]] if closed else [])
+    return sum(dist[a, b] for a, b in zip(path, path[1:]))
+
+
+class TestDistanceMatrix:
+    """Tests de la matrice de distances"""
+
+    def test_matches_scalar_haversine(self):
+        wps = _random_waypoints(5)
+        dist = distance_matrix([w["latitude"] for w in wps], [w["longitude"] for w in wps])
+        for i, j in itertools.product(range(5), repeat=2):
+            expected = _haversine(wps[i]["latitude"], wps[i]["longitude"], wps[j]["latitude"], wps[j]["longitude"])
+            assert dist[i, j] == pytest.approx(expected, abs=1e-9)
+
+    def test_matrix_is_cached_and_read_only(self):
+        lats, lngs = [46.0, 46.1, 46.2], [-71.0, -71.1, -71.3]
+        first = cached_distance_matrix(lats, lngs)
+        assert cached_distance_matrix(lats, lngs) is first
+        with pytest.raises(ValueError):
+            first[0, 1] = 0
+
+
+class TestLocalSearch:
+    """Tests de la recherche locale"""
+
+    def test_reaches_optimum_on_small_open_path(self):
+        wps = _random_waypoints(7, seed=3)
+        dist = distance_matrix([w["latitude"] for w in wps], [w["longitude"] for w in wps])
+        result = solve_route(dist, start=0, time_budget=1.0)
+
+        best = min(_length(dist, (0,) + perm) for perm in itertools.permutations(range(1, 7)))
+        assert result.order[0] == 0
+        assert result.distance_km == pytest.approx(best, rel=0.02)
+
+    def test_improves_greedy_tour(self):
+        wps = _random_waypoints(120)
+        route = optimize_waypoints(wps, optimization="distance", time_budget=1.0)
+        assert sorted(w["id"] for w in route["waypoints"]) == sorted(w["id"] for w in wps)
+        assert route["distance_km"] < route["initial_distance_km"]
+
+    def test_fixed_start_and_end(self):
+        wps = _random_waypoints(15)
+        start = {"id": "start", "latitude": 46.5, "longitude": -71.5}
+        end = {"id": "end", "latitude": 46.7, "longitude": -71.2}
+        route = optimize_waypoints(wps, start_point=start, end_point=end)
+        ids = [w["id"] for w in route["waypoints"]]
+        assert ids[0] == "start" and ids[-1] == "end"
+        assert len(ids) == 17
+
+    def test_return_to_start_closes_loop(self):
+        wps = _random_waypoints(12)
+        start = {"id": "camp", "latitude": 46.6, "longitude": -71.35}
+        route = optimize_waypoints(wps, start_point=start, return_to_start=True)
+        ids = [w["id"] for w in route["waypoints"]]
+        assert ids[0] == ids[-1] == "camp"
+        assert len(set(ids)) == 13
+
+        nodes = [start] + wps
+        dist = distance_matrix([w["latitude"] for w in nodes], [w["longitude"] for w in nodes])
+        assert route["distance_km"] == pytest.approx(_length(dist, route["order"], closed=True), abs=1e-3)
+
+    def test_probability_mode_starts_at_best_zone(self):
+        wps = _random_waypoints(6)
+        wps[4]["probability"] = {"score": 95}
+        route = optimize_waypoints(wps, optimization="probability")
+        assert route["waypoints"][0]["id"] == "w4"
+
+    def test_zero_budget_returns_construction(self):
+        route = optimize_waypoints(_random_waypoints(30), time_budget=0)
+        assert route["timed_out"] is True
+        assert route["distance_km"] == route["initial_distance_km"]
+
+
+class TestBatch:
+    """Tests de l'API par lots"""
+
+    def test_batch_solves_each_set(self):
+        problems = [
+            {"waypoints": _random_waypoints(10, seed=1)},
+            {"waypoints": _random_waypoints(40, seed=2), "return_to_start": True},
+            {"waypoints": _random_waypoints(1, seed=3)},
+        ]
+        results = optimize_waypoint_batch(problems, total_budget=0.5)
+        assert [len(r["order"]) for r in results] == [10, 40, 1]
+        assert results[1]["waypoints"][0] is results[1]["waypoints"][-1]
@@ -0,0 +1,178 @@
+"""
+Tests Unitaires - Territory Map Tiles
+=====================================
+Tests des tuiles z/x/y (calcul des tuiles, requête bbox, ETag,
+cache de tuiles invalidé à l'écriture).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import territory_tiles
+from territory_tiles import (
+    TileCache, tile_bounds, point_to_tile, territory_position, get_tile,
+    territory_written, etag_matches
+)
+
+from conftest import FakeDB
+
+
+# ==============================================
+# FIXTURES
+# ==============================================
+
+def _db(docs):
+    db = FakeDB()
+    db.territories.docs = docs
+    return db
+
+
+def _finds(db):
+    return db.territories.ops.count("find")
+
+
+def _territories():
+    return [
+        {"_id": "a", "name": "Zec Nord", "status": "active", "province": "QC",
+         "coordinates": {"latitude": 47.5, "longitude": -71.5}, "scoring": {"global_score": 80}},
+        {"_id": "b", "name": "Pourvoirie Sud", "status": "active", "province": "QC",
+         "coordinates": {"latitude": 45.2, "longitude": -73.9}, "scoring": {"global_score": 60}},
+        {"_id": "c", "name": "Sans coordonnées", "status": "active", "province": "NB",
+         "scoring": {"global_score": 50}},
+        {"_id": "d", "name": "Inactif", "status": "deleted", "province": "QC",
+         "coordinates": {"latitude": 47.5, "longitude": -71.5}},
+    ]
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(territory_tiles, "tile_cache", TileCache())
+    monkeypatch.setattr(territory_tiles, "_locations_ready", False)
+
+
+def _features(body):
+    import json
+    return json.loads(body)["features"]
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestTileMath:
+    """Tests du calcul des tuiles"""
+
+    def test_point_round_trip(self):
+        for z in (0, 5, 12):
+            x, y = point_to_tile(-71.2, 46.8, z)
+            west, south, east, north = tile_bounds(z, x, y)
+            assert west <= -71.2 < east and south <= 46.8 < north
+
+    def test_estimated_position_is_stable(self):
+        territory = {"_id": "x1", "province": "ON"}
+        assert territory_position(territory) == territory_position(dict(territory))
+        assert territory_position(territory)[2] is True
+
+
+class TestTileServing:
+    """Tests de la génération des tuiles"""
+
+    def test_each_territory_lands_in_one_tile(self):
+        db = _db(_territories())
+        z = 6
+        tiles = {point_to_tile(lon, lat, z) for lon, lat in [(-71.5, 47.5), (-73.9, 45.2)]}
+
+        async def run():
+            seen = []
+            for x, y in tiles:
+                _, body = await get_tile(db, z, x, y)
+                seen += [f["properties"]["id"] for f in _features(body)]
+            return seen
+
+        assert sorted(asyncio.run(run())) == ["a", "b"]
+        # L'emplacement a été rempli pour le territoire sans coordonnées
+        estimated = next(d for d in db.territories.docs if d["_id"] == "c")
+        assert estimated["location_estimated"] is True
+
+    def test_cache_hit_and_etag(self):
+        db = _db(_territories())
+        x, y = point_to_tile(-71.5, 47.5, 8)
+
+        async def run():
+            first = await get_tile(db, 8, x, y)
+            finds = _finds(db)
+            second = await get_tile(db, 8, x, y)
+            return first, second, finds
+
+        first, second, finds = asyncio.run(run())
+        assert first == second
+        assert _finds(db) == finds
+        assert etag_matches(first[0], first[0])
+        assert etag_matches(f'"other", {first[0]}', first[0])
+        assert not etag_matches('"other"', first[0])
+
+    def test_filters_and_heatmap_layer(self):
+        db = _db(_territories())
+
+        async def run():
+            _, body = await get_tile(db, 0, 0, 0, filters={"min_score": 70})
+            _, heat = await get_tile(db, 0, 0, 0, metric="score")
+            return body, heat
+
+        import json
+        body, heat = asyncio.run(run())
+        assert [f["properties"]["id"] for f in _features(body)] == ["a"]
+        assert json.loads(heat)["count"] == 3
+
+    def test_invalid_tile_and_metric(self):
+        db = _db([])
+        with pytest.raises(ValueError):
+            asyncio.run(get_tile(db, 3, 8, 0))
+        with pytest.raises(ValueError):
+            asyncio.run(get_tile(db, 3, 0, 0, metric="wind"))
+
+
+class TestInvalidation:
+    """Tests de l'invalidation à l'écriture"""
+
+    def test_write_drops_only_affected_tiles(self):
+        db = _db(_territories())
+        z = 7
+        tile_a = point_to_tile(-71.5, 47.5, z)
+        tile_b = point_to_tile(-73.9, 45.2, z)
+        new_pos = point_to_tile(-70.0, 48.5, z)
+
+        async def run():
+            await get_tile(db, z, *tile_a)
+            await get_tile(db, z, *tile_b)
+            # Déplacement du territoire "a"
+            db.territories.docs[0]["coordinates"] = {"latitude": 48.5, "longitude": -70.0}
+            await territory_written(db, {"_id": "a"})
+            cache = territory_tiles.tile_cache
+            finds = _finds(db)
+            await get_tile(db, z, *tile_b)
+            assert _finds(db) == finds
+            _, moved = await get_tile(db, z, *new_pos)
+            _, old = await get_tile(db, z, *tile_a)
+            return cache, moved, old
+
+        cache, moved, old = asyncio.run(run())
+        assert cache.stats()["invalidations"] == 1
+        assert [f["properties"]["id"] for f in _features(moved)] == ["a"]
+        assert _features(old) == []
+
+    def test_lru_eviction_keeps_index_consistent(self):
+        cache = TileCache(maxsize=2)
+        cache.set((1, 0, 0, "t", ()), '"1"', b"1")
+        cache.set((1, 1, 0, "t", ()), '"2"', b"2")
+        cache.set((1, 1, 1, "t", ()), '"3"', b"3")
+        assert cache.get((1, 0, 0, "t", ())) is None
+        assert (1, 0, 0) not in cache._by_tile
+        assert cache.stats()["size"] == 2
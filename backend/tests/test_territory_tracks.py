@@ -0,0 +1,215 @@
+"""
+Tests Unitaires - Territory Track Storage
+=========================================
+Tests du stockage segmenté des points de tracés (buckets de taille fixe,
+statistiques incrémentales sur le tracé parent, lectures par plage).
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pymongo.errors import DuplicateKeyError
+
+import territory_tracks
+from territory_tracks import (
+    BUCKETS_COLLECTION, append_point, read_points, iter_points, new_track_fields,
+    track_summary, delete_track_points
+)
+
+from conftest import FakeDB
+
+
+START = datetime(2025, 11, 2, 6, 0, tzinfo=timezone.utc)
+
+
+def _point(i):
+    return {"lat": 46.8 + i * 0.001, "lon": -71.2, "alt": None, "timestamp": START + timedelta(seconds=i)}
+
+
+def _active_track(db, track_id="t1"):
+    track = {"_id": track_id, "user_id": "u1", "name": "Trace", "started_at": START,
+             "ended_at": None, "is_active": True, **new_track_fields()}
+    db.territory_tracks.docs.append(track)
+    return track
+
+
+async def _record(db, track_id, n):
+    for i in range(n):
+        track = await db.territory_tracks.find_one({"_id": track_id})
+        await append_point(db, track, _point(i))
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestAppend:
+    """Tests de l'ajout de points"""
+
+    def test_points_fill_fixed_size_buckets(self, monkeypatch):
+        monkeypatch.setattr(territory_tracks, "BUCKET_SIZE", 10)
+        db = FakeDB()
+        _active_track(db)
+        asyncio.run(_record(db, "t1", 25))
+
+        buckets = db[BUCKETS_COLLECTION].docs
+        assert [(b["seq"], b["count"]) for b in buckets] == [(0, 10), (1, 10), (2, 5)]
+        # Le document parent ne contient aucun tableau de points
+        assert "points" not in db.territory_tracks.docs[0]
+
+    def test_summary_updated_incrementally(self):
+        db = FakeDB()
+        _active_track(db)
+        asyncio.run(_record(db, "t1", 11))
+
+        summary = track_summary(db.territory_tracks.docs[0])
+        assert summary["points_count"] == 11
+        assert summary["distance_km"] == pytest.approx(1.11, abs=0.01)
+        assert summary["bounds"] == {"min_lat": 46.8, "max_lat": pytest.approx(46.81),
+                                     "min_lon": -71.2, "max_lon": -71.2}
+        assert summary["first_point_at"] == START
+        assert summary["last_point_at"] == START + timedelta(seconds=10)
+
+    def test_stale_read_does_not_reuse_slot(self):
+        db = FakeDB()
+        stale = dict(_active_track(db))
+
+        async def run():
+            await append_point(db, stale, _point(0))
+            # Deuxième ajout avec un document périmé (points_count=0)
+            await append_point(db, stale, _point(1))
+
+        asyncio.run(run())
+        bucket = db[BUCKETS_COLLECTION].docs[0]
+        assert [p["n"] for p in bucket["points"]] == [0, 1]
+        assert db.territory_tracks.docs[0]["points_count"] == 2
+
+    def test_concurrent_first_push_into_new_bucket(self, monkeypatch):
+        monkeypatch.setattr(territory_tracks, "BUCKET_SIZE", 2)
+        db = FakeDB()
+        asyncio.run(territory_tracks.ensure_track_indexes(db))
+        _active_track(db)
+        buckets = db[BUCKETS_COLLECTION]
+        original = buckets.update_one
+
+        async def racing_update_one(query, update, upsert=False, **kwargs):
+            if upsert and query["seq"] == 1 and not buckets.docs[1:]:
+                # Un autre worker crée le bucket entre la recherche et l'insertion
+                buckets.docs.append({**query, "points": [], "count": 0, "user_id": "u1"})
+                raise DuplicateKeyError("E11000 duplicate key", 11000)
+            return await original(query, update, upsert=upsert, **kwargs)
+
+        monkeypatch.setattr(buckets, "update_one", racing_update_one)
+        asyncio.run(_record(db, "t1", 4))
+
+        assert [(b["seq"], b["count"]) for b in buckets.docs] == [(0, 2), (1, 2)]
+        assert [p["n"] for p in buckets.docs[1]["points"]] == [2, 3]
+
+    def test_inactive_track_is_rejected(self):
+        db = FakeDB()
+        track = _active_track(db)
+        db.territory_tracks.docs[0]["is_active"] = False
+        with pytest.raises(ValueError):
+            asyncio.run(append_point(db, track, _point(0)))
+
+    def test_legacy_track_is_migrated_on_append(self, monkeypatch):
+        monkeypatch.setattr(territory_tracks, "BUCKET_SIZE", 4)
+        db = FakeDB()
+        legacy = {"_id": "old", "user_id": "u1", "is_active": True, "started_at": START,
+                  "distance_km": 0.5, "points": [_point(i) for i in range(6)]}
+        db.territory_tracks.docs.append(legacy)
+
+        asyncio.run(append_point(db, dict(legacy), _point(6)))
+        track = db.territory_tracks.docs[0]
+        assert "points" not in track
+        assert track["points_count"] == 7
+        points = asyncio.run(read_points(db, track))
+        assert [p["timestamp"] for p in points] == [_point(i)["timestamp"] for i in range(7)]
+
+    def test_concurrent_migration_inserts_buckets_once(self, monkeypatch):
+        monkeypatch.setattr(territory_tracks, "BUCKET_SIZE", 4)
+        db = FakeDB(unique={BUCKETS_COLLECTION: [("track_id", "seq")]})
+        legacy = {"_id": "old", "user_id": "u1", "is_active": True, "started_at": START,
+                  "points": [_point(i) for i in range(6)]}
+        db.territory_tracks.docs.append(legacy)
+
+        async def run():
+            return await asyncio.gather(
+                append_point(db, dict(legacy), _point(6)),
+                append_point(db, dict(legacy), _point(7)),
+                return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        # Le perdant n'insère rien et demande de réessayer (409)
+        assert sum(isinstance(r, RuntimeError) for r in results) == 1
+        assert db[BUCKETS_COLLECTION].ops.count("insert_many") == 1
+        track = db.territory_tracks.docs[0]
+        assert track["points_count"] == 7 and "migration_claimed_at" not in track
+
+    def test_expired_claim_is_taken_over(self, monkeypatch):
+        monkeypatch.setattr(territory_tracks, "BUCKET_SIZE", 4)
+        db = FakeDB(unique={BUCKETS_COLLECTION: [("track_id", "seq")]})
+        points = [_point(i) for i in range(6)]
+        # Migration interrompue: premier bucket écrit, tracé encore en ligne
+        db.territory_tracks.docs.append({
+            "_id": "old", "user_id": "u1", "is_active": True, "started_at": START, "points": points,
+            "migration_claimed_at": datetime.now(timezone.utc) - timedelta(minutes=5)
+        })
+        db[BUCKETS_COLLECTION].docs.append(territory_tracks.build_buckets("old", points)[0])
+
+        migrated = asyncio.run(territory_tracks.migrate_legacy_track(db, db.territory_tracks.docs[0]))
+        assert migrated is True
+        assert sorted(b["seq"] for b in db[BUCKETS_COLLECTION].docs) == [0, 1]
+        assert db.territory_tracks.docs[0]["points_count"] == 6
+
+
+class TestRangedRead:
+    """Tests des lectures par plage"""
+
+    def test_index_range_touches_only_overlapping_buckets(self, monkeypatch):
+        monkeypatch.setattr(territory_tracks, "BUCKET_SIZE", 10)
+        db = FakeDB()
+        _active_track(db)
+        asyncio.run(_record(db, "t1", 50))
+        track = db.territory_tracks.docs[0]
+
+        points = asyncio.run(read_points(db, track, start=15, limit=10))
+        assert [p["timestamp"].second for p in points] == list(range(15, 25))
+        assert all("n" not in p for p in points)
+
+        # Seuls les buckets 1 et 2 sont lus
+        assert db[BUCKETS_COLLECTION].queries[-1]["seq"] == {"$gte": 1, "$lte": 2}
+
+    def test_time_window(self, monkeypatch):
+        monkeypatch.setattr(territory_tracks, "BUCKET_SIZE", 10)
+        db = FakeDB()
+        _active_track(db)
+        asyncio.run(_record(db, "t1", 40))
+        track = db.territory_tracks.docs[0]
+
+        points = asyncio.run(read_points(
+            db, track, since=START + timedelta(seconds=8), until=START + timedelta(seconds=12)
+        ))
+        assert [p["timestamp"].second for p in points] == [8, 9, 10, 11, 12]
+
+    def test_iterate_and_delete(self):
+        db = FakeDB()
+        _active_track(db)
+        asyncio.run(_record(db, "t1", 3))
+        track = db.territory_tracks.docs[0]
+
+        async def collect():
+            return [p async for p in iter_points(db, track)]
+
+        assert len(asyncio.run(collect())) == 3
+        asyncio.run(delete_track_points(db, "t1"))
+        assert db[BUCKETS_COLLECTION].docs == []
@@ -0,0 +1,294 @@
+"""
+Tests Unitaires - Wallet Ledger
+===============================
+Tests du grand livre des portefeuilles: débit conditionnel atomique,
+transferts idempotents (reprise après interruption), règlement par lot
+des parrainages.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import HTTPException
+from pymongo.errors import OperationFailure
+
+import networking
+import networking_wallet as ledger
+from modules.admin_engine.services.networking_admin import NetworkingAdminService
+from conftest import FakeDB
+
+
+def _wallet(db, user_id):
+    return next(d for d in db.wallets.docs if d["user_id"] == user_id)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(networking, "db", fake)
+    monkeypatch.setattr(networking, "NOTIFICATIONS_ENABLED", False)
+    monkeypatch.setattr(ledger, "_transactions_supported", None)
+    # Index uniques (wallets.user_id, legs) déclarés par le module lui-même
+    monkeypatch.setattr(ledger, "_indexes_ready", False)
+    recorded = []
+
+    async def record(changes):
+        recorded.append(changes)
+
+    monkeypatch.setattr(networking, "_record_metrics", record)
+    fake.recorded = recorded
+    fake.wallets.docs.append(dict(networking._new_wallet_doc("alice"), balance_credits=100.0))
+    return fake
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestTransfers:
+    """Tests des transferts"""
+
+    def test_concurrent_transfers_never_overdraw(self, db):
+        async def one(i):
+            try:
+                return await networking.transfer_credits("alice", f"user{i % 3}", 10.0)
+            except HTTPException as e:
+                return e
+
+        results = asyncio.run(_gather(one, 15))
+        ok = [r for r in results if isinstance(r, dict)]
+        refused = [r for r in results if isinstance(r, HTTPException)]
+        assert len(ok) == 10 and len(refused) == 5
+        assert all(r.detail == "Insufficient balance" for r in refused)
+        assert _wallet(db, "alice")["balance_credits"] == 0
+        assert sum(_wallet(db, f"user{i}")["balance_credits"] for i in range(3)) == 100
+        assert len(db.wallet_transactions.docs) == 20
+        assert all(not w.get("pending_transfers") for w in db.wallets.docs)
+        assert sum(c.get("networking.wallets.total", 0) for c in db.recorded) == 3
+
+    def test_replay_is_idempotent(self, db):
+        async def run():
+            first = await networking.transfer_credits("alice", "bob", 25.0, transfer_id="t-1")
+            again = await networking.transfer_credits("alice", "bob", 25.0, transfer_id="t-1")
+            with pytest.raises(HTTPException) as reused:
+                await networking.transfer_credits("alice", "bob", 30.0, transfer_id="t-1")
+            return first, again, reused.value
+
+        first, again, reused = asyncio.run(run())
+        assert first == again
+        assert reused.status_code == 409
+        assert _wallet(db, "alice")["balance_credits"] == 75
+        assert _wallet(db, "bob")["balance_credits"] == 25
+        assert len(db.recorded) == 1
+
+    def test_interrupted_transfer_resumes_once(self, db, monkeypatch):
+        real_credit = ledger.credit
+
+        async def crashing_credit(*args, **kwargs):
+            raise RuntimeError("connexion perdue")
+
+        async def run():
+            monkeypatch.setattr(ledger, "credit", crashing_credit)
+            with pytest.raises(RuntimeError):
+                await ledger.transfer(db, "t-2", "alice", "bob", 40.0, "x", networking._new_wallet_doc)
+            debited = _wallet(db, "alice")["balance_credits"]
+            monkeypatch.setattr(ledger, "credit", real_credit)
+            result = await ledger.transfer(db, "t-2", "alice", "bob", 40.0, "x", networking._new_wallet_doc)
+            return debited, result
+
+        debited, result = asyncio.run(run())
+        assert debited == 60
+        assert _wallet(db, "alice")["balance_credits"] == 60
+        assert _wallet(db, "bob")["balance_credits"] == 40
+        assert result["from_balance"] == 60 and result["to_balance"] == 40
+        assert sorted(t["leg"] for t in db.wallet_transactions.docs) == ["credit", "debit"]
+        assert db[ledger.TRANSFERS_COLLECTION].docs[0]["status"] == "completed"
+
+    def test_concurrent_attempt_waits_for_the_claim_owner(self, db, monkeypatch):
+        real_debit = ledger.debit
+        debited = asyncio.Event()
+        resume = asyncio.Event()
+
+        async def slow_debit(*args, **kwargs):
+            before = await real_debit(*args, **kwargs)
+            debited.set()
+            await resume.wait()
+            return before
+
+        async def run():
+            monkeypatch.setattr(ledger, "debit", slow_debit)
+            first = asyncio.create_task(
+                ledger.transfer(db, "t-4", "alice", "bob", 25.0, "x", networking._new_wallet_doc))
+            await debited.wait()
+            monkeypatch.setattr(ledger, "debit", real_debit)
+            # Même transfer_id pendant l'application: refusé, rien n'est rejoué
+            with pytest.raises(ledger.TransferError) as busy:
+                await ledger.transfer(db, "t-4", "alice", "bob", 25.0, "x", networking._new_wallet_doc)
+            resume.set()
+            done = await first
+            again = await ledger.transfer(db, "t-4", "alice", "bob", 25.0, "x", networking._new_wallet_doc)
+            return busy.value, done, again
+
+        busy, done, again = asyncio.run(run())
+        assert busy.status_code == 409
+        assert done["replayed"] is False and again["replayed"] is True
+        assert _wallet(db, "alice")["balance_credits"] == 75
+        assert _wallet(db, "bob")["balance_credits"] == 25
+        assert len(db.wallet_transactions.docs) == 2
+        assert all(not w.get("pending_transfers") for w in db.wallets.docs)
+
+    def test_expired_claim_is_taken_over(self, db, monkeypatch):
+        real_credit = ledger.credit
+
+        async def crashing_credit(*args, **kwargs):
+            raise RuntimeError("processus arrêté")
+
+        async def noop(*args, **kwargs):
+            pass
+
+        async def run():
+            # Processus mort: la réservation n'est jamais rendue
+            monkeypatch.setattr(ledger, "credit", crashing_credit)
+            monkeypatch.setattr(ledger, "_unclaim", noop)
+            with pytest.raises(RuntimeError):
+                await ledger.transfer(db, "t-5", "alice", "bob", 40.0, "x", networking._new_wallet_doc)
+            monkeypatch.setattr(ledger, "credit", real_credit)
+            with pytest.raises(ledger.TransferError):
+                await ledger.transfer(db, "t-5", "alice", "bob", 40.0, "x", networking._new_wallet_doc)
+            monkeypatch.setattr(ledger, "CLAIM_TTL", 0)
+            return await ledger.transfer(db, "t-5", "alice", "bob", 40.0, "x", networking._new_wallet_doc)
+
+        result = asyncio.run(run())
+        assert result["from_balance"] == 60 and result["to_balance"] == 40
+        assert _wallet(db, "alice")["balance_credits"] == 60
+        assert _wallet(db, "bob")["balance_credits"] == 40
+
+    def test_standalone_server_falls_back_without_transaction(self, db):
+        class NoTransactions:
+            async def start_session(self):
+                raise OperationFailure("Transaction numbers are only allowed on a replica set member or mongos", 20)
+
+        class StandaloneDB(FakeDB):
+            client = NoTransactions()
+
+        standalone = StandaloneDB()
+        standalone.collections = db.collections
+        result = asyncio.run(ledger.transfer(standalone, "t-3", "alice", "bob", 5.0, "x", networking._new_wallet_doc))
+        assert ledger._transactions_supported is False
+        assert result["to_balance"] == 5
+
+
+class TestReferralSettlement:
+    """Tests du règlement des parrainages"""
+
+    def _referrals(self, db, n):
+        db.referrals.docs = [
+            {"id": f"r{i}", "referrer_id": "parrain", "referee_id": f"filleul{i}", "status": "pending",
+             "referrer_reward_amount": 10.0, "referee_reward_amount": 5.0}
+            for i in range(n)
+        ]
+
+    def test_batch_settlement_credits_each_wallet_once(self, db):
+        self._referrals(db, 5)
+
+        async def run():
+            first = await networking.settle_pending_referrals(referral_ids=None, settlement_id=None, limit=500)
+            second = await networking.settle_pending_referrals(referral_ids=None, settlement_id=None, limit=500)
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first["settled"] == 5 and first["total_rewards"] == 75
+        assert second["settled"] == 0
+        assert _wallet(db, "parrain")["balance_credits"] == 50
+        legs = [t for t in db.wallet_transactions.docs if t["user_id"] == "parrain"]
+        assert [t["balance_after"] for t in legs] == [10, 20, 30, 40, 50]
+        assert all(r["status"] == "rewarded" for r in db.referrals.docs)
+        assert db.recorded[-1]["networking.referrals.by_status.rewarded"] == 5
+
+    def test_concurrent_verifications_pay_once(self, db):
+        self._referrals(db, 1)
+
+        async def one():
+            try:
+                return await networking.verify_referral("r0")
+            except HTTPException as e:
+                return e
+
+        results = asyncio.run(_gather(lambda _: one(), 3))
+        assert sum(1 for r in results if isinstance(r, dict)) >= 1
+        assert _wallet(db, "parrain")["balance_credits"] == 10
+        assert _wallet(db, "filleul0")["balance_credits"] == 5
+        assert len(db.wallet_transactions.docs) == 2
+
+    def test_admin_verification_goes_through_the_ledger(self, db, monkeypatch):
+        self._referrals(db, 1)
+        recorded = []
+
+        async def record(_, changes):
+            recorded.append(changes)
+
+        monkeypatch.setattr("modules.admin_engine.services.networking_admin.MetricsAdminService.record", record)
+
+        async def run():
+            # Validation admin et validation publique en même temps
+            return await asyncio.gather(
+                NetworkingAdminService.verify_referral(db, "r0"),
+                networking.verify_referral("r0"),
+                return_exceptions=True
+            )
+
+        admin, public = asyncio.run(run())
+        paid = int(admin["success"]) + int(isinstance(public, dict))
+        assert paid == 1
+        assert [w["user_id"] for w in db.wallets.docs].count("filleul0") == 1
+        assert _wallet(db, "parrain")["balance_credits"] == 10
+        assert _wallet(db, "filleul0")["balance_credits"] == 5
+        assert db.referrals.docs[0]["settlement_id"] == "referral_r0"
+        if admin["success"]:
+            assert recorded[0]["networking.wallets.total"] == 2
+
+    def test_orphaned_settlement_is_resumed_by_the_next_batch(self, db, monkeypatch):
+        self._referrals(db, 4)
+        real_credit = ledger.credit
+        credits = []
+
+        async def crash_after_first(*args, **kwargs):
+            credits.append(args[1])
+            if len(credits) > 1:
+                raise RuntimeError("processus arrêté")
+            return await real_credit(*args, **kwargs)
+
+        async def noop(*args, **kwargs):
+            pass
+
+        async def run():
+            monkeypatch.setattr(ledger, "credit", crash_after_first)
+            monkeypatch.setattr(ledger, "_unclaim", noop)
+            with pytest.raises(RuntimeError):
+                await networking.settle_pending_referrals(referral_ids=["r0", "r1"], settlement_id=None, limit=500)
+            monkeypatch.setattr(ledger, "credit", real_credit)
+            monkeypatch.setattr(ledger, "CLAIM_TTL", 0)
+            return await networking.settle_pending_referrals(referral_ids=None, settlement_id=None, limit=500)
+
+        result = asyncio.run(run())
+        # Règlement interrompu repris, puis les parrainages restants
+        assert result["settled"] == 2
+        assert all(r["status"] == "rewarded" for r in db.referrals.docs)
+        assert _wallet(db, "parrain")["balance_credits"] == 40
+        assert all(_wallet(db, f"filleul{i}")["balance_credits"] == 5 for i in range(4))
+        assert len(db.wallet_transactions.docs) == 8
+        assert sum(c.get("networking.referrals.by_status.rewarded", 0) for c in db.recorded) == 4
+        assert all(not w.get("pending_transfers") for w in db.wallets.docs)
+        settlements = db[ledger.SETTLEMENTS_COLLECTION].docs
+        assert len(settlements) == 2 and all(s["status"] == "completed" for s in settlements)
+
+
+async def _gather(factory, n):
+    return await asyncio.gather(*(factory(i) for i in range(n)))
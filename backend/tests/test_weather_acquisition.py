@@ -0,0 +1,120 @@
+"""
+Tests Unitaires - Weather Acquisition
+=====================================
+Tests de la couche d'acquisition météo (cellules de grille, cache borné
+LRU + TTL, regroupement des requêtes en vol, lot de points) avec le
+fournisseur local FakeWeatherProvider.
+
+Version: 1.0.0
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.weather_engine.v1.external_service import OpenWeatherMapService, grid_cell
+from modules.weather_engine.v1.providers import FakeWeatherProvider, OpenWeatherMapProvider
+
+
+@pytest.fixture
+def provider():
+    return FakeWeatherProvider(delay=0.01)
+
+
+@pytest.fixture
+def service(provider):
+    return OpenWeatherMapService(provider=provider, cache_size=3)
+
+
+# ==============================================
+# TESTS
+# ==============================================
+
+class TestGridCells:
+    """Tests de la quantification des coordonnées"""
+
+    def test_nearby_points_share_a_cell(self):
+        assert grid_cell(46.8131, -71.2075) == grid_cell(46.8139, -71.2071) == (46.815, -71.205)
+        assert grid_cell(46.8131, -71.2075) != grid_cell(46.8231, -71.2075)
+        assert grid_cell(-0.004, 0.004, step=0.1) == (-0.05, 0.05)
+
+
+class TestCache:
+    """Tests du cache borné"""
+
+    def test_cache_hit_and_bounded_size(self, service, provider):
+        async def run():
+            first = await service.get_full_weather(46.8131, -71.2075)
+            again = await service.get_full_weather(46.8139, -71.2071)
+            for i in range(5):
+                await service.get_full_weather(47 + i * 0.1, -71.0)
+            return first, again
+
+        first, again = asyncio.run(run())
+        assert again is first
+        assert len(provider.calls) == 6
+        assert provider.calls[0] == (46.815, -71.205)
+        stats = service.stats()
+        assert stats["size"] == 3 and stats["hits"] == 1
+        assert first.location.lat == 46.815
+
+    def test_failure_falls_back_to_simulated(self):
+        service = OpenWeatherMapService(provider=FakeWeatherProvider(fail=True))
+        result = asyncio.run(service.get_full_weather(46.8, -71.2))
+        assert result.success is True
+        assert "Données simulées" in result.hunting_analysis.recommendations[0]
+
+
+class TestCoalescing:
+    """Tests du regroupement des requêtes concurrentes"""
+
+    def test_concurrent_requests_share_one_fetch(self, service, provider):
+        async def run():
+            return await asyncio.gather(*(service.get_full_weather(46.8131, -71.2075) for _ in range(20)))
+
+        results = asyncio.run(run())
+        assert len(provider.calls) == 1
+        assert all(r is results[0] for r in results)
+        assert service.stats()["coalesced"] == 19
+        assert service.stats()["inflight"] == 0
+
+    def test_cancelled_caller_does_not_cancel_shared_fetch(self, service, provider):
+        async def run():
+            first = asyncio.create_task(service.get_full_weather(46.8131, -71.2075))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(service.get_full_weather(46.8131, -71.2075))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        result = asyncio.run(run())
+        assert result.success is True
+        assert len(provider.calls) == 1
+
+
+class TestBatch:
+    """Tests de l'API par lot"""
+
+    def test_batch_resolves_unique_cells_in_order(self, provider):
+        service = OpenWeatherMapService(provider=provider)
+        points = [(46.8131, -71.2075), (48.4, -68.5), (46.8139, -71.2071), (46.8131, -71.2075)]
+        results = asyncio.run(service.get_weather_batch(points))
+        assert len(results) == 4
+        assert results[0] is results[2] is results[3]
+        assert results[1] is not results[0]
+        assert len(provider.calls) == 2
+
+    def test_provider_shares_one_client(self):
+        owm = OpenWeatherMapProvider(api_key="k")
+
+        async def run():
+            client = owm._get_client()
+            same = owm._get_client() is client
+            await owm.close()
+            return same
+
+        assert asyncio.run(run()) is True
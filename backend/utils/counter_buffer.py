@@ -0,0 +1,187 @@
+"""
+Counter Buffer - Compteurs tamponnés en mémoire
+===============================================
+
+Accumule des incréments ($inc) par document et les vide périodiquement
+en un seul bulk_write non ordonné par collection. Utilisé pour les
+compteurs d'engagement sur les chemins de lecture chauds (impressions
+publicitaires, vues produits...).
+
+La perte maximale en cas d'arrêt brutal est bornée par l'intervalle de
+vidage et par le nombre de documents en attente (max_pending déclenche
+un vidage anticipé). Un arrêt propre appelle stop() qui vide le reste.
+"""
+
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from collections import defaultdict
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de vidage par défaut (secondes)
+DEFAULT_FLUSH_INTERVAL = 10
+
+# Nombre de documents en attente déclenchant un vidage anticipé
+DEFAULT_MAX_PENDING = 5000
+
+
+class CounterBuffer:
+    """
+    Compteurs en mémoire coalescés par (collection, champ clé, valeur).
+
+    increment() ne fait aucune I/O; flush() envoie un UpdateOne $inc par
+    document modifié, regroupés par collection. Un échec ne réinjecte que
+    les deltas non appliqués (collection en erreur, ou opérations citées
+    dans writeErrors), sans bloquer les autres collections.
+    """
+
+    def __init__(
+        self,
+        name: str = "counters",
+        flush_interval: int = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING
+    ):
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[str, str, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._flush_task: Optional[asyncio.Task] = None
+        self._early_flush: Optional[asyncio.Task] = None
+        self._db = None
+        self.flushed_ops = 0
+        self.failed_flushes = 0
+        # Somme des incréments persistés par ce processus, par (collection, champ)
+        self._flushed_totals: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def increment(self, collection: str, key_field: str, key_value: str, field: str, amount: int = 1):
+        """Enregistrer un incrément sans I/O"""
+        if not key_value:
+            return
+        self._pending[(collection, key_field, key_value)][field] += amount
+        if len(self._pending) >= self.max_pending:
+            self._schedule_early_flush()
+
+    def pending(self, collection: str, key_field: str, key_value: str) -> Dict[str, int]:
+        """Deltas non encore persistés pour un document"""
+        return dict(self._pending.get((collection, key_field, key_value), {}))
+
+    def merge_pending(self, doc: Dict, collection: str, key_field: str) -> Dict:
+        """Ajouter les deltas en attente aux compteurs d'un document lu"""
+        for field, amount in self.pending(collection, key_field, doc.get(key_field)).items():
+            doc[field] = doc.get(field, 0) + amount
+        return doc
+
+    def pending_totals(self, collection: str, fields: Iterable[str]) -> Dict[str, int]:
+        """Somme des deltas en attente d'une collection, par champ"""
+        totals = {field: 0 for field in fields}
+        for (coll, _, _), deltas in self._pending.items():
+            if coll == collection:
+                for field in totals:
+                    totals[field] += deltas.get(field, 0)
+        return totals
+
+    def flushed_totals(self, collection: str, fields: Iterable[str]) -> Dict[str, int]:
+        """Somme des incréments déjà persistés par ce processus, par champ"""
+        return {field: self._flushed_totals[(collection, field)] for field in fields}
+
+    def start(self, db):
+        """Démarrer la boucle de vidage périodique (idempotent)"""
+        self._db = db
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+            except RuntimeError:
+                # Pas de boucle active (ex: import hors serveur)
+                self._flush_task = None
+
+    def _schedule_early_flush(self):
+        if self._db is None or (self._early_flush is not None and not self._early_flush.done()):
+            return
+        try:
+            self._early_flush = asyncio.get_running_loop().create_task(self._safe_flush())
+        except RuntimeError:
+            self._early_flush = None
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.warning(f"{self.name} counter flush failed: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._safe_flush()
+
+    async def flush(self, db=None) -> int:
+        """Persister les compteurs accumulés; retourne le nombre d'opérations"""
+        db = db if db is not None else self._db
+        if db is None or not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+
+        entries_by_collection: Dict[str, List[Tuple[Tuple[str, str, str], Dict[str, int]]]] = defaultdict(list)
+        for key, fields in pending.items():
+            entries_by_collection[key[0]].append((key, dict(fields)))
+
+        total = 0
+        error: Optional[Exception] = None
+        for collection, entries in entries_by_collection.items():
+            ops = [
+                UpdateOne({key_field: key_value}, {"$inc": fields})
+                for (_, key_field, key_value), fields in entries
+            ]
+            try:
+                await db[collection].bulk_write(ops, ordered=False)
+                failed = set()
+            except BulkWriteError as e:
+                # Non ordonné: seules les opérations en erreur n'ont pas été appliquées
+                failed = {err["index"] for err in e.details.get("writeErrors", [])}
+                error = error or e
+            except Exception as e:
+                failed = set(range(len(entries)))
+                error = error or e
+
+            for index, (key, fields) in enumerate(entries):
+                if index in failed:
+                    # Réinjecter les deltas pour la prochaine tentative
+                    for field, amount in fields.items():
+                        self._pending[key][field] += amount
+                    continue
+                total += 1
+                for field, amount in fields.items():
+                    self._flushed_totals[(collection, field)] += amount
+
+        self.flushed_ops += total
+        if error is not None:
+            # Les autres collections ont été vidées; l'échec reste signalé
+            raise error
+        return total
+
+    async def stop(self):
+        """Arrêter la boucle et vider les compteurs restants"""
+        for task in (self._flush_task, self._early_flush):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._flush_task = None
+        self._early_flush = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_documents": len(self._pending),
+            "flush_interval": self.flush_interval,
+            "max_pending": self.max_pending,
+            "flushed_ops": self.flushed_ops,
+            "failed_flushes": self.failed_flushes,
+            "running": self._flush_task is not None and not self._flush_task.done()
+        }
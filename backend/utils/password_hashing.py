@@ -0,0 +1,155 @@
+"""
+Password Hashing - bcrypt hors de la boucle d'événements
+========================================================
+
+bcrypt coûte ~250 ms de CPU par appel au facteur 12: exécuté directement
+dans un handler async, il bloque toutes les requêtes du worker. Ici le
+hachage et la vérification passent par un pool de threads dédié et borné
+(bcrypt libère le GIL).
+
+- Contre-pression: au-delà de HASH_MAX_PENDING tâches en attente, l'appel
+  échoue immédiatement (HashingOverloaded → 503) au lieu de s'empiler
+- Limite de connexions simultanées par IP (TooManyLoginAttempts → 429)
+- verify_and_update(): un hachage dont le facteur de coût est inférieur
+  à BCRYPT_ROUNDS est recalculé après une connexion réussie
+"""
+
+from typing import Optional, Dict, Any, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", min(4, os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.environ.get("HASH_MAX_PENDING", 64))
+LOGIN_MAX_CONCURRENT_PER_IP = int(os.environ.get("LOGIN_MAX_CONCURRENT_PER_IP", 3))
+
+
+def build_context(rounds: int = BCRYPT_ROUNDS) -> CryptContext:
+    """Contexte passlib; min_rounds marque les hachages plus faibles comme à mettre à jour"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds
+    )
+
+
+class HashingOverloaded(Exception):
+    """File du pool bcrypt pleine"""
+
+
+class TooManyLoginAttempts(Exception):
+    """Trop de connexions simultanées pour une même IP"""
+
+
+class PasswordHasher:
+    """Pool de threads borné pour bcrypt (hachage et vérification)"""
+
+    def __init__(
+        self,
+        context: Optional[CryptContext] = None,
+        workers: int = HASH_WORKERS,
+        max_pending: int = HASH_MAX_PENDING
+    ):
+        self.context = context or build_context()
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        # _pending n'est modifié que depuis la boucle: pas de verrou nécessaire
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingOverloaded()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self._pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Vérifier et, si le facteur de coût est dépassé, recalculer.
+
+        Returns:
+            (valide, nouveau_hachage ou None)
+        """
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        if valid and new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "rounds": BCRYPT_ROUNDS
+        }
+
+
+class LoginConcurrencyLimiter:
+    """Nombre maximal de connexions en cours par IP cliente"""
+
+    def __init__(self, max_per_ip: int = LOGIN_MAX_CONCURRENT_PER_IP):
+        self.max_per_ip = max_per_ip
+        self._active: Dict[str, int] = defaultdict(int)
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self, ip_address: Optional[str]):
+        key = ip_address or "unknown"
+        if self._active[key] >= self.max_per_ip:
+            self.rejected += 1
+            raise TooManyLoginAttempts()
+        self._active[key] += 1
+        try:
+            yield
+        finally:
+            self._active[key] -= 1
+            if self._active[key] <= 0:
+                del self._active[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_per_ip": self.max_per_ip,
+            "active_ips": len(self._active),
+            "rejected": self.rejected
+        }
+
+
+password_hasher = PasswordHasher()
+login_limiter = LoginConcurrencyLimiter()
@@ -0,0 +1,224 @@
+"""
+Principal Cache - Résolution des jetons JWT en utilisateurs
+===========================================================
+
+Cache borné (LRU + TTL) jeton → instantané utilisateur, partagé par les
+dépendances d'authentification (auth_engine, roles_engine). Un succès de
+cache évite à la fois le décodage JWT et le find_one sur `users`.
+
+- Les entrées expirent au plus tôt entre le TTL et l'expiration du jeton
+- invalidate_user() à chaque changement de rôle, désactivation ou
+  changement de mot de passe
+- revoke_token() à la déconnexion: cache négatif en mémoire + collection
+  `revoked_tokens` (index TTL) consultée en cas d'absence du cache, pour
+  que les autres workers refusent aussi le jeton
+
+Chaque worker a son propre cache: un changement de rôle fait dans un
+autre processus est visible au plus tard après PRINCIPAL_CACHE_TTL.
+"""
+
+from typing import Optional, Dict, Any, Set
+from collections import OrderedDict
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CACHE_TTL = int(os.environ.get("PRINCIPAL_CACHE_TTL", 60))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", 10000))
+
+# Durée par défaut du cache négatif si le jeton n'a pas d'expiration
+REVOKED_DEFAULT_TTL = 24 * 3600
+
+REVOKED_COLLECTION = "revoked_tokens"
+
+# Champs jamais conservés dans l'instantané
+_SENSITIVE_FIELDS = ("password_hash", "_id")
+
+
+class TokenRevoked(Exception):
+    """Jeton révoqué (déconnexion)"""
+
+
+def token_key(token: str) -> str:
+    """Empreinte du jeton (le jeton brut n'est jamais conservé)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class PrincipalCache:
+    """
+    Instantanés utilisateur par jeton, avec index par user_id pour
+    l'invalidation et cache négatif des jetons révoqués.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: int = PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._revoked: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revoked_hits = 0
+        self.invalidations = 0
+
+    # ------------------------------------------
+    # Lecture
+    # ------------------------------------------
+
+    def lookup(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Instantané utilisateur en cache, ou None si absent.
+
+        Raises:
+            TokenRevoked: jeton présent dans le cache négatif
+        """
+        key = token_key(token)
+        now = time.time()
+
+        revoked_until = self._revoked.get(key)
+        if revoked_until is not None:
+            if revoked_until > now:
+                self.revoked_hits += 1
+                raise TokenRevoked()
+            del self._revoked[key]
+
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= now:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[0])
+
+    # ------------------------------------------
+    # Écriture
+    # ------------------------------------------
+
+    def put(self, token: str, user: Dict[str, Any], token_exp: Optional[float] = None):
+        key = token_key(token)
+        expires_at = time.time() + self.ttl
+        if token_exp:
+            expires_at = min(expires_at, float(token_exp))
+
+        snapshot = {k: v for k, v in user.items() if k not in _SENSITIVE_FIELDS}
+        if key in self._entries:
+            self._drop(key)
+        elif len(self._entries) >= self.maxsize:
+            self._drop(next(iter(self._entries)))
+
+        self._entries[key] = (snapshot, expires_at, snapshot.get("user_id"))
+        if snapshot.get("user_id"):
+            self._by_user.setdefault(snapshot["user_id"], set()).add(key)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry[2]]
+
+    def invalidate_user(self, user_id: Optional[str] = None, email: Optional[str] = None) -> int:
+        """Oublier tous les jetons d'un utilisateur (rôle, désactivation, mot de passe)"""
+        keys = set(self._by_user.get(user_id, ())) if user_id else set()
+        if email:
+            email = email.lower()
+            keys |= {k for k, e in self._entries.items() if (e[0].get("email") or "").lower() == email}
+        for key in keys:
+            self._drop(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def invalidate_all(self) -> int:
+        """Oublier tous les instantanés (écriture de masse sur les rôles); les révocations restent"""
+        count = len(self._entries)
+        self._entries.clear()
+        self._by_user.clear()
+        self.invalidations += count
+        return count
+
+    def mark_revoked(self, token: str, token_exp: Optional[float] = None):
+        key = token_key(token)
+        self._drop(key)
+        if len(self._revoked) >= self.maxsize:
+            self._revoked.popitem(last=False)
+        self._revoked[key] = float(token_exp) if token_exp else time.time() + REVOKED_DEFAULT_TTL
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+        self._revoked.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "revoked_size": len(self._revoked),
+            "revoked_hits": self.revoked_hits,
+            "invalidations": self.invalidations
+        }
+
+
+principal_cache = PrincipalCache()
+
+
+# ==============================================
+# RÉSOLUTION (ABSENCE DU CACHE)
+# ==============================================
+
+async def resolve_principal(db, token: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Charger l'utilisateur d'un jeton déjà décodé et le mettre en cache.
+
+    La lecture de l'utilisateur et la vérification de révocation partent
+    en parallèle (un seul aller-retour de latence).
+
+    Raises:
+        TokenRevoked: le jeton a été révoqué (éventuellement par un autre worker)
+    """
+    user_id = payload.get("sub")
+    if not user_id:
+        return None
+
+    user, revoked = await asyncio.gather(
+        db["users"].find_one({"user_id": user_id}, {"_id": 0}),
+        db[REVOKED_COLLECTION].find_one({"_id": token_key(token)}, {"_id": 1})
+    )
+    if revoked:
+        principal_cache.mark_revoked(token, payload.get("exp"))
+        raise TokenRevoked()
+    if not user:
+        return None
+
+    principal_cache.put(token, user, payload.get("exp"))
+    user.pop("password_hash", None)
+    return user
+
+
+async def revoke_token(db, token: str, token_exp: Optional[float] = None):
+    """Révoquer un jeton (déconnexion) pour ce worker et les autres"""
+    principal_cache.mark_revoked(token, token_exp)
+    expires_at = (
+        datetime.fromtimestamp(float(token_exp), tz=timezone.utc) if token_exp
+        else datetime.fromtimestamp(time.time() + REVOKED_DEFAULT_TTL, tz=timezone.utc)
+    )
+    await db[REVOKED_COLLECTION].update_one(
+        {"_id": token_key(token)},
+        {"$set": {"expires_at": expires_at, "revoked_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )